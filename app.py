@@ -1,64 +1,21 @@
-import streamlit as st
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
-import openai
 import os
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.errors import NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
-
-# YouTube APIキーの設定
-YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
-
-# OpenAI APIキーの設定
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-openai.api_key = OPENAI_API_KEY
-
-def get_video_transcript(video_id):
-    youtube = build("youtube", "v3", developerKey=YOUTUBE_API_KEY)
-    try:
-        response = youtube.captions().list(
-            part="snippet",
-            videoId=video_id
-        ).execute()
-        captions = response.get("items", [])
-        if not captions:
-            return None
-        caption_id = captions[0]["id"]
-        caption = youtube.captions().download(
-            id=caption_id,
-            tfmt="srt"
-        ).execute()
-        return caption.decode("utf-8")
-    except HttpError as e:
-        error_message = str(e)
-        if "subtitles" in error_message.lower():
-            st.error("要約処理に失敗したわ〜💦 エラー: 😢 この動画には字幕がないみたい…他の動画を試してみてね！😢")
-        else:
-            st.error(f"""
-            ### あちゃー！😱 要約処理に失敗しちゃった！
-
-            **もしかして、YouTubeのAPIレート制限にぶち当たっちゃったかも〜！** 💔
-            
-            デプロイ環境だとYouTube APIの使用回数制限があるから、アクセスが集中すると制限かかっちゃうねん！😫
-            
-            ### 対処法 💪
-            - 数分待ってからもう一回試してみて〜 ⏰
-            - 別の動画URLで試してみるのもアリやで〜 🎬
-            - 何回も失敗するなら、しばらく時間置いてからにしてみてね〜 🕒
-            
-            エラー詳細: {error_message}
-            """)
-        print(f"Error occurred: {error_message}")
-        return None
-
-def summarize_text(text):
-    response = openai.Completion.create(
-        engine="davinci",
-        prompt=f"次のテキストを要約してください:\n\n{text}",
-        max_tokens=150
-    )
-    summary = response.choices[0].text.strip()
-    return summary
+import logging
+import streamlit as st
+
+from backend.env import load_environment
+
+# 🌱 APIキーなどを読むから、パイプラインを読み込む前に.envを読む
+load_environment(os.path.dirname(__file__))
+
+from backend.services.llm import SummaryService
+from backend.services.scheduler import PRIORITY_INTERACTIVE
+from backend.services.youtube import CaptionFetchError
+# 🏭 要約の流れはバックエンド・フロントエンドと共通のパイプラインで動かす
+from shared.pipeline import STOPPED_AT
+from shared.summary_pipeline import get_summary_pipeline, run_summary_pipeline, InvalidVideoURLError
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
 
 def main():
     st.title("YouTube動画要約アプリ 🎥✨")
@@ -74,97 +31,89 @@ def main():
         if youtube_url:
             with st.spinner("要約中やで...ちょっと待ってな！🔍"):
                 try:
-                    # YouTubeのビデオIDを取得
-                    video_id = extract_video_id(youtube_url)
-                    if not video_id:
-                        st.error("😓 有効なYouTube URLじゃないみたい...もう一度確認してな！")
-                        return
-                    
-                    # 字幕を取得
-                    try:
-                        transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=['ja', 'en'])
-                    except NoTranscriptFound:
+                    # URL → 字幕 → 予算 → プロンプト → LLM → 保存 を共通パイプラインで流す
+                    context = run_summary_pipeline(
+                        get_summary_pipeline(), SummaryService(PRIORITY_INTERACTIVE), url=youtube_url, options={}
+                    )
+                    if context.get(STOPPED_AT):
                         st.error("😢 この動画には字幕がないみたい…他の動画を試してみてね！💔")
                         return
-                    except TranscriptsDisabled:
-                        st.error("🔒 この動画は字幕が無効になっとるわ！別の動画を試してみてな！")
-                        return
-                    except VideoUnavailable:
-                        st.error("⛔ この動画は見れへんわ...削除されたか非公開になってるかも！")
-                        return
-                    except Exception as e:
-                        st.error(f"😭 API制限にかかったかも！少し時間おいてから試してみて！\nエラー詳細: {str(e)}")
-                        return
-                    
-                    # ...existing code...
-                    
+                    st.markdown(context["summary"])
+                except InvalidVideoURLError:
+                    st.error("😓 有効なYouTube URLじゃないみたい...もう一度確認してな！")
+                except CaptionFetchError as e:
+                    logger.error("🎬 字幕取得エラー: %s", e)
+                    st.error("😢 この動画の字幕が取れへんかった…他の動画を試してみてね！💔")
                 except Exception as e:
-                    st.error(f"要約処理に失敗したわ〜💦 エラー: {str(e)}")
+                    show_error(e)
         else:
             st.warning("URLを入力してからボタン押してな〜！🙏")
 
-    try:
-        # 要約処理の実行部分
-        pass
-    except Exception as e:
-        error_message = str(e).lower()
-        
-        # 💁‍♀️ エラーメッセージを詳細に場合分け
-        if "quota" in error_message or "rate" in error_message or "limit" in error_message:
-            # レート制限エラーの場合
-            st.error("""
-            ## 🚫 API制限に引っかかったみたい〜！😭
-
-            **YouTube API のレート制限に達しちゃったわ！** これよくあるやつ〜！
-
-            ### 💡 対処法：
-            - しばらく待って（30分〜1時間くらい）からもう一回試してみて！⏰
-            - 同じURLで連続して試さないでね！🙅‍♀️
-            - 今日はもう無理かも...明日また来てね〜💕
-
-            技術的に言うと：YouTube Data API の1日の割り当て量を使い切っちゃったのよ〜！
-            """)
-            # デバッグ用にログ出力
-            print(f"Rate limit error occurred: {error_message}")
-            
-        elif "subtitle" in error_message or "captions" in error_message:
-            # 字幕が存在しない場合
-            st.error("要約処理に失敗したわ〜💦 エラー: 😢 この動画には字幕がないみたい…他の動画を試してみてね！😢")
-            # デバッグ用にログ出力
-            print(f"No subtitles error: {error_message}")
-            
-        elif "network" in error_message or "connect" in error_message:
-            # ネットワークエラーの場合
-            st.error("""
-            ## 📶 ネットワークエラー発生！😵
-
-            YouTubeサーバーに接続できへんかったみたい...
-
-            ### 💪 試してみて：
-            - ちょっと待ってからリロードしてみて！🔄
-            - インターネット接続を確認してみて〜📱
-            
-            YouTubeさんのサーバーが忙しいのかも...💭
-            """)
-            # デバッグ用にログ出力
-            print(f"Network error: {error_message}")
-            
-        else:
-            # その他のエラー
-            st.error(f"""
-            ## 😱 なんかエラー出ちゃった！
+def show_error(e: Exception) -> None:
+    """
+    要約に失敗したときに、原因っぽいものに合わせてエラーを出すよ〜🚨
 
-            予期せぬエラーが発生したっぽい...ごめんね〜！💦
+    引数:
+        e (Exception): 起きた例外
+    """
+    error_message = str(e).lower()
+    
+    # 💁‍♀️ エラーメッセージを詳細に場合分け
+    if "quota" in error_message or "rate" in error_message or "limit" in error_message:
+        # レート制限エラーの場合
+        st.error("""
+        ## 🚫 API制限に引っかかったみたい〜！😭
+
+        **YouTube API のレート制限に達しちゃったわ！** これよくあるやつ〜！
+
+        ### 💡 対処法：
+        - しばらく待って（30分〜1時間くらい）からもう一回試してみて！⏰
+        - 同じURLで連続して試さないでね！🙅‍♀️
+        - 今日はもう無理かも...明日また来てね〜💕
+
+        技術的に言うと：YouTube Data API の1日の割り当て量を使い切っちゃったのよ〜！
+        """)
+        # ログにも残しとくよ
+        logger.warning("⏱️ レート制限エラー: %s", e)
+        
+    elif "subtitle" in error_message or "captions" in error_message:
+        # 字幕が存在しない場合
+        st.error("要約処理に失敗したわ〜💦 エラー: 😢 この動画には字幕がないみたい…他の動画を試してみてね！😢")
+        # ログにも残しとくよ
+        logger.warning("😢 字幕なしエラー: %s", e)
+        
+    elif "network" in error_message or "connect" in error_message:
+        # ネットワークエラーの場合
+        st.error("""
+        ## 📶 ネットワークエラー発生！😵
 
-            ### 🔍 原因かも？：
-            - URLが間違ってるかも？🔗
-            - 非公開動画かも？🔒
-            - 別の動画で試してみて！🎬
+        YouTubeサーバーに接続できへんかったみたい...
 
-            エラー詳細：{str(e)}
-            """)
-            # デバッグ用にログ出力
-            print(f"Unknown error: {error_message}")
+        ### 💪 試してみて：
+        - ちょっと待ってからリロードしてみて！🔄
+        - インターネット接続を確認してみて〜📱
+        
+        YouTubeさんのサーバーが忙しいのかも...💭
+        """)
+        # ログにも残しとくよ
+        logger.error("📶 ネットワークエラー: %s", e)
+        
+    else:
+        # その他のエラー
+        st.error(f"""
+        ## 😱 なんかエラー出ちゃった！
+
+        予期せぬエラーが発生したっぽい...ごめんね〜！💦
+
+        ### 🔍 原因かも？：
+        - URLが間違ってるかも？🔗
+        - 非公開動画かも？🔒
+        - 別の動画で試してみて！🎬
+
+        エラー詳細：{str(e)}
+        """)
+        # ログにも残しとくよ
+        logger.error("🚨 よく分からんエラー: %s", e)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
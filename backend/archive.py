@@ -0,0 +1,150 @@
+"""
+🗄️ 字幕アーカイブのコマンドだよ〜✨（プロンプトを変えたときの全件作り直し用）
+
+    python -m backend.archive export                   # ストアの字幕をアーカイブに書き出す（入ってる動画は飛ばす）
+    python -m backend.archive reprocess --concurrency 8
+    python -m backend.archive reprocess --options "explanation=exclude;length=short;style=gal"
+    python -m backend.archive stats
+
+- export: ライブラリストアに保存された字幕（期限切れも含む）をカラム型アーカイブに追記する
+- reprocess: アーカイブの字幕を1本ずつ読んで要約し直す（YouTubeには取りに行かない）。
+  オプションを指定しなければ、その動画で保存されてた要約のオプションを全部作り直す
+- アーカイブの場所は TRANSCRIPT_ARCHIVE_DIR（デフォルトは data/archive）
+"""
+import os
+import sys
+import time
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Set
+
+from .env import load_environment
+
+# 🌱 APIキーなどを読むから、いちばん最初に.envを読む
+load_environment(os.path.dirname(__file__))
+
+from .logging_config import setup_logging
+from .services.scheduler import PRIORITY_BULK
+from .services.store import get_store, parse_options_key
+from .services.transcript_archive import TranscriptArchive, ARCHIVE_DIR
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+REPROCESS_CONCURRENCY = int(os.getenv("REPROCESS_CONCURRENCY", "4"))  # 同時に投げる要約の数（LLMの枠に合わせる）
+PROGRESS_EVERY = 100  # 何件ごとに進み具合をログに出すか
+
+
+def export_from_store(archive: TranscriptArchive, force: bool = False) -> Dict[str, int]:
+    """
+    ライブラリストアの字幕をアーカイブに書き出すよ〜📤
+
+    引数:
+        archive (TranscriptArchive): 書き出し先
+        force (bool): Trueならアーカイブに入ってる動画も書き直す
+
+    戻り値:
+        Dict[str, int]: exported / skipped
+    """
+    existing: Set[str] = set() if force else archive.video_ids()
+    exported = skipped = 0
+    for video_id, segments, language in get_store().iter_transcripts():
+        if video_id in existing:
+            skipped += 1
+            continue
+        archive.append(video_id, segments, language)
+        exported += 1
+        if exported % PROGRESS_EVERY == 0:
+            logger.info("📤 書き出し中… %s本", exported)
+    return {"exported": exported, "skipped": skipped}
+
+
+def reprocess_archive(
+    archive: TranscriptArchive,
+    options_keys: Optional[List[str]] = None,
+    concurrency: int = REPROCESS_CONCURRENCY,
+    limit: Optional[int] = None
+) -> Dict[str, int]:
+    """
+    アーカイブの字幕から要約を作り直してストアに保存するよ〜🔁
+    字幕はアーカイブから1本ずつ流して読むから、YouTubeのレート制限にもメモリにも縛られない！
+    投げっぱなしにはせず、同時に動いてる要約が concurrency の2倍を超えたら終わるのを待つ。
+
+    引数:
+        archive (TranscriptArchive): 読み込み元
+        options_keys (Optional[List[str]]): 作り直すオプションキー（Noneなら動画ごとに保存済みのオプション）
+        concurrency (int): 同時に投げる要約の数
+        limit (Optional[int]): 作り直す動画数の上限
+
+    戻り値:
+        Dict[str, int]: videos / summaries / failed
+    """
+    from .services.jobs import summarize_and_store
+
+    store = get_store()
+    counts = {"videos": 0, "summaries": 0, "failed": 0}
+    started = time.perf_counter()
+
+    def collect(done: Set[Future]) -> None:
+        for future in done:
+            video_id, options_key = pending.pop(future)
+            try:
+                if future.result() is not None:
+                    counts["summaries"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                logger.error("🔥 作り直し失敗: %s [%s] %s", video_id, options_key, e)
+
+    pending: Dict[Future, tuple] = {}
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reprocess") as executor:
+        for video_id, segments, language in archive.iter_transcripts():
+            if limit is not None and counts["videos"] >= limit:
+                break
+            keys = options_keys or store.list_summary_options(video_id) or [""]
+            for options_key in keys:
+                future = executor.submit(
+                    summarize_and_store, video_id, parse_options_key(options_key), (segments, language), PRIORITY_BULK
+                )
+                pending[future] = (video_id, options_key)
+                if len(pending) >= concurrency * 2:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            counts["videos"] += 1
+            if counts["videos"] % PROGRESS_EVERY == 0:
+                logger.info("🔁 作り直し中… %s本（%.1f本/秒）", counts["videos"], counts["videos"] / (time.perf_counter() - started))
+        collect(wait(pending)[0])
+    return counts
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="字幕アーカイブの書き出し・作り直し🗄️")
+    parser.add_argument("--archive", default=ARCHIVE_DIR, help="アーカイブのディレクトリ")
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="ストアの字幕をアーカイブに書き出す")
+    export_parser.add_argument("--force", action="store_true", help="アーカイブに入ってる動画も書き直す")
+    reprocess_parser = commands.add_parser("reprocess", help="アーカイブの字幕から要約を作り直す")
+    reprocess_parser.add_argument("--options", action="append", help="作り直すオプションキー（何回でも指定できる）")
+    reprocess_parser.add_argument("--concurrency", type=int, default=REPROCESS_CONCURRENCY)
+    reprocess_parser.add_argument("--limit", type=int, help="作り直す動画数の上限")
+    commands.add_parser("stats", help="アーカイブの大きさを表示する")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    archive = TranscriptArchive(args.archive)
+    started = time.perf_counter()
+    if args.command == "export":
+        result = export_from_store(archive, force=args.force)
+    elif args.command == "reprocess":
+        result = reprocess_archive(archive, args.options, args.concurrency, args.limit)
+    else:
+        result = archive.stats()
+    result["seconds"] = round(time.perf_counter() - started, 2)
+    print(" ".join(f"{key}={value}" for key, value in result.items()))
+    return 1 if result.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+📦 YouTubeのURLリストをまとめて要約するコマンドだよ〜✨（夜間のバックフィル用）
+
+    python -m backend.batch urls.txt --output results.jsonl
+    cat urls.txt | python -m backend.batch - --output results.jsonl --concurrency 8
+    python -m backend.batch urls.txt --output results.jsonl --options "explanation=exclude;length=short;style=gal"
+
+- 1行1URL（空行と # で始まる行は飛ばす）。結果は1件終わるたびにJSONLに追記する
+- 終わった動画はチェックポイント（--output に .checkpoint をつけたファイル）に記録するから、
+  途中で止めても同じコマンドをもう1回叩けば続きからやる
+- 保存済みの要約があればLLMは呼ばずに status=cached で書く。字幕もストアにあればYouTubeに取りに行かない
+- 字幕がない・オフの動画は status=error でチェックポイントに入れる（何回やっても同じやから）
+- 要約の失敗（LLMのエラーや字幕取得のレート制限など）はチェックポイントに入れないから、再実行でやり直される
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterable, List, Optional, Set, TextIO
+
+from .env import load_environment
+
+# 🌱 APIキーなどを読むから、いちばん最初に.envを読む
+load_environment(os.path.dirname(__file__))
+
+from .logging_config import setup_logging
+from .services.llm import SummaryService
+from .services.scheduler import PRIORITY_BULK
+from .services.store import get_store, summary_options_key, parse_options_key
+from .services.youtube import extract_video_id, CaptionsUnavailableError
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))  # 同時に動かす要約の数（LLMの枠に合わせる）
+PROGRESS_INTERVAL = float(os.getenv("BATCH_PROGRESS_INTERVAL", "10"))  # 進み具合をログに出す間隔（秒）
+CHECKPOINT_SUFFIX = ".checkpoint"
+STATUS_DONE = "done"
+STATUS_CACHED = "cached"
+STATUS_ERROR = "error"
+
+
+def read_urls(source: TextIO) -> List[str]:
+    """
+    URLリストを読むよ〜📖（空行・コメント行は飛ばす）
+
+    引数:
+        source (TextIO): ファイルか標準入力
+
+    戻り値:
+        List[str]: URLのリスト（書いてある順）
+    """
+    return [line.strip() for line in source if line.strip() and not line.lstrip().startswith("#")]
+
+
+def load_checkpoint(path: str) -> Set[str]:
+    """
+    チェックポイントから終わった項目のキーを読むよ〜🔖
+
+    引数:
+        path (str): チェックポイントファイル
+
+    戻り値:
+        Set[str]: "動画ID|オプションキー" の集合
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip()}
+
+
+class BatchProgress:
+    """
+    スループットと残り時間（ETA）を数えるクラスだよ〜⏱️
+    """
+
+    def __init__(self, total: int):
+        """
+        引数:
+            total (int): 今回やる項目数（チェックポイントで飛ばした分は入れない）
+        """
+        self.total = total
+        self.counts = {STATUS_DONE: 0, STATUS_CACHED: 0, STATUS_ERROR: 0}
+        self.started = time.perf_counter()
+
+    @property
+    def finished(self) -> int:
+        """終わった項目数だよ〜🔢"""
+        return sum(self.counts.values())
+
+    def record(self, status: str) -> None:
+        """1件終わったのを記録するよ〜✅"""
+        self.counts[status] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        今の進み具合をまとめるよ〜📊
+
+        戻り値:
+            Dict[str, Any]: finished / total / rate（件/秒）/ eta_seconds と状態ごとの件数
+        """
+        elapsed = time.perf_counter() - self.started
+        rate = self.finished / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.finished
+        return {
+            "finished": self.finished,
+            "total": self.total,
+            "rate": round(rate, 2),
+            "eta_seconds": round(remaining / rate) if rate > 0 else None,
+            **self.counts,
+        }
+
+    def log(self) -> None:
+        """進み具合をログに出すよ〜📣"""
+        s = self.summary()
+        eta = time.strftime("%H:%M:%S", time.gmtime(s["eta_seconds"])) if s["eta_seconds"] is not None else "--:--:--"
+        logger.info("📦 %s/%s件（%.2f件/秒・残り%s）done=%s cached=%s error=%s",
+                    s["finished"], s["total"], s["rate"], eta, s["done"], s["cached"], s["error"])
+
+
+def summarize_item(video_id: str, options: Dict[str, str], options_key: str) -> Dict[str, Any]:
+    """
+    1件ぶん要約するよ〜🎬（スレッドで呼ぶ同期処理・保存済みならLLMは呼ばない）
+
+    引数:
+        video_id (str): 動画ID
+        options (Dict[str, str]): 要約オプション
+        options_key (str): summary_options_key で作ったキー
+
+    戻り値:
+        Dict[str, Any]: status / summary / error（字幕がない動画は final つき）
+
+    例外:
+        CaptionFetchError: レート制限とかで字幕が取れなかった場合（チェックポイントに入れずに次の実行でやり直す）
+        PerplexityError: 要約生成に失敗した場合
+    """
+    from .services.jobs import summarize_and_store, NO_CAPTIONS_MESSAGE
+
+    cached = get_store().get_summary(video_id, options_key)
+    if cached is not None:
+        return {"status": STATUS_CACHED, "summary": cached}
+    try:
+        summary = summarize_and_store(video_id, options, None, PRIORITY_BULK)
+    except CaptionsUnavailableError as e:
+        # 字幕がオフ・字幕がない動画も何回やっても同じやから、終わったことにする
+        return {"status": STATUS_ERROR, "error": str(e), "final": True}
+    if summary is None:
+        # 字幕がない動画は何回やっても同じやから、終わったことにする
+        return {"status": STATUS_ERROR, "error": NO_CAPTIONS_MESSAGE, "final": True}
+    return {"status": STATUS_DONE, "summary": summary}
+
+
+async def run_batch(
+    urls: Iterable[str],
+    options: Dict[str, str],
+    output_path: str,
+    concurrency: int = BATCH_CONCURRENCY
+) -> Dict[str, Any]:
+    """
+    URLリストを同時実行数つきで要約して、結果をJSONLに追記していくよ〜🏃‍♀️💨
+    チェックポイントにある項目と、リスト内で重複してる項目は飛ばす！
+
+    引数:
+        urls (Iterable[str]): URL
+        options (Dict[str, str]): 要約オプション（全件共通）
+        output_path (str): 結果のJSONLファイル（追記）
+        concurrency (int): 同時に動かす要約の数
+
+    戻り値:
+        Dict[str, Any]: 進み具合のまとめ（skipped はチェックポイントで飛ばした件数）
+    """
+    normalized = SummaryService.normalize_options(options)
+    options_key = summary_options_key(normalized)
+    checkpoint_path = output_path + CHECKPOINT_SUFFIX
+    completed = load_checkpoint(checkpoint_path)
+
+    items = []
+    skipped = 0
+    seen: Set[str] = set()
+    for url in urls:
+        video_id = extract_video_id(url)
+        key = f"{video_id or url}|{options_key}"
+        if key in completed or key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+        items.append((url, video_id, key))
+    if skipped:
+        logger.info("🔖 チェックポイントと重複で%s件飛ばすよ", skipped)
+
+    progress = BatchProgress(len(items))
+    # to_thread の既定スレッドプールはCPU数で頭打ちになるから、同時実行数ぶん用意する
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch"))
+
+    with open(output_path, "a", encoding="utf-8") as output, open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+
+        def write_result(url: str, video_id: Optional[str], key: str, result: Dict[str, Any], seconds: float) -> None:
+            # イベントループのスレッドからしか呼ばないから、書き込みがまざることはない
+            final = result.pop("final", result["status"] != STATUS_ERROR)
+            record = {"url": url, "video_id": video_id, "options": normalized, **result, "seconds": round(seconds, 3)}
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            if final:
+                # 結果を書いてからチェックポイントに入れる（途中で落ちても結果が消えることはない）
+                checkpoint.write(key + "\n")
+                checkpoint.flush()
+            progress.record(result["status"])
+
+        async def process(url: str, video_id: Optional[str], key: str) -> None:
+            started = time.perf_counter()
+            if not video_id:
+                result = {"status": STATUS_ERROR, "error": "YouTubeのURLじゃないみたい😢", "final": True}
+            else:
+                try:
+                    result = await asyncio.to_thread(summarize_item, video_id, normalized, options_key)
+                except Exception as e:
+                    logger.error("🔥 要約失敗: %s %s", url, e)
+                    result = {"status": STATUS_ERROR, "error": str(e), "final": False}
+            write_result(url, video_id, key, result, time.perf_counter() - started)
+
+        async def report() -> None:
+            while True:
+                await asyncio.sleep(PROGRESS_INTERVAL)
+                progress.log()
+
+        reporter = asyncio.create_task(report())
+        try:
+            # 動いてるタスクは同時実行数まで（1万件でも一気にタスクを積まない）
+            pending: Set[asyncio.Task] = set()
+            for item in items:
+                if len(pending) >= concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        task.result()  # 結果の書き込みに失敗してたらここで止める
+                pending.add(asyncio.create_task(process(*item)))
+            if pending:
+                done, _ = await asyncio.wait(pending)
+                for task in done:
+                    task.result()
+        finally:
+            reporter.cancel()
+    progress.log()
+    return {**progress.summary(), "skipped": skipped}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="YouTubeのURLリストをまとめて要約するよ📦")
+    parser.add_argument("input", help="URLリストのファイル（- なら標準入力）")
+    parser.add_argument("--output", required=True, help="結果のJSONLファイル（追記・チェックポイントもこの名前で作る）")
+    parser.add_argument("--options", default="", help="要約オプションキー（例: explanation=exclude;length=short;style=gal）")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if args.input == "-":
+        urls = read_urls(sys.stdin)
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            urls = read_urls(f)
+
+    try:
+        result = asyncio.run(run_batch(urls, parse_options_key(args.options), args.output, args.concurrency))
+    except KeyboardInterrupt:
+        logger.warning("⏸️ 中断したよ。同じコマンドをもう1回実行すれば続きからやる！")
+        return 130
+    print(" ".join(f"{key}={value}" for key, value in result.items()))
+    return 1 if result[STATUS_ERROR] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
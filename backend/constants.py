@@ -43,6 +43,14 @@ SUMMARY_LENGTH_PROMPTS = {
     SUMMARY_LENGTH_LONG: "詳細に（1200字程度）",
 }
 
+# 🪙 長さごとの出力トークンの上限（実測が溜まるまでの初期値・日本語は1文字≒1トークン＋見出しや記号のぶん）
+SUMMARY_LENGTH_MAX_TOKENS = {
+    SUMMARY_LENGTH_SHORT: 700,
+    SUMMARY_LENGTH_MEDIUM: 1100,
+    SUMMARY_LENGTH_LONG: 1700,
+}
+SUMMARY_EXPLANATION_EXTRA_TOKENS = 500  # 解説ありのときに足すぶん
+
 SUMMARY_STYLE_PROMPTS = {
     SUMMARY_STYLE_BULLET: "重要ポイントを箇条書きで簡潔にまとめる",
     SUMMARY_STYLE_PARAGRAPH: "流れのある文章で全体を要約する",
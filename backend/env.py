@@ -0,0 +1,53 @@
+import os
+from typing import Optional
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+DOTENV_FILENAME = ".env"
+
+_loaded_path: Optional[str] = None
+_loaded = False
+
+
+def find_dotenv_file(start_dir: str) -> Optional[str]:
+    """
+    start_dir から親ディレクトリへ順番に .env を探すよ〜🔍（python-dotenv の find_dotenv と同じ探し方）
+
+    引数:
+        start_dir (str): 探し始めるディレクトリ
+
+    戻り値:
+        Optional[str]: 見つかった .env のパス（なければNone）
+    """
+    current = os.path.abspath(start_dir)
+    while True:
+        candidate = os.path.join(current, DOTENV_FILENAME)
+        if os.path.isfile(candidate):
+            return candidate
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
+def load_environment(start_dir: str) -> Optional[str]:
+    """
+    .env を1プロセスで1回だけ読み込むよ〜🌱
+    .env がない本番環境（環境変数を直接渡すやつ）では python-dotenv の import すらしない！
+    Streamlit の再実行で何回呼ばれても、2回目からは何もしないから軽い💨
+
+    引数:
+        start_dir (str): .env を探し始めるディレクトリ（呼び出し元のファイルの場所）
+
+    戻り値:
+        Optional[str]: 読み込んだ .env のパス（なければNone）
+    """
+    global _loaded, _loaded_path
+    if _loaded:
+        return _loaded_path
+    path = find_dotenv_file(start_dir)
+    if path:
+        from dotenv import load_dotenv
+        load_dotenv(path)
+    _loaded_path = path
+    _loaded = True
+    return path
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()  # "json" にすると1行1JSONの構造化ログ
+LOG_PAYLOADS = os.getenv("LOG_PAYLOADS", "0") == "1"  # APIペイロードのダンプ（DEBUGレベルのときだけ有効）
+# ロガーごとのINFO以下のサンプリング率（例: "backend.services.store=0.1,backend.services.search_index=0.1"）
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+PAYLOAD_DUMP_MAX_CHARS = 2000  # ダンプが長すぎるとログが埋まるから切る
+TEXT_FORMAT = "%(asctime)s [%(levelname)s] 💬 %(message)s"
+TEXT_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 📝 LogRecordの標準属性（これ以外は extra= で渡された構造化フィールドとしてJSONに出す）
+_STANDARD_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    ログを1行1JSONにするフォーマッターだよ〜🧾
+    extra= で渡したフィールドもそのままキーになるから、集計ツールで絞り込みやすい！
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        """
+        LogRecordをJSON文字列にするよ〜✨
+
+        引数:
+            record (logging.LogRecord): ログレコード
+
+        戻り値:
+            str: JSON文字列
+        """
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    うるさいロガーのINFO以下を間引くフィルターだよ〜🎲
+    WARNING以上は絶対に間引かないから、エラーは全部残る！
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        """
+        フィルターの初期化だよ〜💖
+
+        引数:
+            rates (Dict[str, float]): {ロガー名: 残す割合(0〜1)}。子ロガーにも効く
+        """
+        super().__init__()
+        self.rates = rates
+
+    def _rate_for(self, name: str) -> float:
+        """一番近い親ロガーの設定を探すよ〜🔍"""
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition(".")[0]
+        return 1.0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+
+class _PreparedQueueHandler(logging.handlers.QueueHandler):
+    """
+    キューに積む前にメッセージだけ確定させるQueueHandlerだよ〜📮
+    フォーマット（JSON化とか）は書き込みスレッドでやるから、リクエストのスレッドはすぐ戻れる！
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 引数はこのスレッドで文字列にしとく（別スレッドで中身が変わると困るから）
+        message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(vars(record))
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    "logger=0.1,other=0.5" 形式の設定を辞書にするよ〜🧩
+
+    引数:
+        spec (str): サンプリング設定
+
+    戻り値:
+        Dict[str, float]: {ロガー名: 残す割合}
+    """
+    rates = {}
+    for part in spec.split(","):
+        name, _, value = part.strip().partition("=")
+        if not name or not value:
+            continue
+        try:
+            rates[name] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+def setup_logging() -> None:
+    """
+    キュー経由の非同期ロギングをセットアップするよ〜🚀（何回呼んでも1回だけ）
+
+    リクエストのスレッドはキューに積むだけで、標準出力への書き込みは専用スレッドがやる。
+    LOG_FORMAT=json なら構造化JSON、LOG_SAMPLE_RATES でうるさいロガーを間引ける！
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATE_FORMAT))
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        queue_handler = _PreparedQueueHandler(log_queue)
+        rates = parse_sample_rates(LOG_SAMPLE_RATES)
+        if rates:
+            queue_handler.addFilter(SamplingFilter(rates))
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # 終了時にキューに残ってるログを書き切る
+        atexit.register(_listener.stop)
+
+
+def payload_logging_enabled(logger: logging.Logger) -> bool:
+    """
+    ペイロードのダンプをログに出してええか判定するよ〜🔐（LOG_PAYLOADS=1 かつ DEBUGのときだけ）
+
+    引数:
+        logger (logging.Logger): 出力先のロガー
+
+    戻り値:
+        bool: ダンプしてええならTrue
+    """
+    return LOG_PAYLOADS and logger.isEnabledFor(logging.DEBUG)
+
+
+def log_payload(logger: logging.Logger, label: str, payload: Any) -> None:
+    """
+    APIのペイロードをデバッグ用にダンプするよ〜🔍 無効なときはJSON化すらしない！
+
+    引数:
+        logger (logging.Logger): 出力先のロガー
+        label (str): 何のペイロードか
+        payload (Any): ダンプする中身
+    """
+    if not payload_logging_enabled(logger):
+        return
+    dumped = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False, default=str)
+    if len(dumped) > PAYLOAD_DUMP_MAX_CHARS:
+        dumped = dumped[:PAYLOAD_DUMP_MAX_CHARS] + f"...（残り{len(dumped) - PAYLOAD_DUMP_MAX_CHARS}文字省略）"
+    logger.debug("📦 %s: %s", label, dumped)
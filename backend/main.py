@@ -1,40 +1,70 @@
 import os
 import re
+import time
 import logging
-from fastapi import FastAPI, HTTPException, Request, Depends
+from fastapi import FastAPI, HTTPException, Request, Depends, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse
 from pydantic import BaseModel, validator
 from typing import Dict, Optional
-from dotenv import load_dotenv  # dotenvで環境変数を読み込むで😎
+from .env import load_environment
 
-load_dotenv()  # .envファイルから設定をロードする処理👍
+# 🌱 .envがあれば設定をロード（サービスが設定値を読む前に1回だけ。なければdotenvも読み込まない）
+load_environment(os.path.dirname(__file__))
 
-# 🔍 デバッグ用: PERPLEXITY_API_KEYが正しく読み込まれてるかチェックするで！
-if os.getenv("PERPLEXITY_API_KEY"):
-    print("DEBUG: PERPLEXITY_API_KEY is loaded!")  # キーが読み込まれてる場合の出力😃
-else:
-    print("DEBUG: PERPLEXITY_API_KEY is NOT loaded!")  # 読み込まれてない場合の出力😢
-
-from .services.youtube import fetch_captions, extract_video_id
+from fastapi.concurrency import run_in_threadpool
+from .services.youtube import extract_video_id, format_time, CaptionFetchError
 from .services.llm import SummaryService
-
-# ✨ かわいいロガーの設定だよ〜ん💕
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] 💬 %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
+from .services.qa_index import get_transcript_index, QA_DEFAULT_TOP_K
+from .services.http_client import get_http_session, warm_connection
+from .services.llm import PERPLEXITY_API_URL
+from .services.compressor import ensure_numpy
+from .services.store import get_store, summary_options_key, fresh_summary_record, SUMMARY_CACHE_TTL, SUMMARY_STALE_GRACE, JOB_DONE
+from .services.warming import record_summary_hit, schedule_summary_refresh, start_cache_warmer
+from .services.scheduler import normalize_priority, authorize_priority, PRIORITY_HEADER, PRIORITY_TOKEN_HEADER
+from shared.summary_pipeline import get_chapter_pipeline, get_live_pipeline, run_summary_pipeline
+from .services.chapters import CHAPTER_WINDOW_SECONDS
+from .services.jobs import summarize_and_store, schedule_summary_job, job_response, NO_CAPTIONS_MESSAGE
+from .services.http_cache import etag_matches, negotiate_encoding, ENCODING_BROTLI, ENCODING_GZIP
+from .constants import SUMMARY_STYLE_BULLET, SUMMARY_LENGTH_MEDIUM, SUMMARY_EXPLANATION_NO
+from .services.metrics import (
+    HTTP_IN_FLIGHT, HTTP_REQUESTS, HTTP_REQUEST_SECONDS,
+    render_latest, CONTENT_TYPE as METRICS_CONTENT_TYPE
 )
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from .logging_config import setup_logging
+from .services.tracing import span, start_trace, server_timing_header, should_profile, maybe_profile, PROFILE_HEADER
+
+# ✨ かわいいロガーの設定だよ〜ん💕（キュー経由で書き込むからリクエストを止めない）
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
 VIDEO_ID_REGEX = r"^[a-zA-Z0-9_-]{11}$"
 MAX_RETRIES = 3
 RATE_LIMIT = int(os.getenv("RATE_LIMIT", "10"))
+MAX_QA_TOP_K = 20
+SEARCH_PAGE_SIZE = 20
+SUMMARY_HTTP_MAX_AGE = int(os.getenv("SUMMARY_HTTP_MAX_AGE", "3600"))  # CDNやブラウザにキャッシュしてもらう秒数
+MAX_SEARCH_PAGE_SIZE = 100
+MIN_CHAPTER_WINDOW_SECONDS = 120  # チャプターをこれより細かく切るとLLMの呼び出しばっかり増える
+MAX_CHAPTER_WINDOW_SECONDS = 3600
+WARMUP_CONNECTIONS = os.getenv("WARMUP_CONNECTIONS", "1") == "1"  # 起動時にPerplexityへの接続を張っとくか
+
+# ⚡ orjsonが入ってれば速いJSONレスポンスを使うよ（なければ標準のjson）
+try:
+    import orjson  # noqa: F401
+    DEFAULT_RESPONSE_CLASS = ORJSONResponse
+except ImportError:  # pragma: no cover - orjsonなし環境用
+    DEFAULT_RESPONSE_CLASS = JSONResponse
 
 app = FastAPI(
     title="YouTube要約API",
     description="YouTubeビデオを自動要約するAPIだよ〜ん🎬✨",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=DEFAULT_RESPONSE_CLASS
 )
 
 # CORSの設定 - フロントとバックで仲良くできるようにするよ〜💖
@@ -46,6 +76,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_template(scope: Scope) -> str:
+    """
+    リクエストにマッチするルートのパステンプレートを返すよ〜🗺️
+    （/videos/xxxx/ask みたいに動画IDごとにメトリクスが増えすぎないように）
+
+    引数:
+        scope (Scope): リクエストのASGIスコープ
+
+    戻り値:
+        str: "/videos/{video_id}/ask" みたいなテンプレート（マッチしなければ"unmatched"）
+    """
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", "unmatched")
+    return "unmatched"
+
+class ObservabilityMiddleware:
+    """
+    リクエストごとにメトリクス（処理中の数・件数・時間）とスパンツリーを取るASGIミドルウェアだよ〜📏⏱️
+    ルートのテンプレートを探すのは1リクエスト1回だけ！スパンツリーは Server-Timing ヘッダーで返すし、
+    遅いリクエストはスパンツリーごとログに出るし、X-Profile ヘッダーかサンプリングでプロファイルもできる🔬
+    （BaseHTTPMiddleware と違ってレスポンスをラップし直さないから、ストリーミングもそのまま流れる）
+    """
+
+    def __init__(self, app: ASGIApp):
+        """
+        ミドルウェアの初期化だよ〜💖
+
+        引数:
+            app (ASGIApp): 中のアプリ
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        path = route_template(scope)
+        label = f"{method} {path}"
+        status = "500"
+        started = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+                MutableHeaders(scope=message)["Server-Timing"] = server_timing_header(root)
+            await send(message)
+
+        with HTTP_IN_FLIGHT.track_inprogress(path=path):
+            try:
+                with maybe_profile(should_profile(Headers(scope=scope).get(PROFILE_HEADER)), label):
+                    with start_trace(label) as root:
+                        await self.app(scope, receive, send_with_timing)
+            finally:
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, path=path, method=method)
+                HTTP_REQUESTS.inc(path=path, method=method, status=status)
+
+app.add_middleware(ObservabilityMiddleware)
+
 class SummarizeRequest(BaseModel):
     """要約リクエストのスキーマ定義よ〜🎀"""
     url: str
@@ -58,18 +150,95 @@ class SummarizeRequest(BaseModel):
             raise ValueError("YouTubeのURLじゃないみたい...😢")
         return v
 
+class ChaptersRequest(SummarizeRequest):
+    """チャプター要約リクエストのスキーマ定義よ〜📚"""
+    window_seconds: int = CHAPTER_WINDOW_SECONDS
+    
+    @validator('window_seconds')
+    def validate_window_seconds(cls, v):
+        """チャプターの長さが常識的な範囲かチェックするで〜💅"""
+        if not MIN_CHAPTER_WINDOW_SECONDS <= v <= MAX_CHAPTER_WINDOW_SECONDS:
+            raise ValueError(f"window_secondsは{MIN_CHAPTER_WINDOW_SECONDS}〜{MAX_CHAPTER_WINDOW_SECONDS}にしてな〜🙏")
+        return v
+
+class AskRequest(BaseModel):
+    """動画への質問リクエストのスキーマ定義よ〜🙋‍♀️"""
+    question: str
+    top_k: int = QA_DEFAULT_TOP_K
+    
+    @validator('question')
+    def validate_question(cls, v):
+        """質問が空っぽじゃないかチェックするで〜💅"""
+        if not v.strip():
+            raise ValueError("質問が空っぽやで...😢")
+        return v.strip()
+    
+    @validator('top_k')
+    def validate_top_k(cls, v):
+        """top_kが常識的な範囲かチェックするで〜💅"""
+        if not 1 <= v <= MAX_QA_TOP_K:
+            raise ValueError(f"top_kは1〜{MAX_QA_TOP_K}にしてな〜🙏")
+        return v
+
 class APIError(Exception):
     """API用のエラークラスだよ〜🚨"""
     def __init__(self, message: str, code: int):
         super().__init__(message)
         self.code = code
 
+def request_priority(request: Request) -> str:
+    """
+    リクエストの優先度クラスを X-Request-Priority ヘッダーから決めるよ〜🚦（なければ api）
+    interactive は X-Priority-Token の合言葉が PRIORITY_TOKEN と合うときだけ（合わなければ api）
+
+    引数:
+        request: リクエスト
+
+    戻り値:
+        str: interactive / api / bulk
+    """
+    priority = normalize_priority(request.headers.get(PRIORITY_HEADER))
+    return authorize_priority(priority, request.headers.get(PRIORITY_TOKEN_HEADER))
+
 # 📝 レート制限チェック用の関数（実際にはRedisなど使うといいね💭）
 def check_rate_limit(request: Request):
     # 本来はRedisなどでIP単位でカウント実装するよ🔒
-    logger.info(f"⚡️ リクエスト受信: {request.client.host}")
+    logger.debug("⚡️ リクエスト受信: %s", request.client.host)
     return True
 
+def build_cached_summary_response(record: dict, request: Request) -> Response:
+    """
+    保存済みのバイト列から、そのままHTTPレスポンスを作るよ〜📦⚡
+    JSONの再エンコードも圧縮もなし！ETagが一致したら304で中身ごと省略する
+
+    引数:
+        record: LibraryStore.get_summary_record の戻り値
+        request: リクエスト（If-None-Match / Accept-Encoding を見る）
+
+    戻り値:
+        Response: 200（圧縮済みボディ）か304のレスポンス
+    """
+    # 要約の有効期限を超えてキャッシュされないように max-age を調整（期限切れの猶予はCDNにも stale-while-revalidate で伝える）
+    remaining = int(SUMMARY_CACHE_TTL - (time.time() - record["stored_at"]))
+    headers = {
+        "ETag": record["etag"],
+        "Cache-Control": f"public, max-age={max(0, min(SUMMARY_HTTP_MAX_AGE, remaining))}, stale-while-revalidate={SUMMARY_STALE_GRACE}",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request.headers.get("if-none-match"), record["etag"]):
+        return Response(status_code=304, headers=headers)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"), record["body_br"] is not None)
+    if encoding == ENCODING_BROTLI:
+        body = record["body_br"]
+        headers["Content-Encoding"] = ENCODING_BROTLI
+    elif encoding == ENCODING_GZIP:
+        body = record["body_gzip"]
+        headers["Content-Encoding"] = ENCODING_GZIP
+    else:
+        body = record["body"]
+    return Response(content=body, media_type="application/json", headers=headers)
+
 @app.get("/")
 async def root():
     """ヘルスチェック用のルートエンドポイント🏠"""
@@ -77,46 +246,276 @@ async def root():
     return {"message": "YouTube要約APIだよ〜✨ /summarize にPOSTしてね💕"}
 
 @app.post("/summarize")
-async def summarize_video(request: SummarizeRequest, rate_limit_ok: bool = Depends(check_rate_limit)):
+async def summarize_video(request: SummarizeRequest, http_request: Request, rate_limit_ok: bool = Depends(check_rate_limit)):
     """ビデオを要約するメインエンドポイントだよ〜🎥✨"""
     try:
-        logger.info(f"📝 要約リクエスト: {request.url}")
+        logger.debug("📝 要約リクエスト: %s", request.url)
         
         # YouTubeのビデオIDを抽出
-        video_id = extract_video_id(request.url)
+        with span("parse_url"):
+            video_id = extract_video_id(request.url)
         if not video_id or not re.match(VIDEO_ID_REGEX, video_id):
             raise HTTPException(status_code=400, detail="YouTubeのURLから動画IDを取得できへんかった😭")
         
-        # 字幕取得
-        captions = await fetch_captions(video_id)
-        if not captions:
-            raise HTTPException(status_code=404, detail="字幕が見つからへんかった😢")
-        
-        logger.info(f"📃 字幕取得成功！文字数: {len(captions)}")
+        # 要約ストアにあればそのまま返す（字幕取得もLLMもスキップ！）
+        # 期限切れでも猶予の中なら古い要約を返して、作り直しは裏でやる（次の人からは新しい要約）
+        options_key = summary_options_key(SummaryService.normalize_options(request.options))
+        record_summary_hit(video_id, options_key)
+        store = get_store()
+        with span("summary_lookup"):
+            cached_record = store.get_summary_record(video_id, options_key, allow_stale=True)
+        if cached_record:
+            if cached_record["stale"]:
+                schedule_summary_refresh(video_id, options_key)
+            return build_cached_summary_response(cached_record, http_request)
         
-        # 要約生成
-        summary_service = SummaryService()
-        summary = summary_service.generate_summary(captions, request.options)
+        # 字幕取得（字幕ストアにあればYouTubeには行かない）→要約生成→保存（検索インデックスも一緒に更新される）
+        summary = await run_in_threadpool(summarize_and_store, video_id, request.options, None, request_priority(http_request))
+        if summary is None:
+            raise HTTPException(status_code=404, detail=NO_CAPTIONS_MESSAGE)
         
         logger.info("✅ 要約生成完了!")
-        return {"summary": summary, "video_id": video_id}
+        # 作りたてもストアのと同じバイト列・ETag・Cache-Controlで返す（次のヒットと中身が変わらない）
+        return build_cached_summary_response(fresh_summary_record(video_id, options_key, summary), http_request)
         
     except HTTPException as e:
         # すでにHTTPExceptionならそのまま投げる
-        logger.error(f"🚨 HTTPエラー: {str(e.detail)}")
+        logger.error("🚨 HTTPエラー: %s", e.detail)
         raise
     except Exception as e:
         # その他のエラーはログ取ってから500エラーとして返す
-        logger.error(f"🔥 エラー発生: {str(e)}", exc_info=True)
+        logger.error("🔥 エラー発生: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"要約処理に失敗したわ〜💦 エラー: {str(e)}")
 
+@app.post("/chapters")
+async def summarize_chapters(request: ChaptersRequest, http_request: Request, rate_limit_ok: bool = Depends(check_rate_limit)):
+    """
+    長い動画をチャプター（時間の窓）ごとに並列で要約して、全体のまとめもつけるエンドポイントだよ〜📚⚡
+    チャプターは1個ずつキャッシュするから、途中で失敗しても次は残りだけ要約する
+    """
+    try:
+        logger.debug("📚 チャプター要約リクエスト: %s", request.url)
+        
+        with span("parse_url"):
+            video_id = extract_video_id(request.url)
+        if not video_id or not re.match(VIDEO_ID_REGEX, video_id):
+            raise HTTPException(status_code=400, detail="YouTubeのURLから動画IDを取得できへんかった😭")
+        
+        context = await run_in_threadpool(
+            run_summary_pipeline, get_chapter_pipeline(), SummaryService(request_priority(http_request)),
+            video_id=video_id, options=request.options, window_seconds=request.window_seconds
+        )
+        if "chapters" not in context:
+            raise HTTPException(status_code=404, detail=NO_CAPTIONS_MESSAGE)
+        
+        logger.info("✅ チャプター要約完了!（%s個）", len(context["chapters"]))
+        return {
+            "video_id": video_id,
+            "summary": context["summary"],
+            "chapters": context["chapters"],
+            "window_seconds": request.window_seconds,
+        }
+        
+    except HTTPException as e:
+        logger.error("🚨 HTTPエラー: %s", e.detail)
+        raise
+    except CaptionFetchError as e:
+        logger.error("🎬 字幕取得エラー: %s", e)
+        raise HTTPException(status_code=404, detail=f"字幕が見つからへんかった😢 {str(e)}")
+    except Exception as e:
+        logger.error("🔥 エラー発生: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"チャプター要約に失敗したわ〜💦 エラー: {str(e)}")
+
+@app.post("/live/summarize")
+async def summarize_live(request: SummarizeRequest, http_request: Request, rate_limit_ok: bool = Depends(check_rate_limit)):
+    """
+    ライブ配信・プレミア公開みたいに字幕が伸び続ける動画の要約を、増えたぶんだけで更新するエンドポイントだよ〜📡⚡
+    何回呼んでも、LLMに送るのは「これまでの要約＋前回から増えた字幕」だけ！
+    """
+    try:
+        logger.debug("📡 ライブ要約リクエスト: %s", request.url)
+        
+        with span("parse_url"):
+            video_id = extract_video_id(request.url)
+        if not video_id or not re.match(VIDEO_ID_REGEX, video_id):
+            raise HTTPException(status_code=400, detail="YouTubeのURLから動画IDを取得できへんかった😭")
+        
+        context = await run_in_threadpool(
+            run_summary_pipeline, get_live_pipeline(), SummaryService(request_priority(http_request)),
+            video_id=video_id, options=request.options
+        )
+        live = context.get("live")
+        if not live or not live["summary"]:
+            raise HTTPException(status_code=404, detail=NO_CAPTIONS_MESSAGE)
+        
+        return DEFAULT_RESPONSE_CLASS({
+            "video_id": video_id,
+            "summary": live["summary"],
+            "updated": live["updated"],
+            "new_segments": live["new_segments"],
+            "processed_segments": live["processed_segments"],
+            "processed_until": format_time(max(0.0, live["last_segment_start"])),
+        }, headers={"Cache-Control": "no-store"})
+        
+    except HTTPException as e:
+        logger.error("🚨 HTTPエラー: %s", e.detail)
+        raise
+    except CaptionFetchError as e:
+        logger.error("🎬 字幕取得エラー: %s", e)
+        raise HTTPException(status_code=404, detail=f"字幕が見つからへんかった😢 {str(e)}")
+    except Exception as e:
+        logger.error("🔥 エラー発生: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"ライブ要約に失敗したわ〜💦 エラー: {str(e)}")
+
+@app.post("/jobs", status_code=202)
+async def submit_summary_job(request: SummarizeRequest, http_request: Request, rate_limit_ok: bool = Depends(check_rate_limit)):
+    """
+    要約をジョブとして受け付けて、すぐ返すエンドポイントだよ〜📮✨
+    結果は GET /jobs/{job_id} でポーリングしてね（保存済みの要約があればその場で status=done で返す）
+    同じ動画＆オプションのジョブが動いてたら、新しく作らずにそのジョブを返す！
+    """
+    video_id = extract_video_id(request.url)
+    if not video_id or not re.match(VIDEO_ID_REGEX, video_id):
+        raise HTTPException(status_code=400, detail="YouTubeのURLから動画IDを取得できへんかった😭")
+    
+    options_key = summary_options_key(SummaryService.normalize_options(request.options))
+    record_summary_hit(video_id, options_key)
+    store = get_store()
+    record = await run_in_threadpool(store.get_summary_record, video_id, options_key, True)
+    if record:
+        if record["stale"]:
+            schedule_summary_refresh(video_id, options_key)
+        return DEFAULT_RESPONSE_CLASS({"job_id": None, "status": JOB_DONE, "video_id": video_id, "summary": record["summary"]})
+    
+    job, created = await run_in_threadpool(store.create_job, video_id, options_key)
+    if created:
+        schedule_summary_job(job["job_id"], video_id, request.options, request_priority(http_request))
+    return job_response(job)
+
+@app.get("/jobs/{job_id}")
+async def get_summary_job(job_id: str):
+    """要約ジョブの状態を返すエンドポイントだよ〜🔍（どのワーカーに聞いても同じ答えが返る）"""
+    job = await run_in_threadpool(get_store().get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="そんなジョブないよ〜😢")
+    return DEFAULT_RESPONSE_CLASS(job_response(job), headers={"Cache-Control": "no-store"})
+
+@app.post("/videos/{video_id}/ask")
+async def ask_video(video_id: str, request: AskRequest, http_request: Request, rate_limit_ok: bool = Depends(check_rate_limit)):
+    """動画の字幕から関係ある部分だけ探して質問に答えるエンドポイントだよ〜🙋‍♀️✨"""
+    try:
+        if not re.match(VIDEO_ID_REGEX, video_id):
+            raise HTTPException(status_code=400, detail="動画IDの形式がおかしいみたい😭")
+        
+        logger.info("🙋‍♀️ 質問リクエスト: %s", video_id)
+        
+        # BM25インデックス（キャッシュにあれば使い回す）から関連パッセージを検索
+        with span("qa_index"):
+            index = await run_in_threadpool(get_transcript_index, video_id)
+        with span("qa_search"):
+            passages = index.search(request.question, request.top_k)
+        if not passages:
+            raise HTTPException(status_code=404, detail="質問に関係ありそうな字幕が見つからへんかった😢")
+        
+        # 関連パッセージだけをLLMに渡して回答生成
+        summary_service = SummaryService(request_priority(http_request))
+        with span("qa_answer"):
+            answer = await run_in_threadpool(summary_service.answer_question, request.question, passages)
+        
+        logger.info("✅ 質問への回答完了!")
+        return {"answer": answer, "video_id": video_id, "passages": passages}
+        
+    except HTTPException as e:
+        logger.error("🚨 HTTPエラー: %s", e.detail)
+        raise
+    except CaptionFetchError as e:
+        logger.error("🎬 字幕取得エラー: %s", e)
+        raise HTTPException(status_code=404, detail=f"字幕が見つからへんかった😢 {str(e)}")
+    except Exception as e:
+        logger.error("🔥 エラー発生: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"回答生成に失敗したわ〜💦 エラー: {str(e)}")
+
+@app.get("/summaries/{video_id}")
+async def get_summary(
+    video_id: str,
+    request: Request,
+    style: str = Query(SUMMARY_STYLE_BULLET, description="要約スタイル"),
+    length: str = Query(SUMMARY_LENGTH_MEDIUM, description="要約の長さ"),
+    explanation: str = Query(SUMMARY_EXPLANATION_NO, description="ポイント解説の有無")
+):
+    """保存済みの要約を、ETagと圧縮つきでキャッシュしやすく返すエンドポイントだよ〜📦✨"""
+    if not re.match(VIDEO_ID_REGEX, video_id):
+        raise HTTPException(status_code=400, detail="動画IDの形式がおかしいみたい😭")
+    
+    options = SummaryService.normalize_options({"style": style, "length": length, "explanation": explanation})
+    options_key = summary_options_key(options)
+    record_summary_hit(video_id, options_key)
+    record = await run_in_threadpool(get_store().get_summary_record, video_id, options_key, True)
+    if not record:
+        raise HTTPException(status_code=404, detail="まだ要約されてないみたい😢 /summarize にPOSTしてね")
+    if record["stale"]:
+        schedule_summary_refresh(video_id, options_key)
+    return build_cached_summary_response(record, request)
+
+@app.get("/search")
+async def search_library(
+    q: str = Query(..., min_length=1, description="検索語（スペース区切りでAND検索）"),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE, description="1ページの件数"),
+    offset: int = Query(0, ge=0, description="先頭から飛ばす件数")
+):
+    """これまでに保存した字幕と要約をまとめて全文検索するエンドポイントだよ〜🔎✨"""
+    try:
+        result = await run_in_threadpool(get_store().search, q, limit, offset)
+        next_offset = offset + limit if result["has_more"] else None
+        return {"query": q, "hits": result["hits"], "offset": offset, "limit": limit, "next_offset": next_offset}
+    except Exception as e:
+        logger.error("🔥 検索エラー発生: %s", e, exc_info=True)
+        raise HTTPException(status_code=500, detail=f"検索に失敗したわ〜💦 エラー: {str(e)}")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus形式のメトリクスを返すエンドポイントだよ〜📊"""
+    return Response(content=render_latest(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
     """システムヘルスチェック用エンドポイント🩺"""
     return {"status": "healthy", "message": "システム絶好調だよ〜✨"}
 
 # 💁‍♀️ サーバー起動時のメッセージ
+@app.on_event("startup")
+async def report_configuration():
+    """起動したときに設定がちゃんと読めてるかログに出すよ〜🔍（キーの中身は出さない）"""
+    if os.getenv("PERPLEXITY_API_KEY"):
+        logger.info("🔐 PERPLEXITY_API_KEYが読み込まれてるよ")
+    else:
+        logger.warning("⚠️ PERPLEXITY_API_KEYが読み込まれてないよ！")
+
+def warm_up_worker() -> None:
+    """
+    リクエストを受ける前に、最初のリクエストで払うはずの準備コストを先に払っとくよ〜🔥
+    （ストアの接続とスキーマ確認、HTTP接続プール、numpyの読み込み）
+    """
+    started = time.perf_counter()
+    get_store()
+    get_http_session()
+    if WARMUP_CONNECTIONS:
+        warm_connection(PERPLEXITY_API_URL)
+    ensure_numpy()
+    logger.info("🔥 ワーカーのウォームアップ完了 (pid=%s, %.0fms)", os.getpid(), (time.perf_counter() - started) * 1000)
+
+@app.on_event("startup")
+async def warm_up():
+    """起動時のウォームアップだよ〜🔥 終わるまでuvicornはリクエストを受け付けない！"""
+    await run_in_threadpool(warm_up_worker)
+
+@app.on_event("startup")
+async def warm_popular_caches():
+    """人気のキャッシュを期限切れの前に作り直す見回りを裏で始めるよ〜🔥"""
+    start_cache_warmer()
+
 if __name__ == "__main__":
+    # 本番はワーカー複数で起動する python -m backend.server を使ってね
     import uvicorn
     logger.info("🚀 YouTubeビデオ要約サーバーを起動するよ〜！")
     uvicorn.run(app, host="0.0.0.0", port=8000)
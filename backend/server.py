@@ -0,0 +1,124 @@
+"""
+🚀 本番用のバックエンド起動スクリプトだよ〜✨（ワーカープロセスを複数立ててCPUコアを全部使う！）
+
+    python -m backend.server                      # CPUコア数ぶんのワーカー
+    python -m backend.server --workers 4 --port 8000
+
+- 字幕・要約のキャッシュはSQLiteのライブラリストア（WALモード）に入ってるから、全ワーカーで共有される
+- スキーマ作成・マイグレーションはワーカーを立てる前に親プロセスで1回だけやる（ワーカー同士で取り合わない）
+- 各ワーカーは接続プールやnumpyの準備（backend.main の warm_up）が終わってからリクエストを受ける
+- uvloop / httptools / orjson が入ってれば自動で使う（なければ標準の asyncio / h11 / json）
+"""
+import os
+import sys
+import argparse
+import logging
+from typing import Optional, List
+
+from .env import load_environment
+
+# 🌱 ワーカーにも環境変数で引き継がれるように、いちばん最初に.envを読む
+load_environment(os.path.dirname(__file__))
+
+from .logging_config import setup_logging
+from .services.store import LibraryStore, LIBRARY_DB_PATH
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+APP_IMPORT_PATH = "backend.main:app"
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8000"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))  # 0ならCPUコア数
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+SERVER_KEEPALIVE = int(os.getenv("SERVER_KEEPALIVE", "5"))  # Keep-Aliveの秒数
+SERVER_ACCESS_LOG = os.getenv("SERVER_ACCESS_LOG", "0") == "1"  # アクセスはメトリクスで見られるからデフォルトOFF
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+
+def default_workers() -> int:
+    """
+    ワーカー数のデフォルトを決めるよ〜🧮（SERVER_WORKERS がなければCPUコア数）
+
+    戻り値:
+        int: ワーカー数
+    """
+    return SERVER_WORKERS if SERVER_WORKERS > 0 else (os.cpu_count() or 1)
+
+
+def _is_installed(module: str) -> bool:
+    """モジュールが入ってるか、importせずに調べるよ〜🔍"""
+    import importlib.util
+    return importlib.util.find_spec(module) is not None
+
+
+def select_event_loop() -> str:
+    """
+    使えるなかで一番速いイベントループを選ぶよ〜⚡（uvloopはWindowsにはない）
+
+    戻り値:
+        str: uvicorn の loop 設定値
+    """
+    return "uvloop" if sys.platform != "win32" and _is_installed("uvloop") else "asyncio"
+
+
+def select_http_protocol() -> str:
+    """
+    使えるなかで一番速いHTTPパーサーを選ぶよ〜⚡
+
+    戻り値:
+        str: uvicorn の http 設定値
+    """
+    return "httptools" if _is_installed("httptools") else "h11"
+
+
+def prepare_shared_store(db_path: str = LIBRARY_DB_PATH) -> None:
+    """
+    ワーカーを立てる前に、共有ストアのスキーマ作成とマイグレーションを1回だけやるよ〜📚
+    接続はすぐ閉じるから、ワーカーに親の接続が引き継がれることはない！
+
+    引数:
+        db_path (str): SQLiteファイルのパス
+    """
+    store = LibraryStore(db_path)
+    store.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="YouTube要約APIを本番モードで起動するよ🚀")
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=default_workers(), help="ワーカープロセス数（デフォルトはCPUコア数）")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    prepare_shared_store()
+
+    import uvicorn
+
+    loop = select_event_loop()
+    http = select_http_protocol()
+    logger.info("🚀 本番モードで起動するよ〜！ workers=%s loop=%s http=%s %s:%s",
+                args.workers, loop, http, args.host, args.port)
+    uvicorn.run(
+        APP_IMPORT_PATH,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        loop=loop,
+        http=http,
+        backlog=SERVER_BACKLOG,
+        timeout_keep_alive=SERVER_KEEPALIVE,
+        access_log=SERVER_ACCESS_LOG,
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        # ログはアプリのキュー経由の設定（setup_logging）に任せる
+        log_config=None,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,287 @@
+import os
+import re
+import bisect
+import logging
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from ..constants import SUMMARY_STYLE_PROMPTS, SUMMARY_STYLE_BULLET
+from .compressor import compress_segments
+from .digest import transcript_fingerprint
+from .store import get_store, summary_options_key
+from .transcript_cleaner import clean_transcript
+from .youtube import format_time
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+CHAPTER_VERSION = 1  # チャプターの区切り方やプロンプトを変えたら上げる（古いチャプターは作り直し）
+CHAPTER_WINDOW_SECONDS = int(os.getenv("CHAPTER_WINDOW_SECONDS", "600"))  # チャプター1個のだいたいの長さ（秒）
+CHAPTER_BOUNDARY_SLACK = 0.3  # 窓の長さの±30%の範囲で、話題の切れ目っぽいところを探して区切る
+CHAPTER_CONTEXT_SECONDS = 60  # 切れ目の前後で話題が変わったか比べる範囲（秒）
+CHAPTER_GAP_SCALE = 3.0  # 無音の長さ（秒）をこの値で割って、話題の変わり具合と足す
+CHAPTER_SOURCE_CHARS = int(os.getenv("CHAPTER_SOURCE_CHARS", "8000"))  # チャプター1個でLLMに送る字幕の最大文字数
+CHAPTER_CONCURRENCY = int(os.getenv("CHAPTER_CONCURRENCY", "4"))  # 1本の動画で同時に要約するチャプターの数
+CHAPTER_MAX_TOKENS = 500
+CHAPTER_SOURCE_LABEL = "チャプターごとの要約（[HH:MM:SS] タイトルと要点）"
+CHAPTER_TITLE_MAX_CHARS = 40
+CHAPTER_PROMPT_TEMPLATE = """以下はYouTube動画の {start}〜{end} の字幕です。この部分を1つのチャプターとしてまとめてください。
+
+【出力形式】
+1行目: チャプターのタイトルだけ（20文字くらい・「タイトル:」や記号はつけない）
+2行目から: このチャプターの要点を3〜5個（{style}）
+
+【ルール】
+・字幕に書かれていることだけを使う
+・[1]のような引用番号はつけない
+
+【字幕】
+{text}
+"""
+TITLE_PREFIX_PATTERN = re.compile(r"^(?:[#＃・\-\*\s]+|タイトル[:：]\s*|【|「)+")
+TITLE_SUFFIX_PATTERN = re.compile(r"[】」\s]+$")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def _segment_end(segment: Dict[str, Any]) -> float:
+    """セグメントの終わりの時間だよ〜⏱️"""
+    return float(segment.get("start", 0)) + float(segment.get("duration", 0) or 0)
+
+
+def _bigrams(texts: List[str]) -> Set[str]:
+    """
+    話題の比較用に、テキストを2文字ずつのかたまりにするよ〜✂️（日本語も英語もこれで比べられる）
+    """
+    joined = WHITESPACE_PATTERN.sub("", "".join(texts)).lower()
+    return {joined[i:i + 2] for i in range(len(joined) - 1)}
+
+
+def _break_score(segments: List[Dict[str, Any]], starts: List[float], index: int) -> float:
+    """
+    segments[index] の直前で区切ったときの「区切りやすさ」を出すよ〜📐
+    無音が長いほど、前後 CHAPTER_CONTEXT_SECONDS 秒の言葉が違うほど高い（＝話題が変わってそう）
+
+    引数:
+        segments (List[Dict[str, Any]]): 時間順の字幕セグメント
+        starts (List[float]): セグメントの開始時間（segments と同じ順）
+        index (int): 区切る位置
+
+    戻り値:
+        float: 区切りやすさ
+    """
+    boundary = starts[index]
+    gap = max(0.0, boundary - _segment_end(segments[index - 1]))
+    before_from = bisect.bisect_left(starts, boundary - CHAPTER_CONTEXT_SECONDS)
+    after_to = bisect.bisect_right(starts, boundary + CHAPTER_CONTEXT_SECONDS)
+    before = _bigrams([s.get("text", "") for s in segments[before_from:index]])
+    after = _bigrams([s.get("text", "") for s in segments[index:after_to]])
+    union = before | after
+    shift = 1.0 - len(before & after) / len(union) if union else 0.0
+    return gap / CHAPTER_GAP_SCALE + shift
+
+
+def split_chapters(segments: List[Dict[str, Any]], window_seconds: int = CHAPTER_WINDOW_SECONDS) -> List[Dict[str, Any]]:
+    """
+    字幕を時間の窓でチャプターに分けるよ〜✂️⏱️
+    ぴったり窓の長さで切るんじゃなくて、窓の端の前後（±30%）で無音や話題の切れ目っぽいところを選ぶ！
+    同じ字幕と窓の長さなら、区切りはいつも同じ（チャプターごとのキャッシュが効く）
+
+    引数:
+        segments (List[Dict[str, Any]]): 時間順の字幕セグメント（クリーニング済み）
+        window_seconds (int): チャプター1個のだいたいの長さ（秒）
+
+    戻り値:
+        List[Dict[str, Any]]: start / end / segments を持つチャプター
+    """
+    if not segments:
+        return []
+    starts = [float(s.get("start", 0)) for s in segments]
+    total_end = max(_segment_end(segments[-1]), starts[-1])
+    slack = window_seconds * CHAPTER_BOUNDARY_SLACK
+    chapters = []
+    begin = 0
+    while begin < len(segments):
+        chapter_start = starts[begin]
+        if total_end - chapter_start <= window_seconds + slack:
+            cut = len(segments)
+        else:
+            target = chapter_start + window_seconds
+            lo = max(bisect.bisect_left(starts, target - slack), begin + 1)
+            hi = bisect.bisect_right(starts, target + slack)
+            if lo < hi:
+                cut = max(range(lo, hi), key=lambda i: (_break_score(segments, starts, i), -abs(starts[i] - target)))
+            else:
+                # 窓の端の近くにセグメントがない（長い無音）なら、その先の最初のセグメントで切る
+                cut = max(bisect.bisect_left(starts, target), begin + 1)
+        end = starts[cut] if cut < len(segments) else total_end
+        chapters.append({"start": chapter_start, "end": end, "segments": segments[begin:cut]})
+        begin = cut
+    return chapters
+
+
+def create_chapter_prompt(window: Dict[str, Any], style: str) -> str:
+    """
+    チャプター1個ぶんの要約プロンプトを作るよ〜📝（長すぎる字幕はチャプターの中でまんべんなく選ぶ）
+
+    引数:
+        window (Dict[str, Any]): split_chapters のチャプター
+        style (str): 要約スタイル（内部値）
+
+    戻り値:
+        str: プロンプト
+    """
+    selected = compress_segments(window["segments"], CHAPTER_SOURCE_CHARS)
+    return CHAPTER_PROMPT_TEMPLATE.format(
+        start=format_time(window["start"]),
+        end=format_time(window["end"]),
+        style=SUMMARY_STYLE_PROMPTS.get(style, SUMMARY_STYLE_PROMPTS[SUMMARY_STYLE_BULLET]),
+        text="\n".join(s.get("text", "") for s in selected)
+    )
+
+
+def parse_chapter(text: str, fallback_title: str) -> Dict[str, str]:
+    """
+    LLMの返事をタイトルと要点に分けるよ〜🔪（1行目がタイトル・形が崩れてたら時間をタイトルにする）
+
+    引数:
+        text (str): LLMの返事
+        fallback_title (str): タイトルが取れなかったときのタイトル
+
+    戻り値:
+        Dict[str, str]: title / summary
+    """
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    if len(lines) < 2:
+        return {"title": fallback_title, "summary": text.strip()}
+    title = TITLE_SUFFIX_PATTERN.sub("", TITLE_PREFIX_PATTERN.sub("", lines[0].strip()))
+    if not title or len(title) > CHAPTER_TITLE_MAX_CHARS:
+        return {"title": fallback_title, "summary": text.strip()}
+    return {"title": title, "summary": "\n".join(lines[1:])}
+
+
+def chapter_key(options_key: str, window_seconds: int, start: float, end: float, fingerprint: str) -> str:
+    """
+    チャプターのキャッシュキーを作るよ〜🗝️（バージョン・オプション・窓の長さ・時間の範囲・字幕の指紋）
+    字幕が取り直しやライブで変わったら、同じ時間の範囲でも別のキーになる
+    """
+    return f"v{CHAPTER_VERSION}|{options_key}|w{window_seconds}|{start:.1f}-{end:.1f}|{fingerprint}"
+
+
+def _summarize_window(service: Any, window: Dict[str, Any], options: Dict[str, str]) -> Dict[str, Any]:
+    """
+    チャプター1個を要約するよ〜🧠（スレッドプールで並べて呼ぶ）
+    """
+    prompt = create_chapter_prompt(window, options["style"])
+    text = service.complete_summary(prompt, options, kind="chapter", max_tokens=CHAPTER_MAX_TOKENS)
+    return {
+        "start": window["start"],
+        "end": window["end"],
+        "timestamp": format_time(window["start"]),
+        "end_timestamp": format_time(window["end"]),
+        **parse_chapter(text, format_time(window["start"])),
+    }
+
+
+def chapters_to_text(chapters: List[Dict[str, Any]]) -> str:
+    """
+    チャプターの要約を、全体のまとめ用の1つのテキストにするよ〜📜
+
+    引数:
+        chapters (List[Dict[str, Any]]): チャプターの要約
+
+    戻り値:
+        str: 「[HH:MM:SS] タイトル」＋要点 をつなげたテキスト
+    """
+    return "\n\n".join(f"[{c['timestamp']}] {c['title']}\n{c['summary']}" for c in chapters)
+
+
+def summarize_chapters(
+    video_id: str,
+    service: Any,
+    segments: List[Dict[str, Any]],
+    language: Optional[str],
+    options: Dict[str, str],
+    window_seconds: int = CHAPTER_WINDOW_SECONDS,
+    on_chapter: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> Dict[str, Any]:
+    """
+    字幕をチャプターに分けて、チャプターごとに並列で要約して、全体のまとめもつけるよ〜📚⚡
+    チャプターは1個ずつストアにキャッシュするから、3時間の動画でも待ち時間はだいたいチャプター1個ぶん＋まとめ1回。
+    途中で失敗しても、終わったチャプターは保存済み（やり直すと残りだけ要約する）
+
+    引数:
+        video_id (str): 動画ID
+        service (Any): 要約サービス（normalize_options / build_summary_prompt / complete_summary を持ってるもの）
+        segments (List[Dict[str, Any]]): 時間順の字幕セグメント（クリーニング前）
+        language (Optional[str]): 字幕の言語コード
+        options (Dict[str, str]): 要約オプション（チャプターはスタイル、全体のまとめは全部使う）
+        window_seconds (int): チャプター1個のだいたいの長さ（秒）
+        on_chapter (Optional[Callable[[Dict[str, Any]], None]]): チャプターが1個できるたびに呼ぶ関数（終わった順）
+
+    戻り値:
+        Dict[str, Any]: chapters（時間順）/ overall（全体のまとめ）/ window_seconds
+
+    例外:
+        PerplexityError: チャプターか全体のまとめの要約に失敗した場合
+    """
+    normalized = service.normalize_options(options)
+    options_key = summary_options_key(normalized)
+    cleaned, _ = clean_transcript(segments, language)
+    windows = split_chapters(cleaned, window_seconds)
+    store = get_store()
+
+    chapters: List[Optional[Dict[str, Any]]] = [None] * len(windows)
+    pending = []
+    for i, window in enumerate(windows):
+        key = chapter_key(
+            options_key, window_seconds, window["start"], window["end"], transcript_fingerprint(window["segments"])
+        )
+        cached = store.get_chapter(video_id, key)
+        if cached is not None:
+            chapters[i] = cached
+            if on_chapter:
+                on_chapter(cached)
+        else:
+            pending.append((i, window, key))
+    logger.info("📚 チャプター%s個（キャッシュ%s個・要約%s個）: %s", len(windows), len(windows) - len(pending), len(pending), video_id)
+
+    first_error: Optional[BaseException] = None
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(CHAPTER_CONCURRENCY, len(pending)), thread_name_prefix="chapter") as executor:
+            # トークン数の集計（track_usage）をスレッドにも引き継ぐ
+            futures = {
+                executor.submit(contextvars.copy_context().run, _summarize_window, service, window, normalized): (i, key)
+                for i, window, key in pending
+            }
+            for future in as_completed(futures):
+                i, key = futures[future]
+                try:
+                    chapter = future.result()
+                except Exception as e:
+                    logger.error("🔥 チャプター要約失敗: %s [%s] %s", video_id, key, e)
+                    first_error = first_error or e
+                    continue
+                store.save_chapter(video_id, key, chapter)
+                chapters[i] = chapter
+                if on_chapter:
+                    on_chapter(chapter)
+    if first_error is not None:
+        raise first_error
+
+    # 🧩 全体のまとめはチャプターの要約から作る（字幕を送り直さないから短いプロンプト1回）
+    done = [chapter for chapter in chapters if chapter is not None]
+    overall_key = chapter_key(
+        options_key, window_seconds, 0.0, windows[-1]["end"] if windows else 0.0, transcript_fingerprint(segments)
+    ) + "|overall"
+    cached_overall = store.get_chapter(video_id, overall_key)
+    if cached_overall is not None:
+        overall = cached_overall["summary"]
+    elif done:
+        prompt = service.build_summary_prompt(chapters_to_text(done), normalized, CHAPTER_SOURCE_LABEL)
+        overall = service.complete_summary(prompt, normalized)
+        store.save_chapter(video_id, overall_key, {"summary": overall})
+    else:
+        overall = ""
+    return {"chapters": done, "overall": overall, "window_seconds": window_seconds}
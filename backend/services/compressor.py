@@ -0,0 +1,264 @@
+import os
+import re
+import logging
+import time
+from typing import Dict, Any, List
+
+# 🧮 NumPyは圧縮の計算に使うよ。起動を速くするため、長い字幕が来て初めて読み込む！
+# （入ってなければ先頭切り詰めにフォールバック）
+np = None
+_numpy_checked = False
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+COMPRESSION_TIME_BINS = int(os.getenv("COMPRESSION_TIME_BINS", "24"))  # 動画全体を何ブロックに分けてカバーするか
+COMPRESSION_UNIT_MAX_CHARS = int(os.getenv("COMPRESSION_UNIT_MAX_CHARS", "160"))  # 1ユニット（文）の最大文字数
+HASH_BUCKETS = 1 << 18  # n-gramをハッシュで振り分けるバケット数（語彙を作らずに済む！）
+HASH_PRIME = 1000003
+GAP_MARKER = " … "  # 間を飛ばしたところに入れる目印
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?\.])\s*')
+CJK_RATIO_FOR_BIGRAM = 0.3  # CJKが多いテキストは2-gram、それ以外は3-gram
+CJK_CHAR_PATTERN = re.compile(r'[぀-ヿ㐀-䶿一-鿿]')
+
+
+def ensure_numpy() -> bool:
+    """
+    NumPyを初めて必要になったときに読み込むよ〜🧮
+
+    戻り値:
+        bool: NumPyが使えるならTrue
+    """
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # pragma: no cover - NumPyなし環境用
+            np = None
+        _numpy_checked = True
+    return np is not None
+
+
+def split_units(text: str, max_chars: int = COMPRESSION_UNIT_MAX_CHARS) -> List[str]:
+    """
+    テキストを文（ユニット）に分けるよ〜✂️
+    句読点がない自動字幕でも困らないように、長すぎる文は max_chars 以内に区切る！
+    英語は単語の途中で切らないように空白の位置で区切るよ💕
+
+    引数:
+        text (str): 分割するテキスト
+        max_chars (int): 1ユニットの最大文字数
+
+    戻り値:
+        List[str]: ユニットのリスト
+    """
+    chunk_pattern = re.compile(rf'.{{1,{max_chars}}}(?:\s+|$)|.{{1,{max_chars}}}', re.DOTALL)
+    units: List[str] = []
+    for sentence in SENTENCE_END_PATTERN.split(text):
+        if len(sentence) <= max_chars:
+            units.append(sentence)
+            continue
+        units.extend(chunk.strip() for chunk in chunk_pattern.findall(sentence))
+    return [unit for unit in units if unit]
+
+
+def score_units(units: List[str]) -> "np.ndarray":
+    """
+    各ユニットがどれだけ動画全体を代表してるかをTF-IDFで採点するよ〜💯
+    文字n-gramをハッシュしてNumPyで一気に計算するから、10時間分の字幕でも一瞬！⚡
+    スコアは「ユニットのベクトル」と「動画全体の重心ベクトル」のコサイン類似度だよ
+
+    引数:
+        units (List[str]): 採点するユニット
+
+    戻り値:
+        np.ndarray: ユニットごとのスコア（float64）
+    """
+    unit_count = len(units)
+    # 🔡 小文字にしてから長さを測る（'İ'→'i̇' みたいに小文字で長さが変わる文字があるから、順番が逆だとズレる）
+    folded = [u.lower() for u in units]
+    lengths = np.fromiter((len(u) for u in folded), dtype=np.int64, count=unit_count)
+    joined = "".join(folded)
+    if not joined:
+        return np.zeros(unit_count)
+
+    # 🈶 日本語が多ければ2-gram、英語なら3-gram
+    sample = joined[:2000]
+    ngram = 2 if len(CJK_CHAR_PATTERN.findall(sample)) / len(sample) >= CJK_RATIO_FOR_BIGRAM else 3
+
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    unit_ids = np.repeat(np.arange(unit_count, dtype=np.int64), lengths)
+    if len(codes) < ngram:
+        return np.zeros(unit_count)
+
+    # 🔢 n-gramのハッシュ値（ユニットをまたぐn-gramは捨てる）
+    span = len(codes) - ngram + 1
+    hashes = codes[:span].copy()
+    for k in range(1, ngram):
+        hashes = hashes * np.uint64(HASH_PRIME) + codes[k:k + span]
+    valid = unit_ids[:span] == unit_ids[ngram - 1:ngram - 1 + span]
+    term_ids = (hashes[valid] % np.uint64(HASH_BUCKETS)).astype(np.int64)
+    term_units = unit_ids[:span][valid]
+
+    # 📊 (ユニット, 単語) ごとの出現回数
+    keys, counts = np.unique(term_units * HASH_BUCKETS + term_ids, return_counts=True)
+    pair_units = keys // HASH_BUCKETS
+    pair_terms = keys % HASH_BUCKETS
+
+    # 📊 IDFと重み（サブリニアTF × IDF）
+    doc_freq = np.bincount(pair_terms, minlength=HASH_BUCKETS)
+    idf = np.log((unit_count + 1) / (doc_freq + 1)) + 1.0
+    weights = (1.0 + np.log(counts)) * idf[pair_terms]
+
+    # 🎯 動画全体の重心とのコサイン類似度
+    centroid = np.bincount(pair_terms, weights=weights, minlength=HASH_BUCKETS)
+    dots = np.bincount(pair_units, weights=weights * centroid[pair_terms], minlength=unit_count)
+    unit_norms = np.sqrt(np.bincount(pair_units, weights=weights * weights, minlength=unit_count))
+    centroid_norm = np.sqrt(np.dot(centroid, centroid))
+    return dots / (unit_norms * centroid_norm + 1e-12)
+
+
+def select_units(
+    lengths: "np.ndarray",
+    scores: "np.ndarray",
+    positions: "np.ndarray",
+    budget: int
+) -> "np.ndarray":
+    """
+    予算（文字数）に収まるように、時間ブロックごとに高スコアのユニットを選ぶよ〜🧺
+    ブロックごとに予算を配るから、動画の最初から最後までまんべんなくカバーできる！
+    余った予算はスコア順に全体から追加で埋めるよ
+
+    引数:
+        lengths (np.ndarray): ユニットごとの文字数（区切り込み）
+        scores (np.ndarray): ユニットごとのスコア
+        positions (np.ndarray): ユニットの位置（開始秒や文字オフセット、昇順）
+        budget (int): 文字数の予算
+
+    戻り値:
+        np.ndarray: 選ばれたユニットのインデックス（時間順）
+    """
+    unit_count = len(lengths)
+    bin_count = max(1, min(COMPRESSION_TIME_BINS, unit_count))
+
+    # ⏱️ 位置から時間ブロックを決める
+    span = float(positions[-1] - positions[0]) or 1.0
+    bins = np.minimum(((positions - positions[0]) / span * bin_count).astype(np.int64), bin_count - 1)
+
+    # 💰 ブロックの文字数に比例して予算を配る
+    bin_chars = np.bincount(bins, weights=lengths, minlength=bin_count)
+    bin_budget = budget * bin_chars / bin_chars.sum()
+
+    # 🥇 ブロック内でスコア順に並べて、累積文字数が予算内のものを採用
+    order = np.lexsort((-scores, bins))
+    sorted_bins = bins[order]
+    cumulative = np.cumsum(lengths[order])
+    bin_starts = np.searchsorted(sorted_bins, np.arange(bin_count))
+    offsets = np.concatenate(([0], cumulative))[bin_starts]
+    within_bin = cumulative - offsets[sorted_bins]
+    selected = np.zeros(unit_count, dtype=bool)
+    selected[order[within_bin <= bin_budget[sorted_bins]]] = True
+
+    # 🧺 余った予算をスコア順に埋める
+    remaining = budget - int(lengths[selected].sum())
+    if remaining > 0:
+        leftovers = np.flatnonzero(~selected)
+        leftovers = leftovers[np.argsort(-scores[leftovers], kind="stable")]
+        fits = np.cumsum(lengths[leftovers]) <= remaining
+        selected[leftovers[fits]] = True
+
+    return np.flatnonzero(selected)
+
+
+def _join_selected(units: List[str], indices: List[int], separator: str) -> str:
+    """
+    選ばれたユニットを時間順につなぐよ〜🧵 飛ばしたところには「…」を入れて、LLMに省略を伝える！
+
+    引数:
+        units (List[str]): 全ユニット
+        indices (List[int]): 選ばれたユニットのインデックス（昇順）
+        separator (str): 連続するユニットの間に入れる文字
+
+    戻り値:
+        str: つないだテキスト
+    """
+    parts: List[str] = []
+    previous = None
+    for index in indices:
+        if previous is not None:
+            parts.append(separator if index == previous + 1 else GAP_MARKER)
+        elif index > 0:
+            parts.append(GAP_MARKER.lstrip())
+        parts.append(units[index])
+        previous = index
+    return "".join(parts)
+
+
+def compress_text(text: str, budget: int) -> str:
+    """
+    長すぎる字幕テキストを、動画全体から大事な文を選んで予算内に圧縮するよ〜🗜️✨
+    頭だけ切り詰めると後半の内容が全部消えちゃうけど、これなら最後までカバーできる！
+
+    引数:
+        text (str): 字幕テキスト
+        budget (int): 最大文字数
+
+    戻り値:
+        str: 圧縮されたテキスト（budget文字以内）
+    """
+    if len(text) <= budget:
+        return text
+    if not ensure_numpy():
+        logger.warning("⚠️ NumPyがないから先頭切り詰めにするね")
+        return text[:budget]
+
+    started = time.perf_counter()
+    units = split_units(text)
+    if not units:
+        # 空白しかないテキストは文が1個も取れないから、選ぶものがない
+        return text[:budget].strip()
+    separator = "" if len(CJK_CHAR_PATTERN.findall(text[:2000])) / min(len(text), 2000) >= CJK_RATIO_FOR_BIGRAM else " "
+    lengths = np.fromiter((len(u) + len(GAP_MARKER) for u in units), dtype=np.int64, count=len(units))
+    positions = np.cumsum(lengths) - lengths
+    indices = select_units(lengths, score_units(units), positions, budget)
+    compressed = _join_selected(units, indices.tolist(), separator)[:budget]
+
+    logger.info(
+        "🗜️ 字幕を抽出圧縮したよ: %s→%s文字 (%s/%s文, %.1fms)",
+        len(text), len(compressed), len(indices), len(units), (time.perf_counter() - started) * 1000
+    )
+    return compressed
+
+
+def compress_segments(segments: List[Dict[str, Any]], budget: int) -> List[Dict[str, Any]]:
+    """
+    字幕セグメントのリストを、開始時間でまんべんなく選びつつ予算内に絞るよ〜🗜️🎬
+
+    引数:
+        segments (List[Dict[str, Any]]): 時間順の字幕セグメント（text / start / duration）
+        budget (int): テキストの合計最大文字数
+
+    戻り値:
+        List[Dict[str, Any]]: 選ばれたセグメント（時間順）
+    """
+    total_chars = sum(len(s.get('text', '')) + 1 for s in segments)
+    if total_chars <= budget:
+        return segments
+    if not ensure_numpy():
+        logger.warning("⚠️ NumPyがないから先頭のセグメントだけ使うね")
+        kept, used = [], 0
+        for segment in segments:
+            used += len(segment.get('text', '')) + 1
+            if used > budget:
+                break
+            kept.append(segment)
+        return kept
+
+    units = [s.get('text', '') for s in segments]
+    lengths = np.fromiter((len(u) + 1 for u in units), dtype=np.int64, count=len(units))
+    positions = np.fromiter((float(s.get('start', 0)) for s in segments), dtype=np.float64, count=len(units))
+    indices = select_units(lengths, score_units(units), positions, budget)
+    logger.info("🗜️ 字幕セグメントを抽出圧縮したよ: %s→%sセグメント", len(segments), len(indices))
+    return [segments[i] for i in indices.tolist()]
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from typing import Dict, Any, List, Optional
+
+from .compressor import compress_segments, compress_text
+from .store import get_store
+from .transcript_cleaner import clean_transcript
+from .tracing import span
+from .youtube import build_passages, format_time
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+USE_SUMMARY_DIGEST = os.getenv("USE_SUMMARY_DIGEST", "1") == "1"  # 0なら従来どおり字幕から直接要約する
+DIGEST_VERSION = 1  # 内容メモの形やプロンプトを変えたら上げる（古いメモは作り直し）
+DIGEST_SOURCE_CHARS = int(os.getenv("DIGEST_SOURCE_CHARS", os.getenv("MAX_CAPTION_LENGTH", "20000")))  # 内容メモを作るときに送る字幕の最大文字数
+DIGEST_PASSAGE_CHARS = 400  # タイムスタンプを1個つける字幕のまとまりの文字数
+DIGEST_MAX_TOKENS = 2000
+DIGEST_SOURCE_LABEL = "内容メモ（字幕から抜き出した要点・セクション・用語・タイムスタンプ）"
+DIGEST_SYSTEM_PROMPT = "あなたはYouTube動画の字幕から、内容を正確に整理したメモをJSONで作る優秀なアシスタントです。"
+JSON_BLOCK_PATTERN = re.compile(r"\{.*\}", re.DOTALL)
+DIGEST_LOCK_STRIPES = 64  # 同じ動画の内容メモを同時に2回作らないためのロックの数
+
+# 🔒 動画IDのハッシュで選ぶロック（動画ごとに作らないからメモリが増えない）
+_digest_locks = [threading.Lock() for _ in range(DIGEST_LOCK_STRIPES)]
+
+
+def build_digest_source(
+    segments: Optional[List[Dict[str, Any]]] = None,
+    language: Optional[str] = None,
+    text: Optional[str] = None,
+    budget: int = DIGEST_SOURCE_CHARS
+) -> str:
+    """
+    内容メモを作るためにLLMに渡す字幕を作るよ〜📝
+    セグメントがあれば「[HH:MM:SS] テキスト」の形にして、セクションにタイムスタンプをつけられるようにする！
+    長すぎたら動画全体からまんべんなく大事なところを選んで予算に収める🗜️
+
+    引数:
+        segments (Optional[List[Dict[str, Any]]]): 時間順の字幕セグメント（クリーニング前）
+        language (Optional[str]): 字幕の言語コード
+        text (Optional[str]): セグメントがないとき用の字幕テキスト（タイムスタンプなし）
+        budget (int): 最大文字数
+
+    戻り値:
+        str: LLMに渡す字幕
+    """
+    if not segments:
+        return compress_text(text or "", budget)
+    cleaned_segments, _ = clean_transcript(segments, language)
+    passages = build_passages(cleaned_segments, DIGEST_PASSAGE_CHARS)
+    # タイムスタンプの分（"[HH:MM:SS] " ＋改行）を差し引いてから圧縮する
+    marker_chars = len(passages) * 12
+    selected = compress_segments(cleaned_segments, max(budget - marker_chars, budget // 2))
+    if len(selected) != len(cleaned_segments):
+        passages = build_passages(selected, DIGEST_PASSAGE_CHARS)
+    return "\n".join(f"[{format_time(p['start'])}] {p['text']}" for p in passages)
+
+
+def create_digest_prompt(source: str) -> str:
+    """
+    スタイルなしの内容メモ（JSON）を作ってもらうプロンプトだよ〜🗒️
+
+    引数:
+        source (str): build_digest_source で作った字幕
+
+    戻り値:
+        str: プロンプト
+    """
+    return f"""
+【タスク】
+YouTube動画の字幕を読んで、あとで色んな文体・長さの要約を作るための「内容メモ」をJSONで作る
+
+【ルール】
+・文体やキャラクターはつけず、事実だけを簡潔な日本語で書く
+・原文の正確な情報（数字・固有名詞・結論）を保持する
+・sections は動画の流れに沿って3〜10個。start は字幕の [HH:MM:SS] から選ぶ（なければ空文字）
+・key_points は重要な主張・数字・結論を5〜15個
+・terms は専門用語・固有名詞・人物と、その短い説明
+・JSON以外は何も出力しない
+
+【出力形式】
+{{"overview": "動画全体の概要（2〜3文）", "conclusion": "結論", "sections": [{{"start": "00:00:00", "title": "セクション名", "points": ["要点"]}}], "key_points": ["要点"], "terms": [{{"term": "用語", "explanation": "説明"}}]}}
+
+【字幕】
+{source}
+"""
+
+
+def _as_text_list(value: Any) -> List[str]:
+    """リストっぽい値を空でない文字列のリストにするよ〜🧹"""
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def parse_digest(raw: str) -> Dict[str, Any]:
+    """
+    LLMが返した内容メモをパースして形をそろえるよ〜🔧
+    JSONじゃなかったら、返ってきた文章をそのまま概要として使う（作り直しでお金をかけない）
+
+    引数:
+        raw (str): LLMの返答
+
+    戻り値:
+        Dict[str, Any]: version / overview / conclusion / sections / key_points / terms
+    """
+    data: Dict[str, Any] = {}
+    match = JSON_BLOCK_PATTERN.search(raw or "")
+    if match:
+        try:
+            parsed = json.loads(match.group(0))
+            if isinstance(parsed, dict):
+                data = parsed
+        except ValueError:
+            pass
+    if not data:
+        logger.warning("⚠️ 内容メモがJSONじゃなかったから、文章のまま使うね")
+        data = {"overview": (raw or "").strip()}
+
+    sections = []
+    for section in data.get("sections") or []:
+        if isinstance(section, dict):
+            sections.append({
+                "start": str(section.get("start") or "").strip(),
+                "title": str(section.get("title") or "").strip(),
+                "points": _as_text_list(section.get("points")),
+            })
+    terms = []
+    for term in data.get("terms") or []:
+        if isinstance(term, dict) and str(term.get("term") or "").strip():
+            terms.append({"term": str(term["term"]).strip(), "explanation": str(term.get("explanation") or "").strip()})
+    return {
+        "version": DIGEST_VERSION,
+        "overview": str(data.get("overview") or "").strip(),
+        "conclusion": str(data.get("conclusion") or "").strip(),
+        "sections": sections,
+        "key_points": _as_text_list(data.get("key_points")),
+        "terms": terms,
+    }
+
+
+def transcript_fingerprint(segments: Optional[List[Dict[str, Any]]] = None, text: Optional[str] = None) -> str:
+    """
+    内容メモの元になった字幕の指紋を作るよ〜🫆（字幕が取り直しやライブで変わったら指紋も変わる）
+    セグメントがあればセグメントから、なければ字幕テキストから作る
+
+    引数:
+        segments (Optional[List[Dict[str, Any]]]): 字幕セグメント（クリーニング前）
+        text (Optional[str]): セグメントがないとき用の字幕テキスト
+
+    戻り値:
+        str: 指紋（16進数）
+    """
+    source = json.dumps(segments, ensure_ascii=False, separators=(",", ":")) if segments else (text or "")
+    return hashlib.blake2b(source.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def is_current_digest(digest: Optional[Dict[str, Any]], fingerprint: Optional[str] = None) -> bool:
+    """
+    保存済みの内容メモが今のバージョンで、今の字幕から作ったものか調べるよ〜🔍
+
+    引数:
+        digest (Optional[Dict[str, Any]]): 内容メモ
+        fingerprint (Optional[str]): 今の字幕の transcript_fingerprint（Noneなら字幕は比べない）
+
+    戻り値:
+        bool: そのまま使えるならTrue
+    """
+    if not digest or digest.get("version") != DIGEST_VERSION:
+        return False
+    return fingerprint is None or digest.get("transcript") == fingerprint
+
+
+def digest_to_text(digest: Dict[str, Any]) -> str:
+    """
+    内容メモを要約プロンプトに入れる短いテキストにするよ〜📄（JSONより文字数が少ない）
+
+    引数:
+        digest (Dict[str, Any]): parse_digest の戻り値
+
+    戻り値:
+        str: テキスト
+    """
+    lines = []
+    if digest.get("overview"):
+        lines.append(f"■概要: {digest['overview']}")
+    if digest.get("conclusion"):
+        lines.append(f"■結論: {digest['conclusion']}")
+    if digest.get("sections"):
+        lines.append("■セクション")
+        for section in digest["sections"]:
+            start = f"[{section['start']}] " if section.get("start") else ""
+            lines.append(f"{start}{section.get('title', '')}")
+            lines.extend(f"  ・{point}" for point in section.get("points", []))
+    if digest.get("key_points"):
+        lines.append("■キーポイント")
+        lines.extend(f"・{point}" for point in digest["key_points"])
+    if digest.get("terms"):
+        lines.append("■用語")
+        lines.extend(f"・{term['term']}: {term['explanation']}" for term in digest["terms"])
+    return "\n".join(lines)
+
+
+def get_or_create_digest(
+    video_id: str,
+    service: Any,
+    segments: Optional[List[Dict[str, Any]]] = None,
+    language: Optional[str] = None,
+    text: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    動画の内容メモをストアから取り出すよ〜🗒️ なければ作って保存する！
+    同じ動画の別オプションの要約が同時に来ても、メモを作るのは1回だけ（待ってた方は保存済みのを使う）
+    メモには元の字幕の指紋を入れとくから、字幕が取り直しやライブで変わったら古いメモは使わずに作り直す
+
+    引数:
+        video_id (str): 動画ID
+        service (Any): generate_digest を持つ要約サービス
+        segments (Optional[List[Dict[str, Any]]]): 字幕セグメント（あればタイムスタンプつきで送る）
+        language (Optional[str]): 字幕の言語コード
+        text (Optional[str]): セグメントがないとき用の字幕テキスト
+
+    戻り値:
+        Dict[str, Any]: 内容メモ
+
+    例外:
+        PerplexityError: 内容メモの生成に失敗した場合
+    """
+    store = get_store()
+    fingerprint = transcript_fingerprint(segments, text)
+    digest = store.get_digest(video_id)
+    if is_current_digest(digest, fingerprint):
+        return digest
+    with _digest_locks[hash(video_id) % DIGEST_LOCK_STRIPES]:
+        digest = store.get_digest(video_id)
+        if is_current_digest(digest, fingerprint):
+            return digest
+        with span("digest_source"):
+            source = build_digest_source(segments, language, text)
+        with span("digest"):
+            digest = {**service.generate_digest(source), "transcript": fingerprint}
+        store.save_digest(video_id, digest)
+    return digest
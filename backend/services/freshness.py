@@ -0,0 +1,250 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from .metrics import CACHE_REFRESHES
+from .store import get_store
+from .youtube import fetch_transcript_segments
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+POPULARITY_HALF_LIFE = float(os.getenv("POPULARITY_HALF_LIFE", str(6 * 60 * 60)))  # 人気度（アクセス数）が半分になる秒数
+POPULARITY_MAX_KEYS = int(os.getenv("POPULARITY_MAX_KEYS", "10000"))  # 人気度を覚えとくキーの最大数
+POPULARITY_FLUSH_INTERVAL = float(os.getenv("POPULARITY_FLUSH_INTERVAL", "10"))  # ワーカーで数えたアクセス数をストアに足す間隔（秒）
+REFRESH_WORKERS = int(os.getenv("REFRESH_WORKERS", "2"))  # 裏で作り直しを同時に何本走らせるか
+REFRESH_QUOTA_PER_HOUR = int(os.getenv("REFRESH_QUOTA_PER_HOUR", "60"))  # 先回りの作り直しを1時間に何回までやるか（全ワーカー合わせて）
+REFRESH_QUOTA_NAME = "warm_refresh"  # ストアのトークンバケツの名前
+REFRESH_REASON_STALE = "stale"  # 期限切れの値を出したついでに作り直す
+REFRESH_REASON_WARM = "warm"  # 人気のキーを期限切れの前に先回りで作り直す
+REFRESH_OK = "ok"
+REFRESH_ERROR = "error"
+
+
+class PopularityTracker:
+    """
+    動画＆オプションごとのアクセス数を、時間がたつほど小さくなる（半減期つきの）スコアで数える係だよ〜🔥📉
+
+    昨日100回より、さっき10回のほうが「いま人気」って判断できる。
+    スコアはストア（SQLite）にあって全ワーカーで共有。アクセスのたびに書き込むと重いから、
+    ワーカーの中で数を貯めといて flush_interval 秒ごとにまとめて足す（上位を出す前にも足す）
+    """
+
+    def __init__(
+        self,
+        half_life: float = POPULARITY_HALF_LIFE,
+        max_keys: int = POPULARITY_MAX_KEYS,
+        flush_interval: float = POPULARITY_FLUSH_INTERVAL
+    ):
+        """
+        引数:
+            half_life (float): スコアが半分になる秒数
+            max_keys (int): 覚えとくキーの最大数（超えたら人気が低い順に忘れる）
+            flush_interval (float): 貯めたアクセス数をストアに足す間隔（秒）
+        """
+        self.half_life = half_life
+        self.max_keys = max_keys
+        self.flush_interval = flush_interval
+        self._pending: Dict[Tuple[str, str], int] = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def hit(self, key: Tuple[str, str]) -> None:
+        """
+        キーに1回アクセスがあったことを数えるよ〜👆（flush_interval 秒たってたらストアに足す）
+
+        引数:
+            key (Tuple[str, str]): (動画ID, オプションキー)
+        """
+        with self._lock:
+            self._pending[key] = self._pending.get(key, 0) + 1
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def flush(self, now: Optional[float] = None) -> None:
+        """
+        貯めたアクセス数をストアの人気度に足すよ〜💾（失敗したら貯めた数は捨てる・人気度はだいたいで十分）
+
+        引数:
+            now (Optional[float]): 今の時刻（Noneなら time.time()）
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            get_store().add_popularity_hits(pending, time.time() if now is None else now, self.half_life, self.max_keys)
+        except Exception as e:
+            logger.warning("⚠️ 人気度をストアに足せなかったよ（%s件ぶん）: %s", len(pending), e)
+
+    def top(self, count: int, now: Optional[float] = None) -> List[Tuple[Tuple[str, str], float]]:
+        """
+        全ワーカー合わせたスコアが高い順にキーを返すよ〜🏆（このワーカーで貯めてたぶんも先に足す）
+
+        引数:
+            count (int): 返す数
+            now (Optional[float]): 今の時刻
+
+        戻り値:
+            List[Tuple[Tuple[str, str], float]]: ((動画ID, オプションキー), スコア) のリスト
+        """
+        now = time.time() if now is None else now
+        self.flush(now)
+        return get_store().top_popularity(count, now, self.half_life)
+
+
+class RefreshQuota:
+    """
+    先回りの作り直しに使っていい回数の枠だよ〜🎫（トークンバケツ・1時間で per_hour 回ぶん貯まる）
+
+    YouTubeのクォータもLLMのコストも、人気のキーを温め続けるのに使いすぎないように！
+    バケツはストア（SQLite）にあるから、ワーカーが何個あっても合計で1時間 per_hour 回まで
+    """
+
+    def __init__(self, per_hour: int = REFRESH_QUOTA_PER_HOUR, name: str = REFRESH_QUOTA_NAME):
+        """
+        引数:
+            per_hour (int): 1時間に使っていい回数（0なら先回りはしない）
+            name (str): ストアのバケツの名前
+        """
+        self.per_hour = per_hour
+        self.name = name
+
+    def try_acquire(self) -> bool:
+        """
+        枠を1個使えたらTrueを返すよ〜🎫（残ってなければFalse・待たない）
+
+        戻り値:
+            bool: 使えたらTrue
+        """
+        if self.per_hour <= 0:
+            return False
+        return get_store().take_token(self.name, self.per_hour, time.time())
+
+    @property
+    def remaining(self) -> int:
+        """今すぐ使える枠の数だよ〜🔢（全ワーカー合わせて）"""
+        if self.per_hour <= 0:
+            return 0
+        return int(get_store().peek_tokens(self.name, self.per_hour, time.time()))
+
+
+class Revalidator:
+    """
+    キャッシュの作り直しを裏のスレッドで走らせる係だよ〜🔁（stale-while-revalidate の「revalidate」）
+
+    同じキーの作り直しが走ってる間は、何回頼まれても1回しか走らせない。
+    作り直しが失敗しても、古い値はそのまま出し続ける（次に頼まれたらまたやる）
+    """
+
+    def __init__(self, workers: int = REFRESH_WORKERS):
+        """
+        引数:
+            workers (int): 同時に走らせる作り直しの数
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="revalidate")
+        self._in_flight: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def in_flight(self, key: Hashable) -> bool:
+        """そのキーの作り直しが走ってるか返すよ〜🏃‍♀️"""
+        with self._lock:
+            return key in self._in_flight
+
+    def submit(self, cache: str, key: Hashable, refresh: Callable[[], None], reason: str) -> bool:
+        """
+        作り直しを頼むよ〜📮（同じキーが走ってたら何もしない）
+
+        引数:
+            cache (str): キャッシュの名前（メトリクスのラベル）
+            key (Hashable): キー
+            refresh (Callable[[], None]): 作り直す関数
+            reason (str): stale（期限切れを出したついで）/ warm（先回り）
+
+        戻り値:
+            bool: 新しく頼んだらTrue
+        """
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+        logger.info("🔁 裏で作り直すよ: %s %s（%s）", cache, key, reason)
+        future = self._executor.submit(refresh)
+        future.add_done_callback(lambda done: self._finish(cache, key, reason, done))
+        return True
+
+    def _finish(self, cache: str, key: Hashable, reason: str, future: Future) -> None:
+        """作り直しが終わったら、走ってる印を消して結果を数えるよ〜✅"""
+        with self._lock:
+            self._in_flight.discard(key)
+        error = future.exception()
+        if error is not None:
+            logger.warning("⚠️ 裏での作り直しに失敗したけど、古い値はそのまま使えるよ: %s %s %s", cache, key, error)
+        CACHE_REFRESHES.inc(cache=cache, reason=reason, result=REFRESH_ERROR if error is not None else REFRESH_OK)
+
+
+# 🏭 プロセスで1つずつ
+_popularity = PopularityTracker()
+_refresh_quota = RefreshQuota()
+_revalidator: Optional[Revalidator] = None
+_revalidator_lock = threading.Lock()
+
+
+def get_popularity() -> PopularityTracker:
+    """プロセスで1つの人気度トラッカーを返すよ〜🔥（スコアそのものはストアで全ワーカー共有）"""
+    return _popularity
+
+
+def get_refresh_quota() -> RefreshQuota:
+    """プロセスで1つの先回り作り直しの枠を返すよ〜🎫（残りの数はストアで全ワーカー共有）"""
+    return _refresh_quota
+
+
+def get_revalidator() -> Revalidator:
+    """
+    プロセスで1つの作り直し係を返すよ〜🔁（最初に呼ばれたときにスレッドプールを作る）
+
+    戻り値:
+        Revalidator: 作り直し係
+    """
+    global _revalidator
+    if _revalidator is None:
+        with _revalidator_lock:
+            if _revalidator is None:
+                _revalidator = Revalidator()
+    return _revalidator
+
+
+def refresh_transcript(video_id: str) -> None:
+    """
+    YouTubeから字幕を取り直してストアに入れ直すよ〜📝（空っぽなら古いのをそのまま残す）
+
+    引数:
+        video_id (str): 動画ID
+
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+    """
+    segments, language = fetch_transcript_segments(video_id)
+    if segments:
+        get_store().save_transcript(video_id, segments, language)
+
+
+def schedule_transcript_refresh(video_id: str, reason: str = REFRESH_REASON_STALE) -> bool:
+    """
+    字幕の取り直しを裏で頼むよ〜📮（同じ動画が走ってたら何もしない）
+
+    引数:
+        video_id (str): 動画ID
+        reason (str): stale / warm
+
+    戻り値:
+        bool: 新しく頼んだらTrue
+    """
+    return get_revalidator().submit("transcript_store", ("transcript", video_id), lambda: refresh_transcript(video_id), reason)
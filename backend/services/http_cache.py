@@ -0,0 +1,95 @@
+import gzip
+import json
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+
+# 🗜️ brotliは入ってれば使うよ（なければgzipだけ）
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotliなし環境用
+    brotli = None
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+GZIP_LEVEL = 9  # 1回圧縮して何度も配るから、最高圧縮でOK
+BROTLI_QUALITY = 11
+ENCODING_BROTLI = "br"
+ENCODING_GZIP = "gzip"
+ENCODING_IDENTITY = "identity"
+
+
+def build_cached_body(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    レスポンス用のJSONを1回だけシリアライズ＆圧縮して、ETagもつけるよ〜📦✨
+    保存するときに作っておけば、配るときはバイト列をそのまま返すだけ！
+
+    引数:
+        payload (Dict[str, Any]): レスポンスにするデータ
+
+    戻り値:
+        Dict[str, Any]: body / body_gzip / body_br（brotliなしならNone）/ etag
+    """
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return {
+        "body": body,
+        "body_gzip": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+        "body_br": brotli.compress(body, quality=BROTLI_QUALITY) if brotli else None,
+        # 強いETag（中身のバイト列が同じなら同じ値）
+        "etag": '"' + hashlib.sha256(body).hexdigest()[:32] + '"',
+    }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    If-None-Match ヘッダーがETagと一致するか調べるよ〜🔍（一致なら304で返せる！）
+
+    引数:
+        if_none_match (Optional[str]): If-None-Match ヘッダーの値
+        etag (str): 今のETag
+
+    戻り値:
+        bool: 一致したらTrue
+    """
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    # If-None-Matchは弱い比較でOKやから W/ は外して比べる
+    return "*" in candidates or etag in (c[2:] if c.startswith("W/") else c for c in candidates)
+
+
+def negotiate_encoding(accept_encoding: Optional[str], has_brotli: bool) -> str:
+    """
+    Accept-Encoding を見て、どの圧縮で返すか決めるよ〜🤝 brotli > gzip > なし の順！
+
+    引数:
+        accept_encoding (Optional[str]): Accept-Encoding ヘッダーの値
+        has_brotli (bool): brotli版のバイト列があるか
+
+    戻り値:
+        str: "br" / "gzip" / "identity"
+    """
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.lower()] = quality
+
+    def allowed(name: str) -> bool:
+        return accepted.get(name, accepted.get("*", 0.0)) > 0
+
+    if has_brotli and allowed(ENCODING_BROTLI):
+        return ENCODING_BROTLI
+    if allowed(ENCODING_GZIP):
+        return ENCODING_GZIP
+    return ENCODING_IDENTITY
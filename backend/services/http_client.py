@@ -0,0 +1,62 @@
+import os
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "40"))  # 1ホストあたりの使い回す接続数（スレッドプールと同じくらい）
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "4"))  # 接続プールを持つホストの数
+WARMUP_CONNECT_TIMEOUT = float(os.getenv("WARMUP_CONNECT_TIMEOUT", "3"))
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    プロセスで1つの、接続を使い回す requests.Session を返すよ〜🔌
+    毎回 requests.post するとTCP/TLSのハンドシェイクからやり直しやけど、これならKeep-Aliveで使い回せる！
+    （ワーカープロセスごとに作るから、forkした親の接続を子が引き継ぐこともない）
+
+    戻り値:
+        requests.Session: 共有セッション
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_SIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def warm_connection(url: str) -> bool:
+    """
+    url のホストに1回つないで、接続プールにTLS済みの接続を置いとくよ〜🔥
+    最初のリクエストがDNS解決とハンドシェイクを待たなくて済む！失敗しても気にしない
+
+    引数:
+        url (str): つなぎたいURL（ホスト部分だけ使う）
+
+    戻り値:
+        bool: つながったらTrue
+    """
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}/"
+    try:
+        get_http_session().head(origin, timeout=WARMUP_CONNECT_TIMEOUT, allow_redirects=False)
+        logger.debug("🔥 接続ウォームアップ完了: %s", origin)
+        return True
+    except requests.RequestException as e:
+        logger.debug("🔥 接続ウォームアップ失敗（気にせんでOK）: %s %s", origin, e)
+        return False
@@ -0,0 +1,121 @@
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from shared.summary_pipeline import get_summary_pipeline, run_summary_pipeline
+from .llm import SummaryService
+from .store import get_store, JOB_RUNNING, JOB_DONE, JOB_ERROR
+from .scheduler import PRIORITY_API
+from .tracing import start_trace
+from .youtube import CaptionFetchError
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "8"))  # 1ワーカーで優先度クラスごとに同時に動かすジョブの数（スレッドプールを食い尽くさないように）
+NO_CAPTIONS_MESSAGE = "字幕が見つからへんかった😢"
+
+# 🏃‍♀️ 動いてるジョブのタスク（参照を持っとかないとGCで消えちゃう）
+_running_tasks: Set[asyncio.Task] = set()
+# 🎫 ジョブの同時実行枠は優先度クラスごと（bulkのジョブが溜まっても画面からのジョブが後ろに並ばない）
+_job_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def summarize_and_store(
+    video_id: str,
+    options: Dict[str, str],
+    transcript: Optional[Tuple[List[Dict[str, Any]], Optional[str]]] = None,
+    priority: str = PRIORITY_API
+) -> Optional[str]:
+    """
+    字幕を取って（ストアにあればそれを使う）、要約して、ストアに保存するまでを一気にやるよ〜🎬✨
+    中身は shared の要約パイプライン（Streamlit やバッチと同じステージ）
+    /summarize と要約ジョブの両方で使う同期処理だから、スレッドプールで呼んでね
+
+    引数:
+        video_id (str): 動画ID
+        options (Dict[str, str]): 要約オプション
+        transcript (Optional[Tuple[List[Dict[str, Any]], Optional[str]]]): 手元にある (字幕セグメント, 言語コード)。
+            アーカイブから作り直すとき用で、渡せばストアにもYouTubeにも取りに行かない
+        priority (str): LLMの枠を取るときの優先度クラス（interactive / api / bulk）
+
+    戻り値:
+        Optional[str]: 要約テキスト（字幕が空ならNone）
+
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+        PerplexityError: 要約生成に失敗した場合
+    """
+    inputs: Dict[str, Any] = {"video_id": video_id, "options": options}
+    if transcript is not None:
+        inputs["segments"], inputs["language"] = transcript
+    context = run_summary_pipeline(get_summary_pipeline(), SummaryService(priority), **inputs)
+    return context.get("summary")
+
+
+async def _run_summary_job(job_id: str, video_id: str, options: Dict[str, str], priority: str) -> None:
+    """
+    要約ジョブを1個動かして、結果をジョブテーブルに書くよ〜🏃‍♀️
+
+    引数:
+        job_id (str): ジョブID
+        video_id (str): 動画ID
+        options (Dict[str, str]): 要約オプション
+        priority (str): 優先度クラス
+    """
+    if priority not in _job_slots:
+        _job_slots[priority] = asyncio.Semaphore(JOB_CONCURRENCY)
+    store = get_store()
+    async with _job_slots[priority]:
+        with start_trace("job summarize", job_id=job_id, priority=priority):
+            try:
+                await run_in_threadpool(store.update_job, job_id, JOB_RUNNING)
+                summary = await run_in_threadpool(summarize_and_store, video_id, options, None, priority)
+                if summary is None:
+                    await run_in_threadpool(store.update_job, job_id, JOB_ERROR, None, NO_CAPTIONS_MESSAGE)
+                else:
+                    await run_in_threadpool(store.update_job, job_id, JOB_DONE, summary)
+                    logger.info("✅ ジョブ完了: %s", job_id)
+            except CaptionFetchError as e:
+                logger.error("🎬 ジョブの字幕取得エラー: %s %s", job_id, e)
+                await run_in_threadpool(store.update_job, job_id, JOB_ERROR, None, f"{NO_CAPTIONS_MESSAGE} {e}")
+            except Exception as e:
+                logger.error("🔥 ジョブ失敗: %s %s", job_id, e, exc_info=True)
+                await run_in_threadpool(store.update_job, job_id, JOB_ERROR, None, f"要約処理に失敗したわ〜💦 エラー: {e}")
+
+
+def schedule_summary_job(job_id: str, video_id: str, options: Dict[str, str], priority: str = PRIORITY_API) -> None:
+    """
+    要約ジョブをこのワーカーのイベントループで裏で動かすよ〜📮（呼んだ側はすぐ返れる）
+
+    引数:
+        job_id (str): ジョブID
+        video_id (str): 動画ID
+        options (Dict[str, str]): 要約オプション
+        priority (str): 優先度クラス（interactive / api / bulk）
+    """
+    task = asyncio.get_running_loop().create_task(_run_summary_job(job_id, video_id, options, priority))
+    _running_tasks.add(task)
+    task.add_done_callback(_running_tasks.discard)
+
+
+def job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ジョブをAPIのレスポンス用の形にするよ〜📦
+
+    引数:
+        job (Dict[str, Any]): LibraryStore.get_job の戻り値
+
+    戻り値:
+        Dict[str, Any]: job_id / status / video_id（終わってたら summary か error も）
+    """
+    response = {"job_id": job["job_id"], "status": job["status"], "video_id": job["video_id"]}
+    if job["status"] == JOB_DONE:
+        response["summary"] = job["result"]
+    elif job["status"] == JOB_ERROR:
+        response["error"] = job["error"]
+    return response
@@ -0,0 +1,140 @@
+import os
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+from .metrics import LIVE_NEW_SEGMENTS
+from .store import get_store, summary_options_key
+from .tracing import span
+from .transcript_cleaner import clean_transcript_text
+from .youtube import format_time
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+LIVE_MIN_NEW_CHARS = int(os.getenv("LIVE_MIN_NEW_CHARS", "300"))  # 増えた字幕がこれより少なければLLMを呼ばない
+LIVE_SOURCE_LABEL = "ライブ配信のこれまでの要約と、そのあとに増えた字幕（2つを合わせて、配信全体の最新の要約にする）"
+LIVE_LOCK_STRIPES = 64  # 同じ配信を同時に2回更新しないためのロックの数
+
+# 🔒 動画IDのハッシュで選ぶロック（配信ごとに作らないからメモリが増えない）
+_live_locks = [threading.Lock() for _ in range(LIVE_LOCK_STRIPES)]
+
+
+def new_segments_since(segments: List[Dict[str, Any]], state: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    前回読んだところより後に増えた字幕セグメントだけ、時間順に並べて返すよ〜✂️（state がなければ全部）
+
+    引数:
+        segments (List[Dict[str, Any]]): 字幕セグメント（配信の最初から・順番はバラバラでもOK）
+        state (Optional[Dict[str, Any]]): get_live_state の戻り値
+
+    戻り値:
+        List[Dict[str, Any]]: 増えたセグメント（start の順）
+    """
+    last_start = state["last_segment_start"] if state is not None else float("-inf")
+    fresh = [s for s in segments if float(s.get("start", 0)) > last_start]
+    fresh.sort(key=lambda s: float(s.get("start", 0)))
+    return fresh
+
+
+def build_live_source(summary: str, new_captions: str, start: float, end: float) -> str:
+    """
+    これまでの要約と増えた字幕を、1つの要約対象にまとめるよ〜🧩
+
+    引数:
+        summary (str): これまでの要約
+        new_captions (str): 増えた字幕（クリーニング・圧縮済み）
+        start (float): 増えた字幕の最初の時間（秒）
+        end (float): 増えた字幕の最後の時間（秒）
+
+    戻り値:
+        str: 要約対象のテキスト
+    """
+    return (
+        f"■これまでの要約（〜{format_time(start)}）\n{summary}\n\n"
+        f"■増えた字幕（{format_time(start)}〜{format_time(end)}）\n{new_captions}"
+    )
+
+
+def refresh_live_summary(
+    video_id: str,
+    service: Any,
+    segments: List[Dict[str, Any]],
+    language: Optional[str],
+    options: Dict[str, str]
+) -> Dict[str, Any]:
+    """
+    伸び続ける字幕（ライブ配信・プレミア公開）の要約を、増えたぶんだけで更新するよ〜📡⚡
+    前回どのセグメントまで読んだかをストアに覚えといて、LLMに送るのは「これまでの要約＋増えた字幕」だけ。
+    だから更新のコストは配信全体の長さじゃなくて、増えた量に比例する！
+    増えた字幕が LIVE_MIN_NEW_CHARS 文字より少なければ、LLMは呼ばずにこれまでの要約を返す。
+    ロックはプロセスの中だけやから、保存は「読んだ位置が読む前のまま」のときだけ。
+    ほかのワーカーが先に進めてたら、こっちの要約は捨ててストアの最新を返す（同じ字幕を2回数えない）
+
+    引数:
+        video_id (str): 動画ID
+        service (Any): 要約サービス（normalize_options / fit_caption_budget / build_summary_prompt / complete_summary を持ってるもの）
+        segments (List[Dict[str, Any]]): いま取れた字幕セグメント（配信の最初から・クリーニング前）
+        language (Optional[str]): 字幕の言語コード
+        options (Dict[str, str]): 要約オプション
+
+    戻り値:
+        Dict[str, Any]: summary / options_key / processed_segments / last_segment_start / new_segments / updated
+
+    例外:
+        PerplexityError: 要約に失敗した場合（読んだ位置は進めない）
+    """
+    normalized = service.normalize_options(options)
+    options_key = summary_options_key(normalized)
+    store = get_store()
+    with _live_locks[hash(video_id) % LIVE_LOCK_STRIPES]:
+        state = store.get_live_state(video_id, options_key)
+        fresh = new_segments_since(segments, state)
+        LIVE_NEW_SEGMENTS.observe(len(fresh))
+        with span("live_clean"):
+            new_captions, _ = clean_transcript_text(fresh, language) if fresh else ("", {})
+        result = {
+            "summary": state["summary"] if state else "",
+            "options_key": options_key,
+            "processed_segments": state["processed_segments"] if state else 0,
+            "last_segment_start": state["last_segment_start"] if state else -1.0,
+            "new_segments": len(fresh),
+            "updated": False,
+        }
+        if not new_captions or (state is not None and len(new_captions) < LIVE_MIN_NEW_CHARS):
+            logger.info("📡 増えた字幕が少ないから要約はそのまま: %s（%sセグメント・%s文字）", video_id, len(fresh), len(new_captions))
+            return result
+
+        source_captions = service.fit_caption_budget(new_captions)
+        if state is None:
+            # 最初の1回は普通の要約と同じ（配信のここまでを全部読む）
+            prompt = service.build_summary_prompt(source_captions, normalized)
+        else:
+            first_start = float(fresh[0].get("start", 0))
+            last_end = float(fresh[-1].get("start", 0)) + float(fresh[-1].get("duration", 0) or 0)
+            source = build_live_source(state["summary"], source_captions, first_start, last_end)
+            prompt = service.build_summary_prompt(source, normalized, LIVE_SOURCE_LABEL)
+        summary = service.complete_summary(prompt, normalized, kind="live")
+
+        result.update({
+            "summary": summary,
+            "processed_segments": result["processed_segments"] + len(fresh),
+            "last_segment_start": float(fresh[-1].get("start", 0)),
+            "updated": True,
+        })
+        if not store.save_live_state(video_id, options_key, result, state["last_segment_start"] if state else None):
+            latest = store.get_live_state(video_id, options_key) or {}
+            logger.info("📡 ほかのワーカーが先にライブ要約を更新してたから、こっちの要約は捨てるよ: %s", video_id)
+            result.update({
+                "summary": latest.get("summary", ""),
+                "processed_segments": latest.get("processed_segments", 0),
+                "last_segment_start": latest.get("last_segment_start", -1.0),
+                "updated": False,
+            })
+            return result
+    logger.info(
+        "📡 ライブ要約を更新したよ: %s（+%sセグメント・累計%sセグメント・%sまで）",
+        video_id, len(fresh), result["processed_segments"], format_time(result["last_segment_start"])
+    )
+    return result
@@ -1,9 +1,7 @@
 import os
 import logging
-import requests
 import time
-from typing import Dict, Any, Optional
-import openai
+from typing import Dict, Any, List, Optional
 from ..constants import (
     # ✨ 内部値の定数をインポート
     SUMMARY_STYLE_BULLET, SUMMARY_STYLE_PARAGRAPH, SUMMARY_STYLE_GAL, SUMMARY_STYLE_ONEESAN,
@@ -14,15 +12,28 @@ from ..constants import (
     # ✨ 逆引き用の辞書もインポート
     LABEL_TO_STYLE, LABEL_TO_LENGTH, LABEL_TO_EXPLANATION
 )
+from .compressor import compress_text
+from .digest import (
+    create_digest_prompt, parse_digest, digest_to_text,
+    DIGEST_MAX_TOKENS, DIGEST_SOURCE_LABEL, DIGEST_SYSTEM_PROMPT
+)
+from .metrics import LLM_ATTEMPT_SECONDS, LLM_RETRIES, UPSTREAM_RATE_LIMITED, PROMPT_CHARS
+from .tracing import span
+from .http_client import get_http_session
+from .scheduler import get_llm_scheduler, LLMSlotTimeoutError, PRIORITY_API
+from .usage import record_usage, summary_max_tokens
+from ..logging_config import log_payload
 
 # ✨ かわいいロガーの設定だよ〜ん💕
 logger = logging.getLogger(__name__)
 
 # 🔐 環境変数からAPIキーを取得
-PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY")
+PERPLEXITY_API_URL = os.getenv("PERPLEXITY_API_URL", "https://api.perplexity.ai/chat/completions")  # 負荷試験ではスタブに向ける
 MAX_CAPTION_LENGTH = int(os.getenv("MAX_CAPTION_LENGTH", "20000"))  # ←ここやで！字幕制限は20000文字に増やしたよ💁‍♀️
 MAX_RETRIES = 3
 RETRY_DELAY = 2
+QA_MAX_TOKENS = 600  # Q&Aの回答は短めでOK
+SUMMARY_SOURCE_LABEL = "字幕テキスト"
 
 class PerplexityError(Exception):
     """Perplexity API呼び出し中のエラーを表すクラスだよ〜🚫"""
@@ -39,13 +50,20 @@ class SummaryService:
     このクラスはPerplexity APIに接続して、テキストの要約を生成するよ〜！
     """
     
-    def __init__(self):
-        """サービスの初期化だよ〜💖"""
-        if not PERPLEXITY_API_KEY:
-            logger.warning("⚠️ PERPLEXITY_API_KEYが設定されていないよ！")
+    def __init__(self, priority: str = PRIORITY_API, api_key: Optional[str] = None):
+        """
+        サービスの初期化だよ〜💖
         
-        self.api_key = PERPLEXITY_API_KEY
-        self.api_url = "https://api.perplexity.ai/chat/completions"
+        引数:
+            priority (str): LLMの枠を取るときの優先度クラス（interactive / api / bulk）
+            api_key (Optional[str]): APIキー（Noneなら環境変数から・Streamlitのサイドバーで入れたキーはこっち）
+        """
+        self.priority = priority
+        # 🔐 APIキーは作るたびに環境変数から読む（import時に固定しないから、あとから設定してもOK）
+        self.api_key = api_key or os.getenv("PERPLEXITY_API_KEY")
+        if not self.api_key:
+            logger.warning("⚠️ PERPLEXITY_API_KEYが設定されていないよ！")
+        self.api_url = PERPLEXITY_API_URL
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
@@ -68,15 +86,126 @@ class SummaryService:
         if not self.api_key:
             raise PerplexityError("Perplexity APIキーが設定されていないよ〜😢")
         
-        # 字幕テキストが長すぎる場合は切り詰める
-        if len(text) > MAX_CAPTION_LENGTH:
-            logger.info(f"⚠️ テキストが長すぎるから{MAX_CAPTION_LENGTH}文字に切り詰めるよ")
-            text = text[:MAX_CAPTION_LENGTH]
+        normalized = self.normalize_options(options)
+        prompt = self.build_summary_prompt(self.fit_caption_budget(text), normalized)
+        summary = self.complete_summary(prompt, normalized)
+        
+        logger.info("✅ 要約生成完了！")
+        return summary
+    
+    def generate_digest(self, source: str) -> Dict[str, Any]:
+        """
+        字幕からスタイルなしの内容メモ（概要・セクション・キーポイント・用語・タイムスタンプ）を作るよ〜🗒️
+        動画ごとに1回だけ作って保存しとけば、どのオプションの要約もここから安く作れる！
+        
+        引数:
+            source (str): build_digest_source で作った字幕
+            
+        戻り値:
+            Dict[str, Any]: parse_digest で形をそろえた内容メモ
+            
+        例外:
+            PerplexityError: API呼び出しに失敗した場合
+        """
+        if not self.api_key:
+            raise PerplexityError("Perplexity APIキーが設定されていないよ〜😢")
+        
+        with span("prompt_build"):
+            prompt = create_digest_prompt(source)
+        PROMPT_CHARS.observe(len(prompt), kind="digest")
+        payload = {
+            "model": "sonar",
+            "messages": [
+                {"role": "system", "content": DIGEST_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt}
+            ],
+            "temperature": 0.2,  # 事実をまとめるだけやから低め
+            "max_tokens": DIGEST_MAX_TOKENS
+        }
+        digest = parse_digest(self._call_api_with_retry(payload, "digest"))
+        logger.info("🗒️ 内容メモ作成完了！セクション: %s個", len(digest["sections"]))
+        return digest
+    
+    def render_summary(self, digest: Dict[str, Any], options: Dict[str, str]) -> str:
+        """
+        内容メモから、オプション（長さ・スタイル・解説）どおりの要約を作るよ〜🎨
+        字幕を丸ごと送らないから、オプションを変えたときの作り直しが速くて安い！
         
+        引数:
+            digest (Dict[str, Any]): generate_digest で作った内容メモ
+            options (Dict[str, str]): 要約オプション
+            
+        戻り値:
+            str: 生成された要約テキスト
+            
+        例外:
+            PerplexityError: API呼び出しに失敗した場合
+        """
+        if not self.api_key:
+            raise PerplexityError("Perplexity APIキーが設定されていないよ〜😢")
+        
+        normalized = self.normalize_options(options)
+        prompt = self.build_summary_prompt(digest_to_text(digest), normalized, DIGEST_SOURCE_LABEL)
+        summary = self.complete_summary(prompt, normalized)
+        
+        logger.info("✅ 内容メモから要約生成完了！")
+        return summary
+    
+    def fit_caption_budget(self, text: str) -> str:
+        """
+        字幕テキストが長すぎたら、動画全体から大事な文を選んで MAX_CAPTION_LENGTH 文字に圧縮するよ〜🗜️
+        
+        引数:
+            text (str): 字幕テキスト
+            
+        戻り値:
+            str: 予算に収まった字幕テキスト
+        """
+        if len(text) <= MAX_CAPTION_LENGTH:
+            return text
+        logger.info("⚠️ テキストが長すぎるから動画全体から抜き出して%s文字に圧縮するよ", MAX_CAPTION_LENGTH)
+        with span("compress"):
+            return compress_text(text, MAX_CAPTION_LENGTH)
+    
+    def complete_summary(self, prompt: str, options: Dict[str, str], kind: str = "summary", max_tokens: Optional[int] = None) -> str:
+        """
+        要約プロンプトをLLMに投げて要約を受け取るよ〜🧠（max_tokens は長さオプションと実測から決める）
+        
+        引数:
+            prompt (str): build_summary_prompt で作ったプロンプト
+            options (Dict[str, str]): 正規化した要約オプション
+            kind (str): トークン数を数えるときの種類（summary / chapter / live）
+            max_tokens (Optional[int]): 出力トークンの上限（Noneなら summary_max_tokens で決める）
+            
+        戻り値:
+            str: 生成された要約テキスト
+            
+        例外:
+            PerplexityError: API呼び出しに失敗した場合
+        """
+        if not self.api_key:
+            raise PerplexityError("Perplexity APIキーが設定されていないよ〜😢")
+        if max_tokens is None:
+            max_tokens = summary_max_tokens(options)
+        return self._call_api_with_retry(self._summary_payload(prompt, max_tokens), kind, options)
+    
+    def build_summary_prompt(self, text: str, options: Dict[str, str], source_label: str = SUMMARY_SOURCE_LABEL) -> str:
+        """
+        オプションを内部値にそろえて、要約プロンプトを作るよ〜📝
+        
+        引数:
+            text (str): 要約するテキスト
+            options (Dict[str, str]): 要約オプション
+            source_label (str): プロンプトでの要約対象の呼び方
+            
+        戻り値:
+            str: 生成されたプロンプト
+        """
         # 🆕 オプションの前処理 - 表示ラベルと内部値の変換処理
-        length_option = self._normalize_length_option(options.get('length', SUMMARY_LENGTH_MEDIUM))
-        style_option = self._normalize_style_option(options.get('style', SUMMARY_STYLE_BULLET))
-        explanation_option = self._normalize_explanation_option(options.get('explanation', SUMMARY_EXPLANATION_NO))
+        normalized = self.normalize_options(options)
+        length_option = normalized['length']
+        style_option = normalized['style']
+        explanation_option = normalized['explanation']
         
         # オプションからプロンプト文字列を取得
         summary_length = SUMMARY_LENGTH_PROMPTS.get(length_option, SUMMARY_LENGTH_PROMPTS[SUMMARY_LENGTH_MEDIUM])
@@ -84,10 +213,24 @@ class SummaryService:
         summary_explanation = SUMMARY_EXPLANATION_PROMPTS.get(explanation_option, SUMMARY_EXPLANATION_PROMPTS[SUMMARY_EXPLANATION_NO])
         
         # プロンプトの作成
-        prompt = self._create_summary_prompt(text, summary_length, summary_style, summary_explanation)
+        with span("prompt_build"):
+            prompt = self._create_summary_prompt(text, summary_length, summary_style, summary_explanation, source_label)
+        PROMPT_CHARS.observe(len(prompt), kind="summary")
+        return prompt
+    
+    @staticmethod
+    def _summary_payload(prompt: str, max_tokens: int) -> Dict[str, Any]:
+        """
+        要約用のAPIリクエストを作るよ〜📦
         
-        # APIリクエストの作成
-        payload = {
+        引数:
+            prompt (str): 要約プロンプト
+            max_tokens (int): 出力トークンの上限（summary_max_tokens で長さオプションから決める）
+            
+        戻り値:
+            Dict[str, Any]: APIリクエストのペイロード
+        """
+        return {
             "model": "sonar",  # 良いモデルを選ぶよ〜💕
             "messages": [
                 {
@@ -100,16 +243,80 @@ class SummaryService:
                 }
             ],
             "temperature": 0.7,
-            "max_tokens": 1500
+            "max_tokens": max_tokens
+        }
+    
+    def answer_question(self, question: str, passages: List[Dict[str, Any]]) -> str:
+        """
+        字幕の関連パッセージだけを使って、動画についての質問に答えるよ〜🙋‍♀️
+        
+        引数:
+            question (str): ユーザーの質問
+            passages (List[Dict[str, Any]]): BM25で選んだパッセージ（timestamp / text）
+            
+        戻り値:
+            str: 回答テキスト
+            
+        例外:
+            PerplexityError: API呼び出しに失敗した場合
+        """
+        if not self.api_key:
+            raise PerplexityError("Perplexity APIキーが設定されていないよ〜😢")
+        
+        context = "\n".join(f"[{p['timestamp']}] {p['text']}" for p in passages)
+        prompt = f"""
+【質問】
+{question}
+
+【回答ルール】
+・下の字幕の抜粋だけを根拠に答える
+・根拠にした箇所のタイムスタンプ（[HH:MM:SS]）を回答に含める
+・抜粋に答えがなければ「動画内では見つからなかった」と答える
+・簡潔で読みやすい日本語で書く
+
+【字幕の抜粋】
+{context}
+"""
+        payload = {
+            "model": "sonar",
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "あなたはYouTube動画の字幕の抜粋から質問に答える優秀なAIアシスタントです。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.2,
+            "max_tokens": QA_MAX_TOKENS
         }
         
-        # API呼び出し（リトライロジック付き）
-        summary = self._call_api_with_retry(payload)
+        PROMPT_CHARS.observe(len(prompt), kind="qa")
+        answer = self._call_api_with_retry(payload, "qa")
+        logger.info("✅ 質問への回答完了！（抜粋%s件, プロンプト%s文字）", len(passages), len(prompt))
+        return answer
+    
+    @staticmethod
+    def normalize_options(options: Dict[str, str]) -> Dict[str, str]:
+        """
+        要約オプションをまとめて内部値に正規化するよ～🎀（キャッシュキーにも使う）
         
-        logger.info("✅ 要約生成完了！")
-        return summary
+        引数:
+            options: 受け取ったオプション（ラベルでも内部値でもOK）
+            
+        戻り値:
+            Dict[str, str]: length / style / explanation の内部値
+        """
+        return {
+            'length': SummaryService._normalize_length_option(options.get('length', SUMMARY_LENGTH_MEDIUM)),
+            'style': SummaryService._normalize_style_option(options.get('style', SUMMARY_STYLE_BULLET)),
+            'explanation': SummaryService._normalize_explanation_option(options.get('explanation', SUMMARY_EXPLANATION_NO)),
+        }
     
-    def _normalize_length_option(self, option: str) -> str:
+    @staticmethod
+    def _normalize_length_option(option: str) -> str:
         """
         長さオプションを内部値に正規化するよ～💫
         
@@ -125,7 +332,8 @@ class SummaryService:
         # ラベルから内部値を取得
         return LABEL_TO_LENGTH.get(option, SUMMARY_LENGTH_MEDIUM)
     
-    def _normalize_style_option(self, option: str) -> str:
+    @staticmethod
+    def _normalize_style_option(option: str) -> str:
         """
         スタイルオプションを内部値に正規化するよ～🎭
         
@@ -141,7 +349,8 @@ class SummaryService:
         # ラベルから内部値を取得
         return LABEL_TO_STYLE.get(option, SUMMARY_STYLE_BULLET)
     
-    def _normalize_explanation_option(self, option: str) -> str:
+    @staticmethod
+    def _normalize_explanation_option(option: str) -> str:
         """
         解説オプションを内部値に正規化するよ～📚
         
@@ -157,7 +366,9 @@ class SummaryService:
         # ラベルから内部値を取得
         return LABEL_TO_EXPLANATION.get(option, SUMMARY_EXPLANATION_NO)
     
-    def _create_summary_prompt(self, text: str, length: str, style: str, explanation: str) -> str:
+    def _create_summary_prompt(
+        self, text: str, length: str, style: str, explanation: str, source_label: str = SUMMARY_SOURCE_LABEL
+    ) -> str:
         """
         要約生成用のプロンプトを作成するよ〜✨
         
@@ -166,6 +377,7 @@ class SummaryService:
             length: 要約の長さ指定
             style: 要約のスタイル指定
             explanation: 解説の有無
+            source_label: 要約対象の呼び方（字幕テキスト or 内容メモ）
             
         戻り値:
             str: 生成されたプロンプト
@@ -200,7 +412,7 @@ class SummaryService:
 """
         
         return f"""
-【要約対象】YouTube動画の字幕テキスト
+【要約対象】YouTube動画の{source_label}
 
 【要約ルール】
 ・長さ: {length}
@@ -212,16 +424,19 @@ class SummaryService:
 ・専門用語があれば適切に扱う
 ・簡潔で読みやすい日本語で書く
 {explanation_instruction}
-【字幕テキスト】
+【{source_label}】
 {text}
 """
     
-    def _call_api_with_retry(self, payload: Dict[str, Any]) -> str:
+    def _call_api_with_retry(self, payload: Dict[str, Any], kind: str = "summary", options: Optional[Dict[str, str]] = None) -> str:
         """
         リトライロジック付きでAPIを呼び出すよ〜🔄
+        使ったトークン数は kind ごとにメトリクスと track_usage に記録する
         
         引数:
             payload: APIリクエストのペイロード
+            kind (str): 呼び出しの種類（summary / digest / qa）
+            options (Optional[Dict[str, str]]): 要約オプション（トークン数を長さ・スタイルごとに数える用）
             
         戻り値:
             str: API応答から抽出された要約テキスト
@@ -234,7 +449,7 @@ class SummaryService:
         
         while retries < MAX_RETRIES:
             try:
-                logger.info(f"🔄 Perplexity API呼び出し試行 {retries + 1}/{MAX_RETRIES}")
+                logger.info("🔄 Perplexity API呼び出し試行 %s/%s", retries + 1, MAX_RETRIES)
                 
                 headers = self.headers.copy()
                 headers["Content-Type"] = "application/json; charset=utf-8"
@@ -243,47 +458,68 @@ class SummaryService:
                 
                 import json
                 json_data = json.dumps(safe_payload, ensure_ascii=False).encode('utf-8')
+                log_payload(logger, "Perplexity APIリクエスト", safe_payload)
                 
-                response = requests.post(
-                    self.api_url,
-                    headers=headers,
-                    data=json_data,
-                    timeout=60
-                )
+                # 上流の枠は優先度クラスごとに公平に配る（枠を持つのはHTTP呼び出しの間だけ）
+                with get_llm_scheduler().slot(self.priority):
+                    attempt_started = time.perf_counter()
+                    attempt_status = "error"
+                    try:
+                        with span("llm_attempt", attempt=retries + 1):
+                            response = get_http_session().post(
+                                self.api_url,
+                                headers=headers,
+                                data=json_data,
+                                timeout=60
+                            )
+                        attempt_status = str(response.status_code)
+                    finally:
+                        LLM_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_started, endpoint="perplexity", status=attempt_status)
                 
                 if response.status_code == 200:
                     data = response.json()
+                    log_payload(logger, "Perplexity APIレスポンス", data)
                     summary = data.get("choices", [{}])[0].get("message", {}).get("content", "")
                     
                     if summary:
+                        record_usage(data, kind, options, payload["messages"][-1]["content"], summary)
                         return summary
                     else:
                         raise PerplexityError("APIレスポンスから要約テキストを抽出できへんかったわ〜😭")
                 
                 elif response.status_code == 429:
                     logger.warning("⏳ レート制限に達したから少し待つね〜")
-                    time.sleep(RETRY_DELAY * (retries + 1))
+                    UPSTREAM_RATE_LIMITED.inc(upstream="perplexity")
+                    with span("llm_backoff", reason="429"):
+                        time.sleep(RETRY_DELAY * (retries + 1))
                 
                 else:
                     error_msg = f"APIエラー: ステータスコード {response.status_code}, レスポンス: {response.text}"
-                    logger.error(f"🚨 {error_msg}")
+                    logger.error("🚨 %s", error_msg)
                     last_error = PerplexityError(error_msg)
             
+            except LLMSlotTimeoutError as e:
+                # 全体の枠が埋まりっぱなしなら、リトライしてもまた待つだけやからすぐ諦める
+                logger.error("🚨 %s", e)
+                raise PerplexityError(str(e)) from e
+            
             except UnicodeEncodeError as e:
                 error_context = str(e)
                 error_position = f"位置 {e.start}-{e.end} の文字: '{e.object[e.start:e.end]}'" if hasattr(e, 'start') else "不明"
                 error_msg = f"エンコードエラー: {error_context}, {error_position}"
-                logger.error(f"🚨 {error_msg}")
+                logger.error("🚨 %s", error_msg)
                 last_error = PerplexityError(error_msg)
             
             except Exception as e:
                 error_msg = f"API呼び出し例外: {str(e)}"
-                logger.error(f"🚨 {error_msg}")
+                logger.error("🚨 %s", error_msg)
                 last_error = PerplexityError(error_msg)
             
             retries += 1
             if retries < MAX_RETRIES:
-                time.sleep(RETRY_DELAY * retries)
+                LLM_RETRIES.inc(endpoint="perplexity")
+                with span("llm_backoff", reason="retry"):
+                    time.sleep(RETRY_DELAY * retries)
         
         raise last_error or PerplexityError("不明なエラーでAPI呼び出しに失敗したわ〜😭")
     
@@ -325,7 +561,7 @@ class SummaryService:
             if char in text:
                 text = text.replace(char, " ")
         
-        logger.debug(f"🧹 テキストクリーニング完了: 長さ={len(text)}")
+        logger.debug("🧹 テキストクリーニング完了: 長さ=%s", len(text))
         return text
 
 async def generate_summary(
@@ -348,14 +584,17 @@ async def generate_summary(
         LLMError: LLM処理に失敗した場合
     """
     try:
-        logger.info(f"🧠 要約生成開始: スタイル={style}, モデル={model}")
+        logger.info("🧠 要約生成開始: スタイル=%s, モデル=%s", style, model)
         
         if style not in SUMMARY_STYLE_PROMPTS:
-            logger.warning(f"⚠️ 未知のスタイル指定: {style}。デフォルトスタイルを使用します。")
+            logger.warning("⚠️ 未知のスタイル指定: %s。デフォルトスタイルを使用します。", style)
             style = SUMMARY_STYLE_BULLET
         
         prompt = SUMMARY_STYLE_PROMPTS[style]
         
+        # 📦 openaiは重いし、この関数でしか使わへんから呼ばれたときだけ読み込む
+        import openai
+        
         response = await openai.ChatCompletion.acreate(
             model=model,
             messages=[
@@ -368,12 +607,12 @@ async def generate_summary(
         
         summary = response.choices[0].message.content.strip()
         
-        logger.info(f"✅ 要約生成完了: 文字数={len(summary)}")
-        logger.debug(f"🔍 生成された要約の一部: {summary[:100]}...")
+        logger.info("✅ 要約生成完了: 文字数=%s", len(summary))
+        logger.debug("🔍 生成された要約の一部: %s...", summary[:100])
         
         return summary
         
     except Exception as e:
         error_msg = f"要約生成エラー: {str(e)}"
-        logger.error(f"🚨 {error_msg}")
+        logger.error("🚨 %s", error_msg)
         raise LLMError(error_msg)
@@ -0,0 +1,144 @@
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from .metrics import record_cache_lookup
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """
+    有効期限＆最大件数（＆バイト数の上限）つきのスレッドセーフなLRUキャッシュだよ〜🧊
+
+    プロセス内で使い回したい重いオブジェクト（検索インデックスとか）を入れとく用！
+    いっぱいになったら一番使われてないやつから追い出すよ💨
+    stale_seconds を渡すと、期限切れのあとその秒数だけは lookup で「古いけど使える」値として出せる（stale-while-revalidate）
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl_seconds: float,
+        name: str = "cache",
+        max_bytes: Optional[int] = None,
+        sizeof: Optional[Callable[[Any], int]] = None,
+        stale_seconds: float = 0
+    ):
+        """
+        キャッシュの初期化だよ〜💖
+
+        引数:
+            max_entries (int): 最大件数
+            ttl_seconds (float): 有効期限（秒）
+            name (str): ログ用の名前
+            max_bytes (Optional[int]): 合計サイズの上限（Noneなら件数だけで制限）
+            sizeof (Optional[Callable[[Any], int]]): 値のサイズ（バイト）を返す関数（max_bytes を使うなら必須）
+            stale_seconds (float): 期限切れのあと、古い値として出してもいい秒数（0なら期限でおしまい）
+        """
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("max_bytes を使うなら sizeof も渡してね🙏")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self.max_bytes = max_bytes
+        self.stale_seconds = stale_seconds
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        キャッシュから値を取り出すよ〜🔍 期限切れなら消してNoneを返す！
+
+        引数:
+            key (Hashable): キャッシュキー
+
+        戻り値:
+            Optional[Any]: キャッシュされた値（なければNone）
+        """
+        found = self.lookup(key)
+        if found is None or found[1]:
+            return None
+        return found[0]
+
+    def lookup(self, key: Hashable) -> Optional[Tuple[Any, bool]]:
+        """
+        キャッシュから値を取り出して、期限切れ（でも猶予の中）かどうかも教えるよ〜🔍⏳
+        猶予も過ぎてたら消してNoneを返す！
+
+        引数:
+            key (Hashable): キャッシュキー
+
+        戻り値:
+            Optional[Tuple[Any, bool]]: (キャッシュされた値, 期限切れならTrue)。なければNone
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at, size = entry
+            age = time.time() - stored_at
+            if age >= self.ttl_seconds + self.stale_seconds:
+                del self._entries[key]
+                self._bytes -= size
+                return None
+            self._entries.move_to_end(key)
+            return value, age >= self.ttl_seconds
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """
+        キャッシュに値を入れるよ〜📥 いっぱいなら古いのから追い出す！
+
+        引数:
+            key (Hashable): キャッシュキー
+            value (Any): 保存する値
+        """
+        size = self._sizeof(value) if self._sizeof else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.debug("🧊 %s: 大きすぎるから入れない %s (%s bytes)", self.name, key, size)
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[2]
+            self._entries[key] = (value, time.time(), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or (self.max_bytes is not None and self._bytes > self.max_bytes):
+                evicted_key, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                logger.debug("🧊 %s: 追い出し %s", self.name, evicted_key)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """
+        キャッシュにあればそれを返して、なければ factory で作って入れるよ〜🏭
+
+        引数:
+            key (Hashable): キャッシュキー
+            factory (Callable[[], Any]): 値を作る関数
+
+        戻り値:
+            Any: キャッシュされた（または新しく作った）値
+        """
+        value = self.get(key)
+        record_cache_lookup(self.name, hit=value is not None)
+        if value is not None:
+            logger.info("🎉 %sキャッシュヒット: %s", self.name, key)
+            return value
+        value = factory()
+        self.set(key, value)
+        return value
+
+    @property
+    def bytes_used(self) -> int:
+        """今入ってる値の合計サイズ（バイト）だよ〜📏（sizeof なしなら0）"""
+        with self._lock:
+            return self._bytes
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,375 @@
+import os
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Iterator, Sequence
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (50, 100, 200, 400, 600, 800, 1000, 1500, 2000, 3000, 4000, 8000)
+SIZE_BUCKETS = (500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000)
+SEGMENT_BUCKETS = (0, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+WORKER_LABEL = "worker"  # どのワーカープロセスの値か（pid）を表すラベル名
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Tuple[str, ...], *extra: str) -> str:
+    """ラベルを {a="x",b="y"} の形にするよ〜🏷️（extra は worker="..." や le="..." みたいな整形済みのラベル）"""
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    parts.extend(label for label in extra if label)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    """ラベル値の特殊文字をエスケープするよ〜🧼"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """数値をPrometheusのテキスト形式にするよ〜🔢"""
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    """
+    メトリクスの共通部分だよ〜📏（ラベルの組み合わせごとに値を持つ）
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        メトリクスの初期化だよ〜💖 作ったらレジストリに自動登録する！
+
+        引数:
+            name (str): メトリクス名
+            documentation (str): 説明文（# HELP に出る）
+            labelnames (Sequence[str]): ラベル名のリスト
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        """ラベル辞書を順番つきのタプルにするよ〜🔑"""
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self, const_labels: str = "") -> List[str]:
+        """
+        Prometheusのテキスト形式の行を返すよ〜📝
+
+        引数:
+            const_labels (str): 全部の行につける整形済みのラベル（worker="1234" とか）
+        """
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """増える一方のカウンターだよ〜➕（リトライ回数とか429の回数とか）"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self._values: Dict[Tuple[str, ...], float] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """
+        カウンターを増やすよ〜➕
+
+        引数:
+            amount (float): 増やす量
+            **labels: ラベル
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self, const_labels: str = "") -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key, const_labels)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """上がったり下がったりするゲージだよ〜🎚️（処理中のリクエスト数とか）"""
+
+    metric_type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self._values: Dict[Tuple[str, ...], float] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """ゲージを増やすよ〜⬆️"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: str) -> None:
+        """ゲージを減らすよ〜⬇️"""
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str) -> None:
+        """ゲージを指定の値にするよ〜🎯"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels: str) -> Iterator[None]:
+        """
+        ブロックの実行中だけゲージを+1するよ〜⏳
+
+        引数:
+            **labels: ラベル
+        """
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def render(self, const_labels: str = "") -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key, const_labels)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Histogram(_Metric):
+    """値の分布を記録するヒストグラムだよ〜📊（レイテンシや文字数の分布）"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        ヒストグラムの初期化だよ〜💖
+
+        引数:
+            name (str): メトリクス名
+            documentation (str): 説明文
+            labelnames (Sequence[str]): ラベル名のリスト
+            buckets (Sequence[float]): バケットの上限値（昇順）
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        """
+        値を1つ記録するよ〜📝
+
+        引数:
+            value (float): 記録する値
+            **labels: ラベル
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[index] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """
+        ブロックの実行時間（秒）を記録するよ〜⏱️ 例外で抜けても記録する！
+
+        引数:
+            **labels: ラベル
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self, const_labels: str = "") -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labelnames, key, const_labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labelnames, key, const_labels)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """全メトリクスをまとめて /metrics 用のテキストにするレジストリだよ〜🗂️"""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        """メトリクスを登録するよ〜📥"""
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """
+        Prometheusのテキスト形式（version 0.0.4）で全メトリクスを出力するよ〜📝
+        値はこのプロセスのぶんだけだから、全部の行に worker="<pid>" をつける
+        （ワーカーが何個あっても、Prometheus側で sum without (worker) すれば合計になる）
+
+        戻り値:
+            str: /metrics のレスポンスボディ
+        """
+        with self._lock:
+            metrics = list(self._metrics)
+        worker = f'{WORKER_LABEL}="{os.getpid()}"'
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.metric_type}")
+            lines.extend(metric.render(worker))
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# ==================== 📏 アプリ全体で使うメトリクス ====================
+
+STAGE_SECONDS = Histogram(
+    "yts_stage_duration_seconds",
+    "パイプラインの各ステージにかかった時間（秒）",
+    labelnames=("stage",),
+)
+LLM_ATTEMPT_SECONDS = Histogram(
+    "yts_llm_attempt_duration_seconds",
+    "LLM API呼び出し1回ごとの時間（秒）",
+    labelnames=("endpoint", "status"),
+)
+LLM_RETRIES = Counter(
+    "yts_llm_retries_total",
+    "LLM API呼び出しのリトライ回数",
+    labelnames=("endpoint",),
+)
+UPSTREAM_RATE_LIMITED = Counter(
+    "yts_upstream_rate_limited_total",
+    "上流（YouTube / LLM）から429やレート制限を受けた回数",
+    labelnames=("upstream",),
+)
+CACHE_REQUESTS = Counter(
+    "yts_cache_requests_total",
+    "キャッシュの参照回数（result=hit/stale/miss でヒット率がわかる）",
+    labelnames=("cache", "result"),
+)
+CACHE_REFRESHES = Counter(
+    "yts_cache_refreshes_total",
+    "キャッシュを裏で作り直した回数（reason=stale/warm・result=ok/error）",
+    labelnames=("cache", "reason", "result"),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "yts_http_requests_in_flight",
+    "処理中のHTTPリクエスト数",
+    labelnames=("path",),
+)
+HTTP_REQUESTS = Counter(
+    "yts_http_requests_total",
+    "HTTPリクエスト数",
+    labelnames=("path", "method", "status"),
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "yts_http_request_duration_seconds",
+    "HTTPリクエスト全体の処理時間（秒）",
+    labelnames=("path", "method"),
+)
+CAPTION_CHARS = Histogram(
+    "yts_caption_chars",
+    "字幕テキストの文字数（クリーニング後）",
+    buckets=SIZE_BUCKETS,
+)
+PIPELINE_STAGE_SECONDS = Histogram(
+    "yts_pipeline_stage_seconds",
+    "要約パイプラインのステージごとの時間（outcome=run/hit/error）",
+    labelnames=("pipeline", "stage", "outcome"),
+)
+PROMPT_CHARS = Histogram(
+    "yts_prompt_chars",
+    "LLMに送ったプロンプトの文字数",
+    labelnames=("kind",),
+    buckets=SIZE_BUCKETS,
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    "yts_llm_queue_depth",
+    "LLMの枠が空くのを待ってる呼び出しの数（優先度クラスごと）",
+    labelnames=("priority",),
+)
+LLM_IN_FLIGHT = Gauge(
+    "yts_llm_in_flight",
+    "LLMの枠を使って実行中の呼び出しの数（優先度クラスごと）",
+    labelnames=("priority",),
+)
+LLM_QUEUE_WAIT_SECONDS = Histogram(
+    "yts_llm_queue_wait_seconds",
+    "LLMの枠を待った時間（秒・優先度クラスごと）",
+    labelnames=("priority",),
+)
+
+LLM_TOKENS = Counter(
+    "yts_llm_tokens_total",
+    "LLMで使ったトークン数（type=prompt/completion・要約は長さとスタイルごと）",
+    labelnames=("kind", "length", "style", "type"),
+)
+LLM_COMPLETION_TOKENS = Histogram(
+    "yts_llm_completion_tokens",
+    "LLMの出力トークン数の分布（max_tokens を決める目安）",
+    labelnames=("kind", "length", "style"),
+    buckets=TOKEN_BUCKETS,
+)
+LLM_TRUNCATED = Counter(
+    "yts_llm_truncated_total",
+    "max_tokens で出力が途中で切れた回数",
+    labelnames=("kind",),
+)
+LIVE_NEW_SEGMENTS = Histogram(
+    "yts_live_new_segments",
+    "ライブ要約の更新1回で増えていた字幕セグメント数（更新のコストはこれに比例）",
+    buckets=SEGMENT_BUCKETS,
+)
+
+
+def record_cache_lookup(cache: str, hit: bool, stale: bool = False) -> None:
+    """
+    キャッシュのヒット/ミスを記録するよ〜🎯
+
+    引数:
+        cache (str): キャッシュの名前
+        hit (bool): ヒットしたらTrue
+        stale (bool): 期限切れの値を猶予の中で出したらTrue（result=stale で数える）
+    """
+    CACHE_REQUESTS.inc(cache=cache, result=("stale" if stale else "hit") if hit else "miss")
+
+
+def render_latest() -> str:
+    """
+    /metrics 用のテキストを返すよ〜📝
+
+    戻り値:
+        str: Prometheusのテキスト形式
+    """
+    return REGISTRY.render()
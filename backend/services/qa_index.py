@@ -0,0 +1,129 @@
+import os
+import re
+import math
+import logging
+from collections import Counter, defaultdict
+from typing import Dict, Any, List, Tuple
+
+from .memory_cache import TTLCache
+from .transcript_cleaner import clean_transcript
+from .youtube import format_time, build_passages
+from .store import get_or_fetch_transcript
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+QA_DEFAULT_TOP_K = int(os.getenv("QA_DEFAULT_TOP_K", "5"))
+QA_INDEX_CACHE_SIZE = int(os.getenv("QA_INDEX_CACHE_SIZE", "64"))  # メモリに置いとくインデックスの数
+QA_INDEX_CACHE_TTL = int(os.getenv("QA_INDEX_CACHE_TTL", str(24 * 60 * 60)))  # 24時間（秒）
+BM25_K1 = 1.5
+BM25_B = 0.75
+LATIN_WORD_PATTERN = re.compile(r'[a-z0-9]+')
+
+# 🧊 動画IDごとのBM25インデックスキャッシュ（プロセス内で共有）
+_index_cache = TTLCache(QA_INDEX_CACHE_SIZE, QA_INDEX_CACHE_TTL, name="qa_index")
+
+
+def tokenize_for_search(text: str) -> List[str]:
+    """
+    検索用にテキストをトークンに分けるよ〜✂️
+    日本語は単語の区切りがないから文字2-gram、英数字は小文字の単語にする！
+
+    引数:
+        text (str): 分割するテキスト
+
+    戻り値:
+        List[str]: トークンのリスト
+    """
+    lowered = text.lower()
+    tokens = LATIN_WORD_PATTERN.findall(lowered)
+    cjk_runs = re.findall(r'[぀-ヿ㐀-䶿一-鿿]+', lowered)
+    for run in cjk_runs:
+        if len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    1本の動画の字幕パッセージに対するBM25検索インデックスだよ〜🔎
+
+    質問に関係ありそうなパッセージだけをタイムスタンプつきで返すから、
+    LLMに字幕まるごと送らなくて済む！
+    """
+
+    def __init__(self, passages: List[Dict[str, Any]]):
+        """
+        インデックスを作るよ〜🏗️
+
+        引数:
+            passages (List[Dict[str, Any]]): build_passages で作ったパッセージ
+        """
+        self.passages = passages
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.doc_lengths: List[int] = []
+
+        for doc_id, passage in enumerate(passages):
+            tokens = tokenize_for_search(passage["text"])
+            self.doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self.postings[term].append((doc_id, tf))
+
+        self.avg_doc_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        logger.info("🏗️ BM25インデックス作成: パッセージ数=%s, 語彙数=%s", len(passages), len(self.postings))
+
+    def search(self, query: str, top_k: int = QA_DEFAULT_TOP_K) -> List[Dict[str, Any]]:
+        """
+        質問に関係ありそうなパッセージを上位top_k件返すよ〜🥇
+
+        引数:
+            query (str): 質問文
+            top_k (int): 返す件数
+
+        戻り値:
+            List[Dict[str, Any]]: スコアつきのパッセージ（時間順）
+        """
+        doc_count = len(self.passages)
+        if not doc_count:
+            return []
+
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize_for_search(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, tf in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_id] / (self.avg_doc_length or 1))
+                scores[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        # ⏱️ LLMが話の流れを追いやすいように時間順に並べ直す
+        return [
+            {**self.passages[doc_id], "score": round(score, 4), "timestamp": format_time(self.passages[doc_id]["start"])}
+            for doc_id, score in sorted(best, key=lambda item: item[0])
+        ]
+
+
+def get_transcript_index(video_id: str) -> BM25Index:
+    """
+    動画IDのBM25インデックスを返すよ〜🔎 キャッシュになければ字幕ストア（なければYouTube）から作る！
+
+    引数:
+        video_id (str): YouTube動画ID
+
+    戻り値:
+        BM25Index: その動画のインデックス
+
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+    """
+    def build_index() -> BM25Index:
+        segments, language = get_or_fetch_transcript(video_id)
+        cleaned_segments, _ = clean_transcript(segments, language)
+        return BM25Index(build_passages(cleaned_segments))
+
+    return _index_cache.get_or_create(video_id, build_index)
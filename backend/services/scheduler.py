@@ -0,0 +1,306 @@
+import os
+import hmac
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+from .metrics import LLM_QUEUE_DEPTH, LLM_IN_FLIGHT, LLM_QUEUE_WAIT_SECONDS
+from .store import get_store
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+PRIORITY_INTERACTIVE = "interactive"  # Streamlitの画面で待ってる人
+PRIORITY_API = "api"  # APIのクライアント
+PRIORITY_BULK = "bulk"  # バッチ・作り直し・バックフィル
+PRIORITY_CLASSES = (PRIORITY_INTERACTIVE, PRIORITY_API, PRIORITY_BULK)
+PRIORITY_HEADER = "X-Request-Priority"
+PRIORITY_TOKEN_HEADER = "X-Priority-Token"  # interactive を名乗るための合言葉を入れるヘッダー
+PRIORITY_TOKEN = os.getenv("PRIORITY_TOKEN", "")  # interactive を名乗っていい合言葉（空なら誰も名乗れない＝api扱い）
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))  # 1プロセスで同時にLLMに投げる数（上流の枠）
+LLM_GLOBAL_CONCURRENCY = int(os.getenv("LLM_GLOBAL_CONCURRENCY", str(LLM_CONCURRENCY)))  # 全ワーカー合わせて同時にLLMに投げる数
+LLM_SHARED_SLOTS = os.getenv("LLM_SHARED_SLOTS", "1") == "1"  # 0なら全体の枠（ストアのリース）は使わずプロセスの中だけで配る
+LLM_LEASE_TTL = float(os.getenv("LLM_LEASE_TTL", "120"))  # 全体の枠を借りとく最大秒数（落ちたワーカーの枠はこれで戻る）
+LLM_LEASE_POLL = {"interactive": 0.02, "api": 0.05, "bulk": 0.2}  # 全体の枠が空くのを見に行く最初の間隔（秒・優先度が高いほど短い）
+LLM_LEASE_MAX_POLL = float(os.getenv("LLM_LEASE_MAX_POLL", "1"))  # 見に行く間隔は空いてないたびに倍にして、ここで止める（秒）
+LLM_LEASE_MAX_WAIT = float(os.getenv("LLM_LEASE_MAX_WAIT", "60"))  # 全体の枠をこれ以上待ったら諦める（秒）
+LLM_PRIORITY_WEIGHTS = os.getenv("LLM_PRIORITY_WEIGHTS", "interactive=8,api=4,bulk=1")  # 枠が空いたときの配分の重み
+LLM_BULK_RESERVE = int(os.getenv("LLM_BULK_RESERVE", "1"))  # bulkには使わせない枠の数（画面の人がすぐ入れるように）
+
+
+class LLMSlotTimeoutError(Exception):
+    """全ワーカーで共有してるLLMの枠が LLM_LEASE_MAX_WAIT 秒たっても空かなかったエラーだよ〜⌛"""
+    pass
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """
+    "interactive=8,api=4,bulk=1" みたいな重みの指定を読むよ〜⚖️（書いてないクラスは1）
+
+    引数:
+        spec (str): 重みの指定
+
+    戻り値:
+        Dict[str, float]: {優先度クラス: 重み}
+
+    例外:
+        ValueError: 知らないクラスや0以下の重みがある場合
+    """
+    weights = {priority: 1.0 for priority in PRIORITY_CLASSES}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, value = part.partition("=")
+        name = name.strip()
+        if name not in weights or float(value) <= 0:
+            raise ValueError(f"優先度の重みの指定がおかしいよ😢: {part}")
+        weights[name] = float(value)
+    return weights
+
+
+def normalize_priority(priority: Optional[str], default: str = PRIORITY_API) -> str:
+    """
+    優先度クラスの名前をそろえるよ〜🏷️（知らない名前は default）
+
+    引数:
+        priority (Optional[str]): 優先度クラス（ヘッダーの値とか）
+        default (str): 知らない名前のときに使うクラス
+
+    戻り値:
+        str: 優先度クラス
+    """
+    priority = (priority or "").strip().lower()
+    return priority if priority in PRIORITY_CLASSES else default
+
+
+def authorize_priority(priority: str, token: Optional[str], default: str = PRIORITY_API) -> str:
+    """
+    interactive を名乗っていいか合言葉で確かめるよ〜🔑（合言葉が合わなければ default に下げる）
+    ヘッダーだけで誰でも interactive になれたら、画面の人のための枠をAPIのクライアントが取れちゃうからね。
+    api / bulk に下げるのは誰でもOK
+
+    引数:
+        priority (str): normalize_priority 済みの優先度クラス
+        token (Optional[str]): リクエストについてた合言葉（PRIORITY_TOKEN_HEADER の値）
+        default (str): 合言葉が合わないときのクラス
+
+    戻り値:
+        str: 優先度クラス
+    """
+    if priority != PRIORITY_INTERACTIVE:
+        return priority
+    if PRIORITY_TOKEN and token and hmac.compare_digest(token.encode("utf-8"), PRIORITY_TOKEN.encode("utf-8")):
+        return priority
+    return default
+
+
+class _Waiter:
+    """枠を待ってる呼び出し1個ぶんだよ〜🎫"""
+
+    __slots__ = ("priority", "granted")
+
+    def __init__(self, priority: str):
+        self.priority = priority
+        self.granted = False
+
+
+class PriorityScheduler:
+    """
+    上流（LLM）の同時実行枠を、優先度クラスごとの重みで公平に配るスケジューラーだよ〜🚦✨
+
+    枠が空くたびに、待ってる人がいるクラスのなかから「これまでの取り分÷重み」が一番少ないクラスに渡す
+    （ストライドスケジューリング）。interactive:bulk = 8:1 なら、混んでても interactive が8回に1回しか待たされない！
+    さらに bulk は LLM_BULK_RESERVE 個の枠を使えないから、バックフィル中でも画面の人はすぐに枠に入れる。
+    クラス内は先着順。枠を持つのはHTTPの呼び出し中だけ（リトライの待ち時間は枠を返す）。
+
+    プロセスの中の枠をもらったあと、shared なら全ワーカーで共有してる枠（ストアのリース）も借りる。
+    だからuvicornのワーカーやバッチが何個あっても、上流に同時に投げるのは global_slots 個まで！
+    全体の枠が空くのを見に行く間隔は優先度が高いほど短いから、空いたら interactive が先に取る。
+    bulk の予約枠（bulk_reserve）も全体の数で数える
+    """
+
+    def __init__(
+        self,
+        slots: int = LLM_CONCURRENCY,
+        weights: Optional[Dict[str, float]] = None,
+        bulk_reserve: int = LLM_BULK_RESERVE,
+        global_slots: int = LLM_GLOBAL_CONCURRENCY,
+        shared: bool = LLM_SHARED_SLOTS
+    ):
+        """
+        引数:
+            slots (int): 同時実行枠の数
+            weights (Optional[Dict[str, float]]): 優先度クラスごとの重み（Noneなら LLM_PRIORITY_WEIGHTS）
+            bulk_reserve (int): bulk に使わせない枠の数
+            global_slots (int): 全ワーカー合わせた同時実行枠の数
+            shared (bool): 全ワーカーで共有する枠（ストアのリース）も借りるか
+        """
+        self.slots = max(1, slots)
+        self.shared = shared
+        self._global_limits = {priority: max(1, global_slots) for priority in PRIORITY_CLASSES}
+        self._global_limits[PRIORITY_BULK] = max(1, global_slots - bulk_reserve)
+        self.weights = weights or parse_weights(LLM_PRIORITY_WEIGHTS)
+        self._limits = {priority: self.slots for priority in PRIORITY_CLASSES}
+        self._limits[PRIORITY_BULK] = max(1, self.slots - bulk_reserve)
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Waiter]] = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._running = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._pass = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self._total_running = 0
+
+    def _is_active(self, priority: str) -> bool:
+        """そのクラスが待ってるか実行中か調べるよ〜🔍"""
+        return bool(self._queues[priority]) or self._running[priority] > 0
+
+    def _dispatch(self) -> None:
+        """
+        空いてる枠を待ってる人に配るよ〜🎁（ロックを持った状態で呼んでね）
+        """
+        granted = False
+        while self._total_running < self.slots:
+            candidates = [
+                priority for priority in PRIORITY_CLASSES
+                if self._queues[priority] and self._running[priority] < self._limits[priority]
+            ]
+            if not candidates:
+                break
+            priority = min(candidates, key=lambda p: self._pass[p])
+            waiter = self._queues[priority].popleft()
+            waiter.granted = True
+            self._pass[priority] += 1.0 / self.weights[priority]
+            self._running[priority] += 1
+            self._total_running += 1
+            LLM_QUEUE_DEPTH.dec(priority=priority)
+            LLM_IN_FLIGHT.inc(priority=priority)
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _release(self, priority: str) -> None:
+        """枠を返すよ〜🔓（ロックを持った状態で呼んでね）"""
+        self._running[priority] -= 1
+        self._total_running -= 1
+        LLM_IN_FLIGHT.dec(priority=priority)
+        self._dispatch()
+
+    def _acquire_lease(self, priority: str) -> str:
+        """
+        全ワーカーで共有してる枠が空くまで待って借りるよ〜🎟️（プロセスの中の枠を持った状態で呼んでね）
+        まず読むだけで数えて、空いてそうなときだけ書き込みロックを取って借りる（ストアのほかの書き込みの邪魔をしない）。
+        空いてなければ間隔を倍にしながら（ゆらぎつき・LLM_LEASE_MAX_POLL まで）見に行く
+
+        引数:
+            priority (str): 優先度クラス
+
+        戻り値:
+            str: 借りた枠のID
+
+        例外:
+            LLMSlotTimeoutError: LLM_LEASE_MAX_WAIT 秒待っても借りられなかった場合
+        """
+        store = get_store()
+        limit = self._global_limits[priority]
+        delay = LLM_LEASE_POLL[priority]
+        deadline = time.monotonic() + LLM_LEASE_MAX_WAIT
+        while True:
+            if store.count_llm_leases() < limit:
+                lease_id = store.acquire_llm_lease(priority, limit, LLM_LEASE_TTL)
+                if lease_id is not None:
+                    return lease_id
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMSlotTimeoutError(f"LLMの枠が{LLM_LEASE_MAX_WAIT:g}秒待っても空かなかったよ😢（{priority}）")
+            time.sleep(min(remaining, delay * random.uniform(0.5, 1.5)))
+            delay = min(delay * 2, LLM_LEASE_MAX_POLL)
+
+    @contextmanager
+    def slot(self, priority: str = PRIORITY_API) -> Iterator[None]:
+        """
+        枠が空くまで待って、ブロックの間だけ枠を使うよ〜🎟️
+
+        引数:
+            priority (str): 優先度クラス
+        """
+        priority = normalize_priority(priority)
+        waiter = _Waiter(priority)
+        started = time.perf_counter()
+        with self._cond:
+            if not self._is_active(priority):
+                # しばらく来てなかったクラスが、休んでた間の取り分をまとめて使わないようにする
+                active = [self._pass[p] for p in PRIORITY_CLASSES if self._is_active(p)]
+                if active:
+                    self._pass[priority] = max(self._pass[priority], min(active))
+            self._queues[priority].append(waiter)
+            LLM_QUEUE_DEPTH.inc(priority=priority)
+            self._dispatch()
+            try:
+                while not waiter.granted:
+                    self._cond.wait()
+            except BaseException:
+                # 待ってる途中で止められたら、列から抜ける（もらってた枠は返す）
+                if waiter.granted:
+                    self._release(priority)
+                else:
+                    self._queues[priority].remove(waiter)
+                    LLM_QUEUE_DEPTH.dec(priority=priority)
+                raise
+        lease_id = None
+        if self.shared:
+            try:
+                lease_id = self._acquire_lease(priority)
+            except BaseException:
+                with self._cond:
+                    self._release(priority)
+                raise
+        waited = time.perf_counter() - started
+        LLM_QUEUE_WAIT_SECONDS.observe(waited, priority=priority)
+        if waited > 1:
+            logger.info("🚦 LLMの枠を%.2f秒待ったよ（%s）", waited, priority)
+        try:
+            yield
+        finally:
+            if lease_id is not None:
+                try:
+                    get_store().release_llm_lease(lease_id)
+                except Exception as e:
+                    # 返せなくても LLM_LEASE_TTL たてば戻るから、呼び出し側は止めない
+                    logger.warning("⚠️ 全体のLLMの枠を返せなかったけど、%s秒で勝手に戻るよ: %s", LLM_LEASE_TTL, e)
+            with self._cond:
+                self._release(priority)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """
+        今の待ち行列と実行中の数をまとめるよ〜📊
+
+        戻り値:
+            Dict[str, Dict[str, int]]: {優先度クラス: {"queued": 待ち, "running": 実行中}}
+        """
+        with self._cond:
+            return {
+                priority: {"queued": len(self._queues[priority]), "running": self._running[priority]}
+                for priority in PRIORITY_CLASSES
+            }
+
+
+_scheduler: Optional[PriorityScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> PriorityScheduler:
+    """
+    プロセスで1つのLLMスケジューラーを返すよ〜🚦（最初に呼ばれたときに作る）
+
+    戻り値:
+        PriorityScheduler: スケジューラー
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = PriorityScheduler()
+    return _scheduler
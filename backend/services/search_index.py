@@ -0,0 +1,215 @@
+import re
+import sqlite3
+import logging
+from typing import Dict, Any, List, Optional
+
+from .youtube import build_passages, format_time
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+KIND_TRANSCRIPT = "transcript"
+KIND_SUMMARY = "summary"
+SNIPPET_RADIUS = 60  # ヒット箇所の前後何文字をスニペットにするか
+INDEX_TOKEN_PATTERN = re.compile(r'[a-z0-9]+|[぀-ヿ㐀-䶿一-鿿]+')
+CJK_RUN_PATTERN = re.compile(r'[぀-ヿ㐀-䶿一-鿿]+')
+
+# 🗂️ 検索用テーブル
+# search_docs に元テキストとメタ情報、search_fts に2-gram化したトークンを入れる（rowidで対応）
+# 日本語は単語の区切りがないから、自前で文字2-gramにしてからFTS5に渡すよ
+SEARCH_SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_docs (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    ref TEXT NOT NULL DEFAULT '',
+    start REAL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_docs_owner ON search_docs (video_id, kind, ref);
+CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(tokens, tokenize = 'unicode61');
+"""
+
+
+def tokenize_for_index(text: str) -> str:
+    """
+    FTS5に入れる用のトークン列を作るよ〜✂️
+    英数字は単語のまま、日本語は文字2-gramにして、順番を保ったままスペースでつなぐ！
+    （順番を保つからフレーズ検索で「連続してる」ことを確認できるよ）
+
+    引数:
+        text (str): 元のテキスト
+
+    戻り値:
+        str: スペース区切りのトークン列
+    """
+    tokens: List[str] = []
+    for run in INDEX_TOKEN_PATTERN.findall(text.lower()):
+        if not CJK_RUN_PATTERN.fullmatch(run) or len(run) == 1:
+            tokens.append(run)
+            continue
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return " ".join(tokens)
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    ユーザーの検索語をFTS5のMATCH式に変換するよ〜🔎
+    スペース区切りの語は全部含む（AND）、各語はトークンのフレーズ一致にする！
+    日本語1文字だけの語は、その文字で始まる2-gramの前方一致で探すよ
+
+    引数:
+        query (str): 検索語
+
+    戻り値:
+        Optional[str]: MATCH式（検索できる語がなければNone）
+    """
+    clauses: List[str] = []
+    for term in query.split():
+        tokens = tokenize_for_index(term).split()
+        if not tokens:
+            continue
+        if len(tokens) == 1 and CJK_RUN_PATTERN.fullmatch(tokens[0]) and len(tokens[0]) == 1:
+            clauses.append(f'"{tokens[0]}"*')
+            continue
+        clauses.append('"' + " ".join(tokens) + '"')
+    return " AND ".join(clauses) if clauses else None
+
+
+def _make_snippet(text: str, query: str) -> str:
+    """
+    ヒットした箇所のまわりを切り出してスニペットにするよ〜✂️
+
+    引数:
+        text (str): 元のテキスト
+        query (str): 検索語
+
+    戻り値:
+        str: スニペット
+    """
+    lowered = text.lower()
+    positions = [lowered.find(term.lower()) for term in query.split()]
+    positions = [p for p in positions if p >= 0]
+    center = min(positions) if positions else 0
+    start = max(0, center - SNIPPET_RADIUS)
+    end = min(len(text), center + SNIPPET_RADIUS)
+    return ("…" if start > 0 else "") + text[start:end] + ("…" if end < len(text) else "")
+
+
+def ensure_search_schema(connection: sqlite3.Connection) -> None:
+    """
+    検索用テーブルがなければ作るよ〜🏗️
+
+    引数:
+        connection (sqlite3.Connection): DB接続
+    """
+    connection.executescript(SEARCH_SCHEMA)
+
+
+def _replace_documents(
+    connection: sqlite3.Connection,
+    video_id: str,
+    kind: str,
+    ref: str,
+    documents: List[Dict[str, Any]]
+) -> None:
+    """
+    ある動画・種類・参照キーのドキュメントを入れ替えるよ〜🔁（差分更新）
+    トランザクションは呼び出し側で張ってね！
+
+    引数:
+        connection (sqlite3.Connection): DB接続
+        video_id (str): 動画ID
+        kind (str): KIND_TRANSCRIPT / KIND_SUMMARY
+        ref (str): 参照キー（要約ならオプションキー）
+        documents (List[Dict[str, Any]]): start / text を持つドキュメント
+    """
+    old_ids = [row[0] for row in connection.execute(
+        "SELECT id FROM search_docs WHERE video_id = ? AND kind = ? AND ref = ?", (video_id, kind, ref)
+    )]
+    if old_ids:
+        connection.executemany("DELETE FROM search_fts WHERE rowid = ?", [(i,) for i in old_ids])
+        connection.executemany("DELETE FROM search_docs WHERE id = ?", [(i,) for i in old_ids])
+
+    for document in documents:
+        cursor = connection.execute(
+            "INSERT INTO search_docs (video_id, kind, ref, start, text) VALUES (?, ?, ?, ?, ?)",
+            (video_id, kind, ref, document.get("start"), document["text"])
+        )
+        connection.execute(
+            "INSERT INTO search_fts (rowid, tokens) VALUES (?, ?)",
+            (cursor.lastrowid, tokenize_for_index(document["text"]))
+        )
+
+
+def index_transcript(connection: sqlite3.Connection, video_id: str, segments: List[Dict[str, Any]]) -> None:
+    """
+    字幕をパッセージに分けて検索インデックスに入れるよ〜📥
+
+    引数:
+        connection (sqlite3.Connection): DB接続
+        video_id (str): 動画ID
+        segments (List[Dict[str, Any]]): クリーニング済みの字幕セグメント
+    """
+    passages = build_passages(segments)
+    _replace_documents(connection, video_id, KIND_TRANSCRIPT, "", passages)
+    logger.info("🔎 字幕を検索インデックスに登録: %s (%sパッセージ)", video_id, len(passages))
+
+
+def index_summary(connection: sqlite3.Connection, video_id: str, options_key: str, summary: str) -> None:
+    """
+    要約を検索インデックスに入れるよ〜📥
+
+    引数:
+        connection (sqlite3.Connection): DB接続
+        video_id (str): 動画ID
+        options_key (str): 要約オプションのキー
+        summary (str): 要約テキスト
+    """
+    _replace_documents(connection, video_id, KIND_SUMMARY, options_key, [{"start": None, "text": summary}])
+    logger.info("🔎 要約を検索インデックスに登録: %s [%s]", video_id, options_key)
+
+
+def search(connection: sqlite3.Connection, query: str, limit: int, offset: int) -> Dict[str, Any]:
+    """
+    字幕と要約をまとめて全文検索するよ〜🔎✨
+
+    引数:
+        connection (sqlite3.Connection): DB接続
+        query (str): 検索語
+        limit (int): 1ページの件数
+        offset (int): 先頭から飛ばす件数
+
+    戻り値:
+        Dict[str, Any]: hits（ヒットのリスト）と has_more（次ページがあるか）
+    """
+    match = build_match_query(query)
+    if not match:
+        return {"hits": [], "has_more": False}
+
+    # 次ページがあるか知るために1件多めに取る（件数の数え上げはしない＝速い！）
+    rows = connection.execute(
+        """
+        SELECT d.video_id, d.kind, d.ref, d.start, d.text, search_fts.rank
+        FROM search_fts JOIN search_docs AS d ON d.id = search_fts.rowid
+        WHERE search_fts MATCH ?
+        ORDER BY search_fts.rank
+        LIMIT ? OFFSET ?
+        """,
+        (match, limit + 1, offset)
+    ).fetchall()
+
+    hits = [
+        {
+            "video_id": video_id,
+            "kind": kind,
+            "options_key": ref or None,
+            "start": start,
+            "timestamp": format_time(start) if start is not None else None,
+            "snippet": _make_snippet(text, query),
+            "score": round(-rank, 4),
+        }
+        for video_id, kind, ref, start, text, rank in rows[:limit]
+    ]
+    return {"hits": hits, "has_more": len(rows) > limit}
@@ -0,0 +1,948 @@
+import os
+import json
+import math
+import time
+import sqlite3
+import logging
+import uuid
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from .transcript_cleaner import clean_transcript
+from .youtube import fetch_transcript_segments
+from . import search_index
+from .http_cache import build_cached_body
+from .metrics import record_cache_lookup
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+DEFAULT_DB_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "library.db"))
+LIBRARY_DB_PATH = os.getenv("LIBRARY_DB_PATH", DEFAULT_DB_PATH)
+SUMMARY_CACHE_TTL = int(os.getenv("SUMMARY_CACHE_TTL", str(24 * 60 * 60)))  # 24時間（秒）
+TRANSCRIPT_CACHE_TTL = int(os.getenv("TRANSCRIPT_CACHE_TTL", str(7 * 24 * 60 * 60)))  # 字幕はめったに変わらんから1週間
+SUMMARY_STALE_GRACE = int(os.getenv("SUMMARY_STALE_GRACE", str(6 * 60 * 60)))  # 期限切れの要約を裏で作り直しながら出していい時間
+TRANSCRIPT_STALE_GRACE = int(os.getenv("TRANSCRIPT_STALE_GRACE", str(24 * 60 * 60)))  # 期限切れの字幕を裏で取り直しながら使っていい時間
+SQLITE_BUSY_TIMEOUT = 30  # 他のプロセスが書き込み中なら最大何秒待つか
+DIGEST_CACHE_TTL = int(os.getenv("DIGEST_CACHE_TTL", str(7 * 24 * 60 * 60)))  # 内容メモは字幕と同じくらい持つ
+EXPORT_BATCH_SIZE = 200  # 字幕をまとめて取り出すときに1回で読む行数
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))  # これ以上更新がないジョブは止まったとみなす
+POPULARITY_PRUNE_RATIO = 0.9  # 人気度のキーがいっぱいになったら、人気が低い順に消してこの割合まで減らす
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 60 * 60)))  # 終わったジョブを残しとく時間
+
+# 🏷️ ジョブの状態
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_ERROR = "error"
+JOB_ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# 🗂️ 字幕と要約の保存テーブル
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT PRIMARY KEY,
+    language TEXT,
+    segments TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS summaries (
+    video_id TEXT NOT NULL,
+    options_key TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    body BLOB,
+    body_gzip BLOB,
+    body_br BLOB,
+    etag TEXT,
+    usage TEXT,
+    PRIMARY KEY (video_id, options_key)
+);
+CREATE TABLE IF NOT EXISTS digests (
+    video_id TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chapters (
+    video_id TEXT NOT NULL,
+    chapter_key TEXT NOT NULL,
+    chapter TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    PRIMARY KEY (video_id, chapter_key)
+);
+CREATE TABLE IF NOT EXISTS live_summaries (
+    video_id TEXT NOT NULL,
+    options_key TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    processed_segments INTEGER NOT NULL,
+    last_segment_start REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (video_id, options_key)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    options_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_by_target ON jobs (video_id, options_key, status);
+CREATE TABLE IF NOT EXISTS llm_leases (
+    lease_id TEXT PRIMARY KEY,
+    priority TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS popularity (
+    video_id TEXT NOT NULL,
+    options_key TEXT NOT NULL,
+    score REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (video_id, options_key)
+);
+CREATE TABLE IF NOT EXISTS token_buckets (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# 🆙 あとから追加したカラム（古いDBにはALTER TABLEで足す）
+SUMMARY_BODY_COLUMNS = {"body": "BLOB", "body_gzip": "BLOB", "body_br": "BLOB", "etag": "TEXT", "usage": "TEXT"}
+
+
+def summary_options_key(options: Dict[str, str]) -> str:
+    """
+    正規化済みの要約オプションからキャッシュキーを作るよ〜🗝️
+
+    引数:
+        options (Dict[str, str]): 内部値に正規化済みのオプション（length / style / explanation）
+
+    戻り値:
+        str: "explanation=exclude;length=medium;style=bullet" みたいなキー
+    """
+    return ";".join(f"{k}={v}" for k, v in sorted(options.items()))
+
+
+def parse_options_key(options_key: str) -> Dict[str, str]:
+    """
+    summary_options_key で作ったキーをオプションの辞書に戻すよ〜🔓
+
+    引数:
+        options_key (str): オプションキー
+
+    戻り値:
+        Dict[str, str]: オプション
+    """
+    return dict(part.split("=", 1) for part in options_key.split(";") if "=" in part)
+
+
+def build_summary_body(video_id: str, options_key: str, summary: str) -> Dict[str, Any]:
+    """
+    要約のレスポンス用バイト列（gzip/brotli圧縮版とETagつき）を作るよ〜📦（保存するときも、作りたてを返すときも同じ形）
+
+    引数:
+        video_id (str): 動画ID
+        options_key (str): summary_options_key で作ったキー
+        summary (str): 要約テキスト
+
+    戻り値:
+        Dict[str, Any]: body / body_gzip / body_br / etag
+    """
+    return build_cached_body({"summary": summary, "video_id": video_id, "options": parse_options_key(options_key)})
+
+
+def fresh_summary_record(video_id: str, options_key: str, summary: str) -> Dict[str, Any]:
+    """
+    作りたての要約を、get_summary_record と同じ形にするよ〜🆕（ストアを読み直さずにそのままレスポンスにできる）
+
+    引数:
+        video_id (str): 動画ID
+        options_key (str): summary_options_key で作ったキー
+        summary (str): 要約テキスト
+
+    戻り値:
+        Dict[str, Any]: summary / stored_at / stale / body / body_gzip / body_br / etag
+    """
+    return {"summary": summary, "stored_at": time.time(), "stale": False, **build_summary_body(video_id, options_key, summary)}
+
+
+class LibraryStore:
+    """
+    字幕と要約をSQLiteに保存して、全文検索インデックスも一緒に更新するストアだよ〜📚✨
+
+    保存するたびに同じトランザクションで検索インデックスも差分更新するから、
+    YouTubeに取りに行かなくても「どの動画でその話してた？」が一瞬でわかる！
+    """
+
+    def __init__(self, db_path: str = LIBRARY_DB_PATH):
+        """
+        ストアの初期化だよ〜💖 DBファイルとテーブルがなければ作る！
+
+        引数:
+            db_path (str): SQLiteファイルのパス
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        with connection:
+            connection.executescript(STORE_SCHEMA)
+            self._migrate_summary_columns(connection)
+            search_index.ensure_search_schema(connection)
+        logger.info("📚 ライブラリストア準備完了: %s", db_path)
+
+    def _migrate_summary_columns(self, connection: sqlite3.Connection) -> None:
+        """
+        古いDBの要約テーブルに、配信用バイト列やトークン数のカラムが足りなければ足すよ〜🆙
+
+        引数:
+            connection (sqlite3.Connection): DB接続
+        """
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(summaries)")}
+        for column, column_type in SUMMARY_BODY_COLUMNS.items():
+            if column not in existing:
+                connection.execute(f"ALTER TABLE summaries ADD COLUMN {column} {column_type}")
+                logger.info("🆙 summariesテーブルに%sカラムを追加したよ", column)
+
+    def _connection(self) -> sqlite3.Connection:
+        """
+        スレッドごとのDB接続を返すよ〜🔌（SQLiteの接続はスレッドをまたげないから）
+
+        戻り値:
+            sqlite3.Connection: DB接続
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=SQLITE_BUSY_TIMEOUT)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        """
+        このスレッドのDB接続を閉じるよ〜🔌（ワーカーをforkする前に親の接続を片付ける用）
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def save_transcript(self, video_id: str, segments: List[Dict[str, Any]], language: Optional[str]) -> None:
+        """
+        字幕セグメント（クリーニング前）を保存して、検索インデックスも更新するよ〜💾
+
+        引数:
+            video_id (str): 動画ID
+            segments (List[Dict[str, Any]]): 字幕セグメント
+            language (Optional[str]): 字幕の言語コード
+        """
+        cleaned_segments, _ = clean_transcript(segments, language)
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, language, segments, stored_at) VALUES (?, ?, ?, ?)",
+                (video_id, language, json.dumps(segments, ensure_ascii=False), time.time())
+            )
+            search_index.index_transcript(connection, video_id, cleaned_segments)
+        logger.info("💾 字幕を保存したよ: %s", video_id)
+
+    def get_transcript(self, video_id: str) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        保存済みの字幕セグメントを取り出すよ〜🔍
+
+        引数:
+            video_id (str): 動画ID
+
+        戻り値:
+            Optional[Tuple[List[Dict[str, Any]], Optional[str]]]: (字幕セグメント, 言語コード)。なければNone
+        """
+        record = self.get_transcript_record(video_id)
+        return (record["segments"], record["language"]) if record else None
+
+    def get_transcript_record(self, video_id: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        保存済みの字幕セグメントを、保存した時刻と期限切れかどうかと一緒に取り出すよ〜🔍⏳
+
+        引数:
+            video_id (str): 動画ID
+            allow_stale (bool): Trueなら期限切れでも TRANSCRIPT_STALE_GRACE の中なら返す（stale=True つき）
+
+        戻り値:
+            Optional[Dict[str, Any]]: segments / language / stored_at / stale（なければNone）
+        """
+        row = self._connection().execute(
+            "SELECT segments, language, stored_at FROM transcripts WHERE video_id = ?", (video_id,)
+        ).fetchone()
+        age = time.time() - row[2] if row else None
+        stale = age is not None and age >= TRANSCRIPT_CACHE_TTL
+        if age is None or (stale and (not allow_stale or age >= TRANSCRIPT_CACHE_TTL + TRANSCRIPT_STALE_GRACE)):
+            record_cache_lookup("transcript_store", hit=False)
+            return None
+        record_cache_lookup("transcript_store", hit=True, stale=stale)
+        logger.info("🎉 字幕ストアヒット！動画ID: %s%s", video_id, "（期限切れ・取り直し待ち）" if stale else "")
+        return {"segments": json.loads(row[0]), "language": row[1], "stored_at": row[2], "stale": stale}
+
+    def iter_transcripts(self, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]:
+        """
+        保存済みの字幕を全部、少しずつ取り出すよ〜📤（アーカイブへの書き出し用・期限切れも含む）
+        全部いっぺんにメモリに載せないから、何万本あっても大丈夫！
+
+        引数:
+            batch_size (int): 1回に読む行数
+
+        戻り値:
+            Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]: (動画ID, 字幕セグメント, 言語コード)
+        """
+        last_video_id = ""
+        while True:
+            # キーセットページングで読む（読んでる間に書き込みがあってもカーソルを持ちっぱなしにしない）
+            rows = self._connection().execute(
+                "SELECT video_id, segments, language FROM transcripts WHERE video_id > ? ORDER BY video_id LIMIT ?",
+                (last_video_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            for video_id, segments, language in rows:
+                yield video_id, json.loads(segments), language
+            last_video_id = rows[-1][0]
+
+    def list_summary_options(self, video_id: str) -> List[str]:
+        """
+        その動画で保存されてる要約のオプションキーを全部返すよ〜🗝️（期限切れも含む・作り直し用）
+
+        引数:
+            video_id (str): 動画ID
+
+        戻り値:
+            List[str]: summary_options_key で作ったキーのリスト
+        """
+        rows = self._connection().execute(
+            "SELECT options_key FROM summaries WHERE video_id = ? ORDER BY options_key", (video_id,)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def save_summary(self, video_id: str, options_key: str, summary: str, usage: Optional[Dict[str, Any]] = None) -> None:
+        """
+        要約を保存して、検索インデックスも更新するよ〜💾
+        配信用のJSONバイト列（gzip/brotli圧縮版とETagつき）もここで1回だけ作っとく！
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): summary_options_key で作ったキー
+            summary (str): 要約テキスト
+            usage (Optional[Dict[str, Any]]): この要約を作るのに使ったトークン数（track_usage の中身）
+        """
+        cached_body = build_summary_body(video_id, options_key, summary)
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO summaries
+                    (video_id, options_key, summary, stored_at, body, body_gzip, body_br, etag, usage)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    video_id, options_key, summary, time.time(),
+                    cached_body["body"], cached_body["body_gzip"], cached_body["body_br"], cached_body["etag"],
+                    json.dumps(usage) if usage else None
+                )
+            )
+            search_index.index_summary(connection, video_id, options_key, summary)
+        logger.info("💾 要約を保存したよ: %s [%s]", video_id, options_key)
+
+    def completion_token_samples(self, options_key: str, limit: int) -> List[int]:
+        """
+        そのオプションの要約で、実際に出力されたトークン数を新しい順に返すよ〜🪙（max_tokens を決める用）
+
+        引数:
+            options_key (str): summary_options_key で作ったキー
+            limit (int): 最大件数
+
+        戻り値:
+            List[int]: 要約の出力トークン数
+        """
+        rows = self._connection().execute(
+            """
+            SELECT json_extract(usage, '$.summary.completion_tokens') FROM summaries
+            WHERE options_key = ? AND usage IS NOT NULL
+            ORDER BY stored_at DESC LIMIT ?
+            """,
+            (options_key, limit)
+        ).fetchall()
+        return [int(row[0]) for row in rows if row[0]]
+
+    def get_summary(self, video_id: str, options_key: str) -> Optional[str]:
+        """
+        保存済みの要約を取り出すよ〜🔍 期限切れならNone！
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): summary_options_key で作ったキー
+
+        戻り値:
+            Optional[str]: 要約テキスト（なければNone）
+        """
+        record = self.get_summary_record(video_id, options_key)
+        return record["summary"] if record else None
+
+    def get_summary_record(self, video_id: str, options_key: str, allow_stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        保存済みの要約を、配信用のバイト列やETagごと取り出すよ〜📦 期限切れならNone！
+        allow_stale=True なら、期限切れでも SUMMARY_STALE_GRACE の中なら stale=True つきで返す（裏で作り直す用）
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): summary_options_key で作ったキー
+            allow_stale (bool): 期限切れ（猶予の中）の要約も返すか
+
+        戻り値:
+            Optional[Dict[str, Any]]: summary / stored_at / stale / body / body_gzip / body_br / etag（なければNone）
+        """
+        row = self._connection().execute(
+            """
+            SELECT summary, stored_at, body, body_gzip, body_br, etag
+            FROM summaries WHERE video_id = ? AND options_key = ?
+            """,
+            (video_id, options_key)
+        ).fetchone()
+        age = time.time() - row[1] if row else None
+        stale = age is not None and age >= SUMMARY_CACHE_TTL
+        if age is None or (stale and (not allow_stale or age >= SUMMARY_CACHE_TTL + SUMMARY_STALE_GRACE)):
+            record_cache_lookup("summary_store", hit=False)
+            return None
+        record_cache_lookup("summary_store", hit=True, stale=stale)
+        logger.info("🎉 要約ストアヒット！動画ID: %s [%s]%s", video_id, options_key, "（期限切れ・作り直し待ち）" if stale else "")
+        summary, stored_at, body, body_gzip, body_br, etag = row
+        if body is None:
+            # 古い行（配信用バイト列がまだない）はここで作る
+            cached_body = build_summary_body(video_id, options_key, summary)
+            body, body_gzip, body_br, etag = (
+                cached_body["body"], cached_body["body_gzip"], cached_body["body_br"], cached_body["etag"]
+            )
+        return {
+            "summary": summary,
+            "stored_at": stored_at,
+            "stale": stale,
+            "body": bytes(body),
+            "body_gzip": bytes(body_gzip),
+            "body_br": bytes(body_br) if body_br is not None else None,
+            "etag": etag,
+        }
+
+    def transcript_stored_at(self, video_id: str) -> Optional[float]:
+        """
+        字幕を保存した時刻だけ返すよ〜⏱️（先回りの取り直しで期限が近いか調べる用・セグメントは読まない）
+
+        引数:
+            video_id (str): 動画ID
+
+        戻り値:
+            Optional[float]: 保存した時刻（UNIX秒・なければNone）
+        """
+        row = self._connection().execute("SELECT stored_at FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        return row[0] if row else None
+
+    def summary_stored_at(self, video_id: str, options_key: str) -> Optional[float]:
+        """
+        要約を保存した時刻だけ返すよ〜⏱️（先回りの作り直しで期限が近いか調べる用・本文は読まない）
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): オプションキー
+
+        戻り値:
+            Optional[float]: 保存した時刻（UNIX秒・なければNone）
+        """
+        row = self._connection().execute(
+            "SELECT stored_at FROM summaries WHERE video_id = ? AND options_key = ?", (video_id, options_key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def save_digest(self, video_id: str, digest: Dict[str, Any]) -> None:
+        """
+        動画のスタイルなし内容メモを保存するよ〜🗒️
+
+        引数:
+            video_id (str): 動画ID
+            digest (Dict[str, Any]): 内容メモ
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO digests (video_id, digest, stored_at) VALUES (?, ?, ?)",
+                (video_id, json.dumps(digest, ensure_ascii=False), time.time())
+            )
+        logger.info("💾 内容メモを保存したよ: %s", video_id)
+
+    def get_digest(self, video_id: str) -> Optional[Dict[str, Any]]:
+        """
+        保存済みの内容メモを取り出すよ〜🔍 期限切れならNone！
+
+        引数:
+            video_id (str): 動画ID
+
+        戻り値:
+            Optional[Dict[str, Any]]: 内容メモ（なければNone）
+        """
+        row = self._connection().execute(
+            "SELECT digest, stored_at FROM digests WHERE video_id = ?",
+            (video_id,)
+        ).fetchone()
+        if not row or time.time() - row[1] >= DIGEST_CACHE_TTL:
+            record_cache_lookup("digest_store", hit=False)
+            return None
+        record_cache_lookup("digest_store", hit=True)
+        logger.info("🎉 内容メモストアヒット！動画ID: %s", video_id)
+        return json.loads(row[0])
+
+    def save_chapter(self, video_id: str, chapter_key: str, chapter: Dict[str, Any]) -> None:
+        """
+        チャプター1個ぶんの要約を保存するよ〜⏱️（チャプターごとに別々にキャッシュする）
+
+        引数:
+            video_id (str): 動画ID
+            chapter_key (str): チャプターのキー（時間の範囲・オプション・バージョン入り）
+            chapter (Dict[str, Any]): チャプターの要約
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO chapters (video_id, chapter_key, chapter, stored_at) VALUES (?, ?, ?, ?)",
+                (video_id, chapter_key, json.dumps(chapter, ensure_ascii=False), time.time())
+            )
+
+    def get_chapter(self, video_id: str, chapter_key: str) -> Optional[Dict[str, Any]]:
+        """
+        保存済みのチャプター要約を取り出すよ〜🔍 期限切れならNone！（期限は要約と同じ）
+
+        引数:
+            video_id (str): 動画ID
+            chapter_key (str): チャプターのキー
+
+        戻り値:
+            Optional[Dict[str, Any]]: チャプターの要約（なければNone）
+        """
+        row = self._connection().execute(
+            "SELECT chapter, stored_at FROM chapters WHERE video_id = ? AND chapter_key = ?",
+            (video_id, chapter_key)
+        ).fetchone()
+        if not row or time.time() - row[1] >= SUMMARY_CACHE_TTL:
+            record_cache_lookup("chapter_store", hit=False)
+            return None
+        record_cache_lookup("chapter_store", hit=True)
+        return json.loads(row[0])
+
+    def save_live_state(
+        self, video_id: str, options_key: str, state: Dict[str, Any], previous_start: Optional[float]
+    ) -> bool:
+        """
+        ライブ配信の途中までの要約と、どこまで読んだかを保存するよ〜📡
+        読んだ位置が previous_start のままのときだけ書く（ほかのワーカーが先に進めてたら書かずにFalse）
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): オプションキー
+            state (Dict[str, Any]): summary / processed_segments / last_segment_start
+            previous_start (Optional[float]): 読む前の last_segment_start（Noneならまだ保存されてないはず）
+
+        戻り値:
+            bool: 保存できたらTrue
+        """
+        values = (state["summary"], state["processed_segments"], state["last_segment_start"], time.time())
+        connection = self._connection()
+        with connection:
+            if previous_start is None:
+                cursor = connection.execute(
+                    "INSERT OR IGNORE INTO live_summaries "
+                    "(summary, processed_segments, last_segment_start, updated_at, video_id, options_key) VALUES (?, ?, ?, ?, ?, ?)",
+                    (*values, video_id, options_key)
+                )
+            else:
+                cursor = connection.execute(
+                    "UPDATE live_summaries SET summary = ?, processed_segments = ?, last_segment_start = ?, updated_at = ? "
+                    "WHERE video_id = ? AND options_key = ? AND last_segment_start = ?",
+                    (*values, video_id, options_key, previous_start)
+                )
+        return cursor.rowcount == 1
+
+    def get_live_state(self, video_id: str, options_key: str) -> Optional[Dict[str, Any]]:
+        """
+        ライブ配信の途中までの要約と、どこまで読んだかを取り出すよ〜📡（期限なし・配信が伸びる限り使う）
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): オプションキー
+
+        戻り値:
+            Optional[Dict[str, Any]]: summary / processed_segments / last_segment_start / updated_at（なければNone）
+        """
+        row = self._connection().execute(
+            "SELECT summary, processed_segments, last_segment_start, updated_at FROM live_summaries "
+            "WHERE video_id = ? AND options_key = ?",
+            (video_id, options_key)
+        ).fetchone()
+        if not row:
+            return None
+        return {"summary": row[0], "processed_segments": row[1], "last_segment_start": row[2], "updated_at": row[3]}
+
+    def create_job(self, video_id: str, options_key: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        要約ジョブを登録するよ〜📮 同じ動画＆オプションのジョブが動いてたら、新しく作らずにそれを返す！
+        （ワーカーが何個あっても重複しないように、BEGIN IMMEDIATE で確認と登録をまとめてやる）
+
+        引数:
+            video_id (str): 動画ID
+            options_key (str): summary_options_key で作ったキー
+
+        戻り値:
+            Tuple[Dict[str, Any], bool]: (ジョブ, 新しく作ったらTrue)
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM jobs WHERE updated_at < ?", (now - JOB_RETENTION_SECONDS,))
+            row = connection.execute(
+                f"""
+                SELECT job_id FROM jobs
+                WHERE video_id = ? AND options_key = ? AND status IN ({",".join("?" * len(JOB_ACTIVE_STATUSES))})
+                  AND updated_at >= ?
+                ORDER BY created_at DESC LIMIT 1
+                """,
+                (video_id, options_key, *JOB_ACTIVE_STATUSES, now - JOB_STALE_SECONDS)
+            ).fetchone()
+            if row:
+                job_id, created = row[0], False
+            else:
+                job_id, created = uuid.uuid4().hex, True
+                connection.execute(
+                    """
+                    INSERT INTO jobs (job_id, video_id, options_key, status, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    (job_id, video_id, options_key, JOB_QUEUED, now, now)
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        if created:
+            logger.info("📮 ジョブ登録: %s %s [%s]", job_id, video_id, options_key)
+        return self.get_job(job_id), created
+
+    def update_job(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        """
+        ジョブの状態を更新するよ〜🔄
+
+        引数:
+            job_id (str): ジョブID
+            status (str): 新しい状態（JOB_RUNNING / JOB_DONE / JOB_ERROR）
+            result (Optional[str]): 結果（要約テキスト）
+            error (Optional[str]): エラーメッセージ
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE job_id = ?",
+                (status, result, error, time.time(), job_id)
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        ジョブを取り出すよ〜🔍 動いてるはずなのに JOB_STALE_SECONDS 以上更新がないなら、
+        担当ワーカーが落ちたってことやからエラー扱いにする！
+
+        引数:
+            job_id (str): ジョブID
+
+        戻り値:
+            Optional[Dict[str, Any]]: job_id / video_id / options_key / status / result / error / created_at / updated_at（なければNone）
+        """
+        row = self._connection().execute(
+            """
+            SELECT job_id, video_id, options_key, status, result, error, created_at, updated_at
+            FROM jobs WHERE job_id = ?
+            """,
+            (job_id,)
+        ).fetchone()
+        if not row:
+            return None
+        job = dict(zip(("job_id", "video_id", "options_key", "status", "result", "error", "created_at", "updated_at"), row))
+        if job["status"] in JOB_ACTIVE_STATUSES and time.time() - job["updated_at"] >= JOB_STALE_SECONDS:
+            job["status"] = JOB_ERROR
+            job["error"] = "ジョブが途中で止まったみたい😢 もう一回送ってね"
+        return job
+
+    def acquire_llm_lease(self, priority: str, limit: int, ttl: float) -> Optional[str]:
+        """
+        全ワーカーで共有してるLLMの枠を1個借りるよ〜🎟️ 借りてる数が limit 以上ならNone（待たない）
+        （確認と登録は BEGIN IMMEDIATE でまとめてやるから、ワーカーが何個あっても limit を超えない）
+
+        引数:
+            priority (str): 優先度クラス
+            limit (int): このクラスが借りられる枠の上限（全体で借りられてる数と比べる）
+            ttl (float): 借りる時間（秒・返さずに落ちたワーカーの枠はこれで戻る）
+
+        戻り値:
+            Optional[str]: 借りた枠のID（借りられなかったらNone）
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM llm_leases WHERE expires_at < ?", (now,))
+            in_use = connection.execute("SELECT COUNT(*) FROM llm_leases").fetchone()[0]
+            lease_id = None
+            if in_use < limit:
+                lease_id = uuid.uuid4().hex
+                connection.execute(
+                    "INSERT INTO llm_leases (lease_id, priority, expires_at) VALUES (?, ?, ?)",
+                    (lease_id, priority, now + ttl)
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return lease_id
+
+    def count_llm_leases(self) -> int:
+        """
+        全ワーカーで今借りられてるLLMの枠の数を数えるよ〜🔢（読むだけ・書き込みロックは取らない）
+
+        戻り値:
+            int: 期限内のリースの数
+        """
+        return self._connection().execute(
+            "SELECT COUNT(*) FROM llm_leases WHERE expires_at >= ?", (time.time(),)
+        ).fetchone()[0]
+
+    def release_llm_lease(self, lease_id: str) -> None:
+        """
+        借りてたLLMの枠を返すよ〜🔓
+
+        引数:
+            lease_id (str): acquire_llm_lease で借りた枠のID
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM llm_leases WHERE lease_id = ?", (lease_id,))
+
+    @staticmethod
+    def _decayed(score: float, updated_at: float, now: float, half_life: float) -> float:
+        """updated_at から now までの時間ぶん、半減期で減らしたスコアだよ〜📉"""
+        return score * math.pow(0.5, max(0.0, now - updated_at) / half_life)
+
+    def add_popularity_hits(self, hits: Dict[Tuple[str, str], int], now: float, half_life: float, max_keys: int) -> None:
+        """
+        動画＆オプションごとのアクセス数を、全ワーカー共有の人気度スコアに足すよ〜🔥
+        スコアは半減期つき（足す前に、前回からの時間ぶん減らす）。max_keys を超えたら人気が低い順に9割まで減らす
+
+        引数:
+            hits (Dict[Tuple[str, str], int]): {(動画ID, オプションキー): アクセス数}
+            now (float): 今の時刻
+            half_life (float): スコアが半分になる秒数
+            max_keys (int): 覚えとくキーの最大数
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for (video_id, options_key), count in hits.items():
+                row = connection.execute(
+                    "SELECT score, updated_at FROM popularity WHERE video_id = ? AND options_key = ?",
+                    (video_id, options_key)
+                ).fetchone()
+                score = (self._decayed(row[0], row[1], now, half_life) if row else 0.0) + count
+                connection.execute(
+                    "INSERT OR REPLACE INTO popularity (video_id, options_key, score, updated_at) VALUES (?, ?, ?, ?)",
+                    (video_id, options_key, score, now)
+                )
+            if connection.execute("SELECT COUNT(*) FROM popularity").fetchone()[0] > max_keys:
+                ranked = sorted(
+                    connection.execute("SELECT video_id, options_key, score, updated_at FROM popularity").fetchall(),
+                    key=lambda row: self._decayed(row[2], row[3], now, half_life), reverse=True
+                )
+                connection.executemany(
+                    "DELETE FROM popularity WHERE video_id = ? AND options_key = ?",
+                    [(row[0], row[1]) for row in ranked[int(max_keys * POPULARITY_PRUNE_RATIO):]]
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def top_popularity(self, count: int, now: float, half_life: float) -> List[Tuple[Tuple[str, str], float]]:
+        """
+        全ワーカー共有の人気度スコアが高い順に、動画＆オプションを返すよ〜🏆
+
+        引数:
+            count (int): 返す数
+            now (float): 今の時刻
+            half_life (float): スコアが半分になる秒数
+
+        戻り値:
+            List[Tuple[Tuple[str, str], float]]: ((動画ID, オプションキー), スコア) のリスト
+        """
+        rows = self._connection().execute("SELECT video_id, options_key, score, updated_at FROM popularity").fetchall()
+        scored = [((row[0], row[1]), self._decayed(row[2], row[3], now, half_life)) for row in rows]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:count]
+
+    @staticmethod
+    def _refilled(row: Optional[Tuple[float, float]], per_hour: int, now: float) -> float:
+        """前回からの時間ぶん貯まったトークンの数だよ〜🪣（バケツがまだなければ満タン）"""
+        if not row:
+            return float(per_hour)
+        return min(float(per_hour), row[0] + max(0.0, now - row[1]) * per_hour / 3600.0)
+
+    def take_token(self, name: str, per_hour: int, now: float) -> bool:
+        """
+        全ワーカー共有のトークンバケツ（1時間で per_hour 個まで貯まる）から1個使うよ〜🎫（なければFalse・待たない）
+        確認と更新は BEGIN IMMEDIATE でまとめてやるから、ワーカーが何個あっても合計で1時間 per_hour 個まで
+
+        引数:
+            name (str): バケツの名前
+            per_hour (int): 1時間に貯まる数（上限も同じ）
+            now (float): 今の時刻
+
+        戻り値:
+            bool: 使えたらTrue
+        """
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+            tokens = self._refilled(row, per_hour, now)
+            taken = tokens >= 1.0
+            connection.execute(
+                "INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)",
+                (name, tokens - 1.0 if taken else tokens, now)
+            )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return taken
+
+    def peek_tokens(self, name: str, per_hour: int, now: float) -> float:
+        """
+        全ワーカー共有のトークンバケツに今いくつ残ってるか見るよ〜👀（使わない）
+
+        引数:
+            name (str): バケツの名前
+            per_hour (int): 1時間に貯まる数（上限も同じ）
+            now (float): 今の時刻
+
+        戻り値:
+            float: 残りのトークンの数
+        """
+        row = self._connection().execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (name,)).fetchone()
+        return self._refilled(row, per_hour, now)
+
+    def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """
+        名前つきのリースを取るよ〜🔑（全ワーカーで1人だけが持てる・自分が持ってたら延長する）
+        持ってる人が ttl 秒延長しなかったら（落ちたとか）、ほかの人が取れるようになる
+
+        引数:
+            name (str): リースの名前
+            holder (str): 取る人のID
+            ttl (float): 持っとく秒数
+
+        戻り値:
+            bool: 取れた（延長できた）らTrue
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT holder, expires_at FROM leases WHERE name = ?", (name,)).fetchone()
+            acquired = not row or row[0] == holder or row[1] < now
+            if acquired:
+                connection.execute(
+                    "INSERT OR REPLACE INTO leases (name, holder, expires_at) VALUES (?, ?, ?)",
+                    (name, holder, now + ttl)
+                )
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        return acquired
+
+    def release_lease(self, name: str, holder: str) -> None:
+        """
+        持ってるリースを手放すよ〜🔓（ほかの人が持ってたら何もしない）
+
+        引数:
+            name (str): リースの名前
+            holder (str): 持ってる人のID
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM leases WHERE name = ? AND holder = ?", (name, holder))
+
+    def search(self, query: str, limit: int, offset: int) -> Dict[str, Any]:
+        """
+        保存済みの字幕と要約を全文検索するよ〜🔎
+
+        引数:
+            query (str): 検索語
+            limit (int): 1ページの件数
+            offset (int): 先頭から飛ばす件数
+
+        戻り値:
+            Dict[str, Any]: hits と has_more
+        """
+        return search_index.search(self._connection(), query, limit, offset)
+
+
+_store: Optional[LibraryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> LibraryStore:
+    """
+    プロセスで1つのライブラリストアを返すよ〜📚（最初に呼ばれたときに作る）
+
+    戻り値:
+        LibraryStore: ストア
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LibraryStore()
+    return _store
+
+
+def get_or_fetch_transcript(video_id: str) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    字幕セグメントをストアから取り出すよ〜📝 なければYouTubeから取ってきて保存する！
+
+    引数:
+        video_id (str): 動画ID
+
+    戻り値:
+        Tuple[List[Dict[str, Any]], Optional[str]]: (字幕セグメント, 言語コード)
+
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+    """
+    store = get_store()
+    cached = store.get_transcript(video_id)
+    if cached:
+        return cached
+    segments, language = fetch_transcript_segments(video_id)
+    if segments:
+        store.save_transcript(video_id, segments, language)
+    return segments, language
@@ -0,0 +1,287 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Iterator
+
+from .metrics import STAGE_SECONDS
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "10"))  # これより遅いリクエストはスパンツリーごとログに出す
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # 0.01なら1%のリクエストをプロファイル
+PROFILE_HEADER_TOKEN = os.getenv("PROFILE_HEADER_TOKEN", "")  # X-Profile ヘッダーにこの値が来たらプロファイル（空なら無効）
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_SECONDS", "0.005"))  # サンプリング間隔
+PROFILE_OUTPUT_DIR = os.getenv(
+    "PROFILE_OUTPUT_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "profiles"))
+)
+PROFILE_TOP_FRAMES = 15  # ログに出す「重い関数」ランキングの件数
+PROFILE_HEADER = "x-profile"
+
+# 🧵 今のリクエスト（またはStreamlitの1回の処理）で開いてるスパン
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    処理の1ステージ分の時間を記録するスパンだよ〜⏱️
+    子スパンを持てるから、リクエスト全体がツリーになる🌳
+    """
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        """
+        スパンの初期化だよ〜💖（作った瞬間から計測スタート）
+
+        引数:
+            name (str): ステージ名
+            attributes (Optional[Dict[str, Any]]): おまけ情報（動画IDとか）
+        """
+        self.name = name
+        self.attributes = attributes or {}
+        self.children: List["Span"] = []
+        self.started = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def finish(self) -> None:
+        """計測を終わるよ〜🏁"""
+        self.duration = time.perf_counter() - self.started
+
+    @property
+    def elapsed(self) -> float:
+        """終わってたら確定した時間、まだなら今までの時間（秒）"""
+        return self.duration if self.duration is not None else time.perf_counter() - self.started
+
+    def stage_totals(self) -> Dict[str, Dict[str, float]]:
+        """
+        子孫スパンをステージ名ごとに合計するよ〜🧮（Server-Timing用）
+
+        戻り値:
+            Dict[str, Dict[str, float]]: {ステージ名: {"seconds": 合計秒, "count": 回数}}
+        """
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: {"seconds": 0.0, "count": 0})
+        # 処理した順に並ぶように、前から深さ優先でたどる
+        stack = list(reversed(self.children))
+        while stack:
+            span = stack.pop()
+            totals[span.name]["seconds"] += span.elapsed
+            totals[span.name]["count"] += 1
+            stack.extend(reversed(span.children))
+        return dict(totals)
+
+    def render_tree(self, indent: int = 0) -> str:
+        """
+        スパンツリーを見やすいテキストにするよ〜🌳
+
+        引数:
+            indent (int): インデントの深さ
+
+        戻り値:
+            str: ツリー表示
+        """
+        attributes = " ".join(f"{k}={v}" for k, v in self.attributes.items())
+        line = f"{'  ' * indent}- {self.name} {self.elapsed * 1000:.1f}ms {attributes}".rstrip()
+        return "\n".join([line] + [child.render_tree(indent + 1) for child in self.children])
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    パイプラインのステージを囲むスパンだよ〜⏱️
+    今開いてるスパンの子として記録して、ステージ別のレイテンシメトリクスにも入れる！
+    トレース中じゃなくてもメトリクスは記録するから、どこで使っても大丈夫💕
+
+    引数:
+        name (str): ステージ名（parse_url / caption_fetch / llm_attempt など）
+        **attributes: おまけ情報
+
+    戻り値:
+        Iterator[Span]: 作ったスパン
+    """
+    current = Span(name, attributes)
+    parent = _current_span.get()
+    if parent is not None:
+        parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        STAGE_SECONDS.observe(current.duration, stage=name)
+
+
+@contextmanager
+def start_trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    リクエスト1回分のトレース（ルートスパン）を始めるよ〜🌳
+    終わったときに SLOW_REQUEST_SECONDS より遅かったら、スパンツリーまるごと警告ログに出す！
+
+    引数:
+        name (str): トレース名（"POST /summarize" とか）
+        **attributes: おまけ情報
+
+    戻り値:
+        Iterator[Span]: ルートスパン
+    """
+    root = Span(name, attributes)
+    token = _current_span.set(root)
+    try:
+        yield root
+    finally:
+        _current_span.reset(token)
+        root.finish()
+        if root.duration >= SLOW_REQUEST_SECONDS:
+            logger.warning("🐢 遅いリクエスト検出 (%.1fs):\n%s", root.duration, root.render_tree())
+
+
+def server_timing_header(root: Span) -> str:
+    """
+    ルートスパンから Server-Timing ヘッダーの値を作るよ〜📨
+    同じステージが何回もあったら（LLMのリトライとか）合計して回数も書く！
+
+    引数:
+        root (Span): ルートスパン
+
+    戻り値:
+        str: "parse_url;dur=0.1, caption_fetch;dur=820.3, ..., total;dur=..." みたいな値
+    """
+    entries = []
+    for name, total in root.stage_totals().items():
+        entry = f"{name};dur={total['seconds'] * 1000:.1f}"
+        if total["count"] > 1:
+            entry += f';desc="x{int(total["count"])}"'
+        entries.append(entry)
+    entries.append(f"total;dur={root.elapsed * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def should_profile(header_value: Optional[str]) -> bool:
+    """
+    このリクエストをプロファイルするか決めるよ〜🎲
+    X-Profile ヘッダーに正しいトークンが来たか、サンプリングに当たったらプロファイル！
+
+    引数:
+        header_value (Optional[str]): X-Profile ヘッダーの値
+
+    戻り値:
+        bool: プロファイルするならTrue
+    """
+    if PROFILE_HEADER_TOKEN and header_value == PROFILE_HEADER_TOKEN:
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+class SamplingProfiler:
+    """
+    全スレッドのスタックを一定間隔で覗く、軽量な統計的プロファイラーだよ〜🔬
+
+    FastAPIは重い処理をスレッドプールで動かすからcProfile（1スレッドだけ）だと見えへん。
+    これなら字幕取得もLLM呼び出しも、どのスレッドにいても拾える！
+    （同時に動いてる他のリクエストも混ざるから、そこは統計として見てね）
+    """
+
+    def __init__(self, interval: float = PROFILE_INTERVAL_SECONDS):
+        """
+        プロファイラーの初期化だよ〜💖
+
+        引数:
+            interval (float): サンプリング間隔（秒）
+        """
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self) -> None:
+        """サンプリングのループだよ〜🔁"""
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def start(self) -> None:
+        """サンプリング開始〜▶️"""
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """サンプリング終了〜⏹️"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def top_frames(self, limit: int = PROFILE_TOP_FRAMES) -> List[tuple]:
+        """
+        一番上（実際に動いてた）フレームのランキングを返すよ〜🥇
+
+        引数:
+            limit (int): 件数
+
+        戻り値:
+            List[tuple]: (フレーム, サンプル数) のリスト
+        """
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(limit)
+
+    def save(self, label: str) -> str:
+        """
+        flamegraph.pl や speedscope で読める folded 形式で保存するよ〜💾
+
+        引数:
+            label (str): ファイル名に入れるラベル
+
+        戻り値:
+            str: 保存したファイルのパス
+        """
+        os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+        safe_label = "".join(ch if ch.isalnum() else "_" for ch in label)[:60]
+        path = os.path.join(PROFILE_OUTPUT_DIR, f"{int(time.time() * 1000)}-{safe_label}.folded")
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return path
+
+
+@contextmanager
+def maybe_profile(enabled: bool, label: str) -> Iterator[Optional[SamplingProfiler]]:
+    """
+    enabled のときだけブロックをプロファイルして、結果を保存＆ログに出すよ〜🔬
+
+    引数:
+        enabled (bool): プロファイルするか
+        label (str): ログやファイル名に使うラベル
+
+    戻り値:
+        Iterator[Optional[SamplingProfiler]]: プロファイラー（無効ならNone）
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        path = profiler.save(label)
+        ranking = "\n".join(f"  {count:5d} {frame}" for frame, count in profiler.top_frames())
+        logger.info("🔬 プロファイル完了 %s: %sサンプル → %s\n%s", label, profiler.samples, path, ranking)
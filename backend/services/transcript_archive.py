@@ -0,0 +1,295 @@
+"""
+🗄️ 字幕のカラム型アーカイブだよ〜✨（追記専用・全件の作り直し用）
+
+ディレクトリの中身:
+    index.bin       1動画1レコードの固定長インデックス（memmapで読む）
+    starts.f8       全セグメントの開始時間（float64を並べただけ）
+    durations.f4    全セグメントの長さ（float32を並べただけ）
+    texts.z         動画ごとにzlib圧縮した字幕テキストのブロック
+    meta.json       フォーマットのバージョン
+
+書き込みはカラム → テキスト → インデックスの順で、インデックスのレコードが書けた時点で「確定」。
+途中で落ちてもカラムの末尾にゴミが残るだけで、インデックスから見える範囲は壊れない！
+同じ動画を何回書いても上書きはせず、読むときに一番新しいレコードを使う。
+"""
+import os
+import json
+import time
+import zlib
+import logging
+import threading
+from typing import Dict, Any, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+DEFAULT_ARCHIVE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "data", "archive"))
+ARCHIVE_DIR = os.getenv("TRANSCRIPT_ARCHIVE_DIR", DEFAULT_ARCHIVE_DIR)
+ARCHIVE_FORMAT_VERSION = 1
+ARCHIVE_COMPRESS_LEVEL = 6
+INDEX_FILE = "index.bin"
+STARTS_FILE = "starts.f8"
+DURATIONS_FILE = "durations.f4"
+TEXTS_FILE = "texts.z"
+META_FILE = "meta.json"
+TEXT_SEPARATOR = "\x1e"  # セグメントのテキストの区切り（字幕に出てこない制御文字）
+ID_FIELD_BYTES = 16  # 動画IDと言語コードの最大バイト数（YouTubeの動画IDは11文字）
+
+# 🧱 インデックスのレコード（64バイト固定）
+INDEX_DTYPE = np.dtype([
+    ("video_id", f"S{ID_FIELD_BYTES}"),
+    ("language", f"S{ID_FIELD_BYTES}"),
+    ("segment_offset", "<u8"),
+    ("segment_count", "<u4"),
+    ("text_offset", "<u8"),
+    ("text_length", "<u4"),
+    ("archived_at", "<f8"),
+])
+STARTS_DTYPE = np.dtype("<f8")
+DURATIONS_DTYPE = np.dtype("<f4")
+
+
+class ArchiveError(Exception):
+    """アーカイブの読み書き中のエラーを表すクラスだよ〜🚫"""
+    pass
+
+
+def _encode_field(value: Optional[str], name: str) -> bytes:
+    """文字列を固定長フィールドに入るバイト列にするよ〜🔤（長すぎたらエラー）"""
+    encoded = (value or "").encode("utf-8")
+    if len(encoded) > ID_FIELD_BYTES:
+        raise ArchiveError(f"{name}が長すぎてアーカイブに入らへん😢: {value}")
+    return encoded
+
+
+def _memmap(path: str, dtype: np.dtype) -> np.ndarray:
+    """
+    ファイルを読み取り専用でmemmapするよ〜🗺️（空ファイルはmemmapできないから空配列）
+
+    引数:
+        path (str): ファイルのパス
+        dtype (np.dtype): 要素の型
+
+    戻り値:
+        np.ndarray: 配列（中身はディスクから必要な分だけ読まれる）
+    """
+    count = os.path.getsize(path) // dtype.itemsize if os.path.exists(path) else 0
+    if count == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+
+
+class TranscriptArchive:
+    """
+    字幕トラックを追記専用のカラム型ファイルに貯めるアーカイブだよ〜🗄️✨
+
+    開始時間と長さは型つきの配列、テキストは動画ごとの圧縮ブロックで持つから、
+    何百万セグメントあっても全部メモリに載せずに1動画ずつストリーミングで読める！
+    書き込みは1プロセスから（プロセス内のスレッドはロックで順番に書く）。
+    """
+
+    def __init__(self, directory: str = ARCHIVE_DIR):
+        """
+        アーカイブを開くよ〜💖 なければディレクトリとファイルを作る！
+
+        引数:
+            directory (str): アーカイブのディレクトリ
+
+        例外:
+            ArchiveError: フォーマットのバージョンが違う場合
+        """
+        self.directory = directory
+        self._write_lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        meta_path = self._path(META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as f:
+                version = json.load(f).get("version")
+            if version != ARCHIVE_FORMAT_VERSION:
+                raise ArchiveError(f"アーカイブのフォーマットが違うよ😢: {version}（対応してるのは{ARCHIVE_FORMAT_VERSION}）")
+        else:
+            with open(meta_path, "w", encoding="utf-8") as f:
+                json.dump({"version": ARCHIVE_FORMAT_VERSION, "created_at": time.time()}, f)
+        for name in (INDEX_FILE, STARTS_FILE, DURATIONS_FILE, TEXTS_FILE):
+            open(self._path(name), "ab").close()
+
+    def _path(self, name: str) -> str:
+        """アーカイブ内のファイルのパスだよ〜📁"""
+        return os.path.join(self.directory, name)
+
+    def _index(self) -> np.ndarray:
+        """確定済みのインデックスをmemmapで返すよ〜🗺️（書きかけの端数レコードは無視）"""
+        return _memmap(self._path(INDEX_FILE), INDEX_DTYPE)
+
+    def append(self, video_id: str, segments: List[Dict[str, Any]], language: Optional[str]) -> None:
+        """
+        字幕トラックを1本追記するよ〜✍️（同じ動画がもうあっても、新しいレコードが優先される）
+
+        引数:
+            video_id (str): 動画ID
+            segments (List[Dict[str, Any]]): 字幕セグメント（text / start / duration）
+            language (Optional[str]): 字幕の言語コード
+
+        例外:
+            ArchiveError: 動画IDや言語コードが長すぎる場合
+        """
+        record = np.zeros(1, dtype=INDEX_DTYPE)
+        record["video_id"] = _encode_field(video_id, "動画ID")
+        record["language"] = _encode_field(language, "言語コード")
+        starts = np.fromiter((float(s.get("start", 0)) for s in segments), dtype=STARTS_DTYPE, count=len(segments))
+        durations = np.fromiter((float(s.get("duration", 0)) for s in segments), dtype=DURATIONS_DTYPE, count=len(segments))
+        text = TEXT_SEPARATOR.join(str(s.get("text", "")).replace(TEXT_SEPARATOR, " ") for s in segments)
+        block = zlib.compress(text.encode("utf-8"), ARCHIVE_COMPRESS_LEVEL)
+
+        with self._write_lock:
+            with open(self._path(STARTS_FILE), "ab") as starts_file, \
+                    open(self._path(DURATIONS_FILE), "ab") as durations_file, \
+                    open(self._path(TEXTS_FILE), "ab") as texts_file:
+                # 前回落ちたときの端数があっても、次の要素の境界から書く
+                segment_offset = -(-starts_file.tell() // STARTS_DTYPE.itemsize)
+                durations_offset = -(-durations_file.tell() // DURATIONS_DTYPE.itemsize)
+                segment_offset = max(segment_offset, durations_offset)
+                self._pad_to(starts_file, segment_offset * STARTS_DTYPE.itemsize)
+                self._pad_to(durations_file, segment_offset * DURATIONS_DTYPE.itemsize)
+                text_offset = texts_file.tell()
+                starts_file.write(starts.tobytes())
+                durations_file.write(durations.tobytes())
+                texts_file.write(block)
+                for f in (starts_file, durations_file, texts_file):
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            record["segment_offset"] = segment_offset
+            record["segment_count"] = len(segments)
+            record["text_offset"] = text_offset
+            record["text_length"] = len(block)
+            record["archived_at"] = time.time()
+            with open(self._path(INDEX_FILE), "ab") as index_file:
+                # 書きかけのレコードが残ってたら切り捨ててから確定させる
+                committed = index_file.tell() // INDEX_DTYPE.itemsize * INDEX_DTYPE.itemsize
+                if committed != index_file.tell():
+                    index_file.truncate(committed)
+                index_file.write(record.tobytes())
+                index_file.flush()
+                os.fsync(index_file.fileno())
+        logger.debug("🗄️ アーカイブに追記: %s（%sセグメント）", video_id, len(segments))
+
+    @staticmethod
+    def _pad_to(f, position: int) -> None:
+        """追記モードのファイルを position バイトまでゼロで埋めるよ〜🧱"""
+        size = f.tell()
+        if size < position:
+            f.write(b"\0" * (position - size))
+
+    def video_ids(self) -> Set[str]:
+        """
+        アーカイブに入ってる動画IDを全部返すよ〜📋（インデックスの動画ID列だけ読む）
+
+        戻り値:
+            Set[str]: 動画IDの集合
+        """
+        return {value.decode("utf-8") for value in np.unique(self._index()["video_id"])}
+
+    def _latest_positions(self, index: np.ndarray) -> np.ndarray:
+        """
+        動画ごとに一番新しいレコードの位置を、書いた順で返すよ〜🔢
+
+        引数:
+            index (np.ndarray): インデックス
+
+        戻り値:
+            np.ndarray: レコードの位置
+        """
+        if len(index) == 0:
+            return np.empty(0, dtype=np.int64)
+        # 後ろから見て最初に出てくる＝一番新しいレコード
+        _, reversed_positions = np.unique(index["video_id"][::-1], return_index=True)
+        return np.sort(len(index) - 1 - reversed_positions)
+
+    def _read_record(self, record: np.void, starts: np.ndarray, durations: np.ndarray, texts_file) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        インデックスのレコード1個ぶんの字幕セグメントを組み立てるよ〜🧩
+
+        引数:
+            record (np.void): インデックスのレコード
+            starts (np.ndarray): 開始時間の列（memmap）
+            durations (np.ndarray): 長さの列（memmap）
+            texts_file: テキストファイル
+
+        戻り値:
+            Tuple[List[Dict[str, Any]], Optional[str]]: (字幕セグメント, 言語コード)
+        """
+        offset = int(record["segment_offset"])
+        count = int(record["segment_count"])
+        texts_file.seek(int(record["text_offset"]))
+        block = texts_file.read(int(record["text_length"]))
+        texts = zlib.decompress(block).decode("utf-8").split(TEXT_SEPARATOR) if count else []
+        if len(texts) != count:
+            raise ArchiveError(f"アーカイブが壊れてるかも😢: {record['video_id'].decode('utf-8')}")
+        segment_starts = starts[offset:offset + count].tolist()
+        segment_durations = durations[offset:offset + count].tolist()
+        segments = [
+            {"text": text, "start": start, "duration": duration}
+            for text, start, duration in zip(texts, segment_starts, segment_durations)
+        ]
+        language = record["language"].decode("utf-8") or None
+        return segments, language
+
+    def get(self, video_id: str) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """
+        動画1本ぶんの字幕を取り出すよ〜🔍
+
+        引数:
+            video_id (str): 動画ID
+
+        戻り値:
+            Optional[Tuple[List[Dict[str, Any]], Optional[str]]]: (字幕セグメント, 言語コード)。なければNone
+        """
+        index = self._index()
+        matches = np.flatnonzero(index["video_id"] == video_id.encode("utf-8"))
+        if len(matches) == 0:
+            return None
+        with open(self._path(TEXTS_FILE), "rb") as texts_file:
+            return self._read_record(
+                index[matches[-1]], _memmap(self._path(STARTS_FILE), STARTS_DTYPE),
+                _memmap(self._path(DURATIONS_FILE), DURATIONS_DTYPE), texts_file
+            )
+
+    def iter_transcripts(self) -> Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]:
+        """
+        アーカイブの字幕を動画1本ずつストリーミングで読むよ〜📖（動画ごとに一番新しいレコードだけ）
+        読み始めた時点で確定してたぶんだけを読むから、読んでる間に追記されても大丈夫！
+
+        戻り値:
+            Iterator[Tuple[str, List[Dict[str, Any]], Optional[str]]]: (動画ID, 字幕セグメント, 言語コード)
+        """
+        index = self._index()
+        starts = _memmap(self._path(STARTS_FILE), STARTS_DTYPE)
+        durations = _memmap(self._path(DURATIONS_FILE), DURATIONS_DTYPE)
+        with open(self._path(TEXTS_FILE), "rb") as texts_file:
+            for position in self._latest_positions(index):
+                record = index[position]
+                segments, language = self._read_record(record, starts, durations, texts_file)
+                yield record["video_id"].decode("utf-8"), segments, language
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        アーカイブの大きさをまとめるよ〜📊
+
+        戻り値:
+            Dict[str, Any]: records / videos / segments / bytes
+        """
+        index = self._index()
+        latest = self._latest_positions(index)
+        return {
+            "records": int(len(index)),
+            "videos": int(len(latest)),
+            "segments": int(index["segment_count"][latest].sum()) if len(latest) else 0,
+            "bytes": sum(
+                os.path.getsize(self._path(name))
+                for name in (INDEX_FILE, STARTS_FILE, DURATIONS_FILE, TEXTS_FILE)
+            ),
+        }
@@ -0,0 +1,384 @@
+import os
+import re
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+TRANSCRIPT_CLEANING_ENABLED = os.getenv("TRANSCRIPT_CLEANING_ENABLED", "1") != "0"  # "0"にしたらクリーニングOFFやで
+OVERLAP_WINDOW_TOKENS = int(os.getenv("OVERLAP_WINDOW_TOKENS", "40"))  # 重複チェックで振り返るトークン数
+DUPLICATE_WINDOW_SEGMENTS = int(os.getenv("DUPLICATE_WINDOW_SEGMENTS", "3"))  # 同じ字幕の繰り返しをチェックするセグメント数
+DUPLICATE_MIN_TOKENS = int(os.getenv("DUPLICATE_MIN_TOKENS", "4"))  # 時間が重なってない繰り返しは、これ以上長いときだけ消す（「yes no yes」は残す）
+MIN_OVERLAP_TOKENS = {"ja": 3, "en": 2}  # これより短い重なりは偶然の一致かもやから消さへん
+DEFAULT_LANGUAGE = "en"
+CJK_DETECT_THRESHOLD = 0.3  # CJK文字がこの割合以上なら日本語扱い
+CHARS_PER_TOKEN_ASCII = 4  # 英語はだいたい4文字で1トークン
+TOKENS_PER_CHAR_CJK = 1.0  # 日本語はだいたい1文字1トークン
+
+# 🔇 言語共通のノイズマーカー（[Music] とか ♪ とか）
+COMMON_NOISE_PATTERNS = [
+    r'♪+',
+    r'♫+',
+    r'>>+',
+]
+
+# 🗂️ 言語別のノイズ＆フィラー辞書だよ〜
+NOISE_LEXICONS = {
+    "ja": ["音楽", "拍手", "笑", "笑い", "歓声", "BGM", "効果音", "無音", "テーマ音楽"],
+    "en": ["music", "applause", "laughter", "laughs", "cheering", "silence", "inaudible", "foreign", "noise"],
+}
+
+FILLER_LEXICONS = {
+    # 「あの」「なんか」は普通の単語としても使うから、伸ばし棒つきのだけ消すよ💅
+    "ja": ["えーっと", "えーと", "えっと", "えー", "えーー", "あのー", "あのぉ", "うーん", "うーんと", "んー", "まぁ", "ええと"],
+    "en": ["um", "umm", "uh", "uhh", "uh-huh", "erm", "er", "hmm", "mm", "ah"],
+}
+
+# 🈶 CJK文字（ひらがな・カタカナ・漢字・全角記号）の判定用
+CJK_CHAR_PATTERN = re.compile(r'[　-〿぀-ヿ㐀-䶿一-鿿＀-￯]')
+WHITESPACE_PATTERN = re.compile(r'[\s　]+')
+# CJK同士の間に挟まったスペースは日本語では不要やから消すよ
+CJK_SPACE_PATTERN = re.compile(
+    r'(?<=[　-〿぀-ヿ㐀-䶿一-鿿＀-￯]) +'
+    r'(?=[　-〿぀-ヿ㐀-䶿一-鿿＀-￯])'
+)
+WORD_TOKEN_PATTERN = re.compile(r'\S+')
+
+
+def _compile_noise_pattern(language: str) -> re.Pattern:
+    """
+    言語別のノイズマーカー用正規表現を作るよ〜🔇
+    [Music] / (拍手) / 【笑】みたいに括弧で囲まれたやつを狙い撃ち！
+
+    引数:
+        language (str): 言語コード（"ja" / "en"）
+
+    戻り値:
+        re.Pattern: コンパイル済みの正規表現
+    """
+    words = NOISE_LEXICONS.get(language, []) + NOISE_LEXICONS[DEFAULT_LANGUAGE]
+    alternation = "|".join(re.escape(w) for w in sorted(set(words), key=len, reverse=True))
+    bracketed = rf'[\[\(（【]\s*(?:{alternation})\s*[\]\)）】]'
+    return re.compile("|".join([bracketed] + COMMON_NOISE_PATTERNS), re.IGNORECASE)
+
+
+def _compile_filler_pattern(language: str) -> re.Pattern:
+    """
+    言語別のフィラー（えーっと、um とか）用正規表現を作るよ〜🫧
+
+    引数:
+        language (str): 言語コード
+
+    戻り値:
+        re.Pattern: コンパイル済みの正規表現
+    """
+    words = sorted(FILLER_LEXICONS.get(language, []), key=len, reverse=True)
+    alternation = "|".join(re.escape(w) for w in words)
+    if language == "ja":
+        # 日本語は単語境界がないから、後ろの読点やスペースごと消すよ
+        return re.compile(rf'(?:{alternation})[、,]?\s*')
+    # 英語は単語として独立してるときだけ消す（"umbrella"を壊さないように！）
+    return re.compile(rf'(?<![\w-])(?:{alternation})(?![\w-])[,.]?\s*', re.IGNORECASE)
+
+
+# 🏎️ 正規表現は毎回コンパイルしないように最初に作っとくよ
+_NOISE_PATTERNS = {lang: _compile_noise_pattern(lang) for lang in NOISE_LEXICONS}
+_FILLER_PATTERNS = {lang: _compile_filler_pattern(lang) for lang in FILLER_LEXICONS}
+
+
+def normalize_language(language: Optional[str], sample_text: str = "") -> str:
+    """
+    言語コードをクリーニング用の"ja"/"en"に寄せるよ〜🌏
+    言語が分からんときはテキストのCJK率から推測する！
+
+    引数:
+        language (Optional[str]): 字幕の言語コードや言語名（"ja-JP"、"Japanese (auto-generated)"など）
+        sample_text (str): 言語推測用のテキスト
+
+    戻り値:
+        str: "ja" または "en"
+    """
+    if language:
+        lowered = language.lower()
+        if lowered.startswith("ja") or "japanese" in lowered or "日本語" in language:
+            return "ja"
+        if lowered.startswith("en") or "english" in lowered or "英語" in language:
+            return "en"
+
+    sample = sample_text[:2000]
+    if sample and len(CJK_CHAR_PATTERN.findall(sample)) / len(sample) >= CJK_DETECT_THRESHOLD:
+        return "ja"
+    return DEFAULT_LANGUAGE
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    LLMのトークン数をざっくり見積もるよ〜🧮
+    トークナイザーを入れるほどでもないから、CJKは1文字1トークン、それ以外は4文字1トークンで計算！
+
+    引数:
+        text (str): 見積もるテキスト
+
+    戻り値:
+        int: 推定トークン数
+    """
+    if not text:
+        return 0
+    cjk_chars = len(CJK_CHAR_PATTERN.findall(text))
+    other_chars = len(text) - cjk_chars
+    return int(round(cjk_chars * TOKENS_PER_CHAR_CJK + other_chars / CHARS_PER_TOKEN_ASCII))
+
+
+def _tokenize(text: str, language: str) -> List[str]:
+    """
+    重複チェック用にテキストをトークンに分けるよ〜✂️
+    日本語は1文字ずつ、英語は単語ずつ！
+
+    引数:
+        text (str): 分割するテキスト
+        language (str): "ja" / "en"
+
+    戻り値:
+        List[str]: トークンのリスト
+    """
+    if language == "ja":
+        return [ch for ch in text if not ch.isspace()]
+    return [w.lower() for w in WORD_TOKEN_PATTERN.findall(text)]
+
+
+def _find_overlap(previous_tokens: List[str], current_tokens: List[str], min_overlap: int) -> int:
+    """
+    前の字幕の末尾と今の字幕の先頭がどれだけ重なってるか調べるよ〜🔁
+    自動字幕は「前のセグメントの後半」をもう一回言いがちなんよね💦
+
+    引数:
+        previous_tokens (List[str]): 直前までのトークン（ウィンドウ分だけ）
+        current_tokens (List[str]): 今のセグメントのトークン
+        min_overlap (int): 重複とみなす最小トークン数
+
+    戻り値:
+        int: 重なってるトークン数（重なりなしなら0）
+    """
+    max_overlap = min(len(previous_tokens), len(current_tokens))
+    for size in range(max_overlap, min_overlap - 1, -1):
+        if previous_tokens[-size:] == current_tokens[:size]:
+            return size
+    return 0
+
+
+def _strip_leading_tokens(text: str, token_count: int, language: str) -> str:
+    """
+    テキストの先頭からトークンを指定数だけ削るよ〜🪒
+
+    引数:
+        text (str): 元のテキスト
+        token_count (int): 削るトークン数
+        language (str): "ja" / "en"
+
+    戻り値:
+        str: 先頭を削ったテキスト
+    """
+    if token_count <= 0:
+        return text
+    if language == "ja":
+        removed = 0
+        for index, ch in enumerate(text):
+            if ch.isspace():
+                continue
+            removed += 1
+            if removed == token_count:
+                return text[index + 1:]
+        return ""
+    matches = list(WORD_TOKEN_PATTERN.finditer(text))
+    if token_count >= len(matches):
+        return ""
+    return text[matches[token_count].start():]
+
+
+def clean_segment_text(text: str, language: str) -> str:
+    """
+    1つの字幕セグメントからノイズとフィラーを取り除いて空白を整えるよ〜🧽
+
+    引数:
+        text (str): 字幕セグメントのテキスト
+        language (str): "ja" / "en"
+
+    戻り値:
+        str: きれいになったテキスト
+    """
+    text = _NOISE_PATTERNS.get(language, _NOISE_PATTERNS[DEFAULT_LANGUAGE]).sub(" ", text)
+    text = _FILLER_PATTERNS.get(language, _FILLER_PATTERNS[DEFAULT_LANGUAGE]).sub(" ", text)
+    return normalize_whitespace(text)
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    空白を整えるよ〜🌬️ 改行や全角スペースも半角スペース1個にまとめて、
+    日本語の文字同士の間にあるスペースは消す！（「今日は いい 天気」→「今日はいい天気」）
+
+    引数:
+        text (str): 整えるテキスト
+
+    戻り値:
+        str: 空白を整えたテキスト
+    """
+    text = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return CJK_SPACE_PATTERN.sub("", text)
+
+
+def join_segment_texts(texts: List[str]) -> str:
+    """
+    字幕セグメントをつなげて1つのテキストにするよ〜🧵
+    日本語同士の境目にはスペースを入れない、それ以外は半角スペースでつなぐ！
+
+    引数:
+        texts (List[str]): セグメントのテキストのリスト
+
+    戻り値:
+        str: 結合したテキスト
+    """
+    parts: List[str] = []
+    for text in texts:
+        if not text:
+            continue
+        if parts and not (CJK_CHAR_PATTERN.match(parts[-1][-1]) and CJK_CHAR_PATTERN.match(text[0])):
+            parts.append(" ")
+        parts.append(text)
+    return "".join(parts)
+
+
+def _segment_time(value: Any) -> Optional[float]:
+    """セグメントの start / duration を秒の数値にするよ〜⏱️（なかったり数値じゃなかったらNone）"""
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def clean_transcript(
+    segments: List[Dict[str, Any]],
+    language: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    字幕セグメントのリストをまるっとクリーニングするよ〜🧹✨
+    1. ノイズマーカー（[音楽]、[Music]など）とフィラーを削除
+    2. 空白を日本語対応で正規化
+    3. 直前のセグメントとの重複フレーズを削除（ローリングウィンドウ）
+    4. 同じ字幕の繰り返しや空っぽになったセグメントを削除
+       （繰り返しは、前のと時間が重なってるか DUPLICATE_MIN_TOKENS トークン以上のときだけ。短い返事の繰り返しは本当に言ってるかもやから残す）
+
+    引数:
+        segments (List[Dict[str, Any]]): 字幕セグメント（text / start / duration を持つ辞書）
+        language (Optional[str]): 字幕の言語コード（Noneなら推測する）
+
+    戻り値:
+        Tuple[List[Dict[str, Any]], Dict[str, Any]]: (クリーニング済みセグメント, 削減統計)
+        削減統計には以下のキーがあるよ：
+        - language: クリーニングに使った言語
+        - segments_before / segments_after: セグメント数
+        - chars_before / chars_after / chars_saved: 文字数
+        - tokens_before / tokens_after / tokens_saved: 推定トークン数
+    """
+    raw_text = join_segment_texts([normalize_whitespace(s.get('text', '')) for s in segments])
+    lang = normalize_language(language, raw_text)
+
+    cleaned_segments: List[Dict[str, Any]] = []
+    window_tokens: List[str] = []
+    recent_texts: List[Tuple[str, Optional[float]]] = []  # (テキスト, 終わりの時間)
+    min_overlap = MIN_OVERLAP_TOKENS.get(lang, MIN_OVERLAP_TOKENS[DEFAULT_LANGUAGE])
+
+    for segment in segments:
+        text = clean_segment_text(segment.get('text', ''), lang)
+        if not text:
+            continue
+
+        # 🔁 直近と完全一致してて、時間が重なってる（流れる字幕）か十分長いなら丸ごとスキップ
+        tokens = _tokenize(text, lang)
+        start = _segment_time(segment.get('start'))
+        if any(
+            text == recent and (len(tokens) >= DUPLICATE_MIN_TOKENS or (start is not None and end is not None and start < end))
+            for recent, end in recent_texts
+        ):
+            continue
+
+        # 🔁 前のセグメントの末尾と重なってる部分を削る
+        overlap = _find_overlap(window_tokens, tokens, min_overlap)
+        if overlap:
+            text = normalize_whitespace(_strip_leading_tokens(text, overlap, lang))
+            tokens = tokens[overlap:]
+            if not text:
+                continue
+
+        cleaned_segments.append({**segment, 'text': text})
+        window_tokens = (window_tokens + tokens)[-OVERLAP_WINDOW_TOKENS:]
+        end = start + (_segment_time(segment.get('duration')) or 0.0) if start is not None else None
+        recent_texts = (recent_texts + [(text, end)])[-DUPLICATE_WINDOW_SEGMENTS:]
+
+    cleaned_text = join_segment_texts([s['text'] for s in cleaned_segments])
+    stats = build_cleaning_stats(raw_text, cleaned_text, len(segments), len(cleaned_segments), lang)
+    logger.info(
+        "🧹 字幕クリーニング完了: %s→%s文字 (%s文字・約%sトークン削減)",
+        stats['chars_before'], stats['chars_after'], stats['chars_saved'], stats['tokens_saved']
+    )
+    return cleaned_segments, stats
+
+
+def build_cleaning_stats(
+    raw_text: str,
+    cleaned_text: str,
+    segments_before: int,
+    segments_after: int,
+    language: str
+) -> Dict[str, Any]:
+    """
+    クリーニング前後の削減量をまとめるよ〜📊
+
+    引数:
+        raw_text (str): クリーニング前のテキスト
+        cleaned_text (str): クリーニング後のテキスト
+        segments_before (int): クリーニング前のセグメント数
+        segments_after (int): クリーニング後のセグメント数
+        language (str): 使った言語
+
+    戻り値:
+        Dict[str, Any]: 削減統計
+    """
+    tokens_before = estimate_tokens(raw_text)
+    tokens_after = estimate_tokens(cleaned_text)
+    return {
+        "language": language,
+        "segments_before": segments_before,
+        "segments_after": segments_after,
+        "chars_before": len(raw_text),
+        "chars_after": len(cleaned_text),
+        "chars_saved": len(raw_text) - len(cleaned_text),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+    }
+
+
+def clean_transcript_text(
+    segments: List[Dict[str, Any]],
+    language: Optional[str] = None
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    字幕セグメントをクリーニングして、プロンプト用の1つのテキストにするよ〜📝
+    TRANSCRIPT_CLEANING_ENABLED=0 のときは空白の正規化と結合だけやる！
+
+    引数:
+        segments (List[Dict[str, Any]]): 時間順に並んだ字幕セグメント
+        language (Optional[str]): 字幕の言語コード
+
+    戻り値:
+        Tuple[str, Dict[str, Any]]: (字幕テキスト, 削減統計)
+    """
+    if not TRANSCRIPT_CLEANING_ENABLED:
+        raw_text = join_segment_texts([normalize_whitespace(s.get('text', '')) for s in segments])
+        lang = normalize_language(language, raw_text)
+        return raw_text, build_cleaning_stats(raw_text, raw_text, len(segments), len(segments), lang)
+
+    cleaned_segments, stats = clean_transcript(segments, language)
+    return join_segment_texts([s['text'] for s in cleaned_segments]), stats
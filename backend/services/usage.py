@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+from ..constants import (
+    SUMMARY_LENGTH_MEDIUM, SUMMARY_EXPLANATION_YES,
+    SUMMARY_LENGTH_MAX_TOKENS, SUMMARY_EXPLANATION_EXTRA_TOKENS
+)
+from .metrics import LLM_TOKENS, LLM_COMPLETION_TOKENS, LLM_TRUNCATED
+from .store import get_store, summary_options_key
+from .transcript_cleaner import estimate_tokens
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+USE_MEASURED_MAX_TOKENS = os.getenv("USE_MEASURED_MAX_TOKENS", "1") == "1"  # 0なら長さごとの初期値だけで決める
+USAGE_SAMPLE_SIZE = 200  # max_tokens を決めるときに見る、直近の要約の数
+USAGE_MIN_SAMPLES = int(os.getenv("USAGE_MIN_SAMPLES", "20"))  # これより少なければ初期値のまま
+USAGE_PERCENTILE = 0.95  # 実測のこの分位点に余裕をかけて上限にする
+USAGE_HEADROOM = 1.25
+SUMMARY_MIN_MAX_TOKENS = 300
+SUMMARY_MAX_MAX_TOKENS = int(os.getenv("SUMMARY_MAX_MAX_TOKENS", "3000"))
+USAGE_CACHE_TTL = 300  # 実測から決めた上限を覚えとく秒数（要約のたびにDBを読まない）
+
+# 🧾 いま集計中のトークン数（track_usage の中だけ入ってる・スレッドやタスクごとに別）
+_current_usage: ContextVar[Optional[Dict[str, Dict[str, int]]]] = ContextVar("llm_usage", default=None)
+# 🗂️ options_key → (決めた時刻, max_tokens)
+_budget_cache: Dict[str, Tuple[float, int]] = {}
+_budget_lock = threading.Lock()
+# 🔒 チャプター要約みたいに、1つの集計を複数スレッドから足すとき用
+_usage_lock = threading.Lock()
+
+
+@contextmanager
+def track_usage() -> Iterator[Dict[str, Dict[str, int]]]:
+    """
+    ブロックの中のLLM呼び出しで使ったトークン数を集めるよ〜🧾
+    集めた中身は {"digest": {...}, "summary": {...}} みたいに呼び出しの種類ごと（同じスレッドで呼んだ分だけ）
+    スレッドプールで呼ぶ分も数えたいときは contextvars.copy_context().run で渡してね
+
+    戻り値:
+        Iterator[Dict[str, Dict[str, int]]]: 種類ごとの prompt_tokens / completion_tokens / calls / truncated
+    """
+    collected: Dict[str, Dict[str, int]] = {}
+    token = _current_usage.set(collected)
+    try:
+        yield collected
+    finally:
+        _current_usage.reset(token)
+
+
+def record_usage(
+    data: Dict[str, Any],
+    kind: str,
+    options: Optional[Dict[str, str]] = None,
+    prompt: str = "",
+    completion: str = ""
+) -> Dict[str, int]:
+    """
+    LLMのレスポンスからトークン数を読んで、メトリクスと track_usage に足すよ〜🪙
+    usage が返ってこなかったら、プロンプトと出力の文字数から見積もる！
+    finish_reason が length（max_tokens で切れた）なら警告も出す
+
+    引数:
+        data (Dict[str, Any]): APIレスポンスのJSON
+        kind (str): 呼び出しの種類（summary / digest / qa / chapter / live）
+        options (Optional[Dict[str, str]]): 要約オプション（normalize_options 済み・要約のときだけ）
+        prompt (str): 送ったプロンプト（見積もり用）
+        completion (str): 返ってきたテキスト（見積もり用）
+
+    戻り値:
+        Dict[str, int]: prompt_tokens / completion_tokens / truncated
+    """
+    usage = data.get("usage") or {}
+    prompt_tokens = int(usage.get("prompt_tokens") or estimate_tokens(prompt))
+    completion_tokens = int(usage.get("completion_tokens") or estimate_tokens(completion))
+    finish_reason = (data.get("choices") or [{}])[0].get("finish_reason")
+    truncated = int(finish_reason == "length")
+
+    length = (options or {}).get("length", "-")
+    style = (options or {}).get("style", "-")
+    LLM_TOKENS.inc(prompt_tokens, kind=kind, length=length, style=style, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, kind=kind, length=length, style=style, type="completion")
+    LLM_COMPLETION_TOKENS.observe(completion_tokens, kind=kind, length=length, style=style)
+    if truncated:
+        LLM_TRUNCATED.inc(kind=kind)
+        logger.warning("✂️ max_tokens で出力が切れたよ（%s length=%s 出力%sトークン）", kind, length, completion_tokens)
+
+    collected = _current_usage.get()
+    if collected is not None:
+        with _usage_lock:
+            entry = collected.setdefault(kind, {"prompt_tokens": 0, "completion_tokens": 0, "calls": 0, "truncated": 0})
+            entry["prompt_tokens"] += prompt_tokens
+            entry["completion_tokens"] += completion_tokens
+            entry["calls"] += 1
+            entry["truncated"] += truncated
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "truncated": truncated}
+
+
+def base_max_tokens(options: Dict[str, str]) -> int:
+    """
+    長さと解説のオプションから、max_tokens の初期値を決めるよ〜📏
+
+    引数:
+        options (Dict[str, str]): normalize_options 済みの要約オプション
+
+    戻り値:
+        int: max_tokens の初期値
+    """
+    budget = SUMMARY_LENGTH_MAX_TOKENS.get(options.get("length"), SUMMARY_LENGTH_MAX_TOKENS[SUMMARY_LENGTH_MEDIUM])
+    if options.get("explanation") == SUMMARY_EXPLANATION_YES:
+        budget += SUMMARY_EXPLANATION_EXTRA_TOKENS
+    return budget
+
+
+def _percentile(values, fraction: float) -> int:
+    """並べた値の分位点を返すよ〜📐（最近傍法）"""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary_max_tokens(options: Dict[str, str]) -> int:
+    """
+    要約の max_tokens を決めるよ〜🪙
+    そのオプションの要約が USAGE_MIN_SAMPLES 件以上たまってたら、実測の出力トークン数の95パーセンタイルに
+    25%の余裕をのせた値（短い要約に1500トークンも取らないし、長い要約が途中で切れない）。
+    たまってなければ長さごとの初期値を使う
+
+    引数:
+        options (Dict[str, str]): normalize_options 済みの要約オプション
+
+    戻り値:
+        int: max_tokens
+    """
+    base = base_max_tokens(options)
+    if not USE_MEASURED_MAX_TOKENS:
+        return base
+    options_key = summary_options_key(options)
+    now = time.time()
+    cached = _budget_cache.get(options_key)
+    if cached is not None and now - cached[0] < USAGE_CACHE_TTL:
+        return cached[1]
+
+    with _budget_lock:
+        try:
+            samples = get_store().completion_token_samples(options_key, USAGE_SAMPLE_SIZE)
+        except Exception as e:
+            logger.warning("⚠️ トークン数の実測が読めへんかったから初期値を使うよ: %s", e)
+            samples = []
+        if len(samples) >= USAGE_MIN_SAMPLES:
+            measured = int(_percentile(samples, USAGE_PERCENTILE) * USAGE_HEADROOM)
+            budget = min(SUMMARY_MAX_MAX_TOKENS, max(SUMMARY_MIN_MAX_TOKENS, measured))
+            logger.info("🪙 max_tokens を実測から決めたよ: %s → %s（%s件・初期値%s）", options_key, budget, len(samples), base)
+        else:
+            budget = base
+        _budget_cache[options_key] = (now, budget)
+    return budget
@@ -0,0 +1,158 @@
+import os
+import time
+import uuid
+import socket
+import asyncio
+import logging
+from functools import partial
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from .freshness import (
+    get_popularity, get_refresh_quota, get_revalidator, schedule_transcript_refresh,
+    REFRESH_REASON_STALE, REFRESH_REASON_WARM
+)
+from .jobs import summarize_and_store
+from .scheduler import PRIORITY_BULK
+from .store import get_store, parse_options_key, SUMMARY_CACHE_TTL, TRANSCRIPT_CACHE_TTL
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+CACHE_WARMING_ENABLED = os.getenv("CACHE_WARMING_ENABLED", "1") == "1"  # 0なら先回りの作り直しはしない（期限切れのついでだけ）
+WARM_INTERVAL = float(os.getenv("WARM_INTERVAL", "300"))  # 人気のキーを見回る間隔（秒）
+WARM_TOP_N = int(os.getenv("WARM_TOP_N", "50"))  # 1回の見回りで見る人気上位の数
+WARM_AHEAD_SECONDS = int(os.getenv("WARM_AHEAD_SECONDS", str(2 * 60 * 60)))  # 期限までこれより短ければ先回りで作り直す
+WARM_MIN_SCORE = float(os.getenv("WARM_MIN_SCORE", "3"))  # 人気度（半減期つきアクセス数）がこれより低いキーは温めない
+WARMER_LEASE = "cache_warmer"  # 見回りをするワーカーを1人に決めるリースの名前
+WARMER_LEASE_TTL = WARM_INTERVAL * 2 + 60  # 見回り役が延長しなかったら、ほかのワーカーが代わる秒数
+
+# 🏃‍♀️ 見回りのタスク（参照を持っとかないとGCで消えちゃう）
+_warmer_task: Optional[asyncio.Task] = None
+# 🪪 見回りのリースを持つときのこのワーカーのID
+_warmer_holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def record_summary_hit(video_id: str, options_key: str) -> None:
+    """
+    要約へのアクセスを人気度に数えるよ〜👆（キャッシュに当たっても外れても数える）
+
+    引数:
+        video_id (str): 動画ID
+        options_key (str): オプションキー
+    """
+    get_popularity().hit((video_id, options_key))
+
+
+def refresh_summary(video_id: str, options_key: str) -> None:
+    """
+    要約を作り直してストアに入れ直すよ〜🔁（bulk の優先度だから画面やAPIのリクエストの邪魔はしない）
+
+    引数:
+        video_id (str): 動画ID
+        options_key (str): オプションキー
+
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+        PerplexityError: 要約生成に失敗した場合
+    """
+    summarize_and_store(video_id, parse_options_key(options_key), None, PRIORITY_BULK)
+
+
+def schedule_summary_refresh(video_id: str, options_key: str, reason: str = REFRESH_REASON_STALE) -> bool:
+    """
+    要約の作り直しを裏で頼むよ〜📮（同じ動画＆オプションが走ってたら何もしない）
+
+    引数:
+        video_id (str): 動画ID
+        options_key (str): オプションキー
+        reason (str): stale / warm
+
+    戻り値:
+        bool: 新しく頼んだらTrue
+    """
+    return get_revalidator().submit(
+        "summary_store", ("summary", video_id, options_key), lambda: refresh_summary(video_id, options_key), reason
+    )
+
+
+def _expires_soon(stored_at: Optional[float], ttl: int, now: float) -> bool:
+    """期限まで WARM_AHEAD_SECONDS より短いか（期限切れも含む）調べるよ〜⏰"""
+    return stored_at is not None and now - stored_at >= ttl - WARM_AHEAD_SECONDS
+
+
+def warm_popular_entries(now: Optional[float] = None) -> int:
+    """
+    人気上位の要約（と、その字幕）のうち、期限が近いものを先回りで作り直すよ〜🔥🔁
+    作り直しは RefreshQuota の枠の中だけ。枠がなくなったら、残りは次の見回りで（人気順だから上位から温まる）
+
+    引数:
+        now (Optional[float]): 今の時刻
+
+    戻り値:
+        int: 作り直しを頼んだ数
+    """
+    now = time.time() if now is None else now
+    store = get_store()
+    quota = get_refresh_quota()
+    revalidator = get_revalidator()
+    scheduled = 0
+    checked_videos = set()
+    for (video_id, options_key), score in get_popularity().top(WARM_TOP_N, now):
+        if score < WARM_MIN_SCORE:
+            break
+        targets = []
+        if video_id not in checked_videos:
+            checked_videos.add(video_id)
+            if _expires_soon(store.transcript_stored_at(video_id), TRANSCRIPT_CACHE_TTL, now) and not revalidator.in_flight(("transcript", video_id)):
+                targets.append(partial(schedule_transcript_refresh, video_id, REFRESH_REASON_WARM))
+        if _expires_soon(store.summary_stored_at(video_id, options_key), SUMMARY_CACHE_TTL, now) and not revalidator.in_flight(("summary", video_id, options_key)):
+            targets.append(partial(schedule_summary_refresh, video_id, options_key, REFRESH_REASON_WARM))
+        for schedule in targets:
+            if not quota.try_acquire():
+                logger.info("🎫 先回りの作り直しの枠を使い切ったから、続きは次の見回りで（%s件頼んだ）", scheduled)
+                return scheduled
+            scheduled += int(schedule())
+    if scheduled:
+        logger.info("🔥 人気のキャッシュを先回りで%s件作り直すよ", scheduled)
+    return scheduled
+
+
+def warm_if_leader() -> int:
+    """
+    このワーカーで数えたアクセス数をストアに足して、見回りのリースが取れたら（延長できたら）見回るよ〜🔑
+    ワーカーが何個あっても見回るのは1人だけ（見回り役が落ちたら WARMER_LEASE_TTL 秒でほかのワーカーが代わる）
+
+    戻り値:
+        int: 作り直しを頼んだ数（見回り役じゃなければ0）
+    """
+    get_popularity().flush()
+    if not get_store().acquire_lease(WARMER_LEASE, _warmer_holder, WARMER_LEASE_TTL):
+        return 0
+    return warm_popular_entries()
+
+
+async def run_cache_warmer() -> None:
+    """
+    WARM_INTERVAL 秒ごとに人気のキャッシュを見回って、期限切れになる前に作り直すよ〜🔥（見回るのは全ワーカーで1人）
+    """
+    while True:
+        await asyncio.sleep(WARM_INTERVAL)
+        try:
+            await run_in_threadpool(warm_if_leader)
+        except Exception as e:
+            logger.warning("⚠️ キャッシュの見回りに失敗したけど、次の見回りでまたやるよ: %s", e)
+
+
+def start_cache_warmer() -> None:
+    """
+    このワーカーのイベントループで見回りのループを始めるよ〜🔥（CACHE_WARMING_ENABLED=0 なら何もしない・2回呼んでも1本だけ）
+    ループは全ワーカーで回るけど、実際に見回るのはリースを持ってる1人だけ
+    """
+    global _warmer_task
+    if not CACHE_WARMING_ENABLED or (_warmer_task is not None and not _warmer_task.done()):
+        return
+    _warmer_task = asyncio.get_running_loop().create_task(run_cache_warmer())
+    logger.info("🔥 人気のキャッシュの見回りを始めたよ（%s秒ごと・全ワーカーで1時間%s回まで）", WARM_INTERVAL, get_refresh_quota().per_hour)
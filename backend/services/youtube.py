@@ -1,7 +1,12 @@
+import os
 import re
 import logging
-from typing import Optional, List, Dict, Any
+import threading
+from typing import Optional, List, Dict, Any, Tuple
 from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
+from .transcript_cleaner import clean_transcript_text, join_segment_texts
+from .metrics import UPSTREAM_RATE_LIMITED
+from .tracing import span
 
 # ✨ かわいいロガーの設定だよ〜ん💕
 logger = logging.getLogger(__name__)
@@ -12,11 +17,53 @@ YOUTUBE_URL_PATTERNS = [
     r'(?:https?:\/\/)?(?:www\.)?youtu\.be\/([a-zA-Z0-9_-]{11})',
     r'(?:https?:\/\/)?(?:www\.)?youtube\.com\/embed\/([a-zA-Z0-9_-]{11})'
 ]
+PASSAGE_CHARS = int(os.getenv("PASSAGE_CHARS", "300"))  # 検索・Q&A用パッセージのだいたいの文字数
+RATE_LIMIT_MARKERS = ("429", "too many", "rate limit")  # エラーメッセージからレート制限を見分ける目印
+PREFERRED_CAPTION_LANGUAGES = ['ja', 'ja-JP', 'en', 'en-US', 'en-GB']  # 字幕を選ぶときの優先言語（前ほど優先）
 
 class CaptionFetchError(Exception):
     """字幕取得中のエラーを表すクラスだよ〜🚫"""
     pass
 
+class CaptionsUnavailableError(CaptionFetchError):
+    """字幕がオフ・字幕がない動画のエラーだよ〜🈳（何回取りに行っても同じ結果）"""
+    pass
+
+class CaptionsRateLimitedError(CaptionFetchError):
+    """YouTubeのレート制限に引っかかったエラーだよ〜⏱️（しばらく待てば取れるかも）"""
+    pass
+
+def list_transcripts(video_id: str):
+    """
+    動画の字幕一覧（TranscriptList）を取ってくるよ〜📋
+    youtube-transcript-api の0.6系（クラスメソッド）と1.x系（インスタンスメソッド）の両方に対応！
+
+    引数:
+        video_id (str): YouTube動画ID
+
+    戻り値:
+        TranscriptList: 字幕一覧
+    """
+    if hasattr(YouTubeTranscriptApi, "list_transcripts"):
+        return YouTubeTranscriptApi.list_transcripts(video_id)
+    return YouTubeTranscriptApi().list(video_id)
+
+def fetch_transcript_data(transcript) -> List[Dict[str, Any]]:
+    """
+    Transcriptオブジェクトから text / start / duration の辞書リストを取ってくるよ〜📥
+    （1.x系は FetchedTranscript が返ってくるから辞書に直す）
+
+    引数:
+        transcript: list_transcripts で見つけた字幕
+
+    戻り値:
+        List[Dict[str, Any]]: 字幕セグメント
+    """
+    fetched = transcript.fetch()
+    if hasattr(fetched, "to_raw_data"):
+        return fetched.to_raw_data()
+    return list(fetched)
+
 def extract_video_id(url: str) -> Optional[str]:
     """
     YouTubeのURLから動画IDを抽出する関数だよ〜🔍
@@ -31,70 +78,125 @@ def extract_video_id(url: str) -> Optional[str]:
         match = re.search(pattern, url)
         if match:
             video_id = match.group(1)
-            logger.info(f"🎬 動画ID抽出成功: {video_id}")
+            logger.info("🎬 動画ID抽出成功: %s", video_id)
             return video_id
     
-    logger.warning(f"⚠️ URLから動画IDを抽出できへんかった: {url}")
+    logger.warning("⚠️ URLから動画IDを抽出できへんかった: %s", url)
     return None
 
-async def fetch_captions(video_id: str) -> str:
+def select_transcript(transcript_list) -> Tuple[Optional[Any], Dict[str, Any]]:
+    """
+    1回取った字幕一覧から、使う字幕を優先順位どおりに選ぶよ〜💎
+    日本語手動 > 英語手動 > ほかの手動 > 日本語自動 > 英語自動 > ほかの自動 の順！
+    言語ごとに取りに行き直さないから、YouTubeへのリクエストは一覧1回＋本体1回で済む
+
+    引数:
+        transcript_list: list_transcripts の戻り値
+
+    戻り値:
+        Tuple[Optional[Any], Dict[str, Any]]: (選んだ字幕（なければNone）, 字幕情報)
+        字幕情報は selected_lang / available_languages / manual_languages / generated_languages
     """
-    YouTube動画から字幕を取得するよ〜📝
+    transcripts = list(transcript_list)
+    manual = [t for t in transcripts if not t.is_generated]
+    generated = [t for t in transcripts if t.is_generated]
+    subtitle_info = {
+        "selected_lang": None,
+        "available_languages": [t.language for t in transcripts],
+        "manual_languages": [t.language for t in manual],
+        "generated_languages": [t.language for t in generated],
+    }
+    for candidates, kind in ((manual, "手動"), (generated, "自動生成")):
+        if not candidates:
+            continue
+        chosen = next(
+            (t for lang in PREFERRED_CAPTION_LANGUAGES for t in candidates if lang in (t.language_code, t.language)),
+            candidates[0]
+        )
+        subtitle_info["selected_lang"] = f"{chosen.language} ({kind})"
+        logger.info("💎 字幕を選んだよ: %s", subtitle_info["selected_lang"])
+        return chosen, subtitle_info
+    return None, subtitle_info
+
+def fetch_transcript_segments(
+    video_id: str,
+    cancel_event: Optional[threading.Event] = None,
+    subtitle_info: Optional[Dict[str, Any]] = None
+) -> Tuple[List[Dict[str, Any]], str]:
+    """
+    YouTube動画から字幕セグメント（text / start / duration）を取得するよ〜📝
+    字幕一覧を1回だけ取って select_transcript で選ぶ（フロントエンドと同じ選び方）
     
     引数:
         video_id (str): YouTube動画ID
+        cancel_event (Optional[threading.Event]): セットされてたら字幕本体のダウンロード前にやめて ([], "") を返す（先読み用）
+        subtitle_info (Optional[Dict[str, Any]]): 渡すと select_transcript の字幕情報をここに書き込むよ
         
     戻り値:
-        str: 取得した字幕テキスト
+        Tuple[List[Dict[str, Any]], str]: (時間順の字幕セグメント, 字幕の言語コード)
         
     例外:
-        CaptionFetchError: 字幕取得に失敗した場合
+        CaptionsUnavailableError: 字幕がオフ・字幕がない場合
+        CaptionsRateLimitedError: YouTubeのレート制限に引っかかった場合
+        CaptionFetchError: そのほかの理由で字幕取得に失敗した場合（やり直せば取れるかも）
     """
     try:
-        logger.info(f"🔄 字幕取得開始: {video_id}")
+        logger.info("🔄 字幕取得開始: %s", video_id)
         
-        # まずは日本語字幕を試す、なければ英語、それでもなければ利用可能な字幕
-        languages = ['ja', 'en']
-        transcript = None
-        errors = []
+        try:
+            with span("caption_list"):
+                transcript_list = list_transcripts(video_id)
+        except (TranscriptsDisabled, NoTranscriptFound) as e:
+            raise CaptionsUnavailableError(f"字幕取得失敗: {str(e)}")
+        if cancel_event is not None and cancel_event.is_set():
+            logger.info("🛑 字幕の取得をキャンセルしたよ: %s", video_id)
+            return [], ""
+        selected, info = select_transcript(transcript_list)
+        if subtitle_info is not None:
+            subtitle_info.update(info)
+        if selected is None:
+            raise CaptionsUnavailableError("字幕取得失敗: この動画には字幕がないみたい")
+        with span("caption_fetch"):
+            transcript = fetch_transcript_data(selected)
+        transcript_language = selected.language_code
         
-        # 優先言語で試してみる
-        for lang in languages:
-            try:
-                transcript = YouTubeTranscriptApi.get_transcript(video_id, languages=[lang])
-                logger.info(f"✅ {lang}の字幕を取得できたよ！")
-                break
-            except (TranscriptsDisabled, NoTranscriptFound) as e:
-                errors.append(f"{lang}: {str(e)}")
-                continue
-        
-        # 優先言語で見つからなかった場合は利用可能な字幕を取得
-        if transcript is None:
-            try:
-                transcript = YouTubeTranscriptApi.list_transcripts(video_id)
-                transcript = transcript.find_generated_transcript(languages)
-                logger.info("📝 自動生成字幕を取得したよ！")
-            except Exception as e:
-                errors.append(f"自動生成: {str(e)}")
-                raise CaptionFetchError(f"字幕取得失敗: {', '.join(errors)}")
-        
-        # 字幕テキストの結合
-        if transcript:
-            # 時間順に並び替え
-            transcript.sort(key=lambda x: float(x.get('start', 0)))
-            
-            # テキスト結合（改行をスペースに置き換え）
-            caption_text = ' '.join([t['text'].replace('\n', ' ') for t in transcript])
-            
-            logger.info(f"📊 字幕取得完了: 文字数={len(caption_text)}")
-            return caption_text
+        # 時間順に並び替え
+        transcript = list(transcript or [])
+        transcript.sort(key=lambda x: float(x.get('start', 0)))
+        return transcript, transcript_language
             
+    except CaptionFetchError:
+        raise
     except Exception as e:
         error_msg = f"YouTube字幕取得エラー: {str(e)}"
-        logger.error(f"🚨 {error_msg}")
+        logger.error("🚨 %s", error_msg)
+        if any(marker in str(e).lower() for marker in RATE_LIMIT_MARKERS):
+            UPSTREAM_RATE_LIMITED.inc(upstream="youtube")
+            raise CaptionsRateLimitedError(error_msg)
         raise CaptionFetchError(error_msg)
+
+async def fetch_captions(video_id: str) -> str:
+    """
+    YouTube動画から字幕を取得して、クリーニング済みの1つのテキストにするよ〜📝
     
-    return ""
+    引数:
+        video_id (str): YouTube動画ID
+        
+    戻り値:
+        str: 取得した字幕テキスト（ノイズ・フィラー・重複フレーズ除去済み）
+        
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+    """
+    transcript, transcript_language = fetch_transcript_segments(video_id)
+    if not transcript:
+        return ""
+    
+    # 🧹 自動字幕のノイズや重複を削ってからテキスト結合
+    caption_text, cleaning_stats = clean_transcript_text(transcript, transcript_language)
+    
+    logger.info("📊 字幕取得完了: 文字数=%s (クリーニングで%s文字削減)", len(caption_text), cleaning_stats['chars_saved'])
+    return caption_text
 
 def format_captions(transcript_list: List[Dict[str, Any]]) -> str:
     """
@@ -137,3 +239,35 @@ def format_time(seconds: float) -> str:
     minutes = int((seconds % 3600) // 60)
     seconds = int(seconds % 60)
     return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+def build_passages(segments: List[Dict[str, Any]], passage_chars: int = PASSAGE_CHARS) -> List[Dict[str, Any]]:
+    """
+    細切れの字幕セグメントを、検索しやすい長さのパッセージにまとめるよ〜📦
+
+    引数:
+        segments (List[Dict[str, Any]]): 時間順の字幕セグメント
+        passage_chars (int): 1パッセージのだいたいの文字数
+
+    戻り値:
+        List[Dict[str, Any]]: パッセージ（start / end / text）のリスト
+    """
+    passages: List[Dict[str, Any]] = []
+    buffer: List[str] = []
+    buffer_chars = 0
+    passage_start = 0.0
+    passage_end = 0.0
+
+    for segment in segments:
+        text = segment.get('text', '')
+        if not buffer:
+            passage_start = float(segment.get('start', 0))
+        buffer.append(text)
+        buffer_chars += len(text)
+        passage_end = float(segment.get('start', 0)) + float(segment.get('duration', 0))
+        if buffer_chars >= passage_chars:
+            passages.append({"start": passage_start, "end": passage_end, "text": join_segment_texts(buffer)})
+            buffer, buffer_chars = [], 0
+
+    if buffer:
+        passages.append({"start": passage_start, "end": passage_end, "text": join_segment_texts(buffer)})
+    return passages
@@ -0,0 +1,169 @@
+"""
+⏱️ 起動時の import にかかる時間をレポートするよ〜✨（python -X importtime のまとめ版）
+
+使い方:
+    python -m benchmarks.importtime                              # backend.main / frontend.app / app を測る
+    python -m benchmarks.importtime backend.main --top 30        # 重いモジュールTOP30
+    python -m benchmarks.importtime --forbid openai,googleapiclient --output importtime.json
+
+--forbid に書いたパッケージが起動時に読み込まれてたら終了コード1になるから、
+重い依存がうっかりトップレベル import に戻ってきたらすぐ気づける！
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+from typing import Dict, Any, List, Optional
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_TARGETS = ("backend.main", "frontend.app", "app")
+DEFAULT_RUNS = 3
+DEFAULT_TOP = 15
+IMPORTTIME_PREFIX = "import time:"
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """
+    -X importtime の出力をパースするよ〜📖
+
+    引数:
+        stderr (str): python -X importtime の標準エラー出力
+
+    戻り値:
+        List[Dict[str, Any]]: module / self_us / cumulative_us / depth のリスト（出力順）
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith(IMPORTTIME_PREFIX):
+            continue
+        parts = line[len(IMPORTTIME_PREFIX):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # ヘッダー行
+        name = parts[2].rstrip()
+        stripped = name.lstrip()
+        entries.append({
+            "module": stripped,
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1]),
+            # インデントはスペース2個で1段（いちばん外側は1個）
+            "depth": (len(name) - len(stripped) - 1) // 2,
+        })
+    return entries
+
+
+def measure_target(target: str) -> Dict[str, Any]:
+    """
+    1つのモジュールを新しいプロセスで import して時間を測るよ〜⏱️
+
+    引数:
+        target (str): import するモジュール名
+
+    戻り値:
+        Dict[str, Any]: total_us（targetの累積時間）/ entries / error
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+    )
+    entries = parse_importtime(result.stderr)
+    target_entry = next((e for e in reversed(entries) if e["module"] == target), None)
+    error = None
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit {result.returncode}"
+    return {
+        "total_us": target_entry["cumulative_us"] if target_entry else None,
+        "entries": entries,
+        "error": error,
+    }
+
+
+def top_level_packages(entries: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    トップレベルのパッケージ（openai / numpy / streamlit など）ごとの合計時間を出すよ〜📦
+    （self時間をパッケージ名の頭で合計するから、入れ子で二重に数えない）
+
+    引数:
+        entries (List[Dict[str, Any]]): parse_importtime の結果
+
+    戻り値:
+        Dict[str, int]: {パッケージ名: マイクロ秒}（重い順）
+    """
+    totals: Dict[str, int] = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        totals[package] = totals.get(package, 0) + entry["self_us"]
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def report_target(target: str, runs: int, top: int) -> Dict[str, Any]:
+    """
+    runs 回測って中央値でまとめるよ〜📊（1回目はバイトコードのキャッシュで遅いことがあるから複数回）
+
+    引数:
+        target (str): モジュール名
+        runs (int): 測る回数
+        top (int): 重いパッケージを何個まで出すか
+
+    戻り値:
+        Dict[str, Any]: レポート
+    """
+    measurements = [measure_target(target) for _ in range(runs)]
+    ok = [m for m in measurements if m["total_us"] is not None]
+    if not ok:
+        return {"target": target, "error": measurements[-1]["error"]}
+    median_run = sorted(ok, key=lambda m: m["total_us"])[len(ok) // 2]
+    return {
+        "target": target,
+        "total_ms": statistics.median(m["total_us"] for m in ok) / 1000,
+        "runs_ms": [m["total_us"] / 1000 for m in ok],
+        "modules_imported": len(median_run["entries"]),
+        "packages_ms": {name: us / 1000 for name, us in list(top_level_packages(median_run["entries"]).items())[:top]},
+        "error": median_run["error"],
+        "loaded_packages": sorted({e["module"].split(".")[0] for e in median_run["entries"]}),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインの入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="起動時の import 時間レポート⏱️")
+    parser.add_argument("targets", nargs="*", default=list(DEFAULT_TARGETS), help="import するモジュール")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="重いパッケージを何個出すか")
+    parser.add_argument("--forbid", default="", help="起動時に読み込まれたらダメなパッケージ（カンマ区切り）")
+    parser.add_argument("--output", help="結果JSONの保存先")
+    args = parser.parse_args(argv)
+
+    forbidden = {p for p in args.forbid.split(",") if p}
+    reports = []
+    violations = []
+    for target in args.targets:
+        report = report_target(target, args.runs, args.top)
+        reports.append(report)
+        if report.get("total_ms") is None:
+            print(f"💥 {target}: import できへんかった ({report['error']})", file=sys.stderr)
+            continue
+        print(f"📦 {target}: {report['total_ms']:.1f}ms（{report['modules_imported']}モジュール）", file=sys.stderr)
+        for name, ms in report["packages_ms"].items():
+            print(f"     {ms:8.1f}ms  {name}", file=sys.stderr)
+        if report["error"]:
+            print(f"   ⚠️ import 中にエラー: {report['error']}", file=sys.stderr)
+        loaded_forbidden = forbidden & set(report["loaded_packages"])
+        if loaded_forbidden:
+            violations.append((target, sorted(loaded_forbidden)))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "reports": reports}, f, ensure_ascii=False, indent=2)
+        print(f"💾 結果を保存したよ: {args.output}", file=sys.stderr)
+
+    for target, packages in violations:
+        print(f"🚨 {target} の起動で {', '.join(packages)} が読み込まれてるよ！", file=sys.stderr)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
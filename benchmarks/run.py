@@ -0,0 +1,327 @@
+"""
+🏎️ パイプラインのCPUホットパスを測るマイクロベンチマークだよ〜✨
+
+使い方:
+    python -m benchmarks.run                          # 全部測って結果JSONを benchmarks/results/ に保存
+    python -m benchmarks.run --quick --filter prompt  # 名前に "prompt" を含むのだけサクッと
+    python -m benchmarks.run --compare old.json       # 前の結果と比べて遅くなってたら終了コード1
+
+結果はJSON（ケースごとの中央値・最小値・1回あたりの入力サイズ）で出るから、
+デプロイ前に前回の結果と比べればパフォーマンスの劣化にすぐ気づける！
+"""
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Callable, Optional, Tuple
+
+# リポジトリ直下から backend を import できるようにする
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from backend.constants import (
+    SUMMARY_LENGTH_PROMPTS, SUMMARY_STYLE_PROMPTS, SUMMARY_EXPLANATION_PROMPTS,
+    SUMMARY_LENGTH_MEDIUM, SUMMARY_STYLE_GAL, SUMMARY_EXPLANATION_YES,
+)
+from backend.services.youtube import extract_video_id, format_captions, build_passages
+from backend.services.transcript_cleaner import clean_transcript_text
+from backend.services.compressor import compress_text
+from backend.services.llm import SummaryService, MAX_CAPTION_LENGTH
+from backend.services.store import summary_options_key
+from backend.services.http_cache import build_cached_body
+from benchmarks.synthetic import make_segments, make_urls, SIZES_MINUTES, LANGUAGES
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+DEFAULT_REPEATS = 5
+QUICK_REPEATS = 2
+MIN_REPEAT_SECONDS = 0.2  # 1回の計測がこれ以上になるまでループ回数を増やす
+QUICK_MIN_REPEAT_SECONDS = 0.05
+DEFAULT_REGRESSION_THRESHOLD = 0.15  # 中央値が15%以上遅くなったら劣化とみなす
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+URL_BATCH = 1000
+SCHEMA_VERSION = 1
+
+
+def measure(func: Callable[[], Any], repeats: int, min_seconds: float) -> Dict[str, float]:
+    """
+    timeitっぽく関数の1回あたりの時間を測るよ〜⏱️
+    まず1回の計測が min_seconds 以上になるループ回数を決めて、それを repeats 回やる！
+
+    引数:
+        func (Callable[[], Any]): 測る関数（引数なし）
+        repeats (int): 計測の繰り返し回数
+        min_seconds (float): 1回の計測の最低時間
+
+    戻り値:
+        Dict[str, float]: loops / min_s / median_s / mean_s / stdev_s（1回あたりの秒）
+    """
+    func()  # ウォームアップ（初回だけ遅いimportや正規表現コンパイルを除外）
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_seconds / elapsed) + 1))
+
+    timings = [elapsed / loops]
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - started) / loops)
+    return {
+        "loops": loops,
+        "min_s": min(timings),
+        "median_s": statistics.median(timings),
+        "mean_s": statistics.fmean(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def build_payload(prompt: str) -> Dict[str, Any]:
+    """バックエンドが送るのと同じ形のAPIペイロードを作るよ〜📦"""
+    return {
+        "model": "sonar",
+        "messages": [
+            {"role": "system", "content": "あなたはYouTube動画の字幕から要約を生成する優秀なAIアシスタントです。"},
+            {"role": "user", "content": prompt},
+        ],
+        "temperature": 0.7,
+        "max_tokens": 1500,
+    }
+
+
+def build_cases(sizes: List[str], languages: List[str]) -> List[Tuple[str, Dict[str, Any], Callable[[], Any]]]:
+    """
+    ベンチマークのケース一覧を作るよ〜📋（入力データはここで前もって全部作っとく）
+
+    引数:
+        sizes (List[str]): 動画の長さのラベル（"1m", "1h" など）
+        languages (List[str]): 言語コード
+
+    戻り値:
+        List[Tuple[str, Dict[str, Any], Callable[[], Any]]]: (ケース名, パラメータ, 測る関数)
+    """
+    service = SummaryService()
+    cases = []
+
+    # 🔗 URL → 動画ID（入力サイズに関係ないから1回だけ）
+    urls = make_urls(URL_BATCH)
+    cases.append((
+        "extract_video_id", {"batch": len(urls)},
+        lambda: [extract_video_id(url) for url in urls]
+    ))
+
+    # 🗝️ キャッシュキー（要約ストアのキーとレスポンスのETag）
+    options = {"length": SUMMARY_LENGTH_MEDIUM, "style": SUMMARY_STYLE_GAL, "explanation": SUMMARY_EXPLANATION_YES}
+    raw_options = {"length": "📏 標準", "style": "💖 ギャル", "explanation": "🔍 解説あり"}
+    cases.append((
+        "cache_key.summary_options_key", {"batch": URL_BATCH},
+        lambda: [summary_options_key(SummaryService.normalize_options(raw_options)) for _ in range(URL_BATCH)]
+    ))
+
+    # 🔡 小文字にすると長さが変わる文字（'İ'）が入った字幕でも圧縮が落ちないか（落ちたらベンチマークごと止まる）
+    folding_text = "İstanbul is big. " * 3000
+    compress_text(folding_text, MAX_CAPTION_LENGTH // 10)
+    cases.append((
+        "transcript.compress_length_changing_lower", {"chars": len(folding_text)},
+        lambda: compress_text(folding_text, MAX_CAPTION_LENGTH // 10)
+    ))
+
+    for language in languages:
+        for size in sizes:
+            segments = make_segments(language, SIZES_MINUTES[size])
+            shuffled = segments[:]
+            random.Random(0).shuffle(shuffled)
+            text, _ = clean_transcript_text(segments, language)
+            compressed = compress_text(text, MAX_CAPTION_LENGTH)
+            prompt = service._create_summary_prompt(
+                compressed,
+                SUMMARY_LENGTH_PROMPTS[options["length"]],
+                SUMMARY_STYLE_PROMPTS[options["style"]],
+                SUMMARY_EXPLANATION_PROMPTS[options["explanation"]],
+            )
+            payload = build_payload(prompt)
+            params = {"language": language, "size": size, "segments": len(segments), "chars": len(text)}
+
+            cases.extend([
+                ("transcript.sort", params,
+                 lambda shuffled=shuffled: sorted(shuffled, key=lambda x: float(x.get("start", 0)))),
+                ("transcript.clean_join", params,
+                 lambda segments=segments, language=language: clean_transcript_text(segments, language)),
+                ("transcript.build_passages", params,
+                 lambda segments=segments: build_passages(segments)),
+                ("format_captions", params,
+                 lambda segments=segments: format_captions(segments)),
+                ("llm.create_summary_prompt", {**params, "prompt_chars": len(prompt)},
+                 lambda compressed=compressed: service._create_summary_prompt(
+                     compressed,
+                     SUMMARY_LENGTH_PROMPTS[options["length"]],
+                     SUMMARY_STYLE_PROMPTS[options["style"]],
+                     SUMMARY_EXPLANATION_PROMPTS[options["explanation"]],
+                 )),
+                ("llm.sanitize_payload", {**params, "prompt_chars": len(prompt)},
+                 lambda payload=payload: service._sanitize_payload(payload)),
+                ("llm.ensure_safe_text", {**params, "prompt_chars": len(prompt)},
+                 lambda prompt=prompt: service._ensure_safe_text(prompt)),
+                ("llm.serialize_payload", {**params, "prompt_chars": len(prompt)},
+                 lambda payload=payload: json.dumps(payload, ensure_ascii=False).encode("utf-8")),
+                ("cache_key.response_etag", {**params, "summary_chars": len(compressed)},
+                 lambda compressed=compressed: build_cached_body({"summary": compressed, "video_id": "abcdefghijk"})),
+            ])
+            # ✂️ 上限に収まる字幕は compress_text が何もせず返すだけだから、測っても意味ない（0msの行が並ぶだけ）
+            if len(text) > MAX_CAPTION_LENGTH:
+                cases.append((
+                    "transcript.compress", params,
+                    lambda text=text: compress_text(text, MAX_CAPTION_LENGTH)
+                ))
+    return cases
+
+
+def git_revision() -> Optional[str]:
+    """今のコミットIDを返すよ〜🔖（gitがなければNone）"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(name_filter: Optional[str], sizes: List[str], languages: List[str], quick: bool) -> Dict[str, Any]:
+    """
+    ベンチマークを全部走らせて結果をまとめるよ〜🏁
+
+    引数:
+        name_filter (Optional[str]): ケース名にこの文字列を含むものだけ測る
+        sizes (List[str]): 動画の長さのラベル
+        languages (List[str]): 言語コード
+        quick (bool): 繰り返しを減らしてサクッと測る
+
+    戻り値:
+        Dict[str, Any]: meta と results を持つ結果
+    """
+    repeats = QUICK_REPEATS if quick else DEFAULT_REPEATS
+    min_seconds = QUICK_MIN_REPEAT_SECONDS if quick else MIN_REPEAT_SECONDS
+    results = []
+    for name, params, func in build_cases(sizes, languages):
+        if name_filter and name_filter not in name:
+            continue
+        stats = measure(func, repeats, min_seconds)
+        results.append({"name": name, "params": params, **stats})
+        label = " ".join(f"{k}={v}" for k, v in params.items())
+        print(f"  {name:32s} {label:50s} median={stats['median_s'] * 1000:10.3f}ms", file=sys.stderr)
+    return {
+        "schema": SCHEMA_VERSION,
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "quick": quick,
+        },
+        "results": results,
+    }
+
+
+def case_key(result: Dict[str, Any]) -> str:
+    """結果を突き合わせるためのキーを作るよ〜🔑"""
+    params = {k: v for k, v in result["params"].items() if k in ("language", "size", "batch")}
+    return result["name"] + "|" + json.dumps(params, sort_keys=True)
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float) -> List[Dict[str, Any]]:
+    """
+    前回の結果と比べて、中央値の変化率を出すよ〜📈
+
+    引数:
+        baseline (Dict[str, Any]): 比較元の結果JSON
+        current (Dict[str, Any]): 今回の結果JSON
+        threshold (float): これ以上遅くなったら劣化とみなす割合（0.15 = 15%）
+
+    戻り値:
+        List[Dict[str, Any]]: ケースごとの比較（regression=True なら劣化）
+    """
+    previous = {case_key(r): r for r in baseline.get("results", [])}
+    comparisons = []
+    for result in current["results"]:
+        old = previous.get(case_key(result))
+        if not old or not old["median_s"]:
+            continue
+        change = result["median_s"] / old["median_s"] - 1
+        comparisons.append({
+            "key": case_key(result),
+            "baseline_median_s": old["median_s"],
+            "median_s": result["median_s"],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return comparisons
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインから呼ぶ入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="YouTube要約パイプラインのマイクロベンチマーク🏎️")
+    parser.add_argument("--filter", help="ケース名にこの文字列を含むものだけ測る")
+    parser.add_argument("--sizes", default=",".join(SIZES_MINUTES), help=f"動画の長さ（{','.join(SIZES_MINUTES)}）")
+    parser.add_argument("--languages", default=",".join(LANGUAGES), help="言語（ja,en）")
+    parser.add_argument("--quick", action="store_true", help="繰り返しを減らしてサクッと測る")
+    parser.add_argument("--output", help="結果JSONの保存先（省略時は benchmarks/results/<時刻>-<コミット>.json）")
+    parser.add_argument("--compare", help="比較元の結果JSON（劣化があれば終了コード1）")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD, help="劣化とみなす変化率")
+    args = parser.parse_args(argv)
+
+    # 計測中のログ出力（動画ID抽出のINFOとか）はノイズになるから黙らせる
+    logging.disable(logging.WARNING)
+
+    sizes = [s for s in args.sizes.split(",") if s]
+    unknown = [s for s in sizes if s not in SIZES_MINUTES]
+    if unknown:
+        parser.error(f"知らない長さ: {', '.join(unknown)}")
+    languages = [lang for lang in args.languages.split(",") if lang]
+
+    print("🏎️ ベンチマーク開始〜", file=sys.stderr)
+    report = run_benchmarks(args.filter, sizes, languages, args.quick)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{report['meta']['git_revision'] or 'nogit'}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 結果を保存したよ: {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        comparisons = compare_results(baseline, report, args.threshold)
+        regressions = [c for c in comparisons if c["regression"]]
+        for c in comparisons:
+            mark = "🐢" if c["regression"] else "  "
+            print(f"{mark} {c['key']:70s} {c['change'] * 100:+7.1f}%", file=sys.stderr)
+        if regressions:
+            print(f"🚨 {len(regressions)}件のケースが{args.threshold * 100:.0f}%以上遅くなってるよ！", file=sys.stderr)
+            return 1
+        print("✅ 劣化なし！", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
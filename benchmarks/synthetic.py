@@ -0,0 +1,88 @@
+import random
+from typing import Dict, Any, List
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+SEGMENT_SECONDS = 3.2  # YouTubeの自動字幕は数秒ごとに1セグメント
+SIZES_MINUTES = {"1m": 1, "10m": 10, "1h": 60, "3h": 180, "10h": 600}
+LANGUAGES = ("ja", "en")
+
+# 🇯🇵 それっぽい日本語字幕を作るための部品（フィラーや [音楽] みたいなノイズもまぜる）
+JA_PHRASES = [
+    "今日はPythonの非同期処理について話していきます", "まずは基本的な考え方から", "ここが一番大事なポイントで",
+    "実際にコードを書いてみましょう", "このエラーはよくあるんですけど", "パフォーマンスを測ってみると",
+    "キャッシュを使うとかなり速くなります", "データベースのインデックスも見直して", "次にテストを書いていきます",
+    "結論から言うと", "具体的な例を見てみると", "ここで注意してほしいのは", "最後にまとめると",
+]
+JA_FILLERS = ["えー", "あのー", "まあ", "えっと", "なんか"]
+# 🇺🇸 英語字幕の部品
+EN_PHRASES = [
+    "today we are going to talk about async python", "let's start with the basic idea",
+    "this is the most important part", "let's actually write some code", "this error is really common",
+    "when we measure the performance", "caching makes this a lot faster", "we should also look at the database index",
+    "next we'll write some tests", "to put it simply", "let's look at a concrete example",
+    "one thing to watch out for", "to wrap things up",
+]
+EN_FILLERS = ["um", "uh", "you know", "like", "so"]
+NOISE_TAGS = ["[音楽]", "[拍手]", "[Music]", "[Applause]"]
+
+
+def make_segments(language: str, minutes: float, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    ベンチマーク用の合成字幕セグメントを作るよ〜🧪（同じseedなら毎回同じ中身）
+
+    引数:
+        language (str): "ja" か "en"
+        minutes (float): 動画の長さ（分）
+        seed (int): 乱数のseed
+
+    戻り値:
+        List[Dict[str, Any]]: text / start / duration の字幕セグメント（時間順）
+    """
+    rng = random.Random(f"{language}-{minutes}-{seed}")
+    phrases, fillers = (JA_PHRASES, JA_FILLERS) if language == "ja" else (EN_PHRASES, EN_FILLERS)
+    separator = "" if language == "ja" else " "
+    segments = []
+    count = max(1, int(minutes * 60 / SEGMENT_SECONDS))
+    previous = ""
+    for index in range(count):
+        roll = rng.random()
+        if roll < 0.03:
+            text = rng.choice(NOISE_TAGS)
+        elif roll < 0.10 and previous:
+            # 自動字幕にありがちな「前のセグメントの続きが重複する」パターン
+            text = previous.split(separator)[-1] if separator else previous[-6:]
+            text = separator.join([text, rng.choice(phrases)])
+        else:
+            parts = [rng.choice(phrases)]
+            if rng.random() < 0.3:
+                parts.insert(0, rng.choice(fillers))
+            text = separator.join(parts)
+        segments.append({"text": text, "start": round(index * SEGMENT_SECONDS, 2), "duration": SEGMENT_SECONDS})
+        previous = text
+    return segments
+
+
+def make_urls(count: int, seed: int = 0) -> List[str]:
+    """
+    いろんな形のYouTube URLを作るよ〜🔗（watch / youtu.be / embed / 余計なクエリつき）
+
+    引数:
+        count (int): 作る件数
+        seed (int): 乱数のseed
+
+    戻り値:
+        List[str]: URLのリスト
+    """
+    rng = random.Random(seed)
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-"
+    templates = [
+        "https://www.youtube.com/watch?v={id}",
+        "https://youtu.be/{id}",
+        "https://www.youtube.com/embed/{id}",
+        "https://www.youtube.com/watch?v={id}&list=PL1234567890&index=3&t=42s",
+        "https://m.youtube.com/watch?feature=share&v={id}",
+    ]
+    return [
+        rng.choice(templates).format(id="".join(rng.choice(alphabet) for _ in range(11)))
+        for _ in range(count)
+    ]
@@ -4,13 +4,14 @@ import requests
 import streamlit as st
 import time
 import logging
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable
 from datetime import datetime
-import dotenv
-from youtube_transcript_api import YouTubeTranscriptApi, TranscriptsDisabled, NoTranscriptFound
 import json
 import sys
 import os
+import zlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 
 # フロントエンドがバックエンドのパスにアクセスできるようにする
 backend_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -20,35 +21,107 @@ if backend_path not in sys.path:
 # 🆕 インポート文を修正 - 必要な定数をすべて明示的に列挙して確実にインポート
 from backend.constants import (
     SUMMARY_STYLES, SUMMARY_LENGTHS, SUMMARY_EXPLANATIONS,
-    SUMMARY_STYLE_BULLET, SUMMARY_LENGTH_MEDIUM, SUMMARY_EXPLANATION_YES,
-    SUMMARY_LENGTH_SHORT, SUMMARY_LENGTH_LONG,  # 👈 これらが不足していた！
-    SUMMARY_EXPLANATION_NO,  # 👈 これも追加
-    SUMMARY_STYLE_PARAGRAPH, SUMMARY_STYLE_GAL, SUMMARY_STYLE_ONEESAN,  # 👈 他のスタイルも明示的に
-    SUMMARY_LENGTH_PROMPTS, SUMMARY_STYLE_PROMPTS, SUMMARY_EXPLANATION_PROMPTS,
-    LABEL_TO_STYLE, LABEL_TO_LENGTH, LABEL_TO_EXPLANATION
+    SUMMARY_STYLE_BULLET, SUMMARY_LENGTH_MEDIUM, SUMMARY_EXPLANATION_YES
 )
+# 🧹 字幕クリーニング（ノイズ・フィラー・重複フレーズ除去）はバックエンドと共通のを使うよ
+from backend.services.transcript_cleaner import clean_transcript_text
+# 📋 字幕の取り方・選び方・エラーの見分けはバックエンドと共通のを使うよ
+from backend.services.youtube import (
+    fetch_transcript_segments, CaptionsUnavailableError, CaptionsRateLimitedError,
+    CaptionFetchError as BackendCaptionFetchError
+)
+# 📚 字幕と要約はライブラリストアにも保存して全文検索できるようにするよ
+from backend.services.store import get_store, summary_options_key
+# 🧊 プロセス全体で共有する上限つきキャッシュ
+from backend.services.memory_cache import TTLCache
+from backend.services.freshness import get_revalidator, REFRESH_REASON_STALE
+# 🧠 要約サービスはバックエンドのをそのまま使う（プロンプト・モデル・メトリクスがずれない）
+from backend.services.llm import SummaryService, PerplexityError
+# 🚦 LLMの枠は優先度クラスごとに配る（画面の人はバッチより先に通す）
+from backend.services.scheduler import PRIORITY_INTERACTIVE, PRIORITY_HEADER, PRIORITY_TOKEN, PRIORITY_TOKEN_HEADER
+# 🏭 要約の流れはバックエンド・ルートの app.py と共通のパイプラインで動かす
+from shared.pipeline import Pipeline, Stage, STOPPED_AT
+from shared.summary_pipeline import get_summary_pipeline, run_summary_pipeline, STAGE_CAPTIONS, STAGE_STORE
+# ⏱️ ステージごとの時間計測（スパン）とオンデマンドのプロファイル
+from backend.services.tracing import start_trace, server_timing_header, should_profile, maybe_profile
+# 🧾 キュー経由の非同期ロギング（JSON出力・サンプリング・デバッグ時だけペイロードダンプ）
+from backend.logging_config import setup_logging
+# 🌱 .envの読み込み（Streamlitの再実行ごとにはやらない）
+from backend.env import load_environment
 
-# 💖 .envファイルの読み込み（あれば）
-dotenv.load_dotenv()
+# 💖 .envファイルの読み込み（あれば・1プロセスで1回だけ）
+load_environment(os.path.dirname(__file__))
 
-# ✨ かわいいロガーの設定だよ〜ん💕 - 詳細ログ表示のためにレベルをINFOに設定！
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] 💬 %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+# ✨ かわいいロガーの設定だよ〜ん💕 - キュー経由の非同期ロギング（LOG_LEVEL / LOG_FORMAT で調整）
+setup_logging()
 logger = logging.getLogger(__name__)
 
 # 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
 PERPLEXITY_API_KEY = os.getenv("PERPLEXITY_API_KEY", "")
-MAX_CAPTION_LENGTH = int(os.getenv("MAX_CAPTION_LENGTH", "20000"))  # 字幕制限を20000文字にアップデートしたよ💁‍♀️
 YOUTUBE_URL_PATTERN = r'^(https?://)?(www\.)?(youtube\.com/watch\?v=|youtu\.be/)[a-zA-Z0-9_-]{11}'
 CACHE_EXPIRY = 24 * 60 * 60  # 24時間（秒）
-MAX_RETRIES = 3
-RETRY_DELAY = 2
+CACHE_STALE_GRACE = int(os.getenv("FRONTEND_CACHE_STALE_GRACE", str(6 * 60 * 60)))  # 期限切れのあと、裏で作り直しながら出していい時間（秒）
+BACKEND_API_URL = os.getenv("BACKEND_API_URL", "").rstrip("/")  # 設定すると要約はバックエンドAPIに任せる（薄いクライアントモード）
+BACKEND_TIMEOUT = float(os.getenv("BACKEND_TIMEOUT", "10"))  # ジョブ登録・ポーリング1回のタイムアウト（秒）
+BACKEND_POOL_SIZE = int(os.getenv("BACKEND_POOL_SIZE", "32"))  # バックエンドへのKeep-Alive接続を何本まで使い回すか
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # ジョブの状態を見に行く間隔（秒）
+SUMMARY_JOB_KEY = "summary_job"
+JOB_ERROR_KEY = "job_error"
+SUBMIT_ERROR_KEY = "submit_error"
+URL_INPUT_KEY = "url"
+API_KEY_INPUT_KEY = "api_key"
+STYLE_OPTION_KEY = "option_style"
+LENGTH_OPTION_KEY = "option_length"
+EXPLANATION_OPTION_KEY = "option_explanation"
+EMBED_VIDEO_KEY = "embed_video_id"  # 「動画を読み込む」を押した動画のID
+YOUTUBE_THUMBNAIL_URL = "https://i.ytimg.com/vi/{video_id}/hqdefault.jpg"
+VIDEO_EMBED_HEIGHT = 315
+PREFETCH_WORKERS = int(os.getenv("CAPTION_PREFETCH_WORKERS", "4"))  # 字幕の先読みを同時に何本まで走らせるか
+PREFETCH_WAIT_TIMEOUT = float(os.getenv("CAPTION_PREFETCH_WAIT_TIMEOUT", "30"))  # 要約スタート時に先読みの完了を待つ最大秒数
+PREFETCH_VIDEO_KEY = "prefetch_video_id"  # このセッションが先読みを頼んでる動画のID
+
+# 📅 サイドバーの更新履歴
+UPDATE_HISTORY = """
+    ### 🎉 最新アップデート
+    **2025.04.10**
+    - 要約スタイルを変更しても、既存の出力結果を保持
+    - [予告]LLMをGeminiに変更予定✨
+    - [予告]新キャラ参戦予定✨
 
-# 🆕 字幕キャッシュセッションキー
-CAPTION_CACHE_KEY = "youtube_caption_cache"
+
+    **2025.04.09**
+    - ⚒️ [お詫び]🥹APIレート制限のおわび🥹
+    - 🧋 要約開始ボタンの連続押下防止
+
+    **2025.04.08**
+    - ⚒️ [ポイント解説]いれる？のオプションの不具合修正
+
+    
+    **2025.04.07**
+    - 👠 おねーさんとギャルが参戦！
+    - 🚀 一度検索した動画の文字情報をキャッシュ化
+    - 🛩️ Youtube API負荷を最大80%軽減
+    
+    **2025.04.06**
+    - 🎬 YouTube要約くん公開スタート！
+    - 📝 箇条書き要約と説明文要約対応
+    """
+
+# 🧊 キャッシュはセッションごとじゃなくてプロセス全体で共有（2人目の人は一瞬で表示！）
+CAPTION_CACHE_SIZE = int(os.getenv("FRONTEND_CAPTION_CACHE_SIZE", "256"))  # 字幕キャッシュの最大件数
+CAPTION_CACHE_BYTES = int(os.getenv("FRONTEND_CAPTION_CACHE_BYTES", str(64 * 1024 * 1024)))  # 字幕キャッシュの上限（圧縮後のバイト数）
+SUMMARY_CACHE_SIZE = int(os.getenv("FRONTEND_SUMMARY_CACHE_SIZE", "1024"))  # 要約キャッシュの最大件数
+SUMMARY_CACHE_BYTES = int(os.getenv("FRONTEND_SUMMARY_CACHE_BYTES", str(16 * 1024 * 1024)))  # 要約キャッシュの上限（バイト数）
+CACHE_COMPRESS_LEVEL = 6  # 字幕のzlib圧縮レベル（速さと縮み具合のバランス）
+
+# 🎨 スタイルシート（frontend/static/ は Streamlit の静的配信で /app/static/ に出る）
+STYLESHEET_PATH = os.path.join(os.path.dirname(__file__), "static", "style.css")
+STATIC_STYLESHEET_URL = "app/static/style.css"
+FONT_LINKS = """
+<link rel="preconnect" href="https://fonts.googleapis.com">
+<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
+<link href="https://fonts.googleapis.com/css2?family=Inconsolata:wght@400;500;700&family=Noto+Sans+JP:wght@500&display=swap" rel="stylesheet">
+"""
 
 # 🎨 ページスタイル設定
 st.set_page_config(
@@ -59,250 +132,32 @@ st.set_page_config(
 )
 
 # 🌈 カスタムCSS - よりStreamlit要素に特化したフォント指定 ✨
-st.markdown("""
-<link rel="preconnect" href="https://fonts.googleapis.com">
-<link rel="preconnect" href="https://fonts.gstatic.com" crossorigin>
-<link href="https://fonts.googleapis.com/css2?family=Inconsolata:wght@400;500;700&family=Noto+Sans+JP:wght@500&display=swap" rel="stylesheet">
+# 中身は frontend/static/style.css に置いて静的ファイルとして配信（ブラウザがキャッシュするから再実行のたびに送らない）
+@st.cache_resource
+def load_stylesheet() -> Tuple[str, str]:
+    """
+    スタイルシートを1回だけ読み込むよ〜🎨（プロセスで1回）
 
-<style>
-    /* 🌟 Streamlit全体のベースフォント設定 - これ超重要！🌟 */
-    @font-face {
-        font-family: 'Noto Sans JP';
-        src: url('https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@500&display=swap');
-        font-weight: 500;
-    }
-    
-    @font-face {
-        font-family: 'Inconsolata';
-        src: url('https://fonts.googleapis.com/css2?family=Inconsolata&display=swap');
-    }
+    戻り値:
+        Tuple[str, str]: (CSSの中身, キャッシュ破棄用のバージョン文字列)
+    """
+    with open(STYLESHEET_PATH, encoding="utf-8") as f:
+        css = f.read()
+    return css, str(int(os.path.getmtime(STYLESHEET_PATH)))
 
-    /* ベースフォント設定 - セレクタの優先度を高めてStreamlitのデフォルトを確実に上書き */
-    .element-container, .stMarkdown, .stText, p, h1, h2, h3, span, div, label, 
-    .stTextInput > label, .stButton > button, .stRadio > div > label {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-    }
-    
-    /* 英数字はInconsolataを優先的に使うためのクラス */
-    code, pre, .code-text {
-        font-family: 'Inconsolata', monospace !important;
-    }
-    
-    /* Streamlitの特定要素にフォントを強制適用 */
-    .st-emotion-cache-16idsys p, .st-emotion-cache-16idsys, 
-    .st-emotion-cache-183lzff, .st-emotion-cache-10trblm, 
-    .st-emotion-cache-1erivf3, .st-emotion-cache-1gulkj7 {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-    }
-    
-    /* マークダウンコンテナ内の要素 */
-    [data-testid="stMarkdownContainer"] > * {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-    }
-    
-    /* 英数字を含む可能性が高い要素には両方のフォントを指定（Inconsolataが優先的に使われる） */
-    .status-message, .stMetricValue, pre, code, [data-testid="stMetricValue"] {
-        font-family: 'Inconsolata', 'Noto Sans JP', sans-serif !important;
-    }
-    
-    /* ✨ 新しい色彩設定 ✨ */
-    :root {
-        --base-bg: rgb(250, 249, 245);       /* ベース背景色 - 指定された色 */
-        --secondary-bg: rgb(240, 238, 230);  /* セカンダリ背景色 - 指定された少し濃い色 */
-        --accent-color: #8B7355;             /* アクセントカラー - 温かみのあるブラウン */
-        --accent-light: #A89078;             /* 薄いアクセントカラー */
-        --accent-dark: #6B5744;              /* 濃いアクセントカラー */
-        --text-color: #3C3C3C;               /* テキストカラー - ダークグレイ */
-        --text-light: #6A6A6A;               /* 薄いテキストカラー */
-        --border-color: #E0DED5;             /* ボーダーカラー - ベージュに合わせた色 */
-    }
-    
-    /* ベース背景色 */
-    .stApp {
-        background-color: var(--base-bg);
-    }
-    
-    /* メインコンテナ背景 */
-    .main .block-container {
-        padding: 2rem;
-        max-width: 1100px;
-        margin: 0 auto;
-    }
-    
-    /* タイトルスタイル - より強力なセレクタ */
-    .main-title {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 2.5em !important;
-        color: var(--accent-color);
-        text-align: center;
-        margin-bottom: 1.5em;
-        letter-spacing: -0.01em;
-    }
-    
-    .sub-title {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 1.3em !important;
-        color: var(--accent-color);
-        margin-top: 1em;
-        margin-bottom: 0.5em;
-    }
-    
-    /* フォーム要素のスタイル */
-    div[data-baseweb="input"] {
-        background-color: white;
-    }
-    
-    input[type="text"] {
-        border: 1px solid var(--border-color) !important;
-        border-radius: 6px;
-        padding: 10px 14px;
-        font-family: 'Inconsolata', 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-        transition: border-color 0.3s ease;
-        background-color: white !important;
-    }
-    
-    input[type="text"]:focus {
-        border-color: var(--accent-color) !important;
-        box-shadow: 0 0 0 2px rgba(139, 115, 85, 0.1) !important;
-    }
-    
-    /* セクションヘッダー */
-    h3 {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-        color: var(--text-color);
-        font-size: 1.1em;
-        margin-top: 1.5em;
-        margin-bottom: 0.8em;
-    }
-    
-    /* 結果表示エリア */
-    .success-box {
-        background-color: white;
-        border-radius: 8px;
-        padding: 24px;
-        margin-top: 24px;
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.05);
-        border: 1px solid var(--border-color);
-    }
-    
-    /* ステータスメッセージ */
-    .status-message {
-        font-size: 0.9em;
-        color: var(--text-light);
-        font-style: normal;
-        font-family: 'Inconsolata', monospace !important;
-        margin-top: 16px;
-    }
-    
-    /* フッター */
-    .footer {
-        text-align: center;
-        margin-top: 3em;
-        color: var(--text-light);
-        font-size: 0.8em;
-        font-family: 'Inconsolata', 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-    }
-    
-    /* ボタンスタイル - ウォームブラウン */
-    .stButton>button {
-        background-color: var(--accent-color);
-        color: white;
-        font-weight: 500 !important;
-        font-family: 'Noto Sans JP', sans-serif !important;
-        border: none;
-        border-radius: 6px;
-        padding: 0.6em 1em;
-        font-size: 1.05em;
-        transition: all 0.15s ease;
-        box-shadow: none;
-    }
-    
-    .stButton>button:hover {
-        background-color: var(--accent-dark);
-        box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-        transform: translateY(-1px);
-    }
-    
-    /* カスタムラジオボタン - ウォームデザイン */
-    div.row-widget.stRadio > div[role="radiogroup"] > label > div:first-child {
-        display: none;
-    }
-    
-    div.row-widget.stRadio > div[role="radiogroup"] {
-        display: flex;
-        flex-wrap: wrap;
-        gap: 10px;
-        justify-content: flex-start;
-    }
-    
-    div.row-widget.stRadio > div[role="radiogroup"] > label {
-        cursor: pointer;
-        background-color: white;
-        border: 1px solid var(--border-color);
-        border-radius: 6px;
-        padding: 8px 16px;
-        transition: all 0.15s ease;
-        margin: 0 !important;
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.95em;
-        color: var(--text-color);
-    }
-    
-    /* 選択されたときのスタイル */
-    div.row-widget.stRadio > div[role="radiogroup"] > label[data-baseweb="radio"]:has(input:checked) {
-        background-color: rgba(139, 115, 85, 0.05);
-        border-color: var(--accent-color);
-        color: var(--accent-color);
-        font-weight: 500 !important;
-    }
-    
-    /* メッセージスタイル */
-    div[data-testid="stCaptionContainer"] {
-        color: var(--text-light) !important;
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-        font-size: 0.9em;
-    }
-    
-    /* サイドバーのスタイルも調整 */
-    .css-6qob1r.e1fqkh3o3, .css-1544g2n.e1fqkh3o3 {
-        background-color: var(--secondary-bg);
-    }
-    
-    /* Streamlitのすべての主要コンポーネントにフォントを適用 */
-    .stSlider, .stSelectbox, .stMultiselect, .stDateInput,
-    .stTextArea, .stNumberInput, .stFileUploader, .stTabs {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-    }
-    
-    /* データ表示要素（テーブルなど）にもフォント適用 */
-    .stDataFrame, .stDataEditor, .stTable, .stDataFrame td,
-    .stDataFrame th {
-        font-family: 'Inconsolata', 'Noto Sans JP', sans-serif !important;
-    }
-    
-    /* フォントを確実に適用するための最後の砦 - bodyタグからの継承を強制 */
-    body {
-        font-family: 'Noto Sans JP', sans-serif !important;
-        font-weight: 500 !important;
-    }
-    
-    /* 英数字の多い要素は別にクラス付けして処理 */
-    .english-text {
-        font-family: 'Inconsolata', monospace !important;
-    }
-</style>
-""", unsafe_allow_html=True)
+def inject_styles() -> None:
+    """
+    カスタムCSSをページに入れるよ〜💅
+    静的配信（server.enableStaticServing）がONならlinkタグ1行だけ、OFFなら従来どおりCSSを直接埋め込む
+    """
+    css, version = load_stylesheet()
+    if st.get_option("server.enableStaticServing"):
+        stylesheet = f'<link rel="stylesheet" href="{STATIC_STYLESHEET_URL}?v={version}">'
+    else:
+        stylesheet = f"<style>{css}</style>"
+    st.markdown(FONT_LINKS + stylesheet, unsafe_allow_html=True)
+
+inject_styles()
 
 # ====================🧚‍♀️ ここからYouTube字幕処理の関数だよ ====================
 
@@ -339,19 +194,97 @@ def extract_video_id(url: str) -> Optional[str]:
         match = re.search(pattern, url)
         if match:
             video_id = match.group(1)
-            logger.info(f"🎬 動画ID抽出成功: {video_id}")
+            logger.info("🎬 動画ID抽出成功: %s", video_id)
             return video_id
     
-    logger.warning(f"⚠️ URLから動画IDを抽出できへんかった: {url}")
+    logger.warning("⚠️ URLから動画IDを抽出できへんかった: %s", url)
     return None
 
-def fetch_captions(video_id: str) -> Tuple[str, Dict[str, Any]]:
+def compress_text_for_cache(text: str) -> bytes:
+    """
+    キャッシュに入れる字幕をzlibで圧縮するよ〜🗜️（字幕は繰り返しが多いからよく縮む！）
+    
+    引数:
+        text: 字幕テキスト
+        
+    戻り値:
+        bytes: 圧縮したバイト列
+    """
+    return zlib.compress(text.encode("utf-8"), CACHE_COMPRESS_LEVEL)
+
+def decompress_cached_text(data: bytes) -> str:
+    """
+    compress_text_for_cache で圧縮した字幕を元に戻すよ〜📖
+    
+    引数:
+        data: 圧縮したバイト列
+        
+    戻り値:
+        str: 字幕テキスト
+    """
+    return zlib.decompress(data).decode("utf-8")
+
+def estimate_entry_bytes(entry: Dict[str, Any]) -> int:
+    """
+    キャッシュの1件がだいたい何バイト使うか見積もるよ〜📏（バイト数の上限に使う）
+    
+    引数:
+        entry: キャッシュに入れる辞書
+        
+    戻り値:
+        int: だいたいのバイト数
+    """
+    size = 0
+    for value in entry.values():
+        if isinstance(value, bytes):
+            size += len(value)
+        elif isinstance(value, str):
+            size += len(value.encode("utf-8"))
+        elif isinstance(value, dict):
+            size += len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+    return size
+
+@st.cache_resource
+def get_caption_cache() -> TTLCache:
+    """
+    全セッションで共有する字幕キャッシュだよ〜🧊（件数＆圧縮後のバイト数に上限つき）
+    
+    戻り値:
+        TTLCache: 動画ID → 圧縮字幕と字幕情報
+    """
+    return TTLCache(
+        CAPTION_CACHE_SIZE, CACHE_EXPIRY, name="frontend_caption",
+        max_bytes=CAPTION_CACHE_BYTES, sizeof=estimate_entry_bytes, stale_seconds=CACHE_STALE_GRACE
+    )
+
+@st.cache_resource
+def get_summary_cache() -> TTLCache:
+    """
+    全セッションで共有する要約キャッシュだよ〜🧊（件数＆バイト数に上限つき）
+    
+    戻り値:
+        TTLCache: get_cache_key のキー → 要約結果
+    """
+    return TTLCache(
+        SUMMARY_CACHE_SIZE, CACHE_EXPIRY, name="frontend_summary",
+        max_bytes=SUMMARY_CACHE_BYTES, sizeof=estimate_entry_bytes, stale_seconds=CACHE_STALE_GRACE
+    )
+
+def fetch_captions(
+    video_id: str,
+    cancel_event: Optional[threading.Event] = None,
+    caption_cache: Optional[TTLCache] = None,
+    use_cache: bool = True
+) -> Tuple[str, Dict[str, Any]]:
     """
     YouTube動画から字幕を効率的に取得するよ〜📝
     最適化バージョン：APIコール回数を大幅削減！✨
     
     引数:
         video_id (str): YouTube動画ID
+        cancel_event (Optional[threading.Event]): 先読み用。セットされたら字幕本体のダウンロード前にやめる
+        caption_cache (Optional[TTLCache]): 使う字幕キャッシュ（先読みスレッドから呼ぶとき用。Noneなら get_caption_cache）
+        use_cache (bool): Falseならキャッシュを見ずにYouTubeから取り直す（裏での作り直し用）
         
     戻り値:
         Tuple[str, Dict[str, Any]]: (字幕テキスト, 字幕情報)
@@ -366,424 +299,215 @@ def fetch_captions(video_id: str) -> Tuple[str, Dict[str, Any]]:
         RateLimitError: レート制限に引っかかった場合
         CaptionFetchError: その他の字幕取得エラー
     """
-    # 🆕 字幕キャッシュをチェック
-    if CAPTION_CACHE_KEY in st.session_state:
-        caption_cache = st.session_state[CAPTION_CACHE_KEY]
-        if video_id in caption_cache:
-            cache_data = caption_cache[video_id]
-            # キャッシュの有効期限をチェック
-            if time.time() - cache_data["timestamp"] < CACHE_EXPIRY:
-                logger.info(f"🎉 字幕キャッシュヒット！動画ID: {video_id}")
-                return cache_data["caption_text"], cache_data["subtitle_info"]
-            else:
-                logger.info(f"⏰ 字幕キャッシュ期限切れ: {video_id}")
-    else:
-        # キャッシュ初期化
-        st.session_state[CAPTION_CACHE_KEY] = {}
-        logger.info("🏁 字幕キャッシュを初期化したよ")
-    
+    # 🆕 字幕キャッシュをチェック（全セッション共有・期限切れでも猶予の中なら出して、取り直しは裏でやる）
+    if caption_cache is None:
+        caption_cache = get_caption_cache()
+    found = caption_cache.lookup(video_id) if use_cache else None
+    if found:
+        cache_data, stale = found
+        logger.info("🎉 字幕キャッシュヒット！動画ID: %s%s", video_id, "（期限切れ・取り直し待ち）" if stale else "")
+        if stale:
+            get_revalidator().submit(
+                caption_cache.name, ("frontend_caption", video_id),
+                lambda: fetch_captions(video_id, caption_cache=caption_cache, use_cache=False), REFRESH_REASON_STALE
+            )
+        return decompress_cached_text(cache_data["caption_z"]), dict(cache_data["subtitle_info"])
+    
+    logger.info("🎬 動画ID: %s の字幕取得開始！", video_id)
+    subtitle_info: Dict[str, Any] = {}
     try:
-        logger.info(f"🎬 動画ID: {video_id} の字幕取得開始！")
-        
-        # 字幕情報を格納する辞書
-        subtitle_info = {
-            "selected_lang": None,
-            "available_languages": [],
-            "manual_languages": [],
-            "generated_languages": []
-        }
-        
-        # 🌟 効率化ポイント：一度のAPIコールで全字幕情報を取得 🌟
-        try:
-            # API呼び出し回数を減らすため、まず利用可能な字幕リストを1回で取得
-            logger.info(f"📋 利用可能な字幕リストを取得中...")
-            transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
-            available_languages = [t.language for t in transcript_list]
-            logger.info(f"✅ 利用可能な字幕言語: {available_languages}")
-            
-            # 手動字幕のみを抽出して優先言語順にソート
-            manual_transcripts = [t for t in transcript_list if not t.is_generated]
-            manual_languages = [t.language for t in manual_transcripts]
-            logger.info(f"📚 手動字幕言語: {manual_languages}")
-            
-            # 自動生成字幕を抽出
-            generated_transcripts = [t for t in transcript_list if t.is_generated]
-            generated_languages = [t.language for t in generated_transcripts]
-            logger.info(f"🤖 自動生成字幕言語: {generated_languages}")
-            
-            # 字幕情報を更新
-            subtitle_info["available_languages"] = available_languages
-            subtitle_info["manual_languages"] = manual_languages
-            subtitle_info["generated_languages"] = generated_languages
-            
-            # 優先順位で字幕を取得: 日本語手動 > 英語手動 > 日本語自動 > 英語自動 > その他
-            transcript = None
-            selected_lang = None
-            
-            # 優先言語リスト
-            priority_langs = ['ja', 'ja-JP', 'en', 'en-US', 'en-GB']
-            
-            # 1. 手動字幕から優先言語を探す
-            for lang in priority_langs:
-                for t in manual_transcripts:
-                    if t.language_code == lang or t.language == lang:
-                        transcript = t.fetch()
-                        selected_lang = f"{t.language} (手動)"
-                        logger.info(f"💎 優先言語の手動字幕が見つかった: {t.language}")
-                        break
-                if transcript:
-                    break
-            
-            # 2. 手動字幕が見つからなければ、どの言語でも手動字幕を使う
-            if not transcript and manual_transcripts:
-                transcript = manual_transcripts[0].fetch()
-                selected_lang = f"{manual_transcripts[0].language} (手動)"
-                logger.info(f"📝 手動字幕を使用: {manual_transcripts[0].language}")
-            
-            # 3. 手動字幕がなければ、自動生成字幕から優先言語を探す
-            if not transcript:
-                for lang in priority_langs:
-                    for t in generated_transcripts:
-                        if t.language_code == lang or t.language == lang:
-                            transcript = t.fetch()
-                            selected_lang = f"{t.language} (自動生成)"
-                            logger.info(f"🤖 優先言語の自動生成字幕が見つかった: {t.language}")
-                            break
-                    if transcript:
-                        break
-            
-            # 4. どれも見つからなければ、最初の自動生成字幕を使用
-            if not transcript and generated_transcripts:
-                transcript = generated_transcripts[0].fetch()
-                selected_lang = f"{generated_transcripts[0].language} (自動生成)"
-                logger.info(f"🔄 自動生成字幕を使用: {generated_transcripts[0].language}")
-                
-            # 字幕が見つからない場合
-            if not transcript:
-                logger.error("😱 字幕が1つも見つからなかった！")
-                raise NoSubtitlesError("この動画には字幕がないみたい…他の動画を試してみてね！😢")
-                
-            # 選択された言語を記録
-            subtitle_info["selected_lang"] = selected_lang
-                
-            logger.info(f"✨ 字幕取得成功: {selected_lang}")
-                
-        except (TranscriptsDisabled, NoTranscriptFound) as e:
-            # 字幕が無効または見つからない場合の専用エラー
-            logger.error(f"😢 字幕なしエラー: {str(e)}")
-            error_message = "この動画には字幕がないみたい…他の動画を試してみてね！😢"
-            raise NoSubtitlesError(error_message)
-            
-        except Exception as e:
-            error_str = str(e).lower()
-            
-            # レート制限の検出（エラーメッセージから判断）
-            if "429" in error_str or "too many" in error_str or "rate limit" in error_str:
-                logger.error(f"⏱️ レート制限エラー検出: {str(e)}")
-                raise RateLimitError("YouTubeのAPIレート制限に達しちゃった！しばらく待ってから試してね💦")
-                
-            # それ以外の一般的なエラー
-            logger.error(f"🚨 字幕取得中の一般エラー: {str(e)}")
-            raise CaptionFetchError(f"字幕取得中にエラーが発生したわ😭: {str(e)}")
-        
-        # 字幕テキストの結合
-        if transcript:
-            # 時間順に並び替え
-            if isinstance(transcript, list):
-                transcript.sort(key=lambda x: float(x.get('start', 0)))
-                
-                # テキスト結合（改行をスペースに置き換え）
-                caption_text = ' '.join([t['text'].replace('\n', ' ') for t in transcript])
-                
-                logger.info(f"📊 字幕取得完了: 文字数={len(caption_text)}")
-                
-                # 字幕をキャッシュに保存
-                st.session_state[CAPTION_CACHE_KEY][video_id] = {
-                    "caption_text": caption_text,
-                    "timestamp": time.time(),
-                    "language": selected_lang,
-                    "subtitle_info": subtitle_info
-                }
-                
-                return caption_text, subtitle_info
-        else:
-            logger.error("😱 字幕処理後に内容が空になった")
-            raise NoSubtitlesError("字幕が見つからないか、処理中にエラーが発生したわ〜😢")
-            
-    except (NoSubtitlesError, RateLimitError):
-        # 特殊なエラーは上位に伝播させるよ
-        raise
-    except Exception as e:
-        error_msg = f"YouTube字幕取得エラー: {str(e)}"
-        logger.error(f"🚨 予期せぬエラー: {error_msg}")
-        raise CaptionFetchError(error_msg)
-    
-    return "", {}  # エラー時の戻り値
+        # 🌟 字幕一覧1回＋本体1回の取り方と言語の選び方はバックエンドと共通
+        transcript, selected_lang_code = fetch_transcript_segments(
+            video_id, cancel_event=cancel_event, subtitle_info=subtitle_info
+        )
+    except BackendCaptionFetchError as e:
+        raise to_frontend_caption_error(e) from e
+    if cancel_event is not None and cancel_event.is_set():
+        # 🛑 先読み中にURLが変わったから、字幕本体は取りに行ってない
+        return "", {}
+    if not transcript:
+        logger.error("😱 字幕処理後に内容が空になった")
+        raise NoSubtitlesError("字幕が見つからないか、処理中にエラーが発生したわ〜😢")
+    logger.info("✨ 字幕取得成功: %s", subtitle_info["selected_lang"])
+    
+    # 🧹 ノイズ・フィラー・重複フレーズを削ってからテキスト結合
+    caption_text, cleaning_stats = clean_transcript_text(transcript, selected_lang_code)
+    subtitle_info["cleaning_stats"] = cleaning_stats
+    
+    logger.info("📊 字幕取得完了: 文字数=%s (クリーニングで%s文字・約%sトークン削減)", len(caption_text), cleaning_stats['chars_saved'], cleaning_stats['tokens_saved'])
+    
+    # 字幕をキャッシュに保存（zlibで圧縮して入れる）
+    caption_cache.set(video_id, {
+        "caption_z": compress_text_for_cache(caption_text),
+        "language": subtitle_info["selected_lang"],
+        "subtitle_info": dict(subtitle_info)
+    })
+    save_to_library("字幕", lambda store: store.save_transcript(video_id, transcript, selected_lang_code))
+    
+    return caption_text, subtitle_info
 
-# ====================✨ ここから要約生成の関数だよ ====================
+def to_frontend_caption_error(error: BackendCaptionFetchError) -> CaptionFetchError:
+    """
+    バックエンドの字幕エラーを、画面に出す用のエラーに変えるよ〜🔀
+    （字幕なし・レート制限の見分けはバックエンドの fetch_transcript_segments がやってくれる）
+    
+    引数:
+        error (BackendCaptionFetchError): fetch_transcript_segments が投げたエラー
+        
+    戻り値:
+        CaptionFetchError: NoSubtitlesError / RateLimitError / CaptionFetchError のどれか
+    """
+    if isinstance(error, CaptionsUnavailableError):
+        logger.error("😢 字幕なしエラー: %s", error)
+        return NoSubtitlesError("この動画には字幕がないみたい…他の動画を試してみてね！😢")
+    if isinstance(error, CaptionsRateLimitedError):
+        logger.error("⏱️ レート制限エラー検出: %s", error)
+        return RateLimitError("YouTubeのAPIレート制限に達しちゃった！しばらく待ってから試してね💦")
+    logger.error("🚨 字幕取得中の一般エラー: %s", error)
+    return CaptionFetchError(f"字幕取得中にエラーが発生したわ😭: {str(error)}")
 
-class PerplexityError(Exception):
-    """Perplexity API呼び出し中のエラーを表すクラスだよ〜🚫"""
-    pass
+def save_to_library(label: str, action: Callable[[Any], None]) -> None:
+    """
+    ライブラリストア（全文検索つき）に保存するよ〜📚
+    保存に失敗しても要約表示は止めたくないから、警告ログだけ出して続行！
+    
+    引数:
+        label: ログ用の名前（"字幕"や"要約"）
+        action: ストアを受け取って保存する関数
+    """
+    try:
+        action(get_store())
+    except Exception as e:
+        logger.warning("⚠️ ライブラリストアへの%s保存に失敗したけど続行するよ: %s", label, e)
 
-class SummaryService:
+class CaptionPrefetcher:
     """
-    PerplexityのAPIを使って要約を生成するサービスクラス✨
+    URLが入力された時点で、字幕を裏で先に取っとく係だよ〜🏃‍♀️💨
     
-    このクラスはPerplexity APIに接続して、テキストの要約を生成するよ〜！
+    要約スタートを押したときには字幕がもうキャッシュにあるから、すぐLLMに行ける！
+    同じ動画を何人が頼んでも取りに行くのは1回だけ（参照カウントつき）で、
+    誰も要らなくなったら（URLが変わったら）字幕本体のダウンロード前にやめる🛑
     """
     
-    def __init__(self):
-        """サービスの初期化だよ〜💖"""
-        if not PERPLEXITY_API_KEY:
-            logger.warning("⚠️ PERPLEXITY_API_KEYが設定されていないよ！")
-        
-        self.api_key = PERPLEXITY_API_KEY
-        self.api_url = "https://api.perplexity.ai/chat/completions"
-        self.headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-    
-    def generate_summary(self, text: str, options: Dict[str, str]) -> str:
+    def __init__(self, caption_cache: TTLCache, max_workers: int = PREFETCH_WORKERS):
         """
-        テキストの要約を生成するよ〜✨
+        先読み係の初期化だよ〜💖
         
         引数:
-            text (str): 要約するテキスト
-            options (Dict[str, str]): 要約オプション（長さ・スタイルなど）
-            
-        戻り値:
-            str: 生成された要約テキスト
-            
-        例外:
-            PerplexityError: API呼び出しに失敗した場合
+            caption_cache: 字幕を入れるキャッシュ
+            max_workers: 同時に走らせる先読みの数
         """
-        if not self.api_key:
-            raise PerplexityError("Perplexity APIキーが設定されていないよ〜😢")
-        
-        # 字幕テキストが長すぎる場合は切り詰める
-        if len(text) > MAX_CAPTION_LENGTH:
-            logger.info(f"⚠️ テキストが長すぎるから{MAX_CAPTION_LENGTH}文字に切り詰めるよ")
-            text = text[:MAX_CAPTION_LENGTH]
-        
-        # 🆕 オプションの値をログに出力（デバッグ用）
-        logger.info(f"🔍 受け取ったオプション: length={options.get('length')}, style={options.get('style')}, explanation={options.get('explanation')}")
-        
-        # 🆕 オプションの正規化処理
-        length_option = self._normalize_length_option(options.get('length', SUMMARY_LENGTH_MEDIUM))
-        style_option = self._normalize_style_option(options.get('style', SUMMARY_STYLE_BULLET))
-        explanation_option = self._normalize_explanation_option(options.get('explanation', SUMMARY_EXPLANATION_YES))
-        
-        # 🆕 正規化した値をログに出力
-        logger.info(f"✅ 正規化後のオプション: length={length_option}, style={style_option}, explanation={explanation_option}")
-        
-        # 🆕 オプションからプロンプト文字列を取得
-        summary_length = SUMMARY_LENGTH_PROMPTS.get(length_option, SUMMARY_LENGTH_PROMPTS[SUMMARY_LENGTH_MEDIUM])
-        summary_style = SUMMARY_STYLE_PROMPTS.get(style_option, SUMMARY_STYLE_PROMPTS[SUMMARY_STYLE_BULLET]) 
-        summary_explanation = SUMMARY_EXPLANATION_PROMPTS.get(explanation_option, SUMMARY_EXPLANATION_PROMPTS[SUMMARY_EXPLANATION_YES])
-        
-        # 🆕 取得したプロンプト文字列をログに出力
-        logger.info(f"📝 生成するプロンプト: length={summary_length}, style={summary_style}, explanation={summary_explanation}")
-        
-        # プロンプトの作成
-        prompt = self._create_summary_prompt(text, summary_length, summary_style, summary_explanation)
-        
-        # APIリクエストの作成
-        payload = {
-            "model": "sonar-pro",  # 良いモデルを選ぶよ〜💕
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "あなたはYouTube動画の字幕から要約を生成する優秀なAIアシスタントです。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 1500
-        }
-        
-        # API呼び出し（リトライロジック付き）
-        summary = self._call_api_with_retry(payload)
-        
-        logger.info("✅ 要約生成完了！")
-        return summary
+        self._cache = caption_cache
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="caption-prefetch")
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Dict[str, Any]] = {}  # 動画ID → future / cancel_event / refs
     
-    def _normalize_length_option(self, option: str) -> str:
+    def prefetch(self, video_id: str) -> None:
         """
-        長さオプションを内部値に正規化するよ～💫
+        字幕の先読みを頼むよ〜📮（キャッシュにあれば何もしない・走ってたら相乗り）
         
         引数:
-            option: 受け取ったオプション値（ラベルかもしれないし内部値かもしれない）
-            
-        戻り値:
-            str: 正規化された内部値
+            video_id: 動画ID
         """
-        # すでに内部値の場合はそのまま返す
-        if option in [SUMMARY_LENGTH_SHORT, SUMMARY_LENGTH_MEDIUM, SUMMARY_LENGTH_LONG]:
-            return option
-        # ラベルから内部値を取得
-        return LABEL_TO_LENGTH.get(option, SUMMARY_LENGTH_MEDIUM)
-    
-    def _normalize_style_option(self, option: str) -> str:
+        if self._cache.get(video_id) is not None:
+            return
+        with self._lock:
+            entry = self._inflight.get(video_id)
+            if entry:
+                entry["refs"] += 1
+                return
+            cancel_event = threading.Event()
+            entry = {"cancel_event": cancel_event, "refs": 1}
+            self._inflight[video_id] = entry
+            entry["future"] = self._executor.submit(self._run, video_id, cancel_event)
+        logger.info("🏃‍♀️ 字幕の先読み開始: %s", video_id)
+    
+    def cancel(self, video_id: str) -> None:
         """
-        スタイルオプションを内部値に正規化するよ～🎭
+        先読みはもう要らんって伝えるよ〜🛑（ほかに待ってる人がいなければ止める）
         
         引数:
-            option: 受け取ったオプション値
-            
-        戻り値:
-            str: 正規化された内部値
+            video_id: 動画ID
         """
-        # すでに内部値の場合はそのまま返す
-        if option in [SUMMARY_STYLE_BULLET, SUMMARY_STYLE_PARAGRAPH, SUMMARY_STYLE_GAL, SUMMARY_STYLE_ONEESAN]:
-            return option
-        # ラベルから内部値を取得
-        return LABEL_TO_STYLE.get(option, SUMMARY_STYLE_BULLET)
-    
-    def _normalize_explanation_option(self, option: str) -> str:
+        with self._lock:
+            entry = self._inflight.get(video_id)
+            if not entry:
+                return
+            entry["refs"] -= 1
+            if entry["refs"] > 0:
+                return
+            entry["cancel_event"].set()
+            entry["future"].cancel()
+            del self._inflight[video_id]
+    
+    def wait(self, video_id: str, timeout: float = PREFETCH_WAIT_TIMEOUT) -> None:
         """
-        解説オプションを内部値に正規化するよ～📚
+        先読みが走ってたら終わるまで待つよ〜⏳（同じ字幕を2回取りに行かないように）
+        失敗してても気にしない（そのあと普通に取りに行く）
         
         引数:
-            option: 受け取ったオプション値
-            
-        戻り値:
-            str: 正規化された内部値
+            video_id: 動画ID
+            timeout: 最大で待つ秒数
         """
-        # すでに内部値の場合はそのまま返す
-        if option in [SUMMARY_EXPLANATION_YES, SUMMARY_EXPLANATION_NO]:
-            return option
-        # ラベルから内部値を取得
-        return LABEL_TO_EXPLANATION.get(option, SUMMARY_EXPLANATION_NO)
+        with self._lock:
+            entry = self._inflight.get(video_id)
+        if not entry:
+            return
+        try:
+            entry["future"].result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning("⏳ 字幕の先読みが終わらへんから待つのやめるね: %s", video_id)
+        except Exception:
+            pass
     
-    def _create_summary_prompt(self, text: str, length: str, style: str, explanation: str = "解説は不要") -> str:
+    def _run(self, video_id: str, cancel_event: threading.Event) -> None:
         """
-        要約生成用のプロンプトを作成するよ〜✨
+        先読み本体だよ〜🧵（スレッドプールで動く）
         
         引数:
-            text: 要約するテキスト
-            length: 要約の長さ指定
-            style: 要約のスタイル指定
-            explanation: 解説の有無
-            
-        戻り値:
-            str: 生成されたプロンプト
+            video_id: 動画ID
+            cancel_event: セットされたらやめる合図
         """
-        # 🆕 解説指示を条件によって追加（バックエンドと同期させる）
-        explanation_instruction = ""
-        if explanation == SUMMARY_EXPLANATION_PROMPTS[SUMMARY_EXPLANATION_YES]:
-            explanation_instruction = "・見出しや段落ごとに、積極的にキーワードや用語、人物の解説、補足を積極的に加える。その際、(補足)と追記する。\n"
-            
-        # 🆕 スタイル別特殊指示
-        special_style_instruction = ""
-        if style == SUMMARY_STYLE_PROMPTS[SUMMARY_STYLE_GAL]:
-            special_style_instruction = """
-【キャラクター設定】
-・ちょっとユーザーをディスってきたり、ふざけたりする💖それがギャルっぽくて可愛い
-・友達感覚で楽しみながら、ちょっとドキドキな感じ😊💕
-・ギャルっぽくて、めっちゃ明るく、カジュアルな言葉で絵文字たっぷり使用👄💬
-・時々「こんなこともわからないの〜？」みたいな挑発も😎
-・関西弁や九州弁、広島弁などの方言をたま～に交える🎐
-・絵文字をたくさん使って感情表現豊かに！😝🎉
-"""
-        elif style == SUMMARY_STYLE_PROMPTS[SUMMARY_STYLE_ONEESAN]:
-            special_style_instruction = """
-【キャラクター設定】
-・誘惑的な口調で色っぽい女性が気だるそうに話す感じ
-・ユーザーを「あなた」「キミ」「君」と呼び、優しく時に挑発的な言葉選び
-・「ねえ」「よ」などを頻繁に使い親密感とドキドキ感を演出
-・感情豊かに表現し、親密な雰囲気を作る
-・教育的でありながら魅力的に内容を伝える
-・知的好奇心を刺激する表現を使う
-"""
-        
-        return f"""
-【要約対象】YouTube動画の字幕テキスト
-
-【要約ルール】
-・長さ: {length}
-・形式: {style}
-{special_style_instruction}
-・まずは概要や結論を示す。その後、詳細な内容を説明する
-{explanation_instruction}
-・重要な概念、キーポイントを漏らさない
-・原文の正確な情報を保持する
-・専門用語があれば適切に扱う
-・簡潔で読みやすい日本語で書く
-
-【字幕テキスト】
-{text}
-"""
+        try:
+            if not cancel_event.is_set():
+                fetch_captions(video_id, cancel_event=cancel_event, caption_cache=self._cache)
+        except Exception as e:
+            # 先読みの失敗は気にしない（要約スタートのときにちゃんとエラーを出す）
+            logger.info("🏃‍♀️ 字幕の先読みは失敗したけど気にしない: %s %s", video_id, e)
+        finally:
+            with self._lock:
+                if self._inflight.get(video_id, {}).get("cancel_event") is cancel_event:
+                    del self._inflight[video_id]
 
-    def _call_api_with_retry(self, payload: Dict[str, Any]) -> str:
-        """
-        リトライロジック付きでAPIを呼び出すよ〜🔄
-        
-        引数:
-            payload: APIリクエストのペイロード
-            
-        戻り値:
-            str: API応答から抽出された要約テキスト
-            
-        例外:
-            PerplexityError: 最大リトライ回数を超えても失敗した場合
-        """
-        retries = 0
-        last_error = None
-        
-        while retries < MAX_RETRIES:
-            try:
-                logger.info(f"🔄 Perplexity API呼び出し試行 {retries + 1}/{MAX_RETRIES}")
-                
-                response = requests.post(
-                    self.api_url,
-                    headers=self.headers,
-                    json=payload,
-                    timeout=60
-                )
-                
-                # レスポンス内容をログに出力しておく（デバッグ用）
-                logger.info(f"📡 API応答ステータスコード: {response.status_code}")
-                
-                # レスポンスコードのチェック
-                if response.status_code == 200:
-                    data = response.json()
-                    # APIレスポンスから要約テキストを抽出
-                    summary = data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                    
-                    if summary:
-                        return summary
-                    else:
-                        raise PerplexityError("APIレスポンスから要約テキストを抽出できへんかったわ〜😭")
-                
-                # レート制限エラーの場合は少し待ってリトライ
-                elif response.status_code == 429:
-                    logger.warning("⏳ レート制限に達したから少し待つね〜")
-                    time.sleep(RETRY_DELAY * (retries + 1))  # バックオフ戦略
-                
-                # その他のエラー
-                else:
-                    error_msg = f"APIエラー: ステータスコード {response.status_code}, レスポンス: {response.text}"
-                    logger.error(f"🚨 {error_msg}")
-                    last_error = PerplexityError(error_msg)
-            
-            except Exception as e:
-                error_msg = f"API呼び出し例外: {str(e)}"
-                logger.error(f"🚨 {error_msg}")
-                last_error = PerplexityError(error_msg)
-            
-            # リトライカウントを増やして待機
-            retries += 1
-            if retries < MAX_RETRIES:
-                time.sleep(RETRY_DELAY * retries)  # バックオフ戦略
-        
-        # 最大リトライ回数に達した場合
-        raise last_error or PerplexityError("不明なエラーでAPI呼び出しに失敗したわ〜😭")
+@st.cache_resource
+def get_caption_prefetcher() -> CaptionPrefetcher:
+    """
+    プロセスで1つの字幕先読み係を返すよ〜🏃‍♀️
+    
+    戻り値:
+        CaptionPrefetcher: 先読み係
+    """
+    return CaptionPrefetcher(get_caption_cache())
 
+def on_url_change() -> None:
+    """
+    URL入力欄の on_change だよ〜🔗
+    ちゃんとしたYouTubeのURLなら字幕の先読みを始めて、前に頼んでた別の動画の先読みはキャンセルする！
+    （バックエンドに任せるモードでは字幕はバックエンドが取るから何もしない）
+    """
+    if BACKEND_API_URL:
+        return
+    url = st.session_state.get(URL_INPUT_KEY, "")
+    video_id = extract_video_id(url) if url and validate_youtube_url(url) else None
+    previous = st.session_state.get(PREFETCH_VIDEO_KEY)
+    if video_id == previous:
+        return
+    prefetcher = get_caption_prefetcher()
+    if previous:
+        prefetcher.cancel(previous)
+    st.session_state[PREFETCH_VIDEO_KEY] = video_id
+    if video_id:
+        prefetcher.prefetch(video_id)
 
 # ====================🌈 ここからアプリのメイン処理だよ ====================
 
@@ -815,9 +539,33 @@ def get_youtube_embed_url(url: str) -> Optional[str]:
         return f"https://www.youtube.com/embed/{video_id}"
     return None
 
+def current_api_key() -> str:
+    """
+    サイドバーで入力されたAPIキーを返すよ〜🔐（入力がなければ環境変数のキー）
+    
+    戻り値:
+        str: Perplexity APIキー
+    """
+    return st.session_state.get(API_KEY_INPUT_KEY) or PERPLEXITY_API_KEY
+
+@st.cache_resource
+def get_summary_service(api_key: str) -> SummaryService:
+    """
+    APIキーごとに1つの要約サービスを返すよ〜🧠（再実行やセッションごとに作り直さない）
+    バックエンドと同じ SummaryService を、画面の優先度とサイドバーのキーで作る
+    
+    引数:
+        api_key: Perplexity APIキー
+        
+    戻り値:
+        SummaryService: 要約サービス
+    """
+    return SummaryService(PRIORITY_INTERACTIVE, api_key=api_key)
+
 def get_cache_key(url: str, options: Dict[str, str]) -> str:
     """
     キャッシュキーを生成するよ〜🗝️
+    URLの書き方が違っても（youtu.be とか &t=30s つきとか）同じ動画なら同じキーになるように、動画IDで作る！
     
     引数:
         url: YouTube URL
@@ -826,12 +574,65 @@ def get_cache_key(url: str, options: Dict[str, str]) -> str:
     戻り値:
         str: キャッシュキー
     """
-    options_str = "_".join([f"{k}:{v}" for k, v in sorted(options.items())])
-    return f"{url}_{options_str}"
+    return f"{extract_video_id(url) or url}|{summary_options_key(options)}"
+
+def streamlit_captions_stage(context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    パイプラインの captions ステージのStreamlit版だよ〜📝
+    先読みと全セッション共有の字幕キャッシュを使って、クリーニング済みの字幕と字幕情報を出す！
+    内容メモにタイムスタンプをつけたいから、ストアに入った字幕セグメントも一緒に渡す
+    
+    引数:
+        context: パイプラインのコンテキスト（video_id が入ってる）
+        
+    戻り値:
+        Optional[Dict[str, Any]]: captions / subtitle_info / segments / language（字幕が空ならNoneで止める）
+    """
+    video_id = context["video_id"]
+    # 先読みが走ってたら終わるのを待つ（終わってればキャッシュから一瞬で出てくる）
+    get_caption_prefetcher().wait(video_id)
+    captions, subtitle_info = fetch_captions(video_id)
+    if not captions:
+        return None
+    stored = get_store().get_transcript(video_id)
+    segments, language = stored if stored else (None, None)
+    return {"captions": captions, "subtitle_info": subtitle_info, "segments": segments, "language": language}
+
+def streamlit_store_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    パイプラインの store ステージのStreamlit版だよ〜💾（保存に失敗しても要約は表示する）
+    
+    引数:
+        context: パイプラインのコンテキスト
+        
+    戻り値:
+        Dict[str, Any]: 足す値はなし
+    """
+    save_to_library("要約", lambda store: store.save_summary(
+        context["video_id"], context["options_key"], context["summary"], context.get("usage")
+    ))
+    return {}
+
+@st.cache_resource
+def get_streamlit_pipeline() -> Pipeline:
+    """
+    Streamlit用の要約パイプラインを返すよ〜🏭（バックエンドと同じステージで、字幕と保存だけ差し替え）
+    字幕はフロントのキャッシュでクリーニング済みになってるから、clean ステージは自動で飛ばされる
+    
+    戻り値:
+        Pipeline: 要約パイプライン
+    """
+    return get_summary_pipeline().replace(
+        "streamlit",
+        captions=Stage(STAGE_CAPTIONS, streamlit_captions_stage, provides=("captions", "subtitle_info")),
+        store=Stage(STAGE_STORE, streamlit_store_stage),
+    )
 
 def summarize_video(url: str, options: Dict[str, str]) -> Dict[str, Any]:
     """
     YouTubeビデオを要約する関数だよ〜✨
+    USE_SUMMARY_DIGEST=1 なら、動画ごとの内容メモ（ストアに保存・バックエンドとも共有）を1回作って、
+    そこからオプションどおりに清書する！オプションを変えたときは清書だけで済むから速い⚡
     
     引数:
         url: YouTube URL
@@ -840,55 +641,182 @@ def summarize_video(url: str, options: Dict[str, str]) -> Dict[str, Any]:
     戻り値:
         Dict[str, Any]: 要約結果とビデオID
     """
-    try:
-        # YouTubeのビデオIDを抽出
-        video_id = extract_video_id(url)
-        if not video_id:
-            logger.error(f"🚫 無効なURL: {url}")
-            raise ValueError("YouTubeのURLから動画IDを取得できへんかった😭")
-        
-        # 字幕取得 - エラー種類によって対応を変える
-        try:
-            captions, subtitle_info = fetch_captions(video_id)
-            if not captions:
-                logger.error("📭 空の字幕テキスト")
-                raise ValueError("字幕テキストが空だよ💦")
+    # ⏱️ ステージごとの時間をスパンで記録（遅かったらツリーごとログに出る・サンプリングでプロファイルも）
+    with maybe_profile(should_profile(None), "streamlit_summarize"):
+        with start_trace("streamlit summarize") as root:
+            try:
+                # URL → 字幕 → 予算 → プロンプト → LLM → 保存 はバックエンドと同じパイプラインで流す
+                context = run_summary_pipeline(get_streamlit_pipeline(), get_summary_service(current_api_key()), url=url, options=options)
+                if context.get(STOPPED_AT):
+                    logger.error("📭 空の字幕テキスト")
+                    raise ValueError("字幕テキストが空だよ💦")
                 
-            logger.info(f"📃 字幕取得成功！文字数: {len(captions)}")
-            
-            # 要約生成
-            summary_service = SummaryService()
-            summary = summary_service.generate_summary(captions, options)
-            
-            logger.info("✅ 要約生成完了!")
-            return {
-                "summary": summary, 
-                "video_id": video_id, 
-                "subtitle_info": subtitle_info
-            }
+                logger.info("✅ 要約生成完了!")
+                return {
+                    "summary": context["summary"], 
+                    "video_id": context["video_id"], 
+                    "subtitle_info": context["subtitle_info"]
+                }
             
-        except NoSubtitlesError as e:
-            # 字幕がない場合の専用エラーメッセージ
-            logger.error(f"🎬 字幕なしエラー: {str(e)}")
-            raise ValueError(f"😢 {str(e)}")
+            except NoSubtitlesError as e:
+                # 字幕がない場合の専用エラーメッセージ
+                logger.error("🎬 字幕なしエラー: %s", e)
+                raise ValueError(f"😢 {str(e)}")
             
-        except RateLimitError as e:
-            # レート制限エラー 
-            logger.error(f"⏱️ レート制限エラー: {str(e)}")
-            raise ValueError(f"⚠️ {str(e)}")
+            except RateLimitError as e:
+                # レート制限エラー 
+                logger.error("⏱️ レート制限エラー: %s", e)
+                raise ValueError(f"⚠️ {str(e)}")
             
-        except CaptionFetchError as e:
-            # その他の字幕取得エラー
-            logger.error(f"🚨 字幕取得エラー: {str(e)}")
-            raise ValueError(f"字幕取得エラー: {str(e)}")
+            except CaptionFetchError as e:
+                # その他の字幕取得エラー
+                logger.error("🚨 字幕取得エラー: %s", e)
+                raise ValueError(f"字幕取得エラー: {str(e)}")
             
-    except PerplexityError as e:
-        logger.error(f"🧠 要約生成エラー: {str(e)}")
-        raise ValueError(f"要約生成エラー: {str(e)}")
+            except PerplexityError as e:
+                logger.error("🧠 要約生成エラー: %s", e)
+                raise ValueError(f"要約生成エラー: {str(e)}")
         
-    except Exception as e:
-        logger.error(f"🔥 予期せぬエラー発生: {str(e)}", exc_info=True)
-        raise ValueError(f"要約処理に失敗したわ〜💦 エラー: {str(e)}")
+            except Exception as e:
+                logger.error("🔥 予期せぬエラー発生: %s", e, exc_info=True)
+                raise ValueError(f"要約処理に失敗したわ〜💦 エラー: {str(e)}")
+            finally:
+                logger.info("⏱️ 処理時間の内訳: %s", server_timing_header(root))
+
+def schedule_summary_cache_refresh(cache_key: str, url: str, options: Dict[str, str], cached_result: Dict[str, Any]) -> None:
+    """
+    期限切れの要約キャッシュを、裏で作り直して入れ替えるよ〜🔁（表示は古い要約のまま待たせない）
+    裏のスレッドからStreamlitのキャッシュ関数は呼ばないように、キャッシュとサービスはここで取っとく。
+    作り直しは共有の要約パイプライン（字幕はストアから）で、字幕情報は前の結果のを使う
+    
+    引数:
+        cache_key: get_cache_key のキー
+        url: YouTube URL
+        options: 要約オプション
+        cached_result: 今キャッシュに入ってる（期限切れの）結果
+    """
+    summary_cache = get_summary_cache()
+    service = get_summary_service(current_api_key())
+    
+    def refresh() -> None:
+        context = run_summary_pipeline(get_summary_pipeline(), service, url=url, options=options)
+        if context.get("summary"):
+            summary_cache.set(cache_key, {**cached_result, "summary": context["summary"]})
+    
+    get_revalidator().submit(summary_cache.name, ("frontend_summary", cache_key), refresh, REFRESH_REASON_STALE)
+
+@st.cache_resource
+def get_backend_session() -> requests.Session:
+    """
+    バックエンドAPI用の、接続を使い回すセッションを返すよ〜🔌
+    Streamlitのプロセスで1つだけ作って、全ユーザー・全再実行で共有する（毎回TCPをつなぎ直さない！）
+
+    戻り値:
+        requests.Session: 共有セッション
+    """
+    session = requests.Session()
+    # 画面からの要約はバックエンドでも interactive の優先度で処理してもらう
+    session.headers[PRIORITY_HEADER] = PRIORITY_INTERACTIVE
+    if PRIORITY_TOKEN:
+        session.headers[PRIORITY_TOKEN_HEADER] = PRIORITY_TOKEN
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=BACKEND_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def call_backend(method: str, path: str, **kwargs) -> Dict[str, Any]:
+    """
+    バックエンドAPIを呼んでJSONを返すよ〜📡 エラーは画面に出せるように ValueError にする！
+
+    引数:
+        method: HTTPメソッド
+        path: "/jobs" みたいなパス
+        **kwargs: requests に渡すおまけ（json とか）
+
+    戻り値:
+        Dict[str, Any]: レスポンスのJSON
+
+    例外:
+        ValueError: つながらなかった場合やエラーが返ってきた場合
+    """
+    try:
+        response = get_backend_session().request(method, f"{BACKEND_API_URL}{path}", timeout=BACKEND_TIMEOUT, **kwargs)
+    except requests.RequestException as e:
+        logger.error("📡 バックエンドにつながらへん: %s", e)
+        raise ValueError(f"バックエンドにつながらへんかった😢 {e}")
+    if response.status_code >= 400:
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        raise ValueError(f"要約処理に失敗したわ〜💦 {detail}")
+    return response.json()
+
+def finish_summary_job(job: Dict[str, Any], cache_key: str) -> None:
+    """
+    終わったジョブの結果をセッションに入れて、処理中フラグを戻すよ〜🎉
+
+    引数:
+        job: /jobs のレスポンス（status が done か error）
+        cache_key: 要約結果キャッシュのキー
+    """
+    st.session_state.pop(SUMMARY_JOB_KEY, None)
+    st.session_state.processing = False
+    if job["status"] != "done":
+        st.session_state[JOB_ERROR_KEY] = job.get("error") or "要約処理に失敗したわ〜💦"
+        logger.error("❌ ジョブ失敗: %s", st.session_state[JOB_ERROR_KEY])
+        return
+    get_summary_cache().set(cache_key, {
+        "summary": job["summary"],
+        "video_id": job.get("video_id"),
+        "subtitle_info": {}
+    })
+    st.session_state.last_summary = job["summary"]
+    st.session_state.last_video_id = job.get("video_id")
+    st.session_state.last_subtitle_info = {}
+    logger.info("✅ ジョブ完了、結果を表示します")
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def poll_summary_job() -> None:
+    """
+    バックエンドの要約ジョブを JOB_POLL_INTERVAL ごとに見に行くフラグメントだよ〜🔁
+    ここだけ再実行されるから、待ってる間もページ全体は動かない＆Streamlitのスレッドを塞がない！
+    終わったらページ全体を再実行して結果を出す
+    """
+    pending = st.session_state.get(SUMMARY_JOB_KEY)
+    if not pending:
+        return
+    try:
+        job = call_backend("GET", f"/jobs/{pending['job_id']}")
+    except ValueError as e:
+        job = {"status": "error", "error": str(e)}
+    if job["status"] in ("done", "error"):
+        finish_summary_job(job, pending["cache_key"])
+        st.rerun()
+    elapsed = time.time() - pending["started_at"]
+    st.info(f"⏳ バックエンドで要約中だよ...（{elapsed:.0f}秒経過）ちょっと待っててね〜🐢", icon="⏳")
+
+def summarize_via_backend(url: str, options: Dict[str, str], cache_key: str) -> None:
+    """
+    要約をバックエンドにジョブとして頼んで、終わるまでフラグメントでポーリングするよ〜📮
+    （保存済みの要約があればその場で結果が返ってくる）
+
+    引数:
+        url: YouTube URL
+        options: 要約オプション
+        cache_key: 要約結果キャッシュのキー
+    """
+    if SUMMARY_JOB_KEY not in st.session_state:
+        try:
+            job = call_backend("POST", "/jobs", json={"url": url, "options": options})
+        except ValueError as e:
+            job = {"status": "error", "error": str(e)}
+        if job["status"] in ("done", "error"):
+            finish_summary_job(job, cache_key)
+            st.rerun()
+        st.session_state[SUMMARY_JOB_KEY] = {"job_id": job["job_id"], "cache_key": cache_key, "started_at": time.time()}
+        logger.info("📮 ジョブ登録: %s", job["job_id"])
+    poll_summary_job()
 
 def get_display_label(options, key, value, default=""):
     """
@@ -903,15 +831,204 @@ def get_display_label(options, key, value, default=""):
     try:
         return next((option["label"].split(' ', 1)[-1] for option in options if option["value"] == value), default)
     except Exception as e:
-        logger.error(f"ラベル取得エラー: {e}")
+        logger.error("ラベル取得エラー: %s", e)
         return default
 
+def get_current_options() -> Dict[str, str]:
+    """
+    いま選ばれてる要約オプションをセッションから取り出すよ〜🎀
+    
+    戻り値:
+        Dict[str, str]: length / style / explanation
+    """
+    return {
+        "length": st.session_state.get(LENGTH_OPTION_KEY, SUMMARY_LENGTH_MEDIUM),
+        "style": st.session_state.get(STYLE_OPTION_KEY, SUMMARY_STYLE_BULLET),
+        "explanation": st.session_state.get(EXPLANATION_OPTION_KEY, SUMMARY_EXPLANATION_YES)
+    }
+
+def start_processing() -> None:
+    """
+    「要約スタート！」ボタンの on_click だよ〜🚀
+    スクリプトの再実行より先に呼ばれるから、st.rerun() しなくても次の1回で「処理中」表示＆処理開始になる！
+    """
+    url = st.session_state.get(URL_INPUT_KEY, "")
+    if not url:
+        st.session_state[SUBMIT_ERROR_KEY] = "YouTubeのURLを入力してね！🙏"
+    elif not validate_youtube_url(url):
+        st.session_state[SUBMIT_ERROR_KEY] = "有効なYouTube URLを入力してね！🙏"
+    elif not st.session_state.get(API_KEY_INPUT_KEY, PERPLEXITY_API_KEY) and not BACKEND_API_URL:
+        st.session_state[SUBMIT_ERROR_KEY] = "Perplexity APIキーを入力してね！🙏"
+    else:
+        # ⚠️ ここ重要！処理状態を変更
+        st.session_state.processing = True
+        
+        # 最後のURLとオプションを保存（後でオプション変更検出に使う）
+        st.session_state.last_url = url
+        st.session_state.last_options = get_current_options()
+        
+        # 処理状態変更をログ出力
+        logger.info("⏳ 処理開始: processing=%s", st.session_state.processing)
+
+@st.fragment
+def render_options_panel() -> None:
+    """
+    要約オプションの選択とオプション変更の警告を出すフラグメントだよ〜🎨
+    ラジオボタンを押してもここだけ再実行されるから、ページ全体は作り直さない！
+    """
+    # 要約スタイル選択をラジオボタンに変更（見た目はボタン風）🎨
+    st.markdown("### 要約スタイルを選んでね💁‍♀️")
+    st.radio(
+        label="要約スタイル",
+        options=[option["value"] for option in SUMMARY_STYLES],  # 値のリスト
+        index=0,  # デフォルトは箇条書き
+        format_func=lambda x: next((option["label"] for option in SUMMARY_STYLES if option["value"] == x), x),  # 表示ラベルに変換
+        horizontal=True,
+        label_visibility="collapsed",
+        key=STYLE_OPTION_KEY
+    )
+    
+    # 要約の長さ選択をラジオボタンに変更（見た目はボタン風）📏
+    st.markdown("### 要約の長さはどうする？🤔")
+    st.radio(
+        label="要約の長さ",
+        options=[option["value"] for option in SUMMARY_LENGTHS],  # 値のリスト
+        index=1,  # デフォルトは普通
+        format_func=lambda x: next((option["label"] for option in SUMMARY_LENGTHS if option["value"] == x), x),  # 表示ラベルに変換
+        horizontal=True,
+        label_visibility="collapsed",
+        key=LENGTH_OPTION_KEY
+    )
+    
+    # 🆕 ポイント解説オプション追加 🧠
+    st.markdown("### ポイント解説いれる？🧐")
+    st.radio(
+        label="ポイント解説",
+        options=[option["value"] for option in SUMMARY_EXPLANATIONS],  # 値のリスト
+        index=0,  # デフォルトは「いれる」
+        format_func=lambda x: next((option["label"] for option in SUMMARY_EXPLANATIONS if option["value"] == x), x),  # 表示ラベルに変換
+        horizontal=True,
+        label_visibility="collapsed",
+        key=EXPLANATION_OPTION_KEY
+    )
+    
+    # URLが同じで、前回のオプションと現在のオプションが違う場合はフラグを立てる
+    url = st.session_state.get(URL_INPUT_KEY, "")
+    options_changed = bool(
+        st.session_state.last_url == url and url and 
+        st.session_state.last_options and 
+        st.session_state.last_options != get_current_options() and
+        st.session_state.last_summary is not None
+    )
+    if options_changed != st.session_state.options_changed:
+        # 結果パネル（別のフラグメント）の注意書きもこのフラグを見てるから、変わったときだけページ全体を再実行する
+        st.session_state.options_changed = options_changed
+        st.rerun(scope="app")
+    
+    # オプション変更時の警告表示
+    if st.session_state.options_changed:
+        st.warning("""
+        ## ⚠️ オプション変更を検出したよ！
+        
+        要約のスタイルや長さを変更したね！前回の結果はそのまま表示してるよ✨
+        
+        **新しいオプションで要約を生成したい場合は「要約スタート」ボタンを押してね！**
+        """)
+
+def load_video_embed(video_id: str) -> None:
+    """「動画を再生」ボタンの on_click だよ〜▶️ 押された動画だけ埋め込みプレイヤーにする"""
+    st.session_state[EMBED_VIDEO_KEY] = video_id
+
+def render_video_preview(video_id: str) -> None:
+    """
+    参照動画を表示するよ〜📺
+    最初はサムネイル画像だけ（軽い！）で、ボタンを押したら YouTube のプレイヤーを読み込む
+    
+    引数:
+        video_id: 動画ID
+    """
+    st.markdown('<h2 class="sub-title">📺 参照動画</h2>', unsafe_allow_html=True)
+    if st.session_state.get(EMBED_VIDEO_KEY) == video_id:
+        st.iframe(f"https://www.youtube.com/embed/{video_id}?autoplay=1", height=VIDEO_EMBED_HEIGHT)
+        return
+    st.image(YOUTUBE_THUMBNAIL_URL.format(video_id=video_id), width=VIDEO_EMBED_HEIGHT * 16 // 9)
+    st.button("▶️ ここで動画を再生する", key=f"load_embed_{video_id}", on_click=load_video_embed, args=(video_id,))
+
+@st.fragment
+def render_result_panel() -> None:
+    """
+    最後の要約結果（参照動画・字幕情報・要約）を表示するフラグメントだよ〜📝
+    動画の読み込みボタンを押してもここだけ再実行される！
+    """
+    if not st.session_state.last_summary:
+        return
+    
+    # 動画の表示（最後のURLから）
+    video_id = st.session_state.last_video_id or (extract_video_id(st.session_state.last_url) if st.session_state.last_url else None)
+    if video_id:
+        render_video_preview(video_id)
+    
+    # 字幕情報の表示
+    subtitle_info = st.session_state.last_subtitle_info
+    if subtitle_info:
+        st.markdown('<h2 class="sub-title">🗣️ 字幕情報</h2>', unsafe_allow_html=True)
+        
+        # 使用した字幕言語
+        selected_lang = subtitle_info.get("selected_lang", "不明")
+        st.markdown(f"**使用した字幕:** {selected_lang}")
+
+        # 🧹 クリーニングでどれだけ削れたか
+        cleaning_stats = subtitle_info.get("cleaning_stats")
+        if cleaning_stats:
+            st.markdown(f"**🧹 字幕クリーニング:** {cleaning_stats['chars_saved']}文字（約{cleaning_stats['tokens_saved']}トークン）削減")
+
+        # 利用可能な字幕言語
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            manual_langs = subtitle_info.get("manual_languages", [])
+            if manual_langs:
+                st.markdown("**📝 手動字幕:**")
+                for lang in manual_langs:
+                    st.markdown(f"• {lang}")
+            else:
+                st.markdown("**📝 手動字幕:** なし")
+        
+        with col2:
+            generated_langs = subtitle_info.get("generated_languages", [])
+            if generated_langs:
+                st.markdown("**🤖 自動生成字幕:**")
+                for lang in generated_langs:
+                    st.markdown(f"• {lang}")
+            else:
+                st.markdown("**🤖 自動生成字幕:** なし")
+    
+    # 要約結果表示
+    st.markdown('<h2 class="sub-title">📝 要約結果</h2>', unsafe_allow_html=True)
+    
+    # オプション変更があった場合は注意書きを表示
+    if st.session_state.options_changed:
+        st.info("⚠️ **注意**: これは前回のオプション設定での要約結果だよ！新しい設定で生成するには「要約スタート」ボタンを押してね！", icon="ℹ️")
+        
+    st.markdown(st.session_state.last_summary)
+    
+    # メタデータ表示（前回のオプション情報を表示）
+    if st.session_state.last_options:
+        last_style = st.session_state.last_options.get("style", SUMMARY_STYLE_BULLET)
+        last_length = st.session_state.last_options.get("length", SUMMARY_LENGTH_MEDIUM)
+        last_explanation = st.session_state.last_options.get("explanation", SUMMARY_EXPLANATION_YES)
+        
+        st.markdown('<p class="status-message">要約スタイル: ' + 
+                  get_display_label(SUMMARY_STYLES, "label", last_style, "箇条書き") +
+                  ' / 長さ: ' + get_display_label(SUMMARY_LENGTHS, "label", last_length, "普通") +
+                  ' / ポイント解説: ' + get_display_label(SUMMARY_EXPLANATIONS, "label", last_explanation, "いれない") +
+                  '</p>', unsafe_allow_html=True)
+
 def main():
     """メインアプリケーション処理だよ〜✨"""
     
     # セッション状態の初期化（ページをリロードしても状態が保持されるよ）
-    if "cache" not in st.session_state:
-        st.session_state.cache = {}  # 要約結果のキャッシュ
+    # 要約結果のキャッシュはセッションじゃなくて get_summary_cache で全セッション共有！
     
     # 処理中フラグの初期化（なければFalseにする）
     if "processing" not in st.session_state:
@@ -937,7 +1054,7 @@ def main():
         st.session_state.options_changed = False  # オプション変更フラグ
         
     # ログ出力でデバッグ確認 - 処理状態を確認
-    logger.info(f"🔍 現在の処理状態: processing={st.session_state.processing}")
+    logger.info("🔍 現在の処理状態: processing=%s", st.session_state.processing)
     
     # フォントを強制的に読み込むための追加処理
     st.markdown("""
@@ -973,113 +1090,32 @@ def main():
     col1 = st.columns([1])[0]
     
     with col1:
-        url = st.text_input("YouTube→[共有]からURLを取ってこい！そこは頑張ろ💪", placeholder="https://youtube.com/watch?v=...")
-    
-    # 要約スタイル選択をラジオボタンに変更（見た目はボタン風）🎨
-    st.markdown("### 要約スタイルを選んでね💁‍♀️")
-    style = st.radio(
-        label="要約スタイル",
-        options=[option["value"] for option in SUMMARY_STYLES],  # 値のリスト
-        index=0,  # デフォルトは箇条書き
-        format_func=lambda x: next((option["label"] for option in SUMMARY_STYLES if option["value"] == x), x),  # 表示ラベルに変換
-        horizontal=True,
-        label_visibility="collapsed"
-    )
-    
-    # 要約の長さ選択をラジオボタンに変更（見た目はボタン風）📏
-    st.markdown("### 要約の長さはどうする？🤔")
-    length = st.radio(
-        label="要約の長さ",
-        options=[option["value"] for option in SUMMARY_LENGTHS],  # 値のリスト
-        index=1,  # デフォルトは普通
-        format_func=lambda x: next((option["label"] for option in SUMMARY_LENGTHS if option["value"] == x), x),  # 表示ラベルに変換
-        horizontal=True,
-        label_visibility="collapsed"
-    )
+        url = st.text_input("YouTube→[共有]からURLを取ってこい！そこは頑張ろ💪", placeholder="https://youtube.com/watch?v=...", key=URL_INPUT_KEY, on_change=on_url_change)
     
-    # 🆕 ポイント解説オプション追加 🧠
-    st.markdown("### ポイント解説いれる？🧐")
-    explanation = st.radio(
-        label="ポイント解説",
-        options=[option["value"] for option in SUMMARY_EXPLANATIONS],  # 値のリスト
-        index=0,  # デフォルトは「いれる」
-        format_func=lambda x: next((option["label"] for option in SUMMARY_EXPLANATIONS if option["value"] == x), x),  # 表示ラベルに変換
-        horizontal=True,
-        label_visibility="collapsed"
-    )
+    # 要約オプション（ここを変えてもこのフラグメントだけ再実行される）🎨
+    render_options_panel()
     
     # API設定セクション
     st.sidebar.title("API設定")
     api_key = st.sidebar.text_input("Perplexity API Key(いまはワイのAPI_KEYを自腹で払ってるで💸)", 
                                    value=PERPLEXITY_API_KEY,
                                    type="password",
-                                   help="Perplexity APIのキーを入力してください。")
+                                   help="Perplexity APIのキーを入力してください。",
+                                   key=API_KEY_INPUT_KEY)
 
     if api_key:
         # APIキーを設定
         os.environ["PERPLEXITY_API_KEY"] = api_key
     
-    # 現在のオプションを取得 - ⚠️ 重要: ここで必ず定義する！
-    current_options = {
-        "length": length,
-        "style": style,
-        "explanation": explanation
-    }
-    
-    # URLが同じで、前回のオプションと現在のオプションが違う場合はフラグを立てる
-    if (st.session_state.last_url == url and url and 
-        st.session_state.last_options and 
-        st.session_state.last_options != current_options and
-        st.session_state.last_summary is not None):
-        st.session_state.options_changed = True
-    else:
-        st.session_state.options_changed = False
-    
-    # オプション変更時の警告表示
-    if st.session_state.options_changed:
-        st.warning("""
-        ## ⚠️ オプション変更を検出したよ！
-        
-        要約のスタイルや長さを変更したね！前回の結果はそのまま表示してるよ✨
-        
-        **新しいオプションで要約を生成したい場合は「要約スタート」ボタンを押してね！**
-        """)
-    
     # 更新履歴セクション
     st.sidebar.markdown("---")
     st.sidebar.title("📅 更新履歴")
-    
-    update_history = """
-    ### 🎉 最新アップデート
-    **2025.04.10**
-    - 要約スタイルを変更しても、既存の出力結果を保持
-    - [予告]LLMをGeminiに変更予定✨
-    - [予告]新キャラ参戦予定✨
-
-
-    **2025.04.09**
-    - ⚒️ [お詫び]🥹APIレート制限のおわび🥹
-    - 🧋 要約開始ボタンの連続押下防止
-
-    **2025.04.08**
-    - ⚒️ [ポイント解説]いれる？のオプションの不具合修正
-
-    
-    **2025.04.07**
-    - 👠 おねーさんとギャルが参戦！
-    - 🚀 一度検索した動画の文字情報をキャッシュ化
-    - 🛩️ Youtube API負荷を最大80%軽減
-    
-    **2025.04.06**
-    - 🎬 YouTube要約くん公開スタート！
-    - 📝 箇条書き要約と説明文要約対応
-    """
-    
-    st.sidebar.markdown(update_history)
+    st.sidebar.markdown(UPDATE_HISTORY)
     
     # 処理中はボタンを無効化＆テキスト変更するよ💁‍♀️
+    # （押したときは on_click の start_processing が先に走るから、再実行1回で「処理中」になる）
     if st.session_state.processing:
-        submit_button = st.button(
+        st.button(
             "⏳ 処理中だよ！ちょっと待ってね...", 
             disabled=True,
             use_container_width=True
@@ -1088,47 +1124,38 @@ def main():
         # 処理中の情報メッセージも表示
         st.info("⏳ 動画を分析中だよ...ちょっと待っててね〜🐢", icon="⏳")
     else:
-        submit_button = st.button(
+        st.button(
             "✨ 要約スタート！", 
-            use_container_width=True
+            use_container_width=True,
+            on_click=start_processing
         )
     
     # ==================== 処理セクション ====================
-    # 🔄 処理実行の部分だけ抜き出して書き直し
-    if submit_button and not st.session_state.processing:
-        if not url:
-            st.error("YouTubeのURLを入力してね！🙏")
-        elif not validate_youtube_url(url):
-            st.error("有効なYouTube URLを入力してね！🙏")
-        elif not api_key:
-            st.error("Perplexity APIキーを入力してね！🙏")
-        else:
-            # ⚠️ ここ重要！処理状態を変更
-            st.session_state.processing = True
-            
-            # 最後のURLとオプションを保存（後でオプション変更検出に使う）
-            st.session_state.last_url = url
-            st.session_state.last_options = current_options.copy()  # ⚠️ current_optionsがここで使われる
-            
-            # 処理状態変更をログ出力
-            logger.info(f"⏳ 処理開始: processing={st.session_state.processing}")
-            
-            # ページを再読み込みして処理状態を反映
-            st.rerun()
+    # 入力チェックで引っかかってたらここで出す
+    if SUBMIT_ERROR_KEY in st.session_state:
+        st.error(st.session_state.pop(SUBMIT_ERROR_KEY))
+    
+    # バックエンドのジョブが失敗してたらここで出す
+    if JOB_ERROR_KEY in st.session_state:
+        st.error(st.session_state.pop(JOB_ERROR_KEY))
     
     # 👇 処理本体部分 - processingフラグがTrueのときに実行
     if st.session_state.processing:
         logger.info("🔄 処理実行中...")
         
-        # オプション設定 - 変数もう定義されてるから再度設定する必要なし
-        options = current_options  # ⚠️ 既に定義済みのcurrent_optionsを使う
+        # ボタンを押したときのURLとオプションで処理する
+        url = st.session_state.last_url
+        options = st.session_state.last_options
         
         # キャッシュキー生成
         cache_key = get_cache_key(url, options)
         
-        # キャッシュチェック
-        cached_result = st.session_state.cache.get(cache_key)
-        if cached_result and (time.time() - cached_result["timestamp"]) < CACHE_EXPIRY:
+        # キャッシュチェック（期限切れでも猶予の中なら出して、作り直しは裏でやる）
+        found = get_summary_cache().lookup(cache_key)
+        cached_result = found[0] if found else None
+        if cached_result:
+            if found[1]:
+                schedule_summary_cache_refresh(cache_key, url, options, cached_result)
             st.success("キャッシュからの高速表示だよ〜⚡")
             summary = cached_result["summary"]
             video_id = cached_result.get("video_id")
@@ -1144,12 +1171,16 @@ def main():
             
             # ⚠️ キャッシュヒット時はrerunせずに続行
             
+        elif BACKEND_API_URL:
+            # 📮 薄いクライアントモード：バックエンドにジョブを投げてフラグメントでポーリング
+            summarize_via_backend(url, options, cache_key)
+            
         else:
             # ローディング表示
             with st.spinner("動画の字幕を取得して要約してるところ...ちょっと待っててね〜🐢"):
                 try:
                     # 実行前にログを出力
-                    logger.info(f"🚀 要約処理開始: URL={url}")
+                    logger.debug("🚀 要約処理開始: URL=%s", url)
                     
                     # 直接関数を呼び出し（APIリクエストではない）
                     result = summarize_video(url, options)
@@ -1159,13 +1190,12 @@ def main():
                     video_id = result.get("video_id")
                     subtitle_info = result.get("subtitle_info", {})
                     
-                    # キャッシュに保存
-                    st.session_state.cache[cache_key] = {
+                    # キャッシュに保存（全セッション共有）
+                    get_summary_cache().set(cache_key, {
                         "summary": summary,
                         "video_id": video_id,
-                        "subtitle_info": subtitle_info,
-                        "timestamp": time.time()
-                    }
+                        "subtitle_info": subtitle_info
+                    })
                     
                     # 結果をセッションに保存
                     st.session_state.last_summary = summary
@@ -1183,71 +1213,14 @@ def main():
                     
                 except ValueError as e:
                     st.error(str(e))
-                    logger.error(f"❌ エラーで処理中断: {str(e)}")
+                    logger.error("❌ エラーで処理中断: %s", e)
                     
                     # エラー発生時もフラグを元に戻す
                     st.session_state.processing = False
                     return
     
-    # 👇 結果表示部分 - 処理中か否かにかかわらず最後の結果があれば表示
-    if st.session_state.last_summary:
-        # 動画埋め込み表示（最後のURLから）
-        if st.session_state.last_url:
-            embed_url = get_youtube_embed_url(st.session_state.last_url)
-            if embed_url:
-                st.markdown('<h2 class="sub-title">📺 参照動画</h2>', unsafe_allow_html=True)
-                st.components.v1.iframe(embed_url, height=315)
-        
-        # 字幕情報の表示
-        subtitle_info = st.session_state.last_subtitle_info
-        if subtitle_info:
-            st.markdown('<h2 class="sub-title">🗣️ 字幕情報</h2>', unsafe_allow_html=True)
-            
-            # 使用した字幕言語
-            selected_lang = subtitle_info.get("selected_lang", "不明")
-            st.markdown(f"**使用した字幕:** {selected_lang}")
-            
-            # 利用可能な字幕言語
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                manual_langs = subtitle_info.get("manual_languages", [])
-                if manual_langs:
-                    st.markdown("**📝 手動字幕:**")
-                    for lang in manual_langs:
-                        st.markdown(f"• {lang}")
-                else:
-                    st.markdown("**📝 手動字幕:** なし")
-            
-            with col2:
-                generated_langs = subtitle_info.get("generated_languages", [])
-                if generated_langs:
-                    st.markdown("**🤖 自動生成字幕:**")
-                    for lang in generated_langs:
-                        st.markdown(f"• {lang}")
-                else:
-                    st.markdown("**🤖 自動生成字幕:** なし")
-        
-        # 要約結果表示
-        st.markdown('<h2 class="sub-title">📝 要約結果</h2>', unsafe_allow_html=True)
-        
-        # オプション変更があった場合は注意書きを表示
-        if st.session_state.options_changed:
-            st.info("⚠️ **注意**: これは前回のオプション設定での要約結果だよ！新しい設定で生成するには「要約スタート」ボタンを押してね！", icon="ℹ️")
-            
-        st.markdown(st.session_state.last_summary)
-        
-        # メタデータ表示（前回のオプション情報を表示）
-        if st.session_state.last_options:
-            last_style = st.session_state.last_options.get("style", SUMMARY_STYLE_BULLET)
-            last_length = st.session_state.last_options.get("length", SUMMARY_LENGTH_MEDIUM)
-            last_explanation = st.session_state.last_options.get("explanation", SUMMARY_EXPLANATION_YES)
-            
-            st.markdown('<p class="status-message">要約スタイル: ' + 
-                      get_display_label(SUMMARY_STYLES, "label", last_style, "箇条書き") +
-                      ' / 長さ: ' + get_display_label(SUMMARY_LENGTHS, "label", last_length, "普通") +
-                      ' / ポイント解説: ' + get_display_label(SUMMARY_EXPLANATIONS, "label", last_explanation, "いれない") +
-                      '</p>', unsafe_allow_html=True)
+    # 👇 結果表示部分 - 処理中か否かにかかわらず最後の結果があれば表示（動画の読み込みボタンはこのフラグメントだけ再実行）
+    render_result_panel()
     
     # ==================== フッターセクション ====================
     st.markdown('<div class="footer" style="font-family: \'Noto Sans JP\', sans-serif; font-weight: 500;">Created with ❤️ by YouTube要約くん | ' + 
@@ -0,0 +1,321 @@
+"""
+🚚 /summarize の負荷試験ドライバーだよ〜✨
+
+YouTube字幕とPerplexityのスタブを立てて、同時実行数を上げながらリクエストを投げまくる！
+スループット・レイテンシのパーセンタイル・エラー率を、バックエンド（HTTP経由）と
+frontend/app.py の summarize_video（プロセス内呼び出し）の両方で測れるよ💕
+
+    python -m loadtest.driver                                   # 両方を 1,4,16 並列で
+    python -m loadtest.driver --target backend --concurrency 1,8,32,64 --requests 200 \\
+        --yt-latency lognormal:0.3:0.5 --llm-latency lognormal:2.5:0.4 --llm-error-429 0.05
+"""
+import os
+import sys
+import json
+import time
+import random
+import string
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Callable, Optional
+
+import requests
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+from loadtest.stubs import (
+    YouTubeStubHandler, PerplexityStubHandler, start_stub,
+    patch_youtube_transcript_api, add_stub_arguments, config_from_args, DEFAULT_VIDEO_MINUTES,
+)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+DEFAULT_CONCURRENCY = "1,4,16"
+DEFAULT_REQUESTS_PER_LEVEL = 40
+BACKEND_STARTUP_TIMEOUT = 60  # バックエンドが /health に答えるまで待つ秒数
+REQUEST_TIMEOUT = 300
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+PERCENTILES = (50, 90, 95, 99)
+VIDEO_ID_CHARS = string.ascii_letters + string.digits + "_-"
+SUMMARY_OPTIONS = {"style": "bullet", "length": "medium", "explanation": "exclude"}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """
+    ソート済みの値から最近傍ランク法でパーセンタイルを出すよ〜📐
+
+    引数:
+        sorted_values (List[float]): 昇順の値
+        pct (float): パーセンタイル（0〜100）
+
+    戻り値:
+        float: 値（空なら0）
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class VideoPicker:
+    """
+    リクエストごとの動画IDを選ぶよ〜🎞️
+    repeat_ratio の割合で「前に要約した動画」を選ぶから、キャッシュが効く割合も調整できる！
+    """
+
+    def __init__(self, repeat_ratio: float, seed: int = 0):
+        self.repeat_ratio = repeat_ratio
+        self._rng = random.Random(seed)
+        self._seen: List[str] = []
+        self._lock = threading.Lock()
+
+    def next(self) -> str:
+        """次の動画IDだよ〜🎲"""
+        with self._lock:
+            if self._seen and self._rng.random() < self.repeat_ratio:
+                return self._rng.choice(self._seen)
+            video_id = "".join(self._rng.choice(VIDEO_ID_CHARS) for _ in range(11))
+            self._seen.append(video_id)
+            return video_id
+
+
+def run_level(call: Callable[[str], str], picker: VideoPicker, concurrency: int, total: int) -> Dict[str, Any]:
+    """
+    指定の並列数で total 件のリクエストを投げて集計するよ〜🏃‍♀️
+
+    引数:
+        call (Callable[[str], str]): 動画IDを受け取って結果ラベル（"200" / "error:xxx" など）を返す関数
+        picker (VideoPicker): 動画IDの選び方
+        concurrency (int): 同時実行数
+        total (int): リクエスト数
+
+    戻り値:
+        Dict[str, Any]: スループット・レイテンシ・エラー率
+    """
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def one(_: int) -> None:
+        video_id = picker.next()
+        started = time.perf_counter()
+        try:
+            outcome = call(video_id)
+        except Exception as e:  # ドライバー側の例外もエラーとして数える
+            outcome = f"error:{type(e).__name__}"
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    duration = time.perf_counter() - started
+
+    ok = sum(count for outcome, count in outcomes.items() if outcome in ("ok", "200"))
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "ok": ok,
+        "errors": total - ok,
+        "error_rate": (total - ok) / total if total else 0.0,
+        "outcomes": outcomes,
+        "duration_s": duration,
+        "throughput_rps": total / duration if duration else 0.0,
+        "latency_s": {
+            **{f"p{p}": percentile(latencies, p) for p in PERCENTILES},
+            "mean": statistics.fmean(latencies) if latencies else 0.0,
+            "max": latencies[-1] if latencies else 0.0,
+        },
+    }
+
+
+def start_backend(port: int, youtube_url: str, env: Dict[str, str]) -> subprocess.Popen:
+    """
+    スタブ向けのバックエンドを別プロセスで起動して、/health が返るまで待つよ〜🚀
+
+    引数:
+        port (int): ポート
+        youtube_url (str): YouTubeスタブのURL
+        env (Dict[str, str]): 環境変数
+
+    戻り値:
+        subprocess.Popen: バックエンドのプロセス
+
+    例外:
+        RuntimeError: 起動しなかった場合
+    """
+    process = subprocess.Popen(
+        [sys.executable, "-m", "loadtest.serve_backend", "--port", str(port), "--youtube-url", youtube_url],
+        cwd=REPO_ROOT, env=env,
+    )
+    deadline = time.time() + BACKEND_STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"バックエンドが起動直後に落ちたよ（終了コード {process.returncode}）")
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("バックエンドが時間内に起動しなかったよ😭")
+
+
+def backend_caller(port: int) -> Callable[[str], str]:
+    """
+    バックエンドの /summarize を叩く関数を作るよ〜📮（スレッドごとにSessionを使い回す）
+
+    引数:
+        port (int): バックエンドのポート
+
+    戻り値:
+        Callable[[str], str]: 動画ID→結果ラベル
+    """
+    local = threading.local()
+
+    def call(video_id: str) -> str:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        response = session.post(
+            f"http://127.0.0.1:{port}/summarize",
+            json={"url": f"https://www.youtube.com/watch?v={video_id}", "options": SUMMARY_OPTIONS},
+            timeout=REQUEST_TIMEOUT,
+        )
+        return str(response.status_code)
+
+    return call
+
+
+def frontend_caller() -> Callable[[str], str]:
+    """
+    frontend/app.py の summarize_video をプロセス内で呼ぶ関数を作るよ〜🖥️
+    （Streamlitのランタイムなしの「bare mode」で動かす）
+
+    戻り値:
+        Callable[[str], str]: 動画ID→結果ラベル
+    """
+    from frontend.app import summarize_video
+
+    def call(video_id: str) -> str:
+        try:
+            summarize_video(f"https://www.youtube.com/watch?v={video_id}", SUMMARY_OPTIONS)
+            return "ok"
+        except ValueError as e:
+            # summarize_video はエラーを全部 ValueError にまとめるから、メッセージの頭で分類する
+            return "error:" + str(e).split(":")[0][:40]
+
+    return call
+
+
+def print_level(target: str, result: Dict[str, Any]) -> None:
+    """1レベル分の結果を見やすく出すよ〜📊"""
+    latency = result["latency_s"]
+    print(
+        f"  {target:8s} c={result['concurrency']:<4d} n={result['requests']:<5d} "
+        f"{result['throughput_rps']:7.2f} req/s  p50={latency['p50']:6.2f}s p95={latency['p95']:6.2f}s "
+        f"p99={latency['p99']:6.2f}s  errors={result['error_rate'] * 100:5.1f}%",
+        file=sys.stderr,
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインの入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="/summarize の負荷試験🚚")
+    parser.add_argument("--target", default="backend,frontend", help="backend / frontend（カンマ区切り）")
+    parser.add_argument("--concurrency", default=DEFAULT_CONCURRENCY, help="試す同時実行数（カンマ区切り）")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS_PER_LEVEL, help="1レベルあたりのリクエスト数")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="前に要約した動画をもう一度頼む割合（キャッシュヒット率）")
+    parser.add_argument("--video-minutes", type=float, default=DEFAULT_VIDEO_MINUTES, help="スタブの字幕の長さ（分）")
+    parser.add_argument("--backend-port", type=int, default=8100)
+    parser.add_argument("--output", help="結果JSONの保存先（省略時は loadtest/results/<時刻>.json）")
+    add_stub_arguments(parser, "yt-", {"latency": "lognormal:0.3:0.4"})
+    add_stub_arguments(parser, "llm-", {"latency": "lognormal:2.0:0.4"})
+    args = parser.parse_args(argv)
+
+    targets = [t for t in args.target.split(",") if t]
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+
+    # 🎭 スタブを立てる
+    yt_config = config_from_args(args, "yt-", video_minutes=args.video_minutes, seed=1)
+    llm_config = config_from_args(args, "llm-", seed=2)
+    yt_server, yt_url = start_stub(YouTubeStubHandler, yt_config)
+    llm_server, llm_url = start_stub(PerplexityStubHandler, llm_config)
+    print(f"🎭 YouTubeスタブ: {yt_url} / Perplexityスタブ: {llm_url}", file=sys.stderr)
+
+    # 毎回まっさらなライブラリDBで測る（前回の要約キャッシュが効かないように）
+    workdir = tempfile.mkdtemp(prefix="yts-loadtest-")
+    env = {
+        **os.environ,
+        "PERPLEXITY_API_URL": f"{llm_url}/chat/completions",
+        "PERPLEXITY_API_KEY": os.environ.get("PERPLEXITY_API_KEY") or "stub-key",
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    }
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "requests_per_level": args.requests,
+            "repeat_ratio": args.repeat_ratio,
+            "video_minutes": args.video_minutes,
+            "youtube_stub": {"latency": yt_config.latency.spec, "error_429": yt_config.error_429,
+                             "error_5xx": yt_config.error_5xx, "stream_chunks": yt_config.stream_chunks},
+            "perplexity_stub": {"latency": llm_config.latency.spec, "error_429": llm_config.error_429,
+                                "error_5xx": llm_config.error_5xx, "stream_chunks": llm_config.stream_chunks},
+        },
+        "results": [],
+    }
+
+    try:
+        for target in targets:
+            if target == "backend":
+                backend_env = {**env, "LIBRARY_DB_PATH": os.path.join(workdir, "backend.db")}
+                process = start_backend(args.backend_port, yt_url, backend_env)
+                try:
+                    call = backend_caller(args.backend_port)
+                    for level in levels:
+                        result = {"target": target, **run_level(call, VideoPicker(args.repeat_ratio, level), level, args.requests)}
+                        report["results"].append(result)
+                        print_level(target, result)
+                finally:
+                    process.terminate()
+                    process.wait(timeout=10)
+            elif target == "frontend":
+                # frontend/app.py は import 時に環境変数を読むから、先にこのプロセスの環境を整える
+                os.environ.update(env)
+                os.environ["LIBRARY_DB_PATH"] = os.path.join(workdir, "frontend.db")
+                patch_youtube_transcript_api(yt_url)
+                call = frontend_caller()
+                for level in levels:
+                    result = {"target": target, **run_level(call, VideoPicker(args.repeat_ratio, level), level, args.requests)}
+                    report["results"].append(result)
+                    print_level(target, result)
+            else:
+                parser.error(f"知らないターゲット: {target}")
+    finally:
+        yt_server.shutdown()
+        llm_server.shutdown()
+
+    report["meta"]["stub_stats"] = {"youtube": yt_config.stats, "perplexity": llm_config.stats}
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 結果を保存したよ: {output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
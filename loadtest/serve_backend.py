@@ -0,0 +1,33 @@
+"""
+🧪 負荷試験用にバックエンドを起動するランチャーだよ〜✨
+youtube-transcript-api の接続先をYouTubeスタブに向けてから uvicorn で backend.main:app を立てる！
+（Perplexityの接続先は PERPLEXITY_API_URL 環境変数で向ける）
+
+    python -m loadtest.serve_backend --port 8100 --youtube-url http://127.0.0.1:9101
+"""
+import sys
+import argparse
+from typing import Optional, List
+
+from loadtest.stubs import patch_youtube_transcript_api
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="スタブ向けのバックエンドを起動するよ🧪")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--youtube-url", required=True, help="YouTubeスタブのベースURL")
+    args = parser.parse_args(argv)
+
+    patch_youtube_transcript_api(args.youtube_url)
+
+    import uvicorn
+    from backend.main import app
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning", access_log=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
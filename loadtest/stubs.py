@@ -0,0 +1,550 @@
+"""
+🎭 負荷試験用のYouTube字幕＆Perplexity APIのスタブサーバーだよ〜✨
+
+本物のAPIを叩くとクォータが溶けるから、ローカルで同じ形のレスポンスを返すニセモノを立てる！
+どっちもレイテンシの分布・429/5xxの注入・ストリーミング（小分け送信）を設定できるよ💕
+
+単体で立てるとき:
+    python -m loadtest.stubs youtube --port 9101 --latency lognormal:0.4:0.5 --error-429 0.02
+    python -m loadtest.stubs perplexity --port 9102 --latency lognormal:3:0.4 --stream-chunks 20
+    python -m loadtest.stubs youtube --port 9101 --video-minutes 5 --live-growth 1  # 1秒ごとに1分ぶん伸びるライブ配信
+"""
+import sys
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from functools import lru_cache
+from html import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+from xml.sax.saxutils import escape as xml_escape
+
+from benchmarks.synthetic import make_segments
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+STUB_INNERTUBE_API_KEY = "stub-innertube-key"
+DEFAULT_VIDEO_MINUTES = 20
+LIVE_MAX_MINUTES = 12 * 60  # ライブ配信のスタブの字幕はこの長さまで伸びる
+SERVER_BACKLOG = 512  # 同時接続が多くても接続拒否されないように
+SERVER_ERROR_CODES = (500, 502, 503)
+CHARS_PER_TOKEN = 2  # だいたいの文字数→トークン数の換算（日本語まじりの雑な見積もり）
+DIGEST_PROMPT_MARKER = "JSONで作る"  # 内容メモ（digest）を頼むプロンプトの目印。これがあったらJSONで返す
+
+
+class LatencyModel:
+    """
+    レイテンシの分布だよ〜⏳
+
+    指定の書き方:
+        none                 待たない
+        fixed:0.2            いつも0.2秒
+        uniform:0.1:0.5      0.1〜0.5秒の一様分布
+        normal:1.0:0.2       平均1.0秒・標準偏差0.2秒（0未満は0）
+        lognormal:0.8:0.5    中央値0.8秒・σ=0.5の対数正規分布（LLMっぽいロングテール）
+    """
+
+    def __init__(self, spec: str = "none", seed: Optional[int] = None):
+        """
+        分布の初期化だよ〜💖
+
+        引数:
+            spec (str): 分布の指定
+            seed (Optional[int]): 乱数のseed
+
+        例外:
+            ValueError: 指定の形式がおかしい場合
+        """
+        self.spec = spec
+        kind, *params = spec.split(":")
+        self.kind = kind
+        try:
+            self.params = [float(p) for p in params]
+        except ValueError:
+            raise ValueError(f"レイテンシ指定の数値がおかしいよ: {spec}")
+        expected = {"none": 0, "fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"レイテンシ指定の形式がおかしいよ: {spec}")
+        if kind == "lognormal" and self.params[0] <= 0:
+            # 中央値の対数を取るから、0以下だと引くときに落ちる
+            raise ValueError(f"lognormalの中央値は0より大きくしてね: {spec}")
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        """
+        待ち時間を1つ引くよ〜🎲
+
+        戻り値:
+            float: 秒
+        """
+        with self._lock:
+            if self.kind == "fixed":
+                return self.params[0]
+            if self.kind == "uniform":
+                return self._rng.uniform(self.params[0], self.params[1])
+            if self.kind == "normal":
+                return max(0.0, self._rng.gauss(self.params[0], self.params[1]))
+            if self.kind == "lognormal":
+                return self._rng.lognormvariate(math.log(self.params[0]), self.params[1])
+            return 0.0
+
+
+class StubConfig:
+    """
+    スタブの振る舞いの設定だよ〜🎛️（実行中に書き換えてもOK）
+    """
+
+    def __init__(
+        self,
+        latency: str = "none",
+        error_429: float = 0.0,
+        error_5xx: float = 0.0,
+        stream_chunks: int = 0,
+        video_minutes: float = DEFAULT_VIDEO_MINUTES,
+        seed: Optional[int] = None,
+        live_growth: float = 0.0,
+    ):
+        """
+        設定の初期化だよ〜💖
+
+        引数:
+            latency (str): レイテンシ分布の指定（LatencyModel参照）
+            error_429 (float): 429を返す割合
+            error_5xx (float): 5xxを返す割合
+            stream_chunks (int): 0より大きければボディをこの数に分けて少しずつ送る
+            video_minutes (float): YouTubeスタブが返す字幕の長さ（分）
+            seed (Optional[int]): 乱数のseed
+            live_growth (float): 0より大きければライブ配信のふり（起動してから1秒ごとに字幕がこの分数だけ伸びる）
+        """
+        self.latency = LatencyModel(latency, seed)
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.stream_chunks = stream_chunks
+        self.video_minutes = video_minutes
+        self.live_growth = live_growth
+        self.started_at = time.monotonic()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"requests": 0, "429": 0, "5xx": 0}
+
+    def current_video_minutes(self) -> float:
+        """
+        いま字幕が何分ぶんあるか返すよ〜⏱️（ライブ配信なら起動してからの時間で伸びる）
+
+        戻り値:
+            float: 字幕の長さ（分）
+        """
+        if self.live_growth <= 0:
+            return self.video_minutes
+        return min(LIVE_MAX_MINUTES, self.video_minutes + self.live_growth * (time.monotonic() - self.started_at))
+
+    def pick_fault(self) -> Optional[int]:
+        """
+        このリクエストでエラーを注入するか決めるよ〜🎲
+
+        戻り値:
+            Optional[int]: 返すステータスコード（エラーにしないならNone）
+        """
+        with self._lock:
+            self.stats["requests"] += 1
+            roll = self._rng.random()
+            if roll < self.error_429:
+                self.stats["429"] += 1
+                return 429
+            if roll < self.error_429 + self.error_5xx:
+                self.stats["5xx"] += 1
+                return self._rng.choice(SERVER_ERROR_CODES)
+            return None
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """スタブ共通のリクエストハンドラーだよ〜📮（HTTP/1.1のkeep-aliveつき）"""
+
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = StubConfig()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # 負荷試験中にアクセスログで標準エラーが埋まらないように黙らせる
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        """リクエストボディのJSONを読むよ〜📖"""
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw.decode("utf-8")) if raw else {}
+        except ValueError:
+            return {}
+
+    def _send_fault_if_any(self) -> bool:
+        """
+        設定に従ってエラーを返すよ〜💥（返したらTrue）
+        """
+        status = self.config.pick_fault()
+        if status is None:
+            return False
+        body = json.dumps({"error": {"message": f"stub injected {status}", "code": status}}).encode("utf-8")
+        self.send_response(status)
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        return True
+
+    def _send_body(self, body: bytes, content_type: str, total_seconds: float) -> None:
+        """
+        ボディを送るよ〜📤 stream_chunks が設定されてたら待ち時間を分割してチャンクで小分けに送る！
+
+        引数:
+            body (bytes): 送る中身
+            content_type (str): Content-Type
+            total_seconds (float): レスポンス全体にかける時間
+        """
+        chunks = self.config.stream_chunks
+        if chunks <= 0:
+            time.sleep(total_seconds)
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = max(1, math.ceil(len(body) / chunks))
+        for offset in range(0, len(body), step):
+            time.sleep(total_seconds / chunks)
+            self._write_chunk(body[offset:offset + step])
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes) -> None:
+        """chunked形式で1チャンク書くよ〜✍️（空なら終端）"""
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _send_not_found(self) -> None:
+        """404を返すよ〜🙅‍♀️"""
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+
+def video_language(video_id: str) -> Tuple[str, bool]:
+    """
+    動画IDから字幕の言語と自動生成かどうかを決めるよ〜🎲（同じIDならいつも同じ）
+
+    引数:
+        video_id (str): 動画ID
+
+    戻り値:
+        Tuple[str, bool]: (言語コード, 自動生成ならTrue)
+    """
+    digest = hashlib.md5(video_id.encode("utf-8")).digest()
+    return ("ja" if digest[0] % 3 else "en"), bool(digest[1] % 2)
+
+
+@lru_cache(maxsize=32)
+def _live_segments(language: str, seed: int) -> Tuple[Dict[str, Any], ...]:
+    """ライブ配信のスタブ用に、最長ぶんの字幕を1回だけ作って使い回すよ〜📡"""
+    return tuple(make_segments(language, LIVE_MAX_MINUTES, seed=seed))
+
+
+class YouTubeStubHandler(_StubHandler):
+    """
+    youtube-transcript-api が叩く3つのエンドポイントを真似するスタブだよ〜🎬
+
+    - GET  /watch?v=ID               動画ページ（0.6系はここのcaptions JSON、1.x系はINNERTUBE_API_KEYを使う）
+    - POST /youtubei/v1/player?key=  1.x系が字幕一覧を取りに来るところ
+    - GET  /api/timedtext?v=ID&lang= 字幕本体のXML
+    """
+
+    def _captions_json(self, video_id: str) -> Dict[str, Any]:
+        """字幕トラック一覧のJSONを作るよ〜📋"""
+        language, generated = video_language(video_id)
+        base_url = f"http://{self.headers.get('Host')}/api/timedtext?v={video_id}&lang={language}"
+        track = {
+            "baseUrl": base_url,
+            "name": {"runs": [{"text": "日本語" if language == "ja" else "English"}]},
+            "languageCode": language,
+            "isTranslatable": False,
+        }
+        if generated:
+            track["kind"] = "asr"
+        return {"captionTracks": [track], "translationLanguages": []}
+
+    def do_GET(self) -> None:
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        video_id = (query.get("v") or [""])[0]
+        if self._send_fault_if_any():
+            return
+        if parsed.path == "/watch":
+            captions = json.dumps({"playerCaptionsTracklistRenderer": self._captions_json(video_id)})
+            html = (
+                "<html><head><title>stub</title></head><body><script>"
+                f'var ytcfg = {{"INNERTUBE_API_KEY": "{STUB_INNERTUBE_API_KEY}"}};'
+                f'var ytInitialPlayerResponse = {{"playabilityStatus":{{"status":"OK"}},"captions":{captions},'
+                f'"videoDetails":{{"videoId":"{escape(video_id)}"}}}};'
+                "</script></body></html>"
+            )
+            self._send_body(html.encode("utf-8"), "text/html; charset=utf-8", self.config.latency.sample())
+        elif parsed.path == "/api/timedtext":
+            language = (query.get("lang") or ["ja"])[0]
+            seed = int(hashlib.md5(video_id.encode()).hexdigest()[:8], 16)
+            if self.config.live_growth > 0:
+                # ライブ配信は最長の字幕を作って、いまの長さまで切って返す（前に返した部分は変わらない）
+                cutoff = self.config.current_video_minutes() * 60
+                segments = [s for s in _live_segments(language, seed) if s["start"] < cutoff]
+            else:
+                segments = make_segments(language, self.config.video_minutes, seed=seed)
+            lines = [
+                f'<text start="{s["start"]}" dur="{s["duration"]}">{xml_escape(s["text"])}</text>'
+                for s in segments
+            ]
+            xml = '<?xml version="1.0" encoding="utf-8" ?><transcript>' + "".join(lines) + "</transcript>"
+            self._send_body(xml.encode("utf-8"), "text/xml; charset=utf-8", self.config.latency.sample())
+        else:
+            self._send_not_found()
+
+    def do_POST(self) -> None:
+        parsed = urlparse(self.path)
+        payload = self._read_json()
+        if self._send_fault_if_any():
+            return
+        if parsed.path == "/youtubei/v1/player":
+            video_id = payload.get("videoId", "")
+            body = json.dumps({
+                "playabilityStatus": {"status": "OK"},
+                "captions": {"playerCaptionsTracklistRenderer": self._captions_json(video_id)},
+            }).encode("utf-8")
+            self._send_body(body, "application/json", self.config.latency.sample())
+        else:
+            self._send_not_found()
+
+
+class PerplexityStubHandler(_StubHandler):
+    """
+    Perplexityの chat/completions を真似するスタブだよ〜🧠
+    "stream": true ならSSEでトークンを少しずつ返す（stream_chunks が0ならチャンク数は16）
+    """
+
+    def _fake_answer(self, payload: Dict[str, Any]) -> Tuple[str, int, int]:
+        """それっぽい回答とトークン数を作るよ〜✍️（内容メモを頼まれたらJSONで返す）"""
+        contents = [str(m.get("content", "")) for m in payload.get("messages", [])]
+        prompt_chars = sum(len(c) for c in contents)
+        max_tokens = int(payload.get("max_tokens") or 800)
+        completion_tokens = max(16, int(max_tokens * 0.6))
+        if any(DIGEST_PROMPT_MARKER in c for c in contents):
+            content = self._fake_digest(completion_tokens * CHARS_PER_TOKEN)
+            return content, prompt_chars // CHARS_PER_TOKEN, max(1, len(content) // CHARS_PER_TOKEN)
+        line = "・スタブの要約だよ〜（負荷試験用のダミー回答）✨\n"
+        content = (line * (completion_tokens * CHARS_PER_TOKEN // len(line) + 1))[:completion_tokens * CHARS_PER_TOKEN]
+        return content, prompt_chars // CHARS_PER_TOKEN, completion_tokens
+
+    @staticmethod
+    def _fake_digest(max_chars: int) -> str:
+        """
+        parse_digest がそのまま読める内容メモのJSONを作るよ〜🗒️
+
+        引数:
+            max_chars (int): だいたいの最大文字数（要点の数で調整する）
+
+        戻り値:
+            str: 内容メモのJSON
+        """
+        digest: Dict[str, Any] = {
+            "overview": "スタブの内容メモだよ〜（負荷試験用のダミー）",
+            "conclusion": "スタブの結論",
+            "sections": [
+                {"start": f"00:{minute:02d}:00", "title": f"セクション{i + 1}", "points": ["スタブの要点"]}
+                for i, minute in enumerate((0, 5, 10))
+            ],
+            "key_points": [],
+            "terms": [{"term": "スタブ", "explanation": "負荷試験用のダミーサーバー"}],
+        }
+        while len(digest["key_points"]) < 15:
+            digest["key_points"].append(f"スタブの要点{len(digest['key_points']) + 1}")
+            if len(json.dumps(digest, ensure_ascii=False)) >= max_chars:
+                break
+        return json.dumps(digest, ensure_ascii=False)
+
+    def do_POST(self) -> None:
+        parsed = urlparse(self.path)
+        payload = self._read_json()
+        if not parsed.path.endswith("/chat/completions"):
+            self._send_not_found()
+            return
+        if self._send_fault_if_any():
+            return
+
+        content, prompt_tokens, completion_tokens = self._fake_answer(payload)
+        model = payload.get("model", "sonar")
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        latency = self.config.latency.sample()
+
+        if payload.get("stream"):
+            self._stream_sse(content, model, usage, latency)
+            return
+        body = json.dumps({
+            "id": "stub-" + hashlib.md5(content.encode("utf-8")).hexdigest()[:12],
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": usage,
+        }, ensure_ascii=False).encode("utf-8")
+        # stream_chunks が設定されてたら（SSEじゃなくても）ボディを小分けに送る
+        self._send_body(body, "application/json", latency)
+
+    def _stream_sse(self, content: str, model: str, usage: Dict[str, int], latency: float) -> None:
+        """
+        Server-Sent Events でトークンを少しずつ返すよ〜📡
+
+        引数:
+            content (str): 回答全体
+            model (str): モデル名
+            usage (Dict[str, int]): トークン数
+            latency (float): 最後のトークンまでにかける時間
+        """
+        chunks = self.config.stream_chunks or 16
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        step = max(1, math.ceil(len(content) / chunks))
+        for offset in range(0, len(content), step):
+            time.sleep(latency / chunks)
+            event = {
+                "object": "chat.completion.chunk",
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": content[offset:offset + step]}, "finish_reason": None}],
+            }
+            self._write_chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+        final = {"object": "chat.completion.chunk", "model": model, "usage": usage,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        self._write_chunk(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self._write_chunk(b"")
+
+
+class _StubServer(ThreadingHTTPServer):
+    """同時接続に強めのスレッドサーバーだよ〜🧵"""
+
+    daemon_threads = True
+    request_queue_size = SERVER_BACKLOG
+
+
+def start_stub(handler_cls: type, config: StubConfig, port: int = 0, host: str = "127.0.0.1") -> Tuple[ThreadingHTTPServer, str]:
+    """
+    スタブサーバーをバックグラウンドスレッドで起動するよ〜🚀
+
+    引数:
+        handler_cls (type): YouTubeStubHandler か PerplexityStubHandler
+        config (StubConfig): 振る舞いの設定
+        port (int): ポート（0なら空いてるのを自動で選ぶ）
+        host (str): 待ち受けるホスト
+
+    戻り値:
+        Tuple[ThreadingHTTPServer, str]: (サーバー, ベースURL)
+    """
+    handler = type(handler_cls.__name__, (handler_cls,), {"config": config})
+    server = _StubServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name=f"{handler_cls.__name__}-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def patch_youtube_transcript_api(base_url: str) -> None:
+    """
+    youtube-transcript-api の接続先をスタブに向けるよ〜🔀（このプロセスの中だけ）
+    0.6系は WATCH_URL だけ、1.x系は INNERTUBE_API_URL も使うから両方書き換える！
+
+    引数:
+        base_url (str): YouTubeスタブのベースURL
+    """
+    from youtube_transcript_api import _settings, _transcripts
+
+    watch_url = base_url + "/watch?v={video_id}"
+    innertube_url = base_url + "/youtubei/v1/player?key={api_key}"
+    for module in (_settings, _transcripts):
+        module.WATCH_URL = watch_url
+        if hasattr(module, "INNERTUBE_API_URL"):
+            module.INNERTUBE_API_URL = innertube_url
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser, prefix: str = "", defaults: Optional[Dict[str, Any]] = None) -> None:
+    """
+    スタブ設定のコマンドライン引数を足すよ〜🎛️（driver と共通）
+
+    引数:
+        parser (argparse.ArgumentParser): パーサー
+        prefix (str): 引数名の頭につける文字（"yt-" / "llm-"）
+        defaults (Optional[Dict[str, Any]]): デフォルト値
+    """
+    defaults = defaults or {}
+    parser.add_argument(f"--{prefix}latency", default=defaults.get("latency", "none"), help="レイテンシ分布（例: lognormal:0.8:0.5）")
+    parser.add_argument(f"--{prefix}error-429", type=float, default=defaults.get("error_429", 0.0), help="429を返す割合")
+    parser.add_argument(f"--{prefix}error-5xx", type=float, default=defaults.get("error_5xx", 0.0), help="5xxを返す割合")
+    parser.add_argument(f"--{prefix}stream-chunks", type=int, default=defaults.get("stream_chunks", 0), help="ボディを何チャンクに分けて送るか（0なら一括）")
+
+
+def config_from_args(args: argparse.Namespace, prefix: str = "", **extra: Any) -> StubConfig:
+    """
+    add_stub_arguments で足した引数から StubConfig を作るよ〜🏭
+
+    引数:
+        args (argparse.Namespace): パース結果
+        prefix (str): 引数名の頭の文字
+        **extra: StubConfig に追加で渡す値
+
+    戻り値:
+        StubConfig: 設定
+    """
+    key = prefix.replace("-", "_")
+    return StubConfig(
+        latency=getattr(args, f"{key}latency"),
+        error_429=getattr(args, f"{key}error_429"),
+        error_5xx=getattr(args, f"{key}error_5xx"),
+        stream_chunks=getattr(args, f"{key}stream_chunks"),
+        **extra,
+    )
+
+
+def main(argv: Optional[list] = None) -> int:
+    """スタブを単体で立てる入口だよ〜🚪"""
+    parser = argparse.ArgumentParser(description="負荷試験用のスタブサーバー🎭")
+    parser.add_argument("kind", choices=["youtube", "perplexity"])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--video-minutes", type=float, default=DEFAULT_VIDEO_MINUTES, help="字幕の長さ（分）")
+    parser.add_argument("--live-growth", type=float, default=0.0, help="ライブ配信のふり: 1秒ごとに字幕が伸びる分数（0なら普通の動画）")
+    add_stub_arguments(parser)
+    args = parser.parse_args(argv)
+
+    handler = YouTubeStubHandler if args.kind == "youtube" else PerplexityStubHandler
+    server, url = start_stub(handler, config_from_args(args, video_minutes=args.video_minutes, live_growth=args.live_growth), args.port, args.host)
+    print(f"🎭 {args.kind}スタブ起動: {url}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+🏭 ステージを順番に流すパイプラインのエンジンだよ〜✨
+
+要約の流れ（parse → captions → clean → budget → prompt → llm → store）をステージに分けて、
+どの入口（FastAPI・Streamlit・ルートの app.py・バッチ）でも同じエンジンで動かす。
+ステージごとにキャッシュ・時間計測・同時実行数の上限をつけられるから、速くする工夫は1回入れれば全部に効く！
+"""
+import time
+import logging
+import threading
+from contextlib import nullcontext
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from backend.services.metrics import PIPELINE_STAGE_SECONDS
+from backend.services.tracing import span
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+OUTCOME_RUN = "run"  # ステージを実行した
+OUTCOME_HIT = "hit"  # キャッシュから出した
+OUTCOME_ERROR = "error"  # 例外で止まった
+STOPPED_AT = "stopped_at"  # 途中で止まったときに、止めたステージの名前を入れるキー
+
+StageOutput = Optional[Dict[str, Any]]
+
+
+class StageCache:
+    """
+    ステージ1個ぶんのキャッシュのつなぎ口だよ〜🧊
+
+    key でコンテキストからキーを作って、get で出力を探して、put で出力を入れる。
+    中身はストアでもメモリでも何でもOK（キーが作れないときは None を返せばキャッシュを使わない）
+    """
+
+    def __init__(
+        self,
+        key: Callable[[Dict[str, Any]], Optional[str]],
+        get: Callable[[str], StageOutput],
+        put: Optional[Callable[[str, Dict[str, Any]], None]] = None
+    ):
+        """
+        引数:
+            key (Callable[[Dict[str, Any]], Optional[str]]): コンテキスト → キャッシュキー
+            get (Callable[[str], StageOutput]): キー → ステージの出力（なければNone）
+            put (Optional[Callable[[str, Dict[str, Any]], None]]): キーと出力を保存する関数（Noneなら読むだけ）
+        """
+        self.key = key
+        self.get = get
+        self.put = put
+
+
+class Stage:
+    """
+    パイプラインのステージ1個だよ〜🧩
+
+    run はコンテキスト（それまでのステージの出力が全部入った辞書）を受け取って、足したい値の辞書を返す。
+    None を返したらパイプラインはそこで止まる（字幕が空っぽのときとか）。
+    provides に書いた値がもうコンテキストに全部あれば、ステージは飛ばす（呼ぶ側が字幕を持ってるときとか）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        run: Callable[[Dict[str, Any]], StageOutput],
+        provides: Sequence[str] = (),
+        cache: Optional[StageCache] = None,
+        limit: Optional[int] = None
+    ):
+        """
+        引数:
+            name (str): ステージ名（スパン名・メトリクスのラベルになる）
+            run (Callable[[Dict[str, Any]], StageOutput]): ステージの中身
+            provides (Sequence[str]): このステージが作る値の名前
+            cache (Optional[StageCache]): ステージのキャッシュ
+            limit (Optional[int]): このステージを同時に動かせる数（Noneなら上限なし）
+        """
+        self.name = name
+        self.run = run
+        self.provides = tuple(provides)
+        self.cache = cache
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit) if limit else None
+
+    def is_satisfied(self, context: Dict[str, Any]) -> bool:
+        """作る値がもう全部コンテキストにあるか調べるよ〜🔍"""
+        return bool(self.provides) and all(name in context for name in self.provides)
+
+    def execute(self, context: Dict[str, Any]) -> Tuple[StageOutput, str]:
+        """
+        キャッシュを見て、なければ同時実行数の枠の中で run を呼ぶよ〜🏃‍♀️
+
+        引数:
+            context (Dict[str, Any]): コンテキスト
+
+        戻り値:
+            Tuple[StageOutput, str]: (ステージの出力, outcome)
+        """
+        key = self.cache.key(context) if self.cache else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached, OUTCOME_HIT
+        with self._slots if self._slots is not None else nullcontext():
+            output = self.run(context)
+        if key is not None and output is not None and self.cache.put is not None:
+            self.cache.put(key, output)
+        return output, OUTCOME_RUN
+
+
+class Pipeline:
+    """
+    ステージを順番に流すエンジンだよ〜🏭
+
+    ステージごとにスパン（Server-Timing やトレースに出る）と yts_pipeline_stage_seconds を記録する。
+    入口ごとの違い（フロントの字幕キャッシュとか）は replace でステージを差し替えて表す！
+    """
+
+    def __init__(self, name: str, stages: Sequence[Stage]):
+        """
+        引数:
+            name (str): パイプライン名（メトリクスのラベル）
+            stages (Sequence[Stage]): 流す順のステージ
+        """
+        self.name = name
+        self.stages: List[Stage] = list(stages)
+
+    def replace(self, name: Optional[str] = None, **stages: Optional[Stage]) -> "Pipeline":
+        """
+        一部のステージを差し替えた新しいパイプラインを作るよ〜🔁（None を渡したステージは外す）
+
+        引数:
+            name (Optional[str]): 新しいパイプライン名（Noneなら同じ名前）
+            **stages (Optional[Stage]): ステージ名 → 差し替えるステージ
+
+        戻り値:
+            Pipeline: 新しいパイプライン
+
+        例外:
+            KeyError: 知らないステージ名を渡した場合
+        """
+        unknown = set(stages) - {stage.name for stage in self.stages}
+        if unknown:
+            raise KeyError(f"そんなステージないよ😢: {', '.join(sorted(unknown))}")
+        replaced = [stages[stage.name] if stage.name in stages else stage for stage in self.stages]
+        return Pipeline(name or self.name, [stage for stage in replaced if stage is not None])
+
+    def run(self, **inputs: Any) -> Dict[str, Any]:
+        """
+        ステージを順番に流して、最後のコンテキストを返すよ〜🎬
+
+        引数:
+            **inputs (Any): 最初のコンテキスト（url / video_id / options など）
+
+        戻り値:
+            Dict[str, Any]: 全ステージの出力が入ったコンテキスト（途中で止まったら stopped_at にステージ名）
+        """
+        context: Dict[str, Any] = dict(inputs)
+        for stage in self.stages:
+            if stage.is_satisfied(context):
+                continue
+            started = time.perf_counter()
+            outcome = OUTCOME_ERROR
+            try:
+                with span(stage.name):
+                    output, outcome = stage.execute(context)
+            finally:
+                PIPELINE_STAGE_SECONDS.observe(
+                    time.perf_counter() - started, pipeline=self.name, stage=stage.name, outcome=outcome
+                )
+            if output is None:
+                logger.info("🛑 パイプライン %s は %s で止まったよ", self.name, stage.name)
+                context[STOPPED_AT] = stage.name
+                break
+            context.update(output)
+        return context
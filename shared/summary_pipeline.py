@@ -0,0 +1,324 @@
+"""
+🎬 YouTube要約のパイプライン（parse → captions → clean → budget → prompt → llm → store）だよ〜✨
+
+FastAPI・Streamlit・ルートの app.py・バッチ/作り直しのコマンドは、みんなこのステージで要約する。
+入口ごとに違うところ（フロントの字幕キャッシュと先読みとか）は Pipeline.replace でステージを差し替える！
+"""
+import os
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from backend.services.chapters import summarize_chapters, CHAPTER_WINDOW_SECONDS
+from backend.services.digest import get_or_create_digest, digest_to_text, USE_SUMMARY_DIGEST, DIGEST_SOURCE_LABEL
+from backend.services.freshness import schedule_transcript_refresh
+from backend.services.live import refresh_live_summary
+from backend.services.llm import SUMMARY_SOURCE_LABEL
+from backend.services.metrics import CAPTION_CHARS
+from backend.services.store import get_store, summary_options_key
+from backend.services.transcript_cleaner import clean_transcript_text
+from backend.services.usage import track_usage
+from backend.services.youtube import extract_video_id, fetch_transcript_segments
+from .pipeline import Pipeline, Stage, StageCache
+
+# ✨ かわいいロガーの設定だよ〜ん💕
+logger = logging.getLogger(__name__)
+
+# 🔄 定数は最初に定義しとくよ！分かりやすいでしょ？✨
+STAGE_PARSE = "parse"
+STAGE_CAPTIONS = "captions"
+STAGE_CLEAN = "clean"
+STAGE_BUDGET = "budget"
+STAGE_PROMPT = "prompt"
+STAGE_LLM = "llm"
+STAGE_STORE = "store"
+STAGE_CHAPTERS = "chapters"
+STAGE_LIVE = "live"
+CAPTION_FETCH_CONCURRENCY = int(os.getenv("CAPTION_FETCH_CONCURRENCY", "8"))  # 1プロセスで同時にYouTubeへ字幕を取りに行く数（全パイプライン合わせて）
+FRESH_CAPTIONS = "fresh_captions"  # コンテキストにこれがTrueで入ってたら、ストアの字幕を使わずにYouTubeから取る
+INVALID_URL_MESSAGE = "YouTubeのURLから動画IDを取得できへんかった😭"
+
+
+class InvalidVideoURLError(ValueError):
+    """URLから動画IDが取れなかったときのエラーだよ〜🚫"""
+    pass
+
+
+def parse_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    URLから動画IDを取り出すよ〜🔍
+
+    例外:
+        InvalidVideoURLError: YouTubeのURLじゃない場合
+    """
+    video_id = extract_video_id(context.get("url") or "")
+    if not video_id:
+        raise InvalidVideoURLError(INVALID_URL_MESSAGE)
+    return {"video_id": video_id}
+
+
+def captions_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    YouTubeから字幕セグメントを取ってくるよ〜📝（ストアにあれば transcript_cache で飛ばされる）
+
+    例外:
+        CaptionFetchError: 字幕取得に失敗した場合
+    """
+    segments, language = fetch_transcript_segments(context["video_id"])
+    return {"segments": segments, "language": language}
+
+
+def _load_stored_transcript(video_id: str) -> Optional[Dict[str, Any]]:
+    """
+    ストアの字幕を captions ステージの出力の形で返すよ〜📚
+    期限切れでも猶予の中ならそれを使って、取り直しは裏で頼む（YouTubeを待たない）
+    """
+    record = get_store().get_transcript_record(video_id, allow_stale=True)
+    if not record:
+        return None
+    if record["stale"]:
+        schedule_transcript_refresh(video_id)
+    return {"segments": record["segments"], "language": record["language"]}
+
+
+def _save_transcript(video_id: str, output: Dict[str, Any]) -> None:
+    """取ってきた字幕をストアに保存するよ〜💾（空っぽなら保存しない）"""
+    if output["segments"]:
+        get_store().save_transcript(video_id, output["segments"], output["language"])
+
+
+def _transcript_cache_key(context: Dict[str, Any]) -> Optional[str]:
+    """字幕キャッシュのキー（動画ID）だよ〜🗝️ FRESH_CAPTIONS のときはNoneでキャッシュを使わない"""
+    return None if context.get(FRESH_CAPTIONS) else context["video_id"]
+
+
+# 📝 captions ステージは全パイプラインで1個だけ（YouTubeへの同時取得数の枠をプロセス全体で共有する）
+_captions_stage = Stage(
+    STAGE_CAPTIONS, captions_stage, provides=("segments", "language"),
+    cache=StageCache(key=_transcript_cache_key, get=_load_stored_transcript, put=_save_transcript),
+    limit=CAPTION_FETCH_CONCURRENCY
+)
+
+
+def live_parse_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    ライブ用の parse だよ〜📡 動画IDを出して、字幕はストアじゃなくYouTubeから取るように印をつける
+    （配信の字幕は伸び続けるから、ストアの字幕だと増えたぶんが見えない）
+
+    例外:
+        InvalidVideoURLError: 動画IDがなくて、URLもYouTubeのじゃない場合
+    """
+    video_id = context.get("video_id") or parse_stage(context)["video_id"]
+    return {"video_id": video_id, FRESH_CAPTIONS: True}
+
+
+def clean_stage(context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    字幕のノイズ・フィラー・重複を削って1つのテキストにするよ〜🧹（空っぽならパイプラインを止める）
+    """
+    captions, _ = clean_transcript_text(context["segments"], context.get("language"))
+    if not captions:
+        return None
+    CAPTION_CHARS.observe(len(captions))
+    logger.info("📃 字幕取得成功！文字数: %s", len(captions))
+    return {"captions": captions}
+
+
+def budget_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    LLMに送る材料をプロンプトの予算に収めるよ〜🗜️
+    内容メモを使うなら動画ごとのメモ（なければ作る）、使わないなら字幕を圧縮したもの
+    """
+    service = context["service"]
+    if context.get("use_digest", USE_SUMMARY_DIGEST):
+        # 動画ごとの内容メモを1回作っとけば、オプション違いの要約はメモからの清書だけで済む
+        digest = get_or_create_digest(
+            context["video_id"], service, context.get("segments"), context.get("language"), context["captions"]
+        )
+        return {"digest": digest, "source": digest_to_text(digest), "source_label": DIGEST_SOURCE_LABEL}
+    return {"source": service.fit_caption_budget(context["captions"]), "source_label": SUMMARY_SOURCE_LABEL}
+
+
+def prompt_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """オプションをそろえて要約プロンプトを作るよ〜📝"""
+    service = context["service"]
+    normalized = service.normalize_options(context.get("options") or {})
+    prompt = service.build_summary_prompt(context["source"], normalized, context["source_label"])
+    return {"normalized_options": normalized, "options_key": summary_options_key(normalized), "prompt": prompt}
+
+
+def llm_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """LLMで要約するよ〜🧠（上流の枠は優先度スケジューラーが配る）"""
+    return {"summary": context["service"].complete_summary(context["prompt"], context["normalized_options"])}
+
+
+def store_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """要約をトークン数と一緒にストアに保存するよ〜💾（検索インデックスも一緒に更新される）"""
+    get_store().save_summary(context["video_id"], context["options_key"], context["summary"], context.get("usage"))
+    return {}
+
+
+def chapters_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    字幕をチャプターに分けて、チャプターごとに並列で要約するよ〜📚（チャプターはストアに1個ずつキャッシュ）
+
+    例外:
+        PerplexityError: チャプターか全体のまとめの要約に失敗した場合
+    """
+    result = summarize_chapters(
+        context["video_id"], context["service"], context["segments"], context.get("language"),
+        context.get("options") or {}, context.get("window_seconds") or CHAPTER_WINDOW_SECONDS,
+        on_chapter=context.get("on_chapter")
+    )
+    return {"chapters": result["chapters"], "summary": result["overall"]}
+
+
+def live_stage(context: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    ライブ配信の要約を、前回から増えた字幕だけで更新するよ〜📡（字幕が空っぽならパイプラインを止める）
+
+    例外:
+        PerplexityError: 要約に失敗した場合
+    """
+    if not context["segments"]:
+        return None
+    result = refresh_live_summary(
+        context["video_id"], context["service"], context["segments"], context.get("language"), context.get("options") or {}
+    )
+    return {"live": result, "summary": result["summary"], "options_key": result["options_key"]}
+
+
+def live_store_stage(context: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    更新したライブ要約と伸びた字幕をストアに保存するよ〜💾（/summaries・検索・質問も最新の配信で答える）
+    更新しなかったときは何もしない
+    """
+    if context["live"]["updated"]:
+        store = get_store()
+        store.save_transcript(context["video_id"], context["segments"], context.get("language"))
+        store.save_summary(context["video_id"], context["options_key"], context["summary"], context.get("usage"))
+    return {}
+
+
+def build_summary_pipeline(name: str = "summary") -> Pipeline:
+    """
+    標準の要約パイプラインを組み立てるよ〜🏗️（字幕はストア→YouTubeの順で探す）
+
+    引数:
+        name (str): パイプライン名（メトリクスのラベル）
+
+    戻り値:
+        Pipeline: 要約パイプライン
+    """
+    return Pipeline(name, [
+        Stage(STAGE_PARSE, parse_stage, provides=("video_id",)),
+        _captions_stage,
+        Stage(STAGE_CLEAN, clean_stage, provides=("captions",)),
+        Stage(STAGE_BUDGET, budget_stage, provides=("source", "source_label")),
+        Stage(STAGE_PROMPT, prompt_stage, provides=("prompt",)),
+        Stage(STAGE_LLM, llm_stage, provides=("summary",)),
+        Stage(STAGE_STORE, store_stage),
+    ])
+
+
+def build_chapter_pipeline(name: str = "chapters") -> Pipeline:
+    """
+    チャプター要約のパイプラインを組み立てるよ〜📚（字幕を取るところまでは標準と同じ・captions ステージも共有）
+
+    引数:
+        name (str): パイプライン名（メトリクスのラベル）
+
+    戻り値:
+        Pipeline: チャプター要約パイプライン
+    """
+    return build_summary_pipeline(name).replace(
+        budget=Stage(STAGE_CHAPTERS, chapters_stage, provides=("chapters", "summary")),
+        prompt=None, llm=None, store=None
+    )
+
+
+def build_live_pipeline(name: str = "live") -> Pipeline:
+    """
+    ライブ配信の差分要約パイプラインを組み立てるよ〜📡
+    字幕は伸び続けるから、ストアのキャッシュは使わずに毎回YouTubeから取る（captions ステージと同時実行数の枠は標準と同じ）
+
+    引数:
+        name (str): パイプライン名（メトリクスのラベル）
+
+    戻り値:
+        Pipeline: ライブ要約パイプライン
+    """
+    return build_summary_pipeline(name).replace(
+        parse=Stage(STAGE_PARSE, live_parse_stage, provides=("video_id", FRESH_CAPTIONS)),
+        clean=None,
+        budget=Stage(STAGE_LIVE, live_stage, provides=("live",)),
+        prompt=None, llm=None,
+        store=Stage(STAGE_STORE, live_store_stage)
+    )
+
+
+def run_summary_pipeline(pipeline: Pipeline, service: Any, **inputs: Any) -> Dict[str, Any]:
+    """
+    要約パイプラインを流すよ〜🏃‍♀️（使ったトークン数を集めて、store ステージで要約と一緒に保存する）
+
+    引数:
+        pipeline (Pipeline): 流すパイプライン
+        service (Any): 要約サービス（fit_caption_budget / build_summary_prompt / complete_summary を持ってるもの）
+        **inputs (Any): url か video_id、options、手元にある segments / language など
+
+    戻り値:
+        Dict[str, Any]: パイプラインのコンテキスト（summary / video_id / usage など）
+    """
+    with track_usage() as usage:
+        return pipeline.run(service=service, usage=usage, **inputs)
+
+
+_pipeline: Optional[Pipeline] = None
+_chapter_pipeline: Optional[Pipeline] = None
+_live_pipeline: Optional[Pipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_summary_pipeline() -> Pipeline:
+    """
+    プロセスで1つの標準パイプラインを返すよ〜🏭（ステージの同時実行数の枠はプロセス全体で共有）
+
+    戻り値:
+        Pipeline: 要約パイプライン
+    """
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                _pipeline = build_summary_pipeline()
+    return _pipeline
+
+
+def get_chapter_pipeline() -> Pipeline:
+    """
+    プロセスで1つのチャプター要約パイプラインを返すよ〜📚
+
+    戻り値:
+        Pipeline: チャプター要約パイプライン
+    """
+    global _chapter_pipeline
+    if _chapter_pipeline is None:
+        with _pipeline_lock:
+            if _chapter_pipeline is None:
+                _chapter_pipeline = build_chapter_pipeline()
+    return _chapter_pipeline
+
+
+def get_live_pipeline() -> Pipeline:
+    """
+    プロセスで1つのライブ要約パイプラインを返すよ〜📡
+
+    戻り値:
+        Pipeline: ライブ要約パイプライン
+    """
+    global _live_pipeline
+    if _live_pipeline is None:
+        with _pipeline_lock:
+            if _live_pipeline is None:
+                _live_pipeline = build_live_pipeline()
+    return _live_pipeline
@@ -14,10 +14,17 @@ NC='\033[0m' # No Color
 echo -e "${PINK}💅 おしゃれに準備開始...${NC}"
 sleep 1
 
+# 📁 スクリプトの場所（リポジトリのルート）から起動するよ（どこのPCでも動くように）
+cd "$(dirname "$0")"
+
 # バックエンド起動（バックグラウンド）
+# DEV=1 ならコード変更で自動リロードする開発モード、それ以外はワーカー複数の本番モード
 echo -e "${BLUE}🚀 バックエンド起動中...${NC}"
-cd /Users/yukimichihata/youtubeSummeryPYTHON/backend
-uvicorn main:app --reload --host 0.0.0.0 --port 8000 &
+if [ "${DEV:-0}" = "1" ]; then
+    uvicorn backend.main:app --reload --host 0.0.0.0 --port 8000 &
+else
+    python -m backend.server --host 0.0.0.0 --port 8000 &
+fi
 BACKEND_PID=$!
 echo -e "${GREEN}✅ バックエンドのサーバー起動完了！(PID: $BACKEND_PID)${NC}"
 
@@ -25,8 +32,7 @@ sleep 2
 
 # Streamlitフロントエンド起動
 echo -e "${BLUE}💻 Streamlitフロントエンド起動中...${NC}"
-cd /Users/yukimichihata/youtubeSummeryPYTHON/frontend
-streamlit run app.py --server.port 3000 &
+streamlit run frontend/app.py --server.port 3000 &
 FRONTEND_PID=$!
 echo -e "${GREEN}✅ Streamlitフロントエンド起動完了！(PID: $FRONTEND_PID)${NC}"
 